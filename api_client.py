@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the Real Estate Objects tooling
+
+All scripts talk to WordPress through a single pooled, keep-alive requests.Session
+so that TCP/TLS connections are reused between calls, and transient 429/5xx
+responses are retried with exponential backoff. get_data() negotiates JSON,
+XML, MessagePack or CBOR and decodes the body.
+"""
+
+import base64
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import api_formats
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_TIMEOUT = 30
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class ApiClient:
+    """Pooled HTTP client with optional Basic Authentication"""
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES,
+                 backoff_factor=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT):
+        """Create the session and mount a pooled adapter for http and https"""
+        self.timeout = timeout
+        self.auth_header = None
+
+        # POST is not in Retry's default idempotent method set, so creates are
+        # never replayed after a 5xx that may already have been applied.
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers['Connection'] = 'keep-alive'
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def set_auth(self, username, password):
+        """Build the Basic Authentication header once and return it"""
+        credentials = f"{username}:{password}"
+        encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
+        self.auth_header = f"Basic {encoded_credentials}"
+        return self.auth_header
+
+    def clear_auth(self):
+        """Forget the Authentication header (e.g. after a failed login)"""
+        self.auth_header = None
+
+    def request(self, method, url, authenticated=False, **kwargs):
+        """Send a request through the pooled session
+
+        The Authorization header is only attached when authenticated is True, so
+        anonymous reads stay anonymous even when credentials are configured.
+        """
+        headers = dict(kwargs.pop('headers', None) or {})
+        if authenticated and self.auth_header:
+            headers['Authorization'] = self.auth_header
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, headers=headers, **kwargs)
+
+    def get(self, url, **kwargs):
+        """Send a GET request"""
+        return self.request('GET', url, **kwargs)
+
+    def get_data(self, url, format='json', **kwargs):
+        """GET a response in a format and return (response, decoded body)
+
+        gzip and Brotli bodies are decompressed by requests (Brotli when the
+        brotli package is installed); the body is decoded with api_formats.
+        """
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers['Accept'] = api_formats.MEDIA_TYPES[format]
+        headers.setdefault('Accept-Encoding', api_formats.accept_encodings())
+        response = self.get(url, headers=headers, **kwargs)
+        return response, decode_response(response)
+
+    def post(self, url, **kwargs):
+        """Send a POST request"""
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        """Send a PUT request"""
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        """Send a DELETE request"""
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+
+def decode_response(response):
+    """Decode a response body according to its Content-Type"""
+    return api_formats.decode(response.content, api_formats.format_of(response.headers.get('Content-Type')))
+
+
+def add_client_arguments(parser):
+    """Add the shared connection pool / retry options to an argparse parser"""
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help=f'HTTP connection pool size (default: {DEFAULT_POOL_SIZE})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'Retries on 429/5xx responses (default: {DEFAULT_RETRIES})')
+    parser.add_argument('--backoff', type=float, default=DEFAULT_BACKOFF,
+                        help=f'Exponential backoff factor in seconds (default: {DEFAULT_BACKOFF})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Request timeout in seconds (default: {DEFAULT_TIMEOUT})')
+
+
+def client_from_args(args, min_pool_size=0):
+    """Create an ApiClient from parsed add_client_arguments() options"""
+    return ApiClient(
+        pool_size=max(args.pool_size, min_pool_size),
+        retries=args.retries,
+        backoff_factor=args.backoff,
+        timeout=args.timeout,
+    )
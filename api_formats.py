@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Response formats of the Real Estate Objects REST API
+
+GET /properties negotiates JSON, XML, MessagePack and CBOR through the Accept
+header and gzip or Brotli through Accept-Encoding. This module encodes and
+decodes the two binary formats for the local server and the clients. The
+msgpack and cbor2 packages are used when they are installed; otherwise the
+built-in encoders and decoders below handle the types the API sends (maps,
+arrays, strings, integers, floats, booleans and null).
+"""
+
+import gzip
+import json
+import struct
+import xml.etree.ElementTree as ElementTree
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'xml': 'application/xml',
+    'msgpack': 'application/msgpack',
+    'cbor': 'application/cbor',
+}
+
+# Accepted spellings of the media types, as Real_Estate_Encoder::negotiate_format() reads them
+FORMAT_ALIASES = {
+    'application/json': 'json',
+    'application/xml': 'xml',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack',
+    'application/cbor': 'cbor',
+}
+
+BINARY_FORMATS = ('msgpack', 'cbor')
+
+
+def parse_header_values(header):
+    """Split an Accept or Accept-Encoding header into (value, q, position) tuples"""
+    values = []
+    for position, part in enumerate((header or '').split(',')):
+        value, _, params = part.partition(';')
+        value = value.strip().lower()
+        if not value:
+            continue
+
+        q = 1.0
+        for param in params.split(';'):
+            name, _, number = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        values.append((value, q, position))
+    return values
+
+
+def negotiate_format(accept, binary=True):
+    """Pick the response format for an Accept header like the plugin does
+
+    The highest q wins; on a tie an exact media type beats a wildcard and an
+    earlier entry beats a later one. Wildcards and unknown types mean JSON.
+    """
+    best = None
+    for value, q, position in parse_header_values(accept):
+        if q <= 0:
+            continue
+
+        format = FORMAT_ALIASES.get(value)
+        if format in BINARY_FORMATS and not binary:
+            format = None
+        if format is None and value not in ('*/*', 'application/*'):
+            continue
+
+        rank = (q, format is not None, -position)
+        if best is None or rank > best[0]:
+            best = (rank, format or 'json')
+
+    return best[1] if best else 'json'
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick br, gzip or None for an Accept-Encoding header like the plugin does
+
+    Brotli is only offered when the brotli package is installed; ties go to it.
+    """
+    available = {'br': 0.0} if brotli is not None else {}
+    available['gzip'] = 0.0
+    listed = set()
+    wildcard = None
+
+    for value, q, _ in parse_header_values(accept_encoding):
+        value = 'gzip' if value == 'x-gzip' else value
+        if value == '*':
+            wildcard = q
+        elif value in available:
+            available[value] = q
+            listed.add(value)
+
+    if wildcard is not None:
+        for coding in available.keys() - listed:
+            available[coding] = wildcard
+
+    best = None
+    for coding, q in available.items():
+        if q > 0 and (best is None or q > available[best]):
+            best = coding
+    return best
+
+
+def compress(body, encoding):
+    """Apply a br or gzip Content-Encoding with the plugin's levels"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def pack_msgpack(data):
+    """Encode data as MessagePack"""
+    if msgpack is not None:
+        return msgpack.packb(data, use_bin_type=True)
+
+    parts = []
+
+    def write(value):
+        if value is None:
+            parts.append(b'\xc0')
+        elif value is True:
+            parts.append(b'\xc3')
+        elif value is False:
+            parts.append(b'\xc2')
+        elif isinstance(value, int):
+            if 0 <= value < 0x80:
+                parts.append(struct.pack('B', value))
+            elif -32 <= value < 0:
+                parts.append(struct.pack('b', value))
+            elif 0 <= value <= 0xff:
+                parts.append(struct.pack('>BB', 0xcc, value))
+            elif 0 <= value <= 0xffff:
+                parts.append(struct.pack('>BH', 0xcd, value))
+            elif 0 <= value <= 0xffffffff:
+                parts.append(struct.pack('>BI', 0xce, value))
+            elif value > 0:
+                parts.append(struct.pack('>BQ', 0xcf, value))
+            elif value >= -0x80:
+                parts.append(struct.pack('>Bb', 0xd0, value))
+            elif value >= -0x8000:
+                parts.append(struct.pack('>Bh', 0xd1, value))
+            elif value >= -0x80000000:
+                parts.append(struct.pack('>Bi', 0xd2, value))
+            else:
+                parts.append(struct.pack('>Bq', 0xd3, value))
+        elif isinstance(value, float):
+            parts.append(struct.pack('>Bd', 0xcb, value))
+        elif isinstance(value, str):
+            encoded = value.encode('utf-8')
+            write_length(len(encoded), 0xa0, 32, (0xd9, 0xda, 0xdb))
+            parts.append(encoded)
+        elif isinstance(value, (bytes, bytearray)):
+            write_length(len(value), 0, 0, (0xc4, 0xc5, 0xc6))
+            parts.append(bytes(value))
+        elif isinstance(value, dict):
+            write_length(len(value), 0x80, 16, (None, 0xde, 0xdf))
+            for key, item in value.items():
+                write(key)
+                write(item)
+        elif isinstance(value, (list, tuple)):
+            write_length(len(value), 0x90, 16, (None, 0xdc, 0xdd))
+            for item in value:
+                write(item)
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+    def write_length(length, fix, fix_limit, codes):
+        """Write a fix* header or the shortest of the 8-, 16- and 32-bit length forms in `codes`"""
+        if length < fix_limit:
+            parts.append(struct.pack('B', fix | length))
+        elif length <= 0xff and codes[0] is not None:
+            parts.append(struct.pack('>BB', codes[0], length))
+        elif length <= 0xffff:
+            parts.append(struct.pack('>BH', codes[1], length))
+        else:
+            parts.append(struct.pack('>BI', codes[2], length))
+
+    write(data)
+    return b''.join(parts)
+
+
+def unpack_msgpack(body):
+    """Decode a MessagePack document"""
+    if msgpack is not None:
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+
+    view = memoryview(body)
+    position = 0
+
+    def take(size):
+        nonlocal position
+        chunk = view[position:position + size]
+        if len(chunk) < size:
+            raise ValueError('Truncated MessagePack document')
+        position += size
+        return chunk
+
+    def unpack(format):
+        return struct.unpack(format, take(struct.calcsize(format)))[0]
+
+    def read():
+        code = take(1)[0]
+
+        if code < 0x80:
+            return code
+        if code >= 0xe0:
+            return code - 0x100
+        if code & 0xe0 == 0xa0:
+            return bytes(take(code & 0x1f)).decode('utf-8')
+        if code & 0xf0 == 0x90:
+            return [read() for _ in range(code & 0x0f)]
+        if code & 0xf0 == 0x80:
+            return read_map(code & 0x0f)
+
+        if code == 0xc0:
+            return None
+        if code == 0xc2:
+            return False
+        if code == 0xc3:
+            return True
+        if code in SIMPLE_NUMBERS:
+            return unpack(SIMPLE_NUMBERS[code])
+        if code in (0xd9, 0xda, 0xdb):
+            return bytes(take(unpack(LENGTHS[code - 0xd9]))).decode('utf-8')
+        if code in (0xc4, 0xc5, 0xc6):
+            return bytes(take(unpack(LENGTHS[code - 0xc4])))
+        if code in (0xdc, 0xdd):
+            return [read() for _ in range(unpack(LENGTHS[code - 0xdb]))]
+        if code in (0xde, 0xdf):
+            return read_map(unpack(LENGTHS[code - 0xdd]))
+
+        raise ValueError(f"Unsupported MessagePack type 0x{code:02x}")
+
+    def read_map(length):
+        result = {}
+        for _ in range(length):
+            key = read()
+            result[key] = read()
+        return result
+
+    return read()
+
+
+LENGTHS = ('>B', '>H', '>I')
+
+SIMPLE_NUMBERS = {
+    0xca: '>f', 0xcb: '>d',
+    0xcc: '>B', 0xcd: '>H', 0xce: '>I', 0xcf: '>Q',
+    0xd0: '>b', 0xd1: '>h', 0xd2: '>i', 0xd3: '>q',
+}
+
+
+def pack_cbor(data):
+    """Encode data as CBOR (RFC 8949)"""
+    if cbor2 is not None:
+        return cbor2.dumps(data)
+
+    parts = []
+
+    def head(major, value):
+        if value < 24:
+            parts.append(struct.pack('B', major << 5 | value))
+        elif value <= 0xff:
+            parts.append(struct.pack('>BB', major << 5 | 24, value))
+        elif value <= 0xffff:
+            parts.append(struct.pack('>BH', major << 5 | 25, value))
+        elif value <= 0xffffffff:
+            parts.append(struct.pack('>BI', major << 5 | 26, value))
+        else:
+            parts.append(struct.pack('>BQ', major << 5 | 27, value))
+
+    def write(value):
+        if value is None:
+            parts.append(b'\xf6')
+        elif value is True:
+            parts.append(b'\xf5')
+        elif value is False:
+            parts.append(b'\xf4')
+        elif isinstance(value, int):
+            if value >= 0:
+                head(0, value)
+            else:
+                head(1, -1 - value)
+        elif isinstance(value, float):
+            parts.append(struct.pack('>Bd', 0xfb, value))
+        elif isinstance(value, str):
+            encoded = value.encode('utf-8')
+            head(3, len(encoded))
+            parts.append(encoded)
+        elif isinstance(value, (bytes, bytearray)):
+            head(2, len(value))
+            parts.append(bytes(value))
+        elif isinstance(value, dict):
+            head(5, len(value))
+            for key, item in value.items():
+                write(key)
+                write(item)
+        elif isinstance(value, (list, tuple)):
+            head(4, len(value))
+            for item in value:
+                write(item)
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__} as CBOR")
+
+    write(data)
+    return b''.join(parts)
+
+
+def unpack_cbor(body):
+    """Decode a CBOR document; tags are skipped and indefinite lengths are not supported"""
+    if cbor2 is not None:
+        return cbor2.loads(body)
+
+    view = memoryview(body)
+    position = 0
+
+    def take(size):
+        nonlocal position
+        chunk = view[position:position + size]
+        if len(chunk) < size:
+            raise ValueError('Truncated CBOR document')
+        position += size
+        return chunk
+
+    def argument(info):
+        if info < 24:
+            return info
+        if 24 <= info <= 27:
+            size = 1 << (info - 24)
+            return int.from_bytes(take(size), 'big')
+        raise ValueError('Indefinite-length CBOR items are not supported')
+
+    def read():
+        initial = take(1)[0]
+        major, info = initial >> 5, initial & 0x1f
+
+        if major == 0:
+            return argument(info)
+        if major == 1:
+            return -1 - argument(info)
+        if major == 2:
+            return bytes(take(argument(info)))
+        if major == 3:
+            return bytes(take(argument(info))).decode('utf-8')
+        if major == 4:
+            return [read() for _ in range(argument(info))]
+        if major == 5:
+            result = {}
+            for _ in range(argument(info)):
+                key = read()
+                result[key] = read()
+            return result
+        if major == 6:
+            argument(info)
+            return read()
+
+        if info == 20:
+            return False
+        if info == 21:
+            return True
+        if info in (22, 23):
+            return None
+        if info == 25:
+            return struct.unpack('>e', take(2))[0]
+        if info == 26:
+            return struct.unpack('>f', take(4))[0]
+        if info == 27:
+            return struct.unpack('>d', take(8))[0]
+
+        raise ValueError(f"Unsupported CBOR simple value {info}")
+
+    return read()
+
+
+def encode(data, format):
+    """Encode data as json, msgpack or cbor"""
+    if format == 'msgpack':
+        return pack_msgpack(data)
+    if format == 'cbor':
+        return pack_cbor(data)
+    return json.dumps(data).encode('utf-8')
+
+
+def decode(body, format):
+    """Decode a response body of any negotiated format
+
+    XML is returned as an ElementTree element, since its structure does not
+    map back to JSON types.
+    """
+    if format == 'msgpack':
+        return unpack_msgpack(body)
+    if format == 'cbor':
+        return unpack_cbor(body)
+    if format == 'xml':
+        return ElementTree.fromstring(body)
+    return json.loads(body)
+
+
+def format_of(content_type):
+    """Format name of a Content-Type header value"""
+    return FORMAT_ALIASES.get((content_type or '').partition(';')[0].strip().lower(), 'json')
+
+
+def accept_encodings():
+    """Content codings this Python can decode, for the Accept-Encoding header"""
+    return 'br, gzip' if brotli is not None else 'gzip'
+
+
+def decompress(body, content_encoding):
+    """Undo a gzip or Brotli Content-Encoding"""
+    content_encoding = (content_encoding or '').strip().lower()
+    if content_encoding in ('gzip', 'x-gzip'):
+        return gzip.decompress(body)
+    if content_encoding == 'br':
+        if brotli is None:
+            raise ValueError('Install the brotli package to decode Brotli responses')
+        return brotli.decompress(body)
+    if content_encoding not in ('', 'identity'):
+        raise ValueError(f"Unsupported Content-Encoding {content_encoding}")
+    return body
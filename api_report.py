@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test results and reports for the Real Estate Objects API test scripts
+
+Collects pass/fail results with the wall time of every test, runs independent
+checks on a thread pool while keeping each check's printed output together,
+and writes the results as a JSON report or a JUnit XML file for CI, with the
+slowest tests listed first.
+"""
+
+import io
+import sys
+import json
+import time
+import socket
+import threading
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+SLOWEST_COUNT = 5
+
+
+class ThreadOutput:
+    """sys.stdout stand-in that buffers what each worker thread prints
+
+    Threads without a buffer write straight through, so the main thread's
+    output is unaffected.
+    """
+
+    def __init__(self, stream):
+        """Wrap the real stdout"""
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        """Write to the current thread's buffer, or to the real stream"""
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def flush(self):
+        """Flush the real stream"""
+        self.stream.flush()
+
+    def start(self):
+        """Start buffering the current thread's output"""
+        self.local.buffer = io.StringIO()
+
+    def stop(self):
+        """Stop buffering and return what the current thread printed"""
+        text = self.local.buffer.getvalue()
+        self.local.buffer = None
+        return text
+
+
+class TestResults:
+    """Thread-safe pass/fail results with per-test wall time"""
+
+    def __init__(self, suite):
+        """Initialize an empty result set for a named test suite"""
+        self.suite = suite
+        self.details = []
+        self.passed = 0
+        self.failed = 0
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def record(self, name, success, message=None):
+        """Record the result of a test; the running timed() call adds its duration"""
+        label = getattr(self.local, 'label', None)
+        detail = {
+            'name': f"{name} [{label}]" if label else name,
+            'status': "PASS" if success else "FAIL",
+            'message': message,
+            'duration': None,
+        }
+
+        with self.lock:
+            self.details.append(detail)
+            if success:
+                self.passed += 1
+            else:
+                self.failed += 1
+
+        records = getattr(self.local, 'records', None)
+        if records is not None:
+            records.append(detail)
+
+        return success
+
+    def timed(self, test, *args):
+        """Run one test method and set its wall time on the results it recorded"""
+        records = []
+        self.local.records = records
+        started = time.perf_counter()
+
+        try:
+            return test(*args)
+        except Exception as e:
+            # Test methods record their own errors; this catches bugs in them
+            print(f"✗ Error: {str(e)}")
+            self.record(test.__name__, False, str(e))
+            return None
+        finally:
+            duration = time.perf_counter() - started
+            self.local.records = None
+            for detail in records:
+                detail['duration'] = duration
+
+    def run_parallel(self, tasks, workers):
+        """Run (label, callable) tasks on `workers` threads
+
+        Each task may run several timed() tests in sequence. What a task prints
+        is buffered and written as one block when it finishes, so the output of
+        concurrent tasks does not interleave. The label (e.g. "chain 2") is
+        added to the names of the results the task records.
+        """
+        if workers <= 1:
+            for label, task in tasks:
+                self.local.label = label
+                task()
+            self.local.label = None
+            return
+
+        output = ThreadOutput(sys.stdout)
+        print_lock = threading.Lock()
+
+        def run(label, task):
+            self.local.label = label
+            output.start()
+            try:
+                task()
+            finally:
+                text = output.stop()
+                self.local.label = None
+                with print_lock:
+                    output.stream.write(text)
+                    output.stream.flush()
+
+        sys.stdout = output
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for future in [executor.submit(run, label, task) for label, task in tasks]:
+                    future.result()
+        finally:
+            sys.stdout = output.stream
+
+    @property
+    def elapsed(self):
+        """Seconds since the suite started"""
+        return time.perf_counter() - self.started
+
+    def slowest(self, count=SLOWEST_COUNT):
+        """The `count` slowest timed results, slowest first"""
+        timed = [detail for detail in self.details if detail['duration'] is not None]
+        return sorted(timed, key=lambda detail: detail['duration'], reverse=True)[:count]
+
+    def print_slowest(self, count=SLOWEST_COUNT):
+        """Print the slowest tests with their share of the summed test time"""
+        slowest = self.slowest(count)
+        if not slowest:
+            return
+
+        total = sum(detail['duration'] for detail in self.details if detail['duration'] is not None)
+        print(f"\nSlowest tests (wall time {self.elapsed:.2f}s, summed test time {total:.2f}s):")
+        for detail in slowest:
+            share = detail['duration'] / total * 100 if total else 0
+            print(f"  {detail['duration']:>7.2f}s {share:>4.0f}%  {detail['name']}")
+
+    def to_dict(self, extra=None):
+        """Results as a JSON-serializable report"""
+        report = {
+            'suite': self.suite,
+            'started': self.started_at.isoformat(timespec='seconds'),
+            'elapsed': round(self.elapsed, 3),
+            'passed': self.passed,
+            'failed': self.failed,
+            'tests': [dict(detail, duration=round(detail['duration'], 3) if detail['duration'] is not None else None)
+                      for detail in self.details],
+            'slowest': [detail['name'] for detail in self.slowest()],
+        }
+        report.update(extra or {})
+        return report
+
+    def write_json(self, path, extra=None):
+        """Write the JSON report"""
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(extra), file, indent=2, ensure_ascii=False)
+        print(f"✓ JSON report written to {path}")
+
+    def write_junit(self, path):
+        """Write the results as a JUnit XML test suite"""
+        suite = ElementTree.Element('testsuite', {
+            'name': self.suite,
+            'tests': str(self.passed + self.failed),
+            'failures': str(self.failed),
+            'errors': '0',
+            'time': f"{self.elapsed:.3f}",
+            'timestamp': self.started_at.strftime('%Y-%m-%dT%H:%M:%S'),
+            'hostname': socket.gethostname(),
+        })
+
+        for detail in self.details:
+            case = ElementTree.SubElement(suite, 'testcase', {
+                'classname': self.suite,
+                'name': detail['name'],
+                'time': f"{detail['duration'] or 0:.3f}",
+            })
+            if detail['status'] == 'FAIL':
+                failure = ElementTree.SubElement(case, 'failure', {'message': detail['message'] or 'Failed'})
+                failure.text = detail['message'] or ''
+
+        ElementTree.ElementTree(suite).write(path, encoding='utf-8', xml_declaration=True)
+        print(f"✓ JUnit report written to {path}")
+
+
+def add_report_arguments(parser, default_workers=4):
+    """Add the shared parallelism and report options to an argparse parser"""
+    parser.add_argument('--workers', type=int, default=default_workers,
+                        help=f'Checks run concurrently; 1 runs them one by one (default: {default_workers})')
+    parser.add_argument('--report-json', metavar='PATH', help='Write a JSON report with per-test wall times')
+    parser.add_argument('--junit', metavar='PATH', help='Write a JUnit XML report')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print full responses')
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Latency statistics helpers for the Real Estate Objects tooling
+
+Used by the mock data generator and the API benchmark to aggregate request
+latencies, throughput and error rates, and by the API tester to aggregate the
+per-phase Server-Timing headers of the plugin.
+"""
+
+import re
+import math
+import threading
+
+SERVER_TIMING_PARAM = re.compile(r';\s*([a-z]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;,]*)', re.I)
+SERVER_TIMING_METRIC = re.compile(r'\s*([!#$%&\'*+.^_`|~0-9a-z-]+)((?:\s*;\s*[a-z]+\s*=\s*(?:"(?:[^"\\]|\\.)*"|[^;,]*))*)\s*(?:,|$)', re.I)
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values (nearest-rank), or 0 if empty"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class LatencyRecorder:
+    """Thread-safe collector of request latencies and errors for one endpoint"""
+
+    def __init__(self, name):
+        """Initialize an empty recorder"""
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+        self.lock = threading.Lock()
+
+    def record(self, seconds, status=None, success=True):
+        """Record one finished request"""
+        with self.lock:
+            self.latencies.append(seconds)
+            if status is not None:
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+            if not success:
+                self.errors += 1
+
+    def record_error(self, seconds, reason):
+        """Record a request that failed without an HTTP status"""
+        self.record(seconds, status=reason, success=False)
+
+    def summary(self, elapsed):
+        """Return aggregate statistics for a run that took elapsed seconds"""
+        with self.lock:
+            latencies = list(self.latencies)
+            errors = self.errors
+            statuses = dict(self.statuses)
+
+        count = len(latencies)
+        return {
+            'name': self.name,
+            'requests': count,
+            'errors': errors,
+            'error_rate': errors / count if count else 0.0,
+            'throughput': count / elapsed if elapsed > 0 else 0.0,
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies) if latencies else 0.0,
+            'statuses': statuses,
+        }
+
+
+def parse_server_timing(header):
+    """Parse a Server-Timing header into {name: (milliseconds, database queries)}
+
+    Query counts come from desc="N queries" as the plugin writes them; other
+    metrics get a count of None.
+    """
+    metrics = {}
+    for match in SERVER_TIMING_METRIC.finditer(header or ''):
+        if not match.group(1):
+            continue
+        params = {name.lower(): value.strip().strip('"') for name, value in SERVER_TIMING_PARAM.findall(match.group(2))}
+        try:
+            duration = float(params.get('dur', 0))
+        except ValueError:
+            duration = 0.0
+        count = re.match(r'(\d+) quer', params.get('desc', ''))
+        metrics[match.group(1)] = (duration, int(count.group(1)) if count else None)
+    return metrics
+
+
+class ServerTimingRecorder:
+    """Thread-safe collector of Server-Timing phases across responses"""
+
+    def __init__(self):
+        """Initialize an empty recorder"""
+        self.durations = {}
+        self.queries = {}
+        self.responses = 0
+        self.lock = threading.Lock()
+
+    def record(self, header):
+        """Record the phases of one response; return False if it had none"""
+        metrics = parse_server_timing(header)
+        if not metrics:
+            return False
+
+        with self.lock:
+            self.responses += 1
+            for name, (duration, queries) in metrics.items():
+                self.durations.setdefault(name, []).append(duration)
+                if queries is not None:
+                    self.queries.setdefault(name, []).append(queries)
+        return True
+
+    def summary(self):
+        """Return per-phase statistics in milliseconds, in first-seen order"""
+        with self.lock:
+            durations = {name: list(values) for name, values in self.durations.items()}
+            queries = {name: list(values) for name, values in self.queries.items()}
+            responses = self.responses
+
+        total = durations.get('total')
+        total_mean = sum(total) / len(total) if total else 0.0
+
+        phases = []
+        for name, values in durations.items():
+            mean = sum(values) / len(values)
+            counts = queries.get(name)
+            phases.append({
+                'name': name,
+                'samples': len(values),
+                'mean': mean,
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'max': max(values),
+                'queries': sum(counts) / len(counts) if counts else None,
+                'share': mean / total_mean if total_mean and name != 'total' else None,
+            })
+
+        return {'responses': responses, 'phases': phases}
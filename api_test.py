@@ -5,60 +5,143 @@ Real Estate Objects API Test Script
 This script tests the Real Estate Objects WordPress plugin API endpoints.
 """
 
-import requests
 import json
 import sys
 import argparse
-import base64
+import random
+import threading
+import time
+from functools import partial
 from pprint import pprint
 
+import api_formats
+from api_client import ApiClient, add_client_arguments, client_from_args
+from api_report import TestResults, add_report_arguments
+from api_stats import LatencyRecorder, ServerTimingRecorder, parse_server_timing
+
+BENCHMARK_ENDPOINTS = ('list', 'single', 'xml')
+FIELDSET_VARIANTS = [
+    ('full', {}),
+    ('compact', {'compact': 'true'}),
+    ('map', {'fields': 'id,coordinates,eco_rating'}),
+    ('premises', {'fields': 'id,premises.rooms,premises.area'}),
+]
+FIELDSET_KEYS = {
+    'compact': {'id', 'title', 'districts', 'coordinates', 'floors', 'building_type', 'eco_rating'},
+    'map': {'id', 'coordinates', 'eco_rating'},
+    'premises': {'id', 'premises'},
+}
+BENCHMARK_FILTERS = {
+    'district': ['central', 'northern', 'southern', 'eastern', 'western'],
+    'building_type': ['panel', 'brick', 'foam_block'],
+    'min_floors': list(range(1, 11)),
+    'max_floors': list(range(10, 21)),
+    'min_eco_rating': list(range(1, 6)),
+}
+
 class RealEstateApiTester:
     """Class to test the Real Estate Objects API"""
 
-    def __init__(self, base_url, username=None, password=None):
-        """Initialize with the WordPress site URL"""
+    def __init__(self, base_url, username=None, password=None, client=None, workers=4, chains=1, verbose=False):
+        """Initialize with the WordPress site URL
+
+        `workers` read checks run concurrently, followed by `chains` isolated
+        create/update/delete lifecycles; `verbose` prints full responses.
+        """
         self.base_url = base_url.rstrip('/')
+        self.client = client or ApiClient()
         self.api_base = f"{self.base_url}/wp-json/real-estate/v1"
         self.username = username
         self.password = password
         self.auth_header = None
-        self.test_results = {
-            'passed': 0,
-            'failed': 0,
-            'details': []
-        }
+        self.workers = max(1, workers)
+        self.chains = max(0, chains)
+        self.verbose = verbose
+        self.results = TestResults('RealEstateApiTester')
+
+        # Collect the plugin's Server-Timing phases from every response
+        self.server_timing = ServerTimingRecorder()
+        self.client.session.hooks['response'].append(self.collect_server_timing)
 
         if username and password:
             # Set up basic auth for application passwords
             self.setup_auth()
 
+    def collect_server_timing(self, response, *args, **kwargs):
+        """requests response hook: record the Server-Timing header of API responses"""
+        if response.url.startswith(self.api_base):
+            self.server_timing.record(response.headers.get('Server-Timing'))
+        return response
+
+    def print_server_timing(self):
+        """Print the per-phase Server-Timing breakdown across all collected responses"""
+        stats = self.server_timing.summary()
+        if not stats['responses']:
+            print("\nNo Server-Timing headers received "
+                  "(define REAL_ESTATE_OBJECTS_SERVER_TIMING to enable them)")
+            return
+
+        print(f"\n===== SERVER TIMING ({stats['responses']} responses) =====")
+        print(f"{'phase':<11} {'samples':>7} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'max ms':>8} {'queries':>8} {'share':>6}")
+        for phase in stats['phases']:
+            queries = f"{phase['queries']:.1f}" if phase['queries'] is not None else '-'
+            share = f"{phase['share'] * 100:.0f}%" if phase['share'] is not None else ''
+            print(f"{phase['name']:<11} {phase['samples']:>7} {phase['mean']:>8.2f} {phase['p50']:>8.2f} "
+                  f"{phase['p95']:>8.2f} {phase['max']:>8.2f} {queries:>8} {share:>6}")
+        print("=============================")
+
+    def test_server_timing(self):
+        """Check the Server-Timing phases of an uncached GET /properties page, if enabled"""
+        print("\n=== Testing Server-Timing instrumentation ===")
+
+        try:
+            # Authenticated requests bypass the response cache, so every phase runs
+            response = self.client.get(f"{self.api_base}/properties", params={'per_page': 20},
+                                       authenticated=bool(self.auth_header))
+            header = response.headers.get('Server-Timing')
+
+            if not header:
+                print("Server-Timing is disabled on this site, skipping")
+                return None
+
+            phases = set(parse_server_timing(header))
+            missing = {'query', 'prepare', 'serialize', 'total'} - phases
+            if response.status_code != 200 or missing:
+                print(f"✗ Missing phases: {', '.join(sorted(missing))} (HTTP {response.status_code})")
+                self.record_test_result("Server-Timing", False, f"Missing phases: {', '.join(sorted(missing))}")
+                return False
+
+            print(f"✓ Server-Timing: {header}")
+            self.record_test_result("Server-Timing", True)
+            return True
+        except Exception as e:
+            print(f"✗ Error: {str(e)}")
+            self.record_test_result("Server-Timing", False, str(e))
+            return False
+
     def record_test_result(self, test_name, success, message=None):
         """Record the result of a test"""
-        status = "PASS" if success else "FAIL"
-        self.test_results['details'].append({
-            'name': test_name,
-            'status': status,
-            'message': message
-        })
-
-        if success:
-            self.test_results['passed'] += 1
-        else:
-            self.test_results['failed'] += 1
+        return self.results.record(test_name, success, message)
 
-        return success
+    def print_sample(self, label, item):
+        """Print a property in full with --verbose, otherwise as one line"""
+        if self.verbose:
+            print(f"\n{label}:")
+            pprint(item)
+        else:
+            print(f"  {label}: #{item.get('id')} {item.get('title')!r}, "
+                  f"{len(item.get('premises') or [])} premises")
 
     def setup_auth(self):
         """Set up HTTP Basic Authentication using Application Password"""
         if self.username and self.password:
-            # Create the basic auth header
-            credentials = f"{self.username}:{self.password}"
-            encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-            self.auth_header = f"Basic {encoded_credentials}"
+            # Create the basic auth header once for the shared session
+            self.auth_header = self.client.set_auth(self.username, self.password)
             print("✓ Authentication configured")
 
             # Verify authentication works
-            self.test_auth()
+            self.results.timed(self.test_auth)
         else:
             print("✗ Username and password required for authentication")
             self.record_test_result("Authentication configuration", False, "Missing credentials")
@@ -67,11 +150,9 @@ class RealEstateApiTester:
         """Test if authentication works by attempting to access a protected endpoint"""
         print("\n=== Testing Authentication ===")
 
-        headers = {'Authorization': self.auth_header}
-
         try:
             # Try to access a WordPress endpoint that requires authentication
-            response = requests.get(f"{self.base_url}/wp-json/wp/v2/users/me", headers=headers)
+            response = self.client.get(f"{self.base_url}/wp-json/wp/v2/users/me", authenticated=True)
 
             if response.status_code == 200:
                 user_data = response.json()
@@ -82,20 +163,22 @@ class RealEstateApiTester:
                 print(f"✗ Authentication failed: {response.status_code}")
                 print(response.text)
                 self.auth_header = None  # Reset auth if failed
+                self.client.clear_auth()
                 self.record_test_result("Authentication", False, f"Status code: {response.status_code}")
                 return False
         except Exception as e:
             print(f"✗ Authentication error: {str(e)}")
             self.auth_header = None  # Reset auth if error
+            self.client.clear_auth()
             self.record_test_result("Authentication", False, str(e))
             return False
 
     def test_get_properties(self):
-        """Test GET /properties endpoint"""
+        """Test GET /properties endpoint; returns the properties on success"""
         print("\n=== Testing GET /properties ===")
 
         try:
-            response = requests.get(f"{self.api_base}/properties")
+            response = self.client.get(f"{self.api_base}/properties")
 
             if response.status_code == 200:
                 data = response.json()
@@ -103,11 +186,10 @@ class RealEstateApiTester:
 
                 # Print first property if available
                 if data and len(data) > 0:
-                    print("\nSample property:")
-                    pprint(data[0])
+                    self.print_sample("Sample property", data[0])
 
                 self.record_test_result("GET /properties", True)
-                return True
+                return data
             else:
                 print(f"✗ GET /properties failed: {response.status_code}")
                 print(response.text)
@@ -123,12 +205,12 @@ class RealEstateApiTester:
         print(f"\n=== Testing GET /properties/{property_id} ===")
 
         try:
-            response = requests.get(f"{self.api_base}/properties/{property_id}")
+            response = self.client.get(f"{self.api_base}/properties/{property_id}")
 
             if response.status_code == 200:
                 data = response.json()
                 print(f"✓ GET /properties/{property_id} successful")
-                pprint(data)
+                self.print_sample("Property", data)
                 self.record_test_result(f"GET /properties/{property_id}", True)
                 return True
             else:
@@ -152,7 +234,7 @@ class RealEstateApiTester:
         }
 
         try:
-            response = requests.get(f"{self.api_base}/properties", params=filters)
+            response = self.client.get(f"{self.api_base}/properties", params=filters)
 
             if response.status_code == 200:
                 data = response.json()
@@ -160,8 +242,7 @@ class RealEstateApiTester:
 
                 # Print first property if available
                 if data and len(data) > 0:
-                    print("\nSample filtered property:")
-                    pprint(data[0])
+                    self.print_sample("Sample filtered property", data[0])
 
                 self.record_test_result("GET /properties with filters", True)
                 return True
@@ -175,6 +256,140 @@ class RealEstateApiTester:
             self.record_test_result("GET /properties with filters", False, str(e))
             return False
 
+    def test_cursor_pagination(self):
+        """Test walking the whole catalogue with cursor pagination"""
+        print("\n=== Testing GET /properties cursor pagination ===")
+
+        try:
+            params = {'per_page': 100, 'cursor': '*'}
+            seen = set()
+            pages = 0
+            total = None
+            started = time.perf_counter()
+
+            while True:
+                response = self.client.get(f"{self.api_base}/properties", params=params)
+
+                if response.status_code != 200:
+                    print(f"✗ Cursor page {pages + 1} failed: {response.status_code}")
+                    self.record_test_result("Cursor pagination", False, f"Status code: {response.status_code}")
+                    return False
+
+                if total is None:
+                    total = int(response.headers.get('X-WP-Total', 0))
+
+                ids = [item.get('id') for item in response.json()]
+                if seen.intersection(ids):
+                    print(f"✗ Page {pages + 1} repeats properties from earlier pages")
+                    self.record_test_result("Cursor pagination", False, "Duplicate properties across pages")
+                    return False
+
+                seen.update(ids)
+                pages += 1
+
+                next_cursor = response.headers.get('X-Real-Estate-Next-Cursor')
+                if not next_cursor:
+                    break
+                params = {'per_page': 100, 'cursor': next_cursor, 'include_totals': 'false'}
+
+            elapsed = time.perf_counter() - started
+            print(f"  Walked {len(seen)} properties in {pages} page(s) in {elapsed:.2f}s")
+
+            if len(seen) != total:
+                print(f"✗ Walked {len(seen)} properties, X-WP-Total is {total}")
+                self.record_test_result("Cursor pagination", False, f"{len(seen)} of {total} properties")
+                return False
+
+            invalid = self.client.get(f"{self.api_base}/properties", params={'cursor': 'not-a-cursor'})
+            if invalid.status_code != 400:
+                print(f"✗ Invalid cursor returned {invalid.status_code} instead of 400")
+                self.record_test_result("Cursor pagination", False, f"Invalid cursor status: {invalid.status_code}")
+                return False
+
+            print("✓ Cursor pagination successful")
+            self.record_test_result("Cursor pagination", True)
+            return True
+        except Exception as e:
+            print(f"✗ Error: {str(e)}")
+            self.record_test_result("Cursor pagination", False, str(e))
+            return False
+
+    def test_response_cache(self):
+        """Test that repeated GET /properties requests are served from the response cache"""
+        print("\n=== Testing GET /properties response cache ===")
+
+        params = {'per_page': 5}
+
+        try:
+            first = self.client.get(f"{self.api_base}/properties", params=params)
+            second = self.client.get(f"{self.api_base}/properties", params=params)
+
+            if first.status_code != 200 or second.status_code != 200:
+                print(f"✗ GET /properties failed: {first.status_code}/{second.status_code}")
+                self.record_test_result("Response cache", False, f"Status codes: {first.status_code}/{second.status_code}")
+                return False
+
+            cache_status = second.headers.get('X-Real-Estate-Cache')
+            etag = second.headers.get('ETag')
+            print(f"  First request:  {first.headers.get('X-Real-Estate-Cache')}")
+            print(f"  Second request: {cache_status} (ETag {etag})")
+
+            if cache_status != 'HIT' or not etag or second.json() != first.json():
+                print("✗ Second request was not served from the cache")
+                self.record_test_result("Response cache", False, f"Cache status: {cache_status}")
+                return False
+
+            conditional = self.client.get(
+                f"{self.api_base}/properties",
+                params=params,
+                headers={'If-None-Match': etag}
+            )
+
+            if conditional.status_code != 304:
+                print(f"✗ Conditional request returned {conditional.status_code} instead of 304")
+                self.record_test_result("Response cache", False, f"Conditional status: {conditional.status_code}")
+                return False
+
+            print("✓ Response cache hit and 304 Not Modified successful")
+            self.record_test_result("Response cache", True)
+            return True
+        except Exception as e:
+            print(f"✗ Error: {str(e)}")
+            self.record_test_result("Response cache", False, str(e))
+            return False
+
+    def test_cache_invalidation(self, property_id, expected_title, per_page=5):
+        """Test that a cached GET /properties page is not stale after a write
+
+        The page must have been requested before the write; parallel lifecycle
+        chains pass different page sizes so that each checks its own cache entry.
+        """
+        print(f"\n=== Testing response cache invalidation for property {property_id} ===")
+
+        try:
+            response = self.client.get(f"{self.api_base}/properties", params={'per_page': per_page})
+
+            if response.status_code != 200:
+                print(f"✗ GET /properties failed: {response.status_code}")
+                self.record_test_result("Response cache invalidation", False, f"Status code: {response.status_code}")
+                return False
+
+            item = next((p for p in response.json() if p.get('id') == property_id), None)
+            cache_status = response.headers.get('X-Real-Estate-Cache')
+
+            if cache_status == 'HIT' or not item or item.get('title') != expected_title:
+                print(f"✗ Stale response (cache {cache_status}, title {item.get('title') if item else None!r})")
+                self.record_test_result("Response cache invalidation", False, "Stale cached response")
+                return False
+
+            print(f"✓ Cache invalidated - title is {expected_title!r}")
+            self.record_test_result("Response cache invalidation", True)
+            return True
+        except Exception as e:
+            print(f"✗ Error: {str(e)}")
+            self.record_test_result("Response cache invalidation", False, str(e))
+            return False
+
     def test_create_property(self):
         """Test POST /properties endpoint"""
         print("\n=== Testing POST /properties ===")
@@ -216,15 +431,15 @@ class RealEstateApiTester:
         }
 
         headers = {
-            'Authorization': self.auth_header,
             'Content-Type': 'application/json'
         }
 
         try:
-            response = requests.post(
+            response = self.client.post(
                 f"{self.api_base}/properties",
                 headers=headers,
-                data=json.dumps(property_data)
+                data=json.dumps(property_data),
+                authenticated=True
             )
 
             if response.status_code in [200, 201]:
@@ -257,15 +472,15 @@ class RealEstateApiTester:
         }
 
         headers = {
-            'Authorization': self.auth_header,
             'Content-Type': 'application/json'
         }
 
         try:
-            response = requests.put(
+            response = self.client.put(
                 f"{self.api_base}/properties/{property_id}",
                 headers=headers,
-                data=json.dumps(update_data)
+                data=json.dumps(update_data),
+                authenticated=True
             )
 
             if response.status_code == 200:
@@ -294,14 +509,10 @@ class RealEstateApiTester:
             self.record_test_result(f"DELETE /properties/{property_id}", False, "Authentication required")
             return False
 
-        headers = {
-            'Authorization': self.auth_header
-        }
-
         try:
-            response = requests.delete(
+            response = self.client.delete(
                 f"{self.api_base}/properties/{property_id}",
-                headers=headers
+                authenticated=True
             )
 
             if response.status_code == 200:
@@ -329,7 +540,7 @@ class RealEstateApiTester:
         }
 
         try:
-            response = requests.get(f"{self.api_base}/properties", headers=headers)
+            response = self.client.get(f"{self.api_base}/properties", headers=headers)
 
             if response.status_code == 200:
                 if 'application/xml' in response.headers.get('Content-Type', ''):
@@ -353,85 +564,341 @@ class RealEstateApiTester:
             self.record_test_result("XML format", False, str(e))
             return False
 
+    def test_binary_formats(self):
+        """Test that MessagePack, CBOR and compressed responses decode to the JSON data"""
+        print("\n=== Testing MessagePack/CBOR and compression ===")
+
+        try:
+            params = {'per_page': 20}
+            success = True
+
+            response, expected = self.client.get_data(f"{self.api_base}/properties", params=params)
+            if response.status_code != 200:
+                print(f"✗ JSON request failed: {response.status_code}")
+                self.record_test_result("Binary formats", False, f"Status code: {response.status_code}")
+                return False
+
+            encoding = response.headers.get('Content-Encoding', 'identity')
+            print(f"  json     {len(response.content):>7} bytes decoded, Content-Encoding: {encoding}")
+
+            for output_format in api_formats.BINARY_FORMATS:
+                response, data = self.client.get_data(f"{self.api_base}/properties", output_format, params=params)
+                content_type = response.headers.get('Content-Type', '')
+
+                if response.status_code != 200 or api_formats.format_of(content_type) != output_format:
+                    print(f"✗ {output_format} request returned {response.status_code} {content_type}")
+                    success = False
+                elif data != expected:
+                    print(f"✗ {output_format} body differs from the JSON response")
+                    success = False
+                else:
+                    print(f"  {output_format:<8} {len(response.content):>7} bytes decoded, "
+                          f"Content-Encoding: {response.headers.get('Content-Encoding', 'identity')}")
+
+            if success:
+                print("✓ Binary formats match JSON")
+            self.record_test_result("Binary formats", success)
+            return success
+        except Exception as e:
+            print(f"✗ Error: {str(e)}")
+            self.record_test_result("Binary formats", False, str(e))
+            return False
+
+    def test_sparse_fieldsets(self, runs=5):
+        """Compare payload size and latency of full, compact and fields= responses"""
+        print("\n=== Testing GET /properties sparse fieldsets ===")
+
+        try:
+            print(f"  {'variant':<10} {'format':<6} {'bytes':>9} {'median':>9}")
+            success = True
+
+            for label, params in FIELDSET_VARIANTS:
+                for output_format, headers in (('json', {}), ('xml', {'Accept': 'application/xml'})):
+                    timings = []
+                    for _ in range(runs):
+                        # Authenticated requests bypass the anonymous response cache
+                        started = time.perf_counter()
+                        response = self.client.get(
+                            f"{self.api_base}/properties",
+                            params=dict(params, per_page=100),
+                            headers=headers,
+                            authenticated=bool(self.auth_header)
+                        )
+                        timings.append(time.perf_counter() - started)
+
+                    if response.status_code != 200:
+                        print(f"✗ {label} {output_format} request failed: {response.status_code}")
+                        success = False
+                        continue
+
+                    timings.sort()
+                    print(f"  {label:<10} {output_format:<6} {len(response.content):>9} {timings[len(timings) // 2] * 1000:>7.1f}ms")
+
+                    if output_format == 'json' and label in FIELDSET_KEYS:
+                        items = response.json()
+                        unexpected = [item for item in items if set(item) != FIELDSET_KEYS[label]]
+                        if label == 'premises':
+                            unexpected += [item for item in items
+                                           for row in item.get('premises', []) if set(row) != {'rooms', 'area'}]
+                        if unexpected:
+                            print(f"✗ {label} returned unexpected fields: {sorted(unexpected[0])}")
+                            success = False
+
+            invalid = self.client.get(f"{self.api_base}/properties", params={'fields': 'id,price'})
+            if invalid.status_code != 400:
+                print(f"✗ Unknown field returned {invalid.status_code} instead of 400")
+                success = False
+
+            if success:
+                print("✓ Sparse fieldsets successful")
+            self.record_test_result("Sparse fieldsets", success)
+            return success
+        except Exception as e:
+            print(f"✗ Error: {str(e)}")
+            self.record_test_result("Sparse fieldsets", False, str(e))
+            return False
+
+    def random_filters(self):
+        """Build a random combination of GET /properties filters"""
+        filters = {}
+        for name, values in BENCHMARK_FILTERS.items():
+            if random.random() < 0.5:
+                filters[name] = random.choice(values)
+        return filters
+
+    def discover_property_ids(self):
+        """Collect property IDs from the first page of GET /properties"""
+        response = self.client.get(f"{self.api_base}/properties", params={'per_page': 100})
+        if response.status_code != 200:
+            return []
+        return [item.get('id') for item in response.json() if item.get('id')]
+
+    def benchmark_request(self, endpoint, property_ids):
+        """Send one benchmark request to the given endpoint and return the response"""
+        if endpoint == 'single' and property_ids:
+            return self.client.get(f"{self.api_base}/properties/{random.choice(property_ids)}")
+        if endpoint == 'xml':
+            return self.client.get(
+                f"{self.api_base}/properties",
+                params=self.random_filters(),
+                headers={'Accept': 'application/xml'}
+            )
+        return self.client.get(f"{self.api_base}/properties", params=self.random_filters())
+
+    def run_benchmark(self, duration=30, concurrency=8, rate=None, endpoints=BENCHMARK_ENDPOINTS):
+        """Drive the read endpoints for a fixed duration and report per-endpoint statistics
+
+        Requests are spread round-robin over the given endpoints by `concurrency`
+        worker threads. When `rate` is set, the workers are paced so the combined
+        request rate does not exceed `rate` requests per second.
+        """
+        print(f"\n=== Benchmarking {', '.join(endpoints)} for {duration}s "
+              f"(concurrency {concurrency}, rate {rate or 'unlimited'}) ===")
+
+        property_ids = self.discover_property_ids()
+        if 'single' in endpoints and not property_ids:
+            print("✗ No properties found, skipping GET /properties/{id}")
+            endpoints = tuple(e for e in endpoints if e != 'single')
+        if not endpoints:
+            return {}
+
+        recorders = {endpoint: LatencyRecorder(endpoint) for endpoint in endpoints}
+        schedule_lock = threading.Lock()
+        schedule = {'next_slot': time.perf_counter(), 'sequence': 0}
+        started = time.perf_counter()
+        deadline = started + duration
+
+        def next_endpoint():
+            with schedule_lock:
+                endpoint = endpoints[schedule['sequence'] % len(endpoints)]
+                schedule['sequence'] += 1
+                if not rate:
+                    return endpoint, 0
+                slot = max(schedule['next_slot'], time.perf_counter())
+                schedule['next_slot'] = slot + 1.0 / rate
+                return endpoint, slot
+
+        def worker():
+            while True:
+                endpoint, slot = next_endpoint()
+                delay = slot - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                if time.perf_counter() >= deadline:
+                    return
+
+                request_started = time.perf_counter()
+                try:
+                    response = self.benchmark_request(endpoint, property_ids)
+                    recorders[endpoint].record(time.perf_counter() - request_started,
+                                               response.status_code, response.status_code == 200)
+                except Exception as e:
+                    recorders[endpoint].record_error(time.perf_counter() - request_started, type(e).__name__)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.perf_counter() - started
+        results = {endpoint: recorder.summary(elapsed) for endpoint, recorder in recorders.items()}
+        self.print_benchmark_report(results, elapsed)
+        self.print_server_timing()
+        return results
+
+    def print_benchmark_report(self, results, elapsed):
+        """Print throughput, latency percentiles and error rates per endpoint"""
+        print(f"\n===== BENCHMARK REPORT ({elapsed:.1f}s) =====")
+        print(f"{'endpoint':<10} {'reqs':>7} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} "
+              f"{'p99 ms':>8} {'max ms':>8} {'errors':>8}")
+        for stats in results.values():
+            print(f"{stats['name']:<10} {stats['requests']:>7} {stats['throughput']:>8.1f} "
+                  f"{stats['p50'] * 1000:>8.1f} {stats['p90'] * 1000:>8.1f} "
+                  f"{stats['p99'] * 1000:>8.1f} {stats['max'] * 1000:>8.1f} "
+                  f"{stats['error_rate'] * 100:>7.1f}%")
+            failures = {status: n for status, n in stats['statuses'].items() if status != 200}
+            if failures:
+                print(f"{'':<10} non-200 responses: {failures}")
+        print("=============================")
+
     def print_test_summary(self):
         """Print a summary of test results"""
         print("\n===== TEST SUMMARY =====")
 
-        total_tests = self.test_results['passed'] + self.test_results['failed']
-        success_rate = (self.test_results['passed'] / total_tests) * 100 if total_tests > 0 else 0
+        passed, failed = self.results.passed, self.results.failed
+        total_tests = passed + failed
+        success_rate = (passed / total_tests) * 100 if total_tests > 0 else 0
 
         print(f"Tests completed: {total_tests}")
-        print(f"Tests passed:    {self.test_results['passed']} ({success_rate:.1f}%)")
-        print(f"Tests failed:    {self.test_results['failed']}")
+        print(f"Tests passed:    {passed} ({success_rate:.1f}%)")
+        print(f"Tests failed:    {failed}")
 
-        if self.test_results['failed'] > 0:
+        if failed > 0:
             print("\nFailed tests:")
-            for test in self.test_results['details']:
+            for test in self.results.details:
                 if test['status'] == "FAIL":
                     print(f"  ✗ {test['name']}: {test['message']}")
 
-        if self.test_results['passed'] == total_tests:
+        self.results.print_slowest()
+
+        if passed == total_tests:
             print("\n🎉 All tests passed successfully!")
 
         print("=========================")
 
-    def run_all_tests(self):
-        """Run all API tests"""
-        print("Starting Real Estate Objects API Tests")
-        print("=====================================")
-
-        # Test GET endpoints
-        self.test_get_properties()
+    def check_single_property(self):
+        """Test GET /properties, then GET /properties/{id} with its first property"""
+        properties = self.results.timed(self.test_get_properties)
 
-        # Get first property ID for individual tests
-        try:
-            response = requests.get(f"{self.api_base}/properties")
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0:
-                    first_property_id = data[0].get('id')
-                    self.test_get_property(first_property_id)
-        except:
+        if properties:
+            self.results.timed(self.test_get_property, properties[0].get('id'))
+        elif properties is not None:
             self.record_test_result("GET individual property", False, "Could not find property ID")
-            pass
 
-        # Test filters
-        self.test_filter_properties()
+    def run_property_lifecycle(self, per_page):
+        """Create, update and delete one property, checking the cache after the update"""
+        new_property_id = self.results.timed(self.test_create_property)
 
-        # Test XML format
-        self.test_xml_format()
+        if not new_property_id:
+            self.record_test_result("Property lifecycle tests", False, "Could not create property")
+            return
 
-        # Test write operations if authenticated
-        if self.auth_header:
-            # Create a new property
-            new_property_id = self.test_create_property()
+        # Warm the cache with the new property, then make sure the update is not served stale
+        self.client.get(f"{self.api_base}/properties", params={'per_page': per_page})
 
-            if new_property_id:
-                # Update the property
-                self.test_update_property(new_property_id)
+        # Update the property
+        if self.results.timed(self.test_update_property, new_property_id):
+            self.results.timed(self.test_cache_invalidation, new_property_id, 'Updated Test Property', per_page)
 
-                # Delete the property
-                self.test_delete_property(new_property_id)
-            else:
-                self.record_test_result("Property lifecycle tests", False, "Could not create property")
+        # Delete the property
+        self.results.timed(self.test_delete_property, new_property_id)
+
+    def run_all_tests(self):
+        """Run all API tests
+
+        The read checks run concurrently first. The write lifecycles follow,
+        so that their cache flushes cannot break the cache and pagination
+        checks; each chain works on its own property.
+        """
+        print("Starting Real Estate Objects API Tests")
+        print("=====================================")
+
+        # Independent read checks; GET /properties also supplies the ID for the single property check
+        reads = [self.check_single_property] + [partial(self.results.timed, check) for check in (
+            self.test_filter_properties,
+            self.test_xml_format,
+            self.test_binary_formats,
+            self.test_cursor_pagination,
+            self.test_sparse_fieldsets,
+            self.test_response_cache,
+            self.test_server_timing,
+        )]
+        self.results.run_parallel([(None, task) for task in reads], self.workers)
+
+        # Test write operations if authenticated
+        if self.auth_header and self.chains:
+            # Every chain's property has to fit on the page it checks, whatever the others create
+            page_size = max(5, self.chains)
+            self.results.run_parallel(
+                [(f"chain {chain + 1}" if self.chains > 1 else None,
+                  partial(self.run_property_lifecycle, page_size + chain))
+                 for chain in range(self.chains)],
+                min(self.workers, self.chains)
+            )
 
         print("\nAPI Tests Completed")
         print("=====================================")
 
         # Print test summary
         self.print_test_summary()
+        self.print_server_timing()
+
+        return self.results.failed == 0
+
+    def write_reports(self, json_path=None, junit_path=None):
+        """Write the JSON and/or JUnit reports of the last run"""
+        if json_path:
+            self.results.write_json(json_path, {
+                'url': self.base_url,
+                'server_timing': self.server_timing.summary(),
+            })
+        if junit_path:
+            self.results.write_junit(junit_path)
 
 def main():
     """Main function to parse arguments and run tests"""
     parser = argparse.ArgumentParser(description='Test Real Estate Objects WordPress API')
     parser.add_argument('url', help='WordPress site URL')
+    parser.add_argument('command', nargs='?', choices=['test', 'benchmark'], default='test',
+                        help='Run the functional tests (default) or the read endpoint benchmark')
     parser.add_argument('-u', '--username', help='WordPress username for authenticated tests')
     parser.add_argument('-p', '--password', help='WordPress application password for authenticated tests')
+    parser.add_argument('--duration', type=float, default=30, help='Benchmark duration in seconds (default: 30)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Benchmark worker threads (default: 8)')
+    parser.add_argument('--rate', type=float, help='Target benchmark request rate per second (default: unlimited)')
+    parser.add_argument('--endpoints', default=','.join(BENCHMARK_ENDPOINTS),
+                        help='Comma-separated endpoints to benchmark: list, single, xml (default: all)')
+    parser.add_argument('--chains', type=int, default=1,
+                        help='Create/update/delete lifecycles run in parallel, each on its own property (default: 1)')
+    add_report_arguments(parser)
+    add_client_arguments(parser)
 
     args = parser.parse_args()
 
-    tester = RealEstateApiTester(args.url, args.username, args.password)
-    tester.run_all_tests()
+    if args.command == 'benchmark':
+        endpoints = tuple(e.strip() for e in args.endpoints.split(',') if e.strip() in BENCHMARK_ENDPOINTS)
+        client = client_from_args(args, min_pool_size=args.concurrency)
+        tester = RealEstateApiTester(args.url, args.username, args.password, client=client)
+        tester.run_benchmark(args.duration, args.concurrency, args.rate, endpoints)
+        return
+
+    client = client_from_args(args, min_pool_size=max(args.workers, args.chains))
+    tester = RealEstateApiTester(args.url, args.username, args.password, client=client,
+                                 workers=args.workers, chains=args.chains, verbose=args.verbose)
+    success = tester.run_all_tests()
+    tester.write_reports(args.report_json, args.junit)
+    sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
     main()
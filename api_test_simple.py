@@ -5,45 +5,40 @@ Simple Real Estate Objects API Test Script
 This script tests the Real Estate Objects WordPress plugin API endpoints using basic methods.
 """
 
-import requests
 import json
 import sys
-from pprint import pprint
+import argparse
+from functools import partial
+
+from api_client import ApiClient
+from api_report import TestResults, add_report_arguments
 
 # Configuration
 WP_URL = "http://speedrun-rpg.hopto.org"
 API_BASE = "/wp-json/real-estate/v1"
 
 class SimpleApiTester:
-    def __init__(self, wp_url=WP_URL, api_base=API_BASE):
+    def __init__(self, wp_url=WP_URL, api_base=API_BASE, client=None, workers=4, verbose=False):
         """Initialize the tester with WordPress URL and API base path"""
         self.wp_url = wp_url
         self.api_base = api_base
-        self.test_results = {
-            'passed': 0,
-            'failed': 0,
-            'details': []
-        }
+        self.client = client or ApiClient()
+        self.workers = max(1, workers)
+        self.verbose = verbose
+        self.results = TestResults('SimpleApiTester')
 
     def record_test_result(self, test_name, success, message=None):
         """Record the result of a test"""
-        status = "PASS" if success else "FAIL"
-        self.test_results['details'].append({
-            'name': test_name,
-            'status': status,
-            'message': message
-        })
+        return self.results.record(test_name, success, message)
 
-        if success:
-            self.test_results['passed'] += 1
-        else:
-            self.test_results['failed'] += 1
+    def print_response_info(self, response):
+        """Print the status and size of the API response; headers and body too in verbose mode"""
+        print(f"Status Code: {response.status_code} ({response.headers.get('Content-Type')}, "
+              f"{len(response.content)} bytes, {response.elapsed.total_seconds() * 1000:.0f}ms)")
 
-        return success
+        if not self.verbose:
+            return
 
-    def print_response_info(self, response):
-        """Print detailed information about the API response for debugging"""
-        print(f"Status Code: {response.status_code}")
         print(f"Response Headers: {response.headers}")
         print("Response Content:")
         try:
@@ -53,26 +48,33 @@ class SimpleApiTester:
         print("=" * 50)
 
     def test_core_wp_api(self):
-        """Test if the WordPress core REST API is working"""
+        """Test if the WordPress core REST API is working; returns the API index on success"""
         print("\n🔍 Testing WordPress core REST API...")
         try:
-            response = requests.get(f"{self.wp_url}/wp-json/")
+            response = self.client.get(f"{self.wp_url}/wp-json/")
             self.print_response_info(response)
-            success = response.status_code == 200
-            self.record_test_result("WordPress core REST API", success,
-                                   None if success else f"Status code: {response.status_code}")
-            return success
+            if response.status_code != 200:
+                self.record_test_result("WordPress core REST API", False, f"Status code: {response.status_code}")
+                return None
+
+            # Decode before recording, so a non-JSON index is a single failure
+            data = response.json()
+            self.record_test_result("WordPress core REST API", True)
+            return data
         except Exception as e:
             print(f"Error: {e}")
             self.record_test_result("WordPress core REST API", False, str(e))
-            return False
+            return None
 
-    def check_plugin_status(self):
-        """Check if the plugin is properly registered with WP REST API"""
+    def check_plugin_status(self, data=None):
+        """Check if the plugin is properly registered with WP REST API
+
+        Reuses the API index from test_core_wp_api() when given one.
+        """
         print("\n🔍 Checking plugin routes in WP REST API...")
         try:
-            response = requests.get(f"{self.wp_url}/wp-json/")
-            data = response.json()
+            if data is None:
+                data = self.client.get(f"{self.wp_url}/wp-json/").json()
 
             # Look for our namespace in the routes
             namespaces = data.get('namespaces', [])
@@ -95,25 +97,25 @@ class SimpleApiTester:
             return False
 
     def test_get_properties(self):
-        """Test the GET /properties endpoint"""
+        """Test the GET /properties endpoint; returns the properties on success"""
         print("\n🔍 Testing GET /properties endpoint...")
         try:
-            response = requests.get(f"{self.wp_url}{self.api_base}/properties")
+            response = self.client.get(f"{self.wp_url}{self.api_base}/properties")
             self.print_response_info(response)
             success = response.status_code == 200
             self.record_test_result("GET /properties", success,
                                   None if success else f"Status code: {response.status_code}")
-            return success
+            return response.json() if success else None
         except Exception as e:
             print(f"Error: {e}")
             self.record_test_result("GET /properties", False, str(e))
-            return False
+            return None
 
     def test_get_property(self, property_id=1):
         """Test the GET /properties/{id} endpoint"""
         print(f"\n🔍 Testing GET /properties/{property_id} endpoint...")
         try:
-            response = requests.get(f"{self.wp_url}{self.api_base}/properties/{property_id}")
+            response = self.client.get(f"{self.wp_url}{self.api_base}/properties/{property_id}")
             self.print_response_info(response)
             success = response.status_code == 200
             self.record_test_result(f"GET /properties/{property_id}", success,
@@ -133,7 +135,7 @@ class SimpleApiTester:
                 'district': 'central',
                 'min_eco_rating': 3
             }
-            response = requests.get(f"{self.wp_url}{self.api_base}/properties", params=params)
+            response = self.client.get(f"{self.wp_url}{self.api_base}/properties", params=params)
             self.print_response_info(response)
             success = response.status_code == 200
             self.record_test_result("Property filtering", success,
@@ -149,7 +151,7 @@ class SimpleApiTester:
         print("\n🔍 Testing XML format response...")
         try:
             headers = {'Accept': 'application/xml'}
-            response = requests.get(f"{self.wp_url}{self.api_base}/properties", headers=headers)
+            response = self.client.get(f"{self.wp_url}{self.api_base}/properties", headers=headers)
             self.print_response_info(response)
             success = response.status_code == 200 and 'application/xml' in response.headers.get('Content-Type', '')
             self.record_test_result("XML format", success,
@@ -164,71 +166,77 @@ class SimpleApiTester:
         """Print a summary of test results"""
         print("\n====== TEST SUMMARY ======")
 
-        total_tests = self.test_results['passed'] + self.test_results['failed']
-        success_rate = (self.test_results['passed'] / total_tests) * 100 if total_tests > 0 else 0
+        passed, failed = self.results.passed, self.results.failed
+        total_tests = passed + failed
+        success_rate = (passed / total_tests) * 100 if total_tests > 0 else 0
 
         print(f"Tests completed: {total_tests}")
-        print(f"Tests passed:    {self.test_results['passed']} ({success_rate:.1f}%)")
-        print(f"Tests failed:    {self.test_results['failed']}")
+        print(f"Tests passed:    {passed} ({success_rate:.1f}%)")
+        print(f"Tests failed:    {failed}")
 
-        if self.test_results['failed'] > 0:
+        if failed > 0:
             print("\nFailed tests:")
-            for test in self.test_results['details']:
+            for test in self.results.details:
                 if test['status'] == "FAIL":
                     message = test['message'] if test['message'] else "Unknown error"
                     print(f"  ❌ {test['name']}: {message}")
 
-        if self.test_results['passed'] == total_tests:
+        self.results.print_slowest()
+
+        if passed == total_tests:
             print("\n🎉 All tests passed successfully!")
 
         print("==========================")
 
+    def check_properties(self):
+        """Test GET /properties, then GET /properties/{id} with its first property"""
+        properties = self.results.timed(self.test_get_properties)
+
+        # Try with ID 1 if no properties found
+        property_id = properties[0].get('id') if properties else 1
+        self.results.timed(self.test_get_property, property_id)
+
     def run_all_tests(self):
-        """Run all API tests"""
+        """Run all API tests; the checks after the core API one run concurrently"""
         print("\n====== REAL ESTATE OBJECTS API TEST ======\n")
 
         # First check core WP API
-        wp_api_works = self.test_core_wp_api()
+        index = self.results.timed(self.test_core_wp_api)
 
-        # Check plugin registration
-        plugin_registered = self.check_plugin_status()
+        # Check plugin registration against the same API index
+        self.results.timed(self.check_plugin_status, index)
 
         # Only continue with other tests if the core API works
-        if wp_api_works:
-            # Try to get a property ID for individual property test
-            property_id = None
-            try:
-                response = requests.get(f"{self.wp_url}{self.api_base}/properties")
-                if response.status_code == 200:
-                    data = response.json()
-                    if data and len(data) > 0:
-                        property_id = data[0].get('id')
-            except:
-                pass
-
-            # Test get properties
-            self.test_get_properties()
-
-            # Test get single property if we found an ID
-            if property_id:
-                self.test_get_property(property_id)
-            else:
-                # Try with ID 1 if no properties found
-                self.test_get_property()
-
-            # Test filtering
-            self.test_filter_properties()
-
-            # Test XML format
-            self.test_xml_format()
+        if index is not None:
+            self.results.run_parallel([
+                (None, self.check_properties),
+                (None, partial(self.results.timed, self.test_filter_properties)),
+                (None, partial(self.results.timed, self.test_xml_format)),
+            ], self.workers)
 
         # Print test summary
         self.print_test_summary()
 
+        return self.results.failed == 0
+
 def main():
     """Main function to run tests"""
-    tester = SimpleApiTester()
-    tester.run_all_tests()
+    parser = argparse.ArgumentParser(description='Simple Real Estate Objects API test')
+    parser.add_argument('url', nargs='?', default=WP_URL, help=f'WordPress site URL (default: {WP_URL})')
+    add_report_arguments(parser)
+
+    args = parser.parse_args()
+
+    tester = SimpleApiTester(args.url.rstrip('/'), client=ApiClient(pool_size=max(args.workers, 10)),
+                             workers=args.workers, verbose=args.verbose)
+    success = tester.run_all_tests()
+
+    if args.report_json:
+        tester.results.write_json(args.report_json, {'url': tester.wp_url})
+    if args.junit:
+        tester.results.write_junit(args.junit)
+
+    sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Premises Filter Benchmark
+
+This script measures room/balcony/bathroom filter latency of the REST list
+endpoint and the AJAX filter as the catalogue grows. For each target size it
+first tops the catalogue up with create_mock_entries.py's batched seeding and
+then times every filter combination.
+"""
+
+import re
+import time
+import argparse
+
+from api_client import add_client_arguments, client_from_args
+from api_stats import LatencyRecorder
+from create_mock_entries import MockDataGenerator
+
+DEFAULT_SIZES = '1000,10000,100000'
+FILTER_COMBINATIONS = [
+    {'rooms': 2},
+    {'rooms': 3, 'balcony': 'yes'},
+    {'balcony': 'yes', 'bathroom': 'no'},
+    {'rooms': 1, 'balcony': 'no', 'bathroom': 'yes'},
+]
+
+
+class FilterBenchmark:
+    """Class to time premises filters at several catalogue sizes"""
+
+    def __init__(self, base_url, username, password, client, page_url=None, seed=42):
+        """Initialize with WordPress credentials and the seed of the seeded catalogue"""
+        self.base_url = base_url.rstrip('/')
+        self.api_base = f"{self.base_url}/wp-json/real-estate/v1"
+        self.ajax_url = f"{self.base_url}/wp-admin/admin-ajax.php"
+        self.page_url = page_url or f"{self.base_url}/real-estate/"
+        self.client = client
+        self.generator = MockDataGenerator(base_url, username, password, client=client, seed=seed)
+        self.nonce = None
+
+    def current_total(self):
+        """Return the number of properties reported by X-WP-Total"""
+        response = self.client.get(f"{self.api_base}/properties", params={'per_page': 1}, authenticated=True)
+        response.raise_for_status()
+        return int(response.headers.get('X-WP-Total', 0))
+
+    def seed_to(self, size, workers):
+        """Create properties until the catalogue has at least `size` of them"""
+        total = self.current_total()
+        if size > total:
+            self.generator.generate_mock_data(size - total, workers, 100, start=total)
+
+    def fetch_nonce(self):
+        """Read the AJAX nonce from a page that renders the filter form"""
+        response = self.client.get(self.page_url)
+        match = re.search(r'"nonce":"([0-9a-f]+)"', response.text)
+        if not match:
+            print(f"✗ No real_estate_filter nonce found on {self.page_url}, skipping AJAX timings")
+            return None
+        return match.group(1)
+
+    def time_rest(self, filters, iterations):
+        """Time GET /properties with the given filters
+
+        Requests are authenticated so the anonymous response cache is bypassed.
+        """
+        recorder = LatencyRecorder('rest')
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = self.client.get(f"{self.api_base}/properties", params=filters, authenticated=True)
+            recorder.record(time.perf_counter() - started, response.status_code, response.status_code == 200)
+        return recorder
+
+    def time_ajax(self, filters, iterations):
+        """Time the real_estate_filter AJAX action with the given filters"""
+        recorder = LatencyRecorder('ajax')
+        data = dict(filters, action='real_estate_filter', nonce=self.nonce, page=1)
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = self.client.post(self.ajax_url, data=data)
+            success = response.status_code == 200 and response.json().get('success')
+            recorder.record(time.perf_counter() - started, response.status_code, bool(success))
+        return recorder
+
+    def run(self, sizes, iterations, workers):
+        """Seed to every size in turn and print a latency table per filter"""
+        for size in sizes:
+            print(f"\n=== Catalogue size {size} ===")
+            self.seed_to(size, workers)
+            total = self.current_total()
+            self.nonce = self.fetch_nonce()
+
+            print(f"\n{total} properties, {iterations} requests per filter")
+            print(f"{'filter':<44} {'REST p50':>9} {'REST p95':>9} {'AJAX p50':>9} {'AJAX p95':>9}")
+
+            for filters in FILTER_COMBINATIONS:
+                label = '&'.join(f"{k}={v}" for k, v in filters.items())
+                rest = self.time_rest(filters, iterations).summary(1)
+                line = f"{label:<44} {rest['p50'] * 1000:>7.1f}ms {rest['p95'] * 1000:>7.1f}ms"
+
+                if self.nonce:
+                    ajax = self.time_ajax(filters, iterations).summary(1)
+                    line += f" {ajax['p50'] * 1000:>7.1f}ms {ajax['p95'] * 1000:>7.1f}ms"
+
+                print(line)
+
+
+def main():
+    """Main function to parse arguments and run the benchmark"""
+    parser = argparse.ArgumentParser(description='Benchmark premises filter latency at several catalogue sizes')
+    parser.add_argument('url', help='WordPress site URL')
+    parser.add_argument('-u', '--username', required=True, help='WordPress username')
+    parser.add_argument('-p', '--password', required=True, help='WordPress application password')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Catalogue sizes to test (default: {DEFAULT_SIZES})')
+    parser.add_argument('--iterations', type=int, default=20, help='Requests per filter and size (default: 20)')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='Concurrent seeding batches (default: 4)')
+    parser.add_argument('--page-url', help='Page that renders [real_estate_filter] (default: the property archive)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the generated properties (default: 42)')
+    add_client_arguments(parser)
+
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(',') if size.strip())
+    client = client_from_args(args, min_pool_size=args.workers)
+    benchmark = FilterBenchmark(args.url, args.username, args.password, client, args.page_url, args.seed)
+    benchmark.run(sizes, args.iterations, args.workers)
+
+
+if __name__ == "__main__":
+    main()
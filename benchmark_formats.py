@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Response Format Benchmark
+
+This script requests the same GET /properties pages as JSON, XML, MessagePack
+and CBOR, each uncompressed, gzip- and (with the brotli package) Brotli-
+encoded, and reports the bytes on the wire, the decoded size, the request
+latency and the client-side decompression and decoding time per combination.
+Every decoded JSON, MessagePack and CBOR body is compared with the JSON one.
+"""
+
+import time
+import argparse
+
+import api_formats
+from api_client import add_client_arguments, client_from_args
+from api_stats import LatencyRecorder
+
+FORMATS = ('json', 'xml', 'msgpack', 'cbor')
+QUERIES = [
+    {'per_page': 100},
+    {'per_page': 100, 'compact': 'true'},
+    {'per_page': 10},
+]
+
+
+class FormatBenchmark:
+    """Class to compare payload size and decode time of the negotiated formats"""
+
+    def __init__(self, base_url, client):
+        """Initialize with the WordPress site URL"""
+        self.api_url = f"{base_url.rstrip('/')}/wp-json/real-estate/v1/properties"
+        self.client = client
+        self.encodings = ['identity', 'gzip'] + (['br'] if api_formats.brotli is not None else [])
+
+    def fetch(self, params, format, encoding):
+        """Send one request and return (response, raw body, body, request time, decompress time, decode time, data)
+
+        The body is streamed and read undecoded, so its length is the number
+        of bytes on the wire and decompression is timed separately.
+        """
+        headers = {'Accept': api_formats.MEDIA_TYPES[format], 'Accept-Encoding': encoding}
+
+        started = time.perf_counter()
+        response = self.client.get(self.api_url, params=params, headers=headers, stream=True)
+        raw = response.raw.read(decode_content=False)
+        received = time.perf_counter()
+
+        body = api_formats.decompress(raw, response.headers.get('Content-Encoding'))
+        decompressed = time.perf_counter()
+        data = api_formats.decode(body, api_formats.format_of(response.headers.get('Content-Type')))
+        decoded = time.perf_counter()
+
+        return response, raw, body, received - started, decompressed - received, decoded - decompressed, data
+
+    def run(self, iterations):
+        """Time every format/encoding pair and print one table per query"""
+        print(f"MessagePack: {'msgpack package' if api_formats.msgpack else 'built-in decoder'}, "
+              f"CBOR: {'cbor2 package' if api_formats.cbor2 else 'built-in decoder'}, "
+              f"encodings: {', '.join(self.encodings)}")
+
+        mismatches = 0
+
+        for params in QUERIES:
+            label = ', '.join(f"{name}={value}" for name, value in params.items())
+            print(f"\n=== GET /properties?{label} ===\n")
+            print(f"{'format':<8} {'encoding':<9} {'wire':>9} {'decoded':>9} {'ratio':>6} "
+                  f"{'request p50':>12} {'inflate':>9} {'decode':>9}")
+
+            expected = None
+
+            for format in FORMATS:
+                for encoding in self.encodings:
+                    latency = LatencyRecorder(f"{format}/{encoding}")
+                    inflate_times = []
+                    decode_times = []
+                    started = time.perf_counter()
+
+                    for _ in range(iterations):
+                        response, raw, body, elapsed, inflate, decode, data = self.fetch(params, format, encoding)
+                        success = response.status_code == 200
+                        latency.record(elapsed, response.status_code, success)
+                        inflate_times.append(inflate)
+                        decode_times.append(decode)
+
+                    if not success:
+                        print(f"✗ {format}/{encoding} returned HTTP {response.status_code}")
+                        continue
+
+                    if format == 'json' and expected is None:
+                        expected = data
+                    elif format != 'xml' and data != expected:
+                        mismatches += 1
+                        print(f"✗ {format}/{encoding} decoded to different data than JSON")
+
+                    stats = latency.summary(time.perf_counter() - started)
+                    print(f"{format:<8} {encoding:<9} {len(raw):>9} {len(body):>9} {len(raw) / len(body) if body else 0:>6.2f} "
+                          f"{stats['p50'] * 1000:>10.2f}ms {median(inflate_times) * 1000:>7.3f}ms "
+                          f"{median(decode_times) * 1000:>7.3f}ms")
+
+        if mismatches:
+            print(f"\n✗ {mismatches} format/encoding pairs differed from JSON")
+        else:
+            print("\n✓ MessagePack and CBOR decode to the same data as JSON")
+
+        return mismatches == 0
+
+
+def median(values):
+    """Median of a non-empty list"""
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    """Main function to parse arguments and run the benchmark"""
+    parser = argparse.ArgumentParser(description='Compare bytes on the wire and decode time of the GET /properties formats')
+    parser.add_argument('url', help='WordPress site URL')
+    parser.add_argument('--iterations', type=int, default=10, help='Requests per format and encoding (default: 10)')
+    add_client_arguments(parser)
+
+    args = parser.parse_args()
+
+    client = client_from_args(args)
+    FormatBenchmark(args.url, client).run(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
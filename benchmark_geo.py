@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Geospatial Search Benchmark
+
+This script compares the server-side near/radius and bbox filters of
+GET /properties with the naive alternative: downloading the whole catalogue and
+filtering the "lat, lon" coordinates client-side. Every query uses a random
+point in the Kyiv area that create_mock_entries.py seeds, and both approaches
+must return the same set of properties.
+"""
+
+import math
+import time
+import random
+import argparse
+
+from api_client import add_client_arguments, client_from_args
+from api_stats import LatencyRecorder
+from export_properties import PropertyExporter
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.045
+
+# Area covered by create_mock_entries.py
+LAT_RANGE = (50.38, 50.52)
+LON_RANGE = (30.28, 30.71)
+
+
+def parse_coordinates(value):
+    """Parse a "lat, lon" string, returning None if it is not a point"""
+    try:
+        lat, lon = (float(part) for part in str(value).split(','))
+    except ValueError:
+        return None
+    return lat, lon
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    d_lat = math.radians(lat2 - lat1)
+    d_lon = math.radians(lon2 - lon1)
+    a = (math.sin(d_lat / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lon / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * math.asin(math.sqrt(a))
+
+
+class GeoBenchmark:
+    """Class to time server-side and client-side location filters"""
+
+    def __init__(self, base_url, client):
+        """Initialize with the WordPress site URL"""
+        self.base_url = base_url
+        self.client = client
+
+    def fetch_all(self, filters=None):
+        """Fetch every page matching `filters` and return the properties"""
+        exporter = PropertyExporter(self.base_url, client=self.client, filters=filters)
+        items, _, total_pages = exporter.fetch_page(1)
+        for page in range(2, total_pages + 1):
+            page_items, _, _ = exporter.fetch_page(page)
+            items.extend(page_items)
+        return items
+
+    def client_side(self, query):
+        """Download the catalogue and filter it locally"""
+        matches = set()
+        for item in self.fetch_all():
+            point = parse_coordinates(item.get('coordinates'))
+            if point is None:
+                continue
+
+            if 'near' in query:
+                lat, lon = query['near']
+                if haversine_km(lat, lon, *point) <= query['radius']:
+                    matches.add(item['id'])
+            else:
+                min_lat, min_lon, max_lat, max_lon = query['bbox']
+                if min_lat <= point[0] <= max_lat and min_lon <= point[1] <= max_lon:
+                    matches.add(item['id'])
+        return matches
+
+    def server_side(self, query):
+        """Let GET /properties filter through its location index"""
+        if 'near' in query:
+            lat, lon = query['near']
+            filters = {'near': f"{lat},{lon}", 'radius': query['radius']}
+        else:
+            filters = {'bbox': ','.join(str(value) for value in query['bbox'])}
+        return {item['id'] for item in self.fetch_all(filters)}
+
+    def random_query(self, kind, radius):
+        """Build a random radius or viewport query inside the seeded area"""
+        lat = round(random.uniform(*LAT_RANGE), 6)
+        lon = round(random.uniform(*LON_RANGE), 6)
+
+        if kind == 'near':
+            return {'near': (lat, lon), 'radius': radius}
+
+        # A viewport roughly 2 * radius across
+        lat_delta = radius / KM_PER_DEGREE
+        lon_delta = radius / (KM_PER_DEGREE * math.cos(math.radians(lat)))
+        return {'bbox': (round(lat - lat_delta, 6), round(lon - lon_delta, 6),
+                         round(lat + lat_delta, 6), round(lon + lon_delta, 6))}
+
+    def run(self, iterations, radius):
+        """Time both approaches and print a comparison per query type"""
+        print(f"Running {iterations} random queries per type, radius {radius} km")
+        print(f"{'query':<8} {'approach':<12} {'p50':>9} {'p95':>9} {'avg hits':>9}")
+
+        mismatches = 0
+
+        for kind in ('near', 'bbox'):
+            recorders = {'server': LatencyRecorder('server'), 'client-scan': LatencyRecorder('client-scan')}
+            hits = 0
+
+            for _ in range(iterations):
+                query = self.random_query(kind, radius)
+
+                started = time.perf_counter()
+                server = self.server_side(query)
+                recorders['server'].record(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                local = self.client_side(query)
+                recorders['client-scan'].record(time.perf_counter() - started)
+
+                hits += len(server)
+                if server != local:
+                    mismatches += 1
+
+            for label, recorder in recorders.items():
+                summary = recorder.summary(1)
+                print(f"{kind:<8} {label:<12} {summary['p50'] * 1000:>7.1f}ms {summary['p95'] * 1000:>7.1f}ms {hits / iterations:>9.1f}")
+
+        if mismatches:
+            print(f"✗ {mismatches} queries returned different results server-side and client-side")
+        else:
+            print("✓ Server-side and client-side results match")
+
+
+def main():
+    """Main function to parse arguments and run the benchmark"""
+    parser = argparse.ArgumentParser(description='Compare server-side geospatial filters with a client-side full scan')
+    parser.add_argument('url', help='WordPress site URL')
+    parser.add_argument('--iterations', type=int, default=20, help='Random queries per query type (default: 20)')
+    parser.add_argument('--radius', type=float, default=2.0, help='Search radius in kilometres (default: 2)')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible query points')
+    add_client_arguments(parser)
+
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    client = client_from_args(args)
+    GeoBenchmark(args.url, client).run(args.iterations, args.radius)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Lean Bootstrap TTFB Benchmark
+
+This script compares time-to-first-byte of anonymous GET /properties reads
+served by the real-estate-objects-fast-path MU-plugin with the same cached
+reads going through the full WordPress bootstrap (all plugins, the theme,
+widget and shortcode registration). The X-Real-Estate-Full-Bootstrap header
+makes the fast path step aside, so both paths return the same cached payload
+and the difference is the cost of loading WordPress.
+"""
+
+import time
+import argparse
+
+from api_client import add_client_arguments, client_from_args
+from api_stats import LatencyRecorder
+
+FULL_BOOTSTRAP_HEADER = 'X-Real-Estate-Full-Bootstrap'
+QUERIES = [
+    {},
+    {'page': 2},
+    {'per_page': 50},
+    {'building_type': 'brick', 'min_eco_rating': 3},
+    {'rooms': 2, 'balcony': 'yes'},
+]
+
+
+class TtfbBenchmark:
+    """Class to time the lean and full bootstrap paths of GET /properties"""
+
+    def __init__(self, base_url, client):
+        """Initialize with the WordPress site URL"""
+        self.api_url = f"{base_url.rstrip('/')}/wp-json/real-estate/v1/properties"
+        self.client = client
+
+    def fetch(self, params, full_bootstrap):
+        """Send one anonymous read and return (ttfb, total, response)
+
+        The response is streamed so that `elapsed` stops when the headers have
+        been parsed, which is the time to first byte.
+        """
+        headers = {FULL_BOOTSTRAP_HEADER: '1'} if full_bootstrap else {}
+
+        started = time.perf_counter()
+        response = self.client.get(self.api_url, params=params, headers=headers, stream=True)
+        ttfb = response.elapsed.total_seconds()
+        response.content
+        total = time.perf_counter() - started
+
+        return ttfb, total, response
+
+    def warm_up(self):
+        """Make sure every query is in the response cache and served by the fast path
+
+        Returns True when the lean path is active.
+        """
+        lean = True
+
+        for params in QUERIES:
+            self.fetch(params, True)
+            _, _, response = self.fetch(params, False)
+
+            if response.status_code != 200:
+                print(f"✗ {params or 'default query'} returned HTTP {response.status_code}")
+                lean = False
+            elif response.headers.get('X-Real-Estate-Path') != 'lean':
+                print(f"✗ {params or 'default query'} was not served by the fast path; is the MU-plugin installed?")
+                lean = False
+
+        return lean
+
+    def run(self, iterations):
+        """Time both paths and print TTFB and total latency percentiles"""
+        print(f"Warming up {len(QUERIES)} queries")
+        if self.warm_up():
+            print("✓ Fast path is serving cached reads")
+
+        paths = {'lean': False, 'full': True}
+        ttfb = {name: LatencyRecorder(name) for name in paths}
+        totals = {name: LatencyRecorder(name) for name in paths}
+        mismatches = 0
+
+        started = time.perf_counter()
+
+        for _ in range(iterations):
+            for params in QUERIES:
+                bodies = {}
+
+                # Alternate the paths so drift on the server affects both equally
+                for name, full_bootstrap in paths.items():
+                    first_byte, total, response = self.fetch(params, full_bootstrap)
+                    success = response.status_code == 200
+                    ttfb[name].record(first_byte, response.status_code, success)
+                    totals[name].record(total, response.status_code, success)
+                    bodies[name] = response.content
+
+                if bodies['lean'] != bodies['full']:
+                    mismatches += 1
+
+        elapsed = time.perf_counter() - started
+
+        print(f"\n{'path':<6} {'requests':>8} {'ttfb p50':>10} {'ttfb p95':>10} {'total p50':>10} {'total p95':>10} {'errors':>7}")
+        for name in paths:
+            first_byte = ttfb[name].summary(elapsed)
+            total = totals[name].summary(elapsed)
+            print(f"{name:<6} {first_byte['requests']:>8} {first_byte['p50'] * 1000:>8.1f}ms {first_byte['p95'] * 1000:>8.1f}ms "
+                  f"{total['p50'] * 1000:>8.1f}ms {total['p95'] * 1000:>8.1f}ms {first_byte['errors']:>7}")
+
+        lean_p50 = ttfb['lean'].summary(elapsed)['p50']
+        full_p50 = ttfb['full'].summary(elapsed)['p50']
+        if lean_p50 > 0:
+            print(f"\nMedian TTFB speed-up: {full_p50 / lean_p50:.1f}x")
+
+        if mismatches:
+            print(f"✗ {mismatches} responses differed between the lean and full paths")
+        else:
+            print("✓ Lean and full paths returned identical bodies")
+
+
+def main():
+    """Main function to parse arguments and run the benchmark"""
+    parser = argparse.ArgumentParser(description='Compare TTFB of the lean fast path with the full WordPress bootstrap')
+    parser.add_argument('url', help='WordPress site URL')
+    parser.add_argument('--iterations', type=int, default=20, help='Rounds over all queries (default: 20)')
+    add_client_arguments(parser)
+
+    args = parser.parse_args()
+
+    client = client_from_args(args)
+    TtfbBenchmark(args.url, client).run(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
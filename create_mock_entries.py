@@ -8,25 +8,135 @@ without handling any SVG images, as those will be managed manually in WP admin.
 
 import os
 import sys
-import requests
 import json
-import base64
 import random
 import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from api_client import ApiClient, add_client_arguments, client_from_args
+from api_stats import LatencyRecorder
+
+
+DISTRICTS = [
+    # slug, name, locative case used in descriptions
+    ('central', 'Центральний', 'Центральному'),
+    ('northern', 'Північний', 'Північному'),
+    ('southern', 'Південний', 'Південному'),
+    ('eastern', 'Східний', 'Східному'),
+    ('western', 'Західний', 'Західному'),
+]
+BUILDING_TYPE_NAMES = {
+    'panel': 'Панель',
+    'brick': 'Цегла',
+    'foam_block': 'Піноблок'
+}
+BUILDING_NAMES = [
+    'Сонячний', 'Затишний', 'Престижний', 'Ексклюзивний', 'Елітний',
+    'Парковий', 'Центральний', 'Новий', 'Сучасний', 'Комфортний'
+]
+
+
+class PropertyFactory:
+    """Deterministic generator of property payloads
+
+    Every property gets its own random.Random seeded with "<seed>:<index>", so
+    the same seed and index always produce the same property, whatever order,
+    chunking or number of workers the properties are generated with.
+    Districts are always picked from the fixed DISTRICTS list, so the output
+    does not depend on the districts a target site happens to have.
+    """
+
+    def __init__(self, seed=None):
+        """Initialize with a seed (random if None)"""
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.district_slugs = [slug for slug, _, _ in DISTRICTS]
+
+    def random_building_data(self, rng):
+        """Generate random building data from rng"""
+        # Random district
+        district = rng.choice(self.district_slugs)
+
+        # Random building data
+        building_type = rng.choice(list(BUILDING_TYPE_NAMES))
+        floors = rng.randint(5, 25)
+        eco_rating = rng.randint(1, 5)
+        building_name = f"{rng.choice(BUILDING_NAMES)} {rng.randint(1, 100)}"
+
+        # Random coordinates (Kyiv area)
+        lat = round(rng.uniform(50.38, 50.52), 6)
+        lon = round(rng.uniform(30.28, 30.71), 6)
+        coordinates = f"{lat}, {lon}"
+
+        # Generate 1-5 random premises
+        premises = []
+        num_premises = rng.randint(1, 5)
+        for _ in range(num_premises):
+            area = round(rng.uniform(50, 150), 1)
+            rooms = rng.randint(1, 4)
+            balcony = rng.choice(['yes', 'no'])
+            bathroom = rng.choice(['yes', 'no'])
+
+            premises.append({
+                'area': str(area),
+                'rooms': rooms,
+                'balcony': balcony,
+                'bathroom': bathroom
+            })
+
+        return {
+            'district': district,
+            'building_name': building_name,
+            'building_type': building_type,
+            'floors': floors,
+            'eco_rating': eco_rating,
+            'coordinates': coordinates,
+            'premises': premises
+        }
+
+    def build(self, index):
+        """Build the REST payload for the property with the given index"""
+        building_data = self.random_building_data(random.Random(f"{self.seed}:{index}"))
+
+        # Create a title for the property
+        title = f"Будинок {building_data['building_name']} ({index + 1})"
+
+        # Use correct grammatical case for Ukrainian
+        district_locative = {slug: locative for slug, _, locative in DISTRICTS}
+        district_name = district_locative.get(building_data['district'], "Центральному")  # Default fallback
+
+        return {
+            'title': title,
+            'content': f"Сучасний будинок {building_data['building_name']} у {district_name} районі. "
+                       f"Тип: {BUILDING_TYPE_NAMES[building_data['building_type']]}, "
+                       f"поверхів: {building_data['floors']}, "
+                       f"екологічний рейтинг: {building_data['eco_rating']}. "
+                       f"Розташування: {building_data['coordinates']}.",
+            'district': building_data['district'],
+            'building_name': building_data['building_name'],
+            'coordinates': building_data['coordinates'],
+            'floors': building_data['floors'],
+            'building_type': building_data['building_type'],
+            'eco_rating': building_data['eco_rating'],
+            'premises': building_data['premises']
+        }
+
+
 class MockDataGenerator:
     """Class to generate mock real estate entries"""
 
-    def __init__(self, base_url, username, password):
-        """Initialize with WordPress credentials"""
+    def __init__(self, base_url, username, password, client=None, seed=None):
+        """Initialize with WordPress credentials and an optional seed for reproducible data"""
         self.base_url = base_url.rstrip('/')
+        self.client = client or ApiClient()
         self.api_base = f"{self.base_url}/wp-json/real-estate/v1"
         self.wp_api_base = f"{self.base_url}/wp-json/wp/v2"
         self.username = username
         self.password = password
         self.auth_header = None
-        self.districts = []
+        self.districts = {}
+        self.latency = LatencyRecorder('POST /properties')
 
         # Set up authentication
         self.setup_auth()
@@ -34,12 +144,12 @@ class MockDataGenerator:
         # Get or create districts
         self.ensure_districts()
 
+        self.factory = PropertyFactory(seed)
+
     def setup_auth(self):
         """Set up HTTP Basic Authentication"""
         if self.username and self.password:
-            credentials = f"{self.username}:{self.password}"
-            encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-            self.auth_header = f"Basic {encoded_credentials}"
+            self.auth_header = self.client.set_auth(self.username, self.password)
             print("✅ Authentication configured")
 
             # Test authentication
@@ -50,10 +160,8 @@ class MockDataGenerator:
 
     def test_auth(self):
         """Test if authentication works"""
-        headers = {'Authorization': self.auth_header}
-
         try:
-            response = requests.get(f"{self.base_url}/wp-json/wp/v2/users/me", headers=headers)
+            response = self.client.get(f"{self.base_url}/wp-json/wp/v2/users/me", authenticated=True)
 
             if response.status_code == 200:
                 user_data = response.json()
@@ -67,159 +175,76 @@ class MockDataGenerator:
             sys.exit(1)
 
     def ensure_districts(self):
-        """Get existing districts or create new ones if needed"""
-        district_names = ['Центральний', 'Північний', 'Південний', 'Східний', 'Західний']
-        district_slugs = ['central', 'northern', 'southern', 'eastern', 'western']
+        """Map the DISTRICTS slugs to the site's district terms, creating the missing ones
 
-        # Check if districts already exist
+        Properties reference their district by slug, so the generated data is
+        the same whatever other districts the site has or in which order.
+        """
         try:
             # Get all terms from the district taxonomy
-            headers = {'Authorization': self.auth_header}
-            response = requests.get(f"{self.wp_api_base}/district", headers=headers)
+            response = self.client.get(f"{self.wp_api_base}/district", params={'per_page': 100},
+                                       authenticated=True)
 
             if response.status_code == 200:
-                existing_districts = response.json()
-                if existing_districts:
-                    self.districts = existing_districts
-                    print(f"✅ Found {len(existing_districts)} existing districts")
-                    return
-
-            # If we get here, we need to create the districts
-            for i, name in enumerate(district_names):
+                self.districts = {district['slug']: district for district in response.json()}
+
+            found = sum(1 for slug, _, _ in DISTRICTS if slug in self.districts)
+            if found:
+                print(f"✅ Found {found} existing districts")
+
+            for slug, name, _ in DISTRICTS:
+                if slug in self.districts:
+                    continue
+
                 data = {
                     'name': name,
-                    'slug': district_slugs[i],
+                    'slug': slug,
                     'description': f'Properties in the {name} district'
                 }
 
-                response = requests.post(
+                response = self.client.post(
                     f"{self.wp_api_base}/district",
                     headers={
-                        'Authorization': self.auth_header,
                         'Content-Type': 'application/json'
                     },
-                    data=json.dumps(data)
+                    data=json.dumps(data),
+                    authenticated=True
                 )
 
                 if response.status_code == 201:
-                    district = response.json()
-                    self.districts.append(district)
+                    self.districts[slug] = response.json()
                     print(f"✅ Created district: {name}")
                 else:
                     print(f"❌ Failed to create district {name}: {response.status_code}")
 
-            print(f"✅ Created {len(self.districts)} districts")
-
         except Exception as e:
             print(f"❌ Error ensuring districts: {str(e)}")
             sys.exit(1)
 
-    def random_building_data(self):
-        """Generate random building data"""
-        building_types = ['panel', 'brick', 'foam_block']
-        building_type_names = {
-            'panel': 'Панель',
-            'brick': 'Цегла',
-            'foam_block': 'Піноблок'
-        }
-        building_names = [
-            'Сонячний', 'Затишний', 'Престижний', 'Ексклюзивний', 'Елітний',
-            'Парковий', 'Центральний', 'Новий', 'Сучасний', 'Комфортний'
-        ]
-
-        # Random district
-        district = random.choice(self.districts)
-
-        # Random building data
-        building_type = random.choice(building_types)
-        floors = random.randint(5, 25)
-        eco_rating = random.randint(1, 5)
-        building_name = f"{random.choice(building_names)} {random.randint(1, 100)}"
-
-        # Random coordinates (Kyiv area)
-        lat = round(random.uniform(50.38, 50.52), 6)
-        lon = round(random.uniform(30.28, 30.71), 6)
-        coordinates = f"{lat}, {lon}"
-
-        # Generate 1-5 random premises
-        premises = []
-        num_premises = random.randint(1, 5)
-        for _ in range(num_premises):
-            area = round(random.uniform(50, 150), 1)
-            rooms = random.randint(1, 4)
-            balcony = random.choice(['yes', 'no'])
-            bathroom = random.choice(['yes', 'no'])
-
-            premises.append({
-                'area': str(area),
-                'rooms': rooms,
-                'balcony': balcony,
-                'bathroom': bathroom
-            })
-
-        return {
-            'district': district['slug'],
-            'building_name': building_name,
-            'building_type': building_type,
-            'floors': floors,
-            'eco_rating': eco_rating,
-            'coordinates': coordinates,
-            'premises': premises
-        }
+    def build_property_data(self, index):
+        """Build the REST payload for the property with the given index"""
+        return self.factory.build(index)
 
     def create_property(self, index):
         """Create a single property without image handling"""
-        building_data = self.random_building_data()
-
-        # Create a title for the property
-        title = f"Будинок {building_data['building_name']} ({index + 1})"
-
-        building_type_names = {
-            'panel': 'Панель',
-            'brick': 'Цегла',
-            'foam_block': 'Піноблок'
-        }
-
-        # Find district name from slug and use correct grammatical case for Ukrainian
-        district_locative = {
-            'central': 'Центральному',
-            'northern': 'Північному',
-            'southern': 'Південному',
-            'eastern': 'Східному',
-            'western': 'Західному'
-        }
-
-        district_name = district_locative.get(building_data['district'], "Центральному")  # Default fallback
-
-        # Create property data
-        property_data = {
-            'title': title,
-            'content': f"Сучасний будинок {building_data['building_name']} у {district_name} районі. "
-                       f"Тип: {building_type_names[building_data['building_type']]}, "
-                       f"поверхів: {building_data['floors']}, "
-                       f"екологічний рейтинг: {building_data['eco_rating']}. "
-                       f"Розташування: {building_data['coordinates']}.",
-            'district': building_data['district'],
-            'building_name': building_data['building_name'],
-            'coordinates': building_data['coordinates'],
-            'floors': building_data['floors'],
-            'building_type': building_data['building_type'],
-            'eco_rating': building_data['eco_rating'],
-            'premises': building_data['premises']
-        }
+        property_data = self.build_property_data(index)
+        title = property_data['title']
 
         headers = {
-            'Authorization': self.auth_header,
             'Content-Type': 'application/json'
         }
 
         try:
             # Create the property
-            response = requests.post(
+            started = time.perf_counter()
+            response = self.client.post(
                 f"{self.api_base}/properties",
                 headers=headers,
-                data=json.dumps(property_data)
+                data=json.dumps(property_data),
+                authenticated=True
             )
+            self.latency.record(time.perf_counter() - started, response.status_code,
+                                response.status_code in [200, 201])
 
             if response.status_code in [200, 201]:
                 data = response.json()
@@ -235,21 +260,103 @@ class MockDataGenerator:
             print(f"❌ Error creating property: {str(e)}")
             return None
 
-    def generate_mock_data(self, count):
-        """Generate a specified number of mock properties"""
-        print(f"\n=== Generating {count} mock real estate properties ===\n")
+    def create_property_batch(self, indices):
+        """Create several properties with a single POST /properties/batch request
+
+        Returns the number of properties that were created.
+        """
+        return self.create_properties([self.build_property_data(i) for i in indices])
 
+    def create_properties(self, properties):
+        """Create the given property payloads with a single POST /properties/batch request
+
+        Returns the number of properties that were created.
+        """
+        operations = [{'method': 'create', 'data': data} for data in properties]
+        headers = {
+            'Content-Type': 'application/json'
+        }
+
+        try:
+            started = time.perf_counter()
+            response = self.client.post(
+                f"{self.api_base}/properties/batch",
+                headers=headers,
+                data=json.dumps({'operations': operations}),
+                authenticated=True
+            )
+            self.latency.record(time.perf_counter() - started, response.status_code,
+                                response.status_code == 200)
+
+            if response.status_code != 200:
+                print(f"❌ Failed to create batch of {len(operations)} properties: {response.status_code}")
+                print(response.text)
+                return 0
+
+            created = 0
+            for result in response.json().get('results', []):
+                title = operations[result['index']]['data']['title']
+                if result.get('status') == 201:
+                    created += 1
+                    print(f"✅ Created property: {title} (ID: {result.get('id')})")
+                else:
+                    error = result.get('error', {})
+                    print(f"❌ Failed to create property {title}: {result.get('status')} {error.get('message', '')}")
+            return created
+
+        except Exception as e:
+            print(f"❌ Error creating property batch: {str(e)}")
+            return 0
+
+    def generate_mock_data(self, count, workers=1, batch_size=0, start=0):
+        """Generate a specified number of mock properties
+
+        With workers > 1 the properties are created concurrently from a thread pool.
+        With batch_size > 0 they are sent batch_size at a time to /properties/batch.
+        Properties are numbered from `start`, so topping up a catalogue continues
+        the seeded sequence instead of repeating it.
+        """
+        mode = f"batches of {batch_size}" if batch_size > 0 else "single requests"
+        print(f"\n=== Generating {count} mock real estate properties ({workers} worker(s), {mode}, seed {self.factory.seed}) ===\n")
+
+        self.latency = LatencyRecorder('POST /properties/batch' if batch_size > 0 else 'POST /properties')
         created_count = 0
-        for i in range(count):
-            if self.create_property(i):
-                created_count += 1
+        started = time.perf_counter()
+
+        if batch_size > 0:
+            chunks = [range(i, min(i + batch_size, start + count)) for i in range(start, start + count, batch_size)]
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+                for created in executor.map(self.create_property_batch, chunks):
+                    created_count += created
+        elif workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.create_property, i) for i in range(start, start + count)]
+                for future in as_completed(futures):
+                    if future.result():
+                        created_count += 1
+        else:
+            for i in range(start, start + count):
+                if self.create_property(i):
+                    created_count += 1
+
+        elapsed = time.perf_counter() - started
 
         print(f"\n=== Mock data generation complete ===")
         print(f"Successfully created {created_count} out of {count} properties")
-        print(f"\nNote: No images were uploaded. Please add images manually through the WordPress admin.")
+        self.print_throughput_summary(count, elapsed)
+        print(f"\nNote: No images were uploaded. Add them in the WordPress admin or push them with upload_media.py.")
 
         return created_count
 
+    def print_throughput_summary(self, count, elapsed):
+        """Print aggregate throughput and request latency percentiles"""
+        stats = self.latency.summary(elapsed)
+        rate = count / elapsed if elapsed > 0 else 0
+        print(f"Elapsed time:   {elapsed:.2f}s")
+        print(f"Throughput:     {rate:.2f} items/s")
+        print(f"Latency p50:    {stats['p50'] * 1000:.1f} ms")
+        print(f"Latency p95:    {stats['p95'] * 1000:.1f} ms")
+
 def main():
     """Main function to parse arguments and run the generator"""
     parser = argparse.ArgumentParser(description='Generate mock real estate entries')
@@ -257,11 +364,20 @@ def main():
     parser.add_argument('-u', '--username', required=True, help='WordPress username')
     parser.add_argument('-p', '--password', required=True, help='WordPress application password')
     parser.add_argument('-c', '--count', type=int, default=8, help='Number of entries to generate (default: 8)')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of concurrent workers (default: 1)')
+    parser.add_argument('-b', '--batch-size', type=int, default=0,
+                        help='Create properties through /properties/batch, this many per request (max 100, default: off)')
+    parser.add_argument('--seed', type=int, help='Random seed; the same seed always creates the same properties')
+    parser.add_argument('--start', type=int, default=0,
+                        help='Number of the first property, to top up a seeded catalogue without repeating it (default: 0)')
+    add_client_arguments(parser)
 
     args = parser.parse_args()
 
-    generator = MockDataGenerator(args.url, args.username, args.password)
-    generator.generate_mock_data(args.count)
+    # Every worker gets its own pooled connection
+    client = client_from_args(args, min_pool_size=args.workers)
+    generator = MockDataGenerator(args.url, args.username, args.password, client=client, seed=args.seed)
+    generator.generate_mock_data(args.count, args.workers, min(args.batch_size, 100), args.start)
 
 if __name__ == "__main__":
     main()
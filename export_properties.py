@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Real Estate Property Exporter
+
+This script streams the full property catalogue from GET /properties page by page
+and writes it incrementally as NDJSON or CSV, so memory use stays constant
+regardless of catalogue size. Pages are walked with cursor pagination by
+default, so every page costs the same no matter how deep into the catalogue it is.
+"""
+
+import sys
+import csv
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import ApiClient, add_client_arguments, client_from_args
+
+MAX_PER_PAGE = 100
+CURSOR_START = '*'
+CSV_COLUMNS = [
+    'id', 'title', 'link', 'districts', 'building_name', 'coordinates',
+    'floors', 'building_type', 'eco_rating', 'premises', 'content',
+]
+
+
+class NdjsonWriter:
+    """Write one JSON document per line"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, item):
+        self.stream.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+class CsvWriter:
+    """Write one CSV row per property, nested fields encoded as JSON"""
+
+    def __init__(self, stream):
+        self.writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, item):
+        row = dict(item)
+        row['districts'] = ';'.join(d.get('slug', '') for d in item.get('districts') or [])
+        row['premises'] = json.dumps(item.get('premises') or [], ensure_ascii=False)
+        self.writer.writerow(row)
+
+
+WRITERS = {
+    'ndjson': NdjsonWriter,
+    'csv': CsvWriter,
+}
+
+
+class PropertyExporter:
+    """Class to walk every page of GET /properties"""
+
+    def __init__(self, base_url, client=None, per_page=MAX_PER_PAGE, filters=None, pagination='cursor'):
+        """Initialize with the WordPress site URL"""
+        self.base_url = base_url.rstrip('/')
+        self.api_base = f"{self.base_url}/wp-json/real-estate/v1"
+        self.client = client or ApiClient()
+        self.per_page = min(per_page, MAX_PER_PAGE)
+        self.filters = filters or {}
+        self.pagination = pagination
+
+    def fetch_page(self, page):
+        """Fetch a single page and return (items, total, total_pages)"""
+        params = dict(self.filters, page=page, per_page=self.per_page)
+        response = self.client.get(f"{self.api_base}/properties", params=params)
+        response.raise_for_status()
+
+        total = int(response.headers.get('X-WP-Total', 0))
+        total_pages = int(response.headers.get('X-WP-TotalPages', 0))
+        return response.json(), total, total_pages
+
+    def fetch_cursor_page(self, cursor):
+        """Fetch the page at `cursor` and return (items, total, next_cursor)
+
+        Totals are only requested with the first page; total is None afterwards.
+        """
+        params = dict(self.filters, cursor=cursor, per_page=self.per_page)
+        if cursor != CURSOR_START:
+            params['include_totals'] = 'false'
+
+        response = self.client.get(f"{self.api_base}/properties", params=params)
+        response.raise_for_status()
+
+        total = response.headers.get('X-WP-Total')
+        next_cursor = response.headers.get('X-Real-Estate-Next-Cursor')
+        return response.json(), int(total) if total is not None else None, next_cursor
+
+    def iter_properties_cursor(self):
+        """Yield every property by following X-Real-Estate-Next-Cursor"""
+        items, total, cursor = self.fetch_cursor_page(CURSOR_START)
+        print(f"Exporting {total} properties", file=sys.stderr)
+        yield from items
+
+        while cursor:
+            items, _, cursor = self.fetch_cursor_page(cursor)
+            yield from items
+
+    def iter_properties(self, workers=1):
+        """Yield every property in page order
+
+        In cursor mode pages are walked one after another and `workers` is
+        ignored. In offset mode the first page is fetched on its own to learn
+        X-WP-TotalPages. With workers > 1 the remaining pages are then fetched
+        in parallel, keeping at most `workers` pages in flight so memory use
+        stays bounded.
+        """
+        if self.pagination == 'cursor':
+            yield from self.iter_properties_cursor()
+            return
+
+        items, total, total_pages = self.fetch_page(1)
+        print(f"Exporting {total} properties from {total_pages} page(s)", file=sys.stderr)
+        yield from items
+
+        if workers <= 1:
+            for page in range(2, total_pages + 1):
+                items, _, _ = self.fetch_page(page)
+                yield from items
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            next_page = 2
+            while next_page <= total_pages or pending:
+                while next_page <= total_pages and len(pending) < workers:
+                    pending.append(executor.submit(self.fetch_page, next_page))
+                    next_page += 1
+
+                items, _, _ = pending.popleft().result()
+                yield from items
+
+    def export(self, stream, output_format='ndjson', workers=1):
+        """Stream every property to `stream` and return the number written"""
+        writer = WRITERS[output_format](stream)
+        count = 0
+        for item in self.iter_properties(workers):
+            writer.write(item)
+            count += 1
+        stream.flush()
+        return count
+
+
+def main():
+    """Main function to parse arguments and run the exporter"""
+    parser = argparse.ArgumentParser(description='Export all real estate properties')
+    parser.add_argument('url', help='WordPress site URL')
+    parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+    parser.add_argument('-f', '--format', choices=sorted(WRITERS), default='ndjson', help='Output format (default: ndjson)')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Pages fetched in parallel in offset mode (default: 1)')
+    parser.add_argument('--pagination', choices=['cursor', 'offset'], default='cursor',
+                        help='Walk pages by cursor, or by page number so they can be fetched in parallel (default: cursor)')
+    parser.add_argument('--per-page', type=int, default=MAX_PER_PAGE, help=f'Items per page (default: {MAX_PER_PAGE})')
+    parser.add_argument('--district', help='Only export properties in this district')
+    parser.add_argument('--building-type', help='Only export properties of this building type')
+    add_client_arguments(parser)
+
+    args = parser.parse_args()
+
+    filters = {}
+    if args.district:
+        filters['district'] = args.district
+    if args.building_type:
+        filters['building_type'] = args.building_type
+
+    client = client_from_args(args, min_pool_size=args.workers)
+    exporter = PropertyExporter(args.url, client=client, per_page=args.per_page, filters=filters, pagination=args.pagination)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as stream:
+            count = exporter.export(stream, args.format, args.workers)
+    else:
+        count = exporter.export(sys.stdout, args.format, args.workers)
+
+    print(f"✅ Exported {count} properties", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Deterministic Dataset Generator
+
+This script streams any number of seeded mock properties, premises included,
+to one of several targets:
+
+- ndjson: one REST payload per line, e.g. for export/import comparisons
+- sql:    a MySQL dump of posts, ACF post meta and district relationships
+- wxr:    a WordPress eXtended RSS file for the WordPress Importer
+- api:    a batched push through POST /properties/batch
+
+Properties are generated one at a time with create_mock_entries.py's
+PropertyFactory, so the same seed always yields the same dataset and memory
+use does not grow with --count. Outputs ending in .gz are gzip-compressed.
+"""
+
+import sys
+import gzip
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from api_client import add_client_arguments, client_from_args
+from create_mock_entries import DISTRICTS, MockDataGenerator, PropertyFactory
+
+FORMATS = ('ndjson', 'sql', 'wxr', 'api')
+BASE_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+PROGRESS_EVERY = 100000
+
+# ACF field keys stored next to each value, as ACF's update_field() does
+ACF_FIELD_KEYS = {
+    'building_name': 'field_building_name',
+    'coordinates': 'field_coordinates',
+    'floors': 'field_floors',
+    'building_type': 'field_building_type',
+    'eco_rating': 'field_eco_rating',
+    'premises': 'field_premises',
+}
+ACF_PREMISE_KEYS = {
+    'area': 'field_premise_area',
+    'rooms': 'field_premise_rooms',
+    'balcony': 'field_premise_balcony',
+    'bathroom': 'field_premise_bathroom',
+}
+
+
+def acf_meta_rows(data):
+    """Yield the (meta_key, meta_value) rows ACF stores for a property payload"""
+    for name, field_key in ACF_FIELD_KEYS.items():
+        value = len(data['premises']) if name == 'premises' else data[name]
+        yield name, str(value)
+        yield f"_{name}", field_key
+
+    for row, premise in enumerate(data['premises']):
+        for name, field_key in ACF_PREMISE_KEYS.items():
+            yield f"premises_{row}_{name}", str(premise[name])
+            yield f"_premises_{row}_{name}", field_key
+
+
+def post_date(index):
+    """Deterministic publication date of the property with the given index"""
+    return (BASE_DATE + timedelta(minutes=index)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class NdjsonWriter:
+    """Write one REST payload per line"""
+
+    def __init__(self, stream):
+        """Initialize with a text stream"""
+        self.stream = stream
+
+    def write(self, index, data):
+        """Write one property"""
+        self.stream.write(json.dumps(data, ensure_ascii=False))
+        self.stream.write('\n')
+
+    def close(self):
+        """Nothing to finish"""
+
+
+class SqlWriter:
+    """Write a MySQL dump of properties with explicit post IDs
+
+    Rows are sent as multi-row INSERTs of at most `chunk_rows` rows, so the
+    dump imports quickly and only one chunk per table is held in memory.
+    Districts are created if missing and looked up by slug into variables.
+    """
+
+    def __init__(self, stream, table_prefix, first_post_id, author_id, site_url, chunk_rows=500):
+        """Initialize with a text stream and the target site's settings"""
+        self.stream = stream
+        self.prefix = table_prefix
+        self.first_post_id = first_post_id
+        self.author_id = author_id
+        self.site_url = site_url.rstrip('/')
+        self.chunk_rows = chunk_rows
+        self.buffers = {'posts': [], 'postmeta': [], 'term_relationships': []}
+        self.columns = {
+            'posts': '(ID, post_author, post_date, post_date_gmt, post_content, post_title, post_excerpt, '
+                     'post_status, comment_status, ping_status, post_name, to_ping, pinged, post_modified, '
+                     'post_modified_gmt, post_content_filtered, post_parent, guid, menu_order, post_type, comment_count)',
+            'postmeta': '(post_id, meta_key, meta_value)',
+            'term_relationships': '(object_id, term_taxonomy_id, term_order)',
+        }
+        self.write_header()
+
+    @staticmethod
+    def quote(value):
+        """Quote a string as a MySQL literal"""
+        value = str(value)
+        for char, escaped in (('\\', '\\\\'), ("'", "\\'"), ('\n', '\\n'), ('\r', '\\r'), ('\x00', '\\0'), ('\x1a', '\\Z')):
+            value = value.replace(char, escaped)
+        return f"'{value}'"
+
+    def write_header(self):
+        """Create missing districts and look up their term_taxonomy_id"""
+        p = self.prefix
+        self.stream.write("-- Real Estate Objects dataset generated by generate_dataset.py\n")
+        self.stream.write("SET NAMES utf8mb4;\n\n")
+
+        for slug, name, _ in DISTRICTS:
+            exists = (f"SELECT 1 FROM {p}term_taxonomy tt JOIN {p}terms t ON t.term_id = tt.term_id "
+                      f"WHERE tt.taxonomy = 'district' AND t.slug = {self.quote(slug)}")
+            self.stream.write(f"INSERT INTO {p}terms (name, slug, term_group) SELECT {self.quote(name)}, {self.quote(slug)}, 0 "
+                              f"FROM DUAL WHERE NOT EXISTS ({exists});\n")
+            self.stream.write(f"INSERT INTO {p}term_taxonomy (term_id, taxonomy, description, parent, count) "
+                              f"SELECT LAST_INSERT_ID(), 'district', '', 0, 0 FROM DUAL WHERE ROW_COUNT() > 0;\n")
+            self.stream.write(f"SET @district_{slug} = (SELECT tt.term_taxonomy_id FROM {p}term_taxonomy tt "
+                              f"JOIN {p}terms t ON t.term_id = tt.term_id WHERE tt.taxonomy = 'district' "
+                              f"AND t.slug = {self.quote(slug)} LIMIT 1);\n\n")
+
+    def write(self, index, data):
+        """Buffer the rows of one property, flushing full chunks"""
+        post_id = self.first_post_id + index
+        date = post_date(index)
+        q = self.quote
+
+        self.add('posts', f"({post_id}, {self.author_id}, {q(date)}, {q(date)}, {q(data['content'])}, {q(data['title'])}, '', "
+                          f"'publish', 'closed', 'closed', {q(f'property-{index + 1}')}, '', '', {q(date)}, {q(date)}, '', 0, "
+                          f"{q(f'{self.site_url}/?post_type=real_estate_object&p={post_id}')}, 0, 'real_estate_object', 0)")
+
+        for key, value in acf_meta_rows(data):
+            self.add('postmeta', f"({post_id}, {q(key)}, {q(value)})")
+
+        self.add('term_relationships', f"({post_id}, @district_{data['district']}, 0)")
+
+    def add(self, table, row):
+        """Buffer one row and flush the table's chunk when it is full"""
+        self.buffers[table].append(row)
+        if len(self.buffers[table]) >= self.chunk_rows:
+            self.flush(table)
+
+    def flush(self, table):
+        """Write the buffered rows of a table as one INSERT"""
+        rows = self.buffers[table]
+        if rows:
+            self.stream.write(f"INSERT INTO {self.prefix}{table} {self.columns[table]} VALUES\n")
+            self.stream.write(',\n'.join(rows))
+            self.stream.write(';\n')
+            self.buffers[table] = []
+
+    def close(self):
+        """Flush the remaining rows and recount the districts"""
+        for table in self.buffers:
+            self.flush(table)
+
+        p = self.prefix
+        self.stream.write(f"\nUPDATE {p}term_taxonomy tt SET count = (SELECT COUNT(*) FROM {p}term_relationships tr "
+                          f"WHERE tr.term_taxonomy_id = tt.term_taxonomy_id) WHERE tt.taxonomy = 'district';\n")
+        self.stream.write("-- Afterwards run: wp real-estate reindex-premises && wp real-estate reindex-attributes "
+                          "&& wp real-estate rebuild-facets && wp real-estate rebuild-documents\n")
+
+
+class WxrWriter:
+    """Write a WXR 1.2 file for the WordPress Importer"""
+
+    def __init__(self, stream, first_post_id, site_url):
+        """Initialize with a text stream and the target site's settings"""
+        self.stream = stream
+        self.first_post_id = first_post_id
+        self.site_url = site_url.rstrip('/')
+        self.district_names = {slug: name for slug, name, _ in DISTRICTS}
+        self.write_header()
+
+    @staticmethod
+    def cdata(value):
+        """Wrap a value in CDATA, splitting any "]]>" it contains"""
+        return '<![CDATA[' + str(value).replace(']]>', ']]]]><![CDATA[>') + ']]>'
+
+    @staticmethod
+    def escape(value):
+        """Escape text for an XML element"""
+        return str(value).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+    def write_header(self):
+        """Write the channel header and the district terms"""
+        self.stream.write(
+            '<?xml version="1.0" encoding="UTF-8" ?>\n'
+            '<rss version="2.0" xmlns:excerpt="http://wordpress.org/export/1.2/excerpt/" '
+            'xmlns:content="http://purl.org/rss/1.0/modules/content/" xmlns:wfw="http://wellformedweb.org/CommentAPI/" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:wp="http://wordpress.org/export/1.2/">\n'
+            '<channel>\n'
+            '\t<title>Real Estate Objects dataset</title>\n'
+            f'\t<link>{self.escape(self.site_url)}</link>\n'
+            '\t<description></description>\n'
+            '\t<wp:wxr_version>1.2</wp:wxr_version>\n'
+            f'\t<wp:base_site_url>{self.escape(self.site_url)}</wp:base_site_url>\n'
+            f'\t<wp:base_blog_url>{self.escape(self.site_url)}</wp:base_blog_url>\n'
+        )
+
+        for term_id, (slug, name, _) in enumerate(DISTRICTS, start=1):
+            self.stream.write(
+                f'\t<wp:term><wp:term_id>{term_id}</wp:term_id><wp:term_taxonomy>district</wp:term_taxonomy>'
+                f'<wp:term_slug>{self.cdata(slug)}</wp:term_slug><wp:term_parent></wp:term_parent>'
+                f'<wp:term_name>{self.cdata(name)}</wp:term_name></wp:term>\n'
+            )
+
+    def write(self, index, data):
+        """Write one property as an item"""
+        post_id = self.first_post_id + index
+        date = post_date(index)
+        link = f"{self.site_url}/?post_type=real_estate_object&p={post_id}"
+        meta = ''.join(
+            f'\t\t<wp:postmeta><wp:meta_key>{self.cdata(key)}</wp:meta_key>'
+            f'<wp:meta_value>{self.cdata(value)}</wp:meta_value></wp:postmeta>\n'
+            for key, value in acf_meta_rows(data)
+        )
+
+        self.stream.write(
+            '\t<item>\n'
+            f'\t\t<title>{self.escape(data["title"])}</title>\n'
+            f'\t\t<link>{self.escape(link)}</link>\n'
+            f'\t\t<dc:creator>{self.cdata("admin")}</dc:creator>\n'
+            f'\t\t<guid isPermaLink="false">{self.escape(link)}</guid>\n'
+            '\t\t<description></description>\n'
+            f'\t\t<content:encoded>{self.cdata(data["content"])}</content:encoded>\n'
+            f'\t\t<excerpt:encoded>{self.cdata("")}</excerpt:encoded>\n'
+            f'\t\t<wp:post_id>{post_id}</wp:post_id>\n'
+            f'\t\t<wp:post_date>{self.cdata(date)}</wp:post_date>\n'
+            f'\t\t<wp:post_date_gmt>{self.cdata(date)}</wp:post_date_gmt>\n'
+            '\t\t<wp:comment_status>closed</wp:comment_status>\n'
+            '\t\t<wp:ping_status>closed</wp:ping_status>\n'
+            f'\t\t<wp:post_name>property-{index + 1}</wp:post_name>\n'
+            '\t\t<wp:status>publish</wp:status>\n'
+            '\t\t<wp:post_parent>0</wp:post_parent>\n'
+            '\t\t<wp:menu_order>0</wp:menu_order>\n'
+            '\t\t<wp:post_type>real_estate_object</wp:post_type>\n'
+            '\t\t<wp:post_password></wp:post_password>\n'
+            '\t\t<wp:is_sticky>0</wp:is_sticky>\n'
+            f'\t\t<category domain="district" nicename="{data["district"]}">'
+            f'{self.cdata(self.district_names.get(data["district"], data["district"]))}</category>\n'
+            f'{meta}'
+            '\t</item>\n'
+        )
+
+    def close(self):
+        """Close the channel"""
+        self.stream.write('</channel>\n</rss>\n')
+
+
+class ApiWriter:
+    """Push properties through POST /properties/batch from a thread pool
+
+    At most 2 * workers batches are queued at any time, so memory stays
+    bounded however many properties are pushed.
+    """
+
+    def __init__(self, generator, batch_size, workers):
+        """Initialize with an authenticated MockDataGenerator"""
+        self.generator = generator
+        self.batch_size = batch_size
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = []
+        self.batch = []
+        self.created = 0
+
+    def write(self, index, data):
+        """Queue one property, sending a batch when it is full"""
+        self.batch.append(data)
+        if len(self.batch) >= self.batch_size:
+            self.submit()
+
+    def submit(self):
+        """Send the current batch, waiting for the oldest one if too many are in flight"""
+        if self.batch:
+            self.pending.append(self.executor.submit(self.generator.create_properties, self.batch))
+            self.batch = []
+
+        while len(self.pending) > 2 * self.workers:
+            self.created += self.pending.pop(0).result()
+
+    def close(self):
+        """Send the last batch and wait for every request"""
+        self.submit()
+        for future in self.pending:
+            self.created += future.result()
+        self.pending = []
+        self.executor.shutdown()
+
+
+def open_output(path):
+    """Open a text output stream, gzip-compressed for .gz paths, stdout for -"""
+    if path == '-':
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    return open(path, 'w', encoding='utf-8')
+
+
+def generate(factory, writer, start, count):
+    """Stream `count` properties starting at index `start` into a writer"""
+    started = time.perf_counter()
+
+    for index in range(start, start + count):
+        writer.write(index, factory.build(index))
+
+        done = index - start + 1
+        if done % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - started
+            print(f"Generated {done} properties ({done / elapsed:.0f}/s)", file=sys.stderr)
+
+    writer.close()
+
+    return time.perf_counter() - started
+
+
+def main():
+    """Main function to parse arguments and run the generator"""
+    parser = argparse.ArgumentParser(description='Stream a reproducible mock property dataset')
+    parser.add_argument('-c', '--count', type=int, default=100000, help='Number of properties (default: 100000)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--start', type=int, default=0, help='Index of the first property, to generate a dataset in shards (default: 0)')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='ndjson', help='Output target (default: ndjson)')
+    parser.add_argument('-o', '--output', default='-', help='Output file, .gz for gzip, - for stdout (default: -)')
+    parser.add_argument('--site-url', default='http://localhost', help='Site URL used in GUIDs and links (sql, wxr)')
+    parser.add_argument('--first-post-id', type=int, default=1000000,
+                        help='Post ID of property 0; IDs must be free on the target site (sql, wxr; default: 1000000)')
+    parser.add_argument('--table-prefix', default='wp_', help='Database table prefix (sql; default: wp_)')
+    parser.add_argument('--author-id', type=int, default=1, help='post_author of the properties (sql; default: 1)')
+    parser.add_argument('--url', help='WordPress site URL (api)')
+    parser.add_argument('-u', '--username', help='WordPress username (api)')
+    parser.add_argument('-p', '--password', help='WordPress application password (api)')
+    parser.add_argument('-b', '--batch-size', type=int, default=100, help='Properties per /properties/batch request (api, max 100; default: 100)')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='Concurrent batches (api; default: 4)')
+    add_client_arguments(parser)
+
+    args = parser.parse_args()
+
+    if args.format == 'api':
+        if not (args.url and args.username and args.password):
+            parser.error('--url, --username and --password are required for --format api')
+
+        client = client_from_args(args, min_pool_size=args.workers)
+        generator = MockDataGenerator(args.url, args.username, args.password, client=client, seed=args.seed)
+        writer = ApiWriter(generator, min(args.batch_size, 100), args.workers)
+        elapsed = generate(generator.factory, writer, args.start, args.count)
+
+        print(f"\nCreated {writer.created} of {args.count} properties")
+        generator.print_throughput_summary(args.count, elapsed)
+        sys.exit(0 if writer.created == args.count else 1)
+
+    stream = open_output(args.output)
+    factory = PropertyFactory(args.seed)
+
+    if args.format == 'ndjson':
+        writer = NdjsonWriter(stream)
+    elif args.format == 'sql':
+        writer = SqlWriter(stream, args.table_prefix, args.first_post_id, args.author_id, args.site_url)
+    else:
+        writer = WxrWriter(stream, args.first_post_id, args.site_url)
+
+    try:
+        elapsed = generate(factory, writer, args.start, args.count)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    rate = args.count / elapsed if elapsed > 0 else 0
+    print(f"Generated {args.count} properties (seed {args.seed}) in {elapsed:.2f}s ({rate:.0f}/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
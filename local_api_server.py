@@ -0,0 +1,1211 @@
+#!/usr/bin/env python3
+"""
+Local Real Estate API Server
+
+This script serves a self-contained stand-in for the parts of the WordPress
+REST API the tooling talks to, so api_test.py, create_mock_entries.py and the
+benchmarks can run on a machine without WordPress:
+
+- /wp-json/real-estate/v1/properties with the plugin's filters, page and
+  cursor pagination, the modified_after change feed with tombstones,
+  fields/compact, X-WP-Total headers, XML/MessagePack/CBOR negotiation,
+  gzip/Brotli compression, opt-in Server-Timing phases and the response
+  cache's ETag/Last-Modified/X-Real-Estate-Cache behaviour
+- /wp-json/real-estate/v1/properties/{id} and /properties/batch
+- /wp-json/wp/v2/district and /wp-json/wp/v2/users/me
+- Basic Authentication against one configured user and application password
+
+Properties live in memory with per-attribute indexes, and anonymous list
+responses are cached as encoded bodies, so the server sustains high request
+rates. Latency and errors can be injected for realistic load runs.
+"""
+
+import re
+import sys
+import gzip
+import json
+import math
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit
+
+import api_formats
+from create_mock_entries import DISTRICTS, PropertyFactory
+from generate_dataset import post_date
+
+BUILDING_TYPES = ('panel', 'brick', 'foam_block')
+YES_NO = ('yes', 'no')
+CURSOR_START = '*'
+COMPACT_FIELDS = 'id,title,districts.slug,coordinates,floors,building_type,eco_rating'
+BATCH_MAX_OPERATIONS = 100
+CACHE_MAX_ENTRIES = 1000
+COMPRESS_MIN_BYTES = 1024
+EARTH_RADIUS_KM = 6371.0
+NOTE = 'Images should be added manually through WordPress admin'
+
+# Property response fields in output order, with the sub-fields that can be selected
+RESPONSE_FIELDS = OrderedDict([
+    ('id', True),
+    ('title', True),
+    ('content', True),
+    ('link', True),
+    ('modified_gmt', True),
+    ('districts', ('id', 'name', 'slug')),
+    ('building_name', True),
+    ('coordinates', True),
+    ('floors', True),
+    ('building_type', True),
+    ('eco_rating', True),
+    ('premises', ('area', 'rooms', 'balcony', 'bathroom')),
+    ('note', True),
+])
+
+# Arguments of GET /properties, as registered by the plugin
+PROPERTY_ARGS = {
+    'district': {'type': 'string'},
+    'building_type': {'type': 'string', 'enum': BUILDING_TYPES},
+    'min_floors': {'type': 'integer', 'minimum': 1, 'maximum': 20},
+    'max_floors': {'type': 'integer', 'minimum': 1, 'maximum': 20},
+    'min_eco_rating': {'type': 'integer', 'minimum': 1, 'maximum': 5},
+    'rooms': {'type': 'integer', 'minimum': 1, 'maximum': 10},
+    'balcony': {'type': 'string', 'enum': YES_NO},
+    'bathroom': {'type': 'string', 'enum': YES_NO},
+    'near': {'type': 'string', 'validate': lambda value: None if parse_coordinates(value) else 'Invalid parameter.'},
+    'radius': {'type': 'number', 'default': 2, 'minimum': 0.01, 'maximum': 100},
+    'bbox': {'type': 'string', 'validate': lambda value: None if parse_bbox(value) else 'Invalid parameter.'},
+    'fields': {'type': 'string', 'validate': lambda value: getattr(parse_fields(value), 'message', None)},
+    'compact': {'type': 'boolean', 'default': False},
+    'cursor': {'type': 'string'},
+    'modified_after': {'type': 'string', 'validate': lambda value: None if parse_datetime(value) else 'Invalid parameter.'},
+    'modified_after_id': {'type': 'integer', 'default': 0, 'minimum': 0},
+    'include_deleted': {'type': 'boolean', 'default': False},
+    'include_totals': {'type': 'boolean', 'default': True},
+    'page': {'type': 'integer', 'default': 1, 'minimum': 1},
+    'per_page': {'type': 'integer', 'default': 10, 'minimum': 1, 'maximum': 100},
+}
+
+PROPERTY_ITEM_ARGS = {
+    'fields': PROPERTY_ARGS['fields'],
+    'compact': PROPERTY_ARGS['compact'],
+}
+
+DISTRICT_ARGS = {
+    'page': {'type': 'integer', 'default': 1, 'minimum': 1},
+    'per_page': {'type': 'integer', 'default': 10, 'minimum': 1, 'maximum': 100},
+    'slug': {'type': 'string'},
+}
+
+
+class ApiError(Exception):
+    """A WP_Error-style error response"""
+
+    def __init__(self, code, message, status, **data):
+        """Initialize with the error code, message, HTTP status and extra data"""
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+        self.data = data
+
+    def to_dict(self):
+        """Body of the error response"""
+        return {'code': self.code, 'message': self.message, 'data': dict(self.data, status=self.status)}
+
+
+def parse_coordinates(value):
+    """Parse a "lat, lon" string into (lat, lon), or None if invalid"""
+    match = re.match(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$', value or '')
+    if not match:
+        return None
+
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if abs(lat) > 90 or abs(lon) > 180:
+        return None
+
+    return lat, lon
+
+
+def parse_bbox(value):
+    """Parse "min_lat,min_lon,max_lat,max_lon" into a tuple, or None if invalid
+
+    A min_lon greater than max_lon is a box crossing the 180th meridian.
+    """
+    parts = [part.strip() for part in (value or '').split(',')]
+    if len(parts) != 4:
+        return None
+
+    south_west = parse_coordinates(f"{parts[0]},{parts[1]}")
+    north_east = parse_coordinates(f"{parts[2]},{parts[3]}")
+    if not south_west or not north_east or south_west[0] > north_east[0]:
+        return None
+
+    return south_west + north_east
+
+
+def in_longitude_range(lon, min_lon, max_lon):
+    """Whether a longitude is in a range, which crosses the 180th meridian if min_lon > max_lon"""
+    if min_lon <= max_lon:
+        return min_lon <= lon <= max_lon
+
+    return lon >= min_lon or lon <= max_lon
+
+
+def parse_datetime(value):
+    """Parse a modified_after value into a GMT "Y-m-d H:i:s" string, or None if invalid
+
+    Values without a UTC offset are read as GMT, like the modified_gmt field.
+    """
+    match = re.match(r'^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:\.\d+)?(Z|[+-]\d{2}:?\d{2})?$', (value or '').strip(), re.I)
+    if not match:
+        return None
+
+    offset = (match.group(3) or 'Z').upper()
+    offset = '+00:00' if offset == 'Z' else offset if ':' in offset else f"{offset[:3]}:{offset[3:]}"
+
+    try:
+        moment = datetime.fromisoformat(f"{match.group(1)}T{match.group(2)}{offset}")
+    except ValueError:
+        return None
+
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_fields(value):
+    """Parse a fields list into {field: True | {sub_field: True}}, or an ApiError"""
+    fields = OrderedDict()
+
+    for path in (value or '').split(','):
+        path = path.strip()
+        if not path:
+            continue
+
+        name, _, sub_field = path.partition('.')
+        allowed = RESPONSE_FIELDS.get(name)
+
+        if allowed is None or (sub_field and (allowed is True or sub_field not in allowed)):
+            return ApiError('invalid_field', f"Unknown field: {path}", 400)
+
+        if not sub_field:
+            fields[name] = True
+        elif fields.get(name) is not True:
+            # A whole field wins over some of its sub-fields
+            fields.setdefault(name, {})[sub_field] = True
+
+    if not fields:
+        return ApiError('invalid_field', 'No fields requested', 400)
+
+    return fields
+
+
+def distance_key(lat, lon, point):
+    """Great-circle distance from point in millimetres, as the plugin's sort and cursor key"""
+    lat1, lon1 = point
+    a = (math.sin(math.radians(lat - lat1) / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat)) * math.sin(math.radians(lon - lon1) / 2) ** 2)
+    return int(round(EARTH_RADIUS_KM * 2 * math.asin(math.sqrt(a)) * 1000000))
+
+
+def validate_args(params, spec):
+    """Coerce and validate query parameters like the REST API's argument schema
+
+    Returns the values of every argument in spec (defaults included) or raises
+    a rest_invalid_param ApiError naming the invalid parameters.
+    """
+    values = {}
+    invalid = {}
+
+    for name, schema in spec.items():
+        if name not in params:
+            values[name] = schema.get('default')
+            continue
+
+        raw = params[name]
+        kind = schema['type']
+
+        if kind == 'integer':
+            if not re.match(r'^-?\d+$', raw.strip()):
+                invalid[name] = f"{name} is not of type integer."
+                continue
+            value = int(raw)
+        elif kind == 'number':
+            try:
+                value = float(raw)
+            except ValueError:
+                invalid[name] = f"{name} is not of type number."
+                continue
+        elif kind == 'boolean':
+            if raw.lower() not in ('true', 'false', '1', '0', ''):
+                invalid[name] = f"{name} is not of type boolean."
+                continue
+            value = raw.lower() in ('true', '1')
+        else:
+            value = raw
+
+        if 'enum' in schema and value not in schema['enum']:
+            invalid[name] = f"{name} is not one of {', '.join(schema['enum'])}."
+        elif 'minimum' in schema and value < schema['minimum']:
+            invalid[name] = f"{name} must be greater than or equal to {schema['minimum']}"
+        elif 'maximum' in schema and value > schema['maximum']:
+            invalid[name] = f"{name} must be less than or equal to {schema['maximum']}"
+        elif 'validate' in schema and schema['validate'](value):
+            invalid[name] = schema['validate'](value)
+        else:
+            values[name] = value
+
+    if invalid:
+        raise ApiError('rest_invalid_param', f"Invalid parameter(s): {', '.join(invalid)}", 400, params=invalid)
+
+    return values
+
+
+def encode_json(data):
+    """Encode like wp_json_encode: compact, ASCII-only, with escaped slashes"""
+    return json.dumps(data, separators=(',', ':')).replace('/', '\\/').encode('ascii')
+
+
+def encode_xml(data):
+    """Encode like the plugin's write_xml(): numeric keys become <item>, angle brackets go in CDATA"""
+    parts = ['<?xml version="1.0"?>\n<response>']
+
+    def write(key, value):
+        key = 'item' if isinstance(key, int) else re.sub(r'[^a-z0-9_]', '', key, flags=re.I)
+        parts.append(f"<{key}>")
+
+        if isinstance(value, dict):
+            for child_key, child_value in value.items():
+                write(child_key, child_value)
+        elif isinstance(value, list):
+            for child_key, child_value in enumerate(value):
+                write(child_key, child_value)
+        elif isinstance(value, str) and ('<' in value or '>' in value):
+            parts.append('<![CDATA[' + value.replace(']]>', ']]]]><![CDATA[>') + ']]>')
+        elif value is not None and value is not False:
+            text = '1' if value is True else str(value)
+            parts.append(text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'))
+
+        parts.append(f"</{key}>")
+
+    for key, value in (data.items() if isinstance(data, dict) else enumerate(data)):
+        write(key, value)
+
+    parts.append('</response>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def format_server_timing(timings, total):
+    """Format phases in seconds like Real_Estate_Timing::format_header(); there are no database queries here"""
+    metrics = list(timings.items()) + [('total', total)]
+    return ', '.join(f'{name};dur={seconds * 1000:.2f};desc="0 queries"' for name, seconds in metrics)
+
+
+class PropertyStore:
+    """In-memory properties and districts with the indexes the filters need
+
+    Properties are kept in (post_date, id) order for date-sorted pages and
+    cursors and in (modified, id) order for the change feed, next to the
+    tombstones of deleted ones. Every filterable attribute maps its values to
+    sets of IDs, so a filtered page intersects a few sets instead of scanning
+    everything.
+    Values are stored as strings, as WordPress returns post meta.
+    """
+
+    INDEXED = ('district', 'building_type', 'floors', 'eco_rating', 'rooms', 'balcony', 'bathroom')
+
+    def __init__(self):
+        """Initialize an empty store"""
+        self.lock = threading.RLock()
+        self.properties = {}
+        self.order = []
+        self.changes = []
+        self.tombstones = []
+        self.indexes = {name: {} for name in self.INDEXED}
+        self.districts = OrderedDict()
+        self.next_post_id = 1
+        self.next_term_id = 1
+        self.generation = 0
+        self.modified = time.time()
+
+    def touch(self):
+        """Record a change, invalidating cached responses"""
+        self.generation += 1
+        self.modified = time.time()
+
+    def add_district(self, name, slug, description=''):
+        """Create a district and return it"""
+        with self.lock:
+            district = {
+                'id': self.next_term_id,
+                'name': name,
+                'slug': slug,
+                'description': description,
+            }
+            self.next_term_id += 1
+            self.districts[slug] = district
+            self.touch()
+            return district
+
+    def district_count(self, slug):
+        """Number of properties in a district"""
+        return len(self.indexes['district'].get(slug, ()))
+
+    def index_values(self, record):
+        """Yield the (index, value) pairs of a property"""
+        if record['district']:
+            yield 'district', record['district']
+        yield 'building_type', record['building_type']
+        yield 'floors', self.to_int(record['floors'])
+        yield 'eco_rating', self.to_int(record['eco_rating'])
+        for premise in record['premises']:
+            yield 'rooms', self.to_int(premise['rooms'])
+            yield 'balcony', premise['balcony']
+            yield 'bathroom', premise['bathroom']
+
+    @staticmethod
+    def to_int(value):
+        """intval() of a stored string"""
+        match = re.match(r'^\s*-?\d+', str(value or ''))
+        return int(match.group(0)) if match else 0
+
+    def index(self, record):
+        """Add a property to the order and attribute indexes"""
+        insort(self.order, (record['date'], record['id']))
+        insort(self.changes, (record['modified'], record['id']))
+        for name, value in self.index_values(record):
+            self.indexes[name].setdefault(value, set()).add(record['id'])
+
+    def unindex(self, record):
+        """Remove a property from the order and attribute indexes"""
+        del self.order[bisect_left(self.order, (record['date'], record['id']))]
+        del self.changes[bisect_left(self.changes, (record['modified'], record['id']))]
+        for name, value in self.index_values(record):
+            ids = self.indexes[name].get(value)
+            if ids is not None:
+                ids.discard(record['id'])
+                if not ids:
+                    del self.indexes[name][value]
+
+    def apply_fields(self, record, params):
+        """Apply the non-empty property fields of a create/update payload"""
+        for name in ('building_name', 'coordinates', 'building_type'):
+            if params.get(name):
+                record[name] = str(params[name])
+
+        for name in ('floors', 'eco_rating'):
+            if params.get(name):
+                record[name] = str(self.to_int(params[name]))
+
+        if params.get('premises') and isinstance(params['premises'], list):
+            record['premises'] = [{
+                'area': str(premise.get('area', '')),
+                'rooms': str(self.to_int(premise.get('rooms', 1))),
+                'balcony': str(premise.get('balcony', 'no')),
+                'bathroom': str(premise.get('bathroom', 'yes')),
+            } for premise in params['premises'] if isinstance(premise, dict)]
+
+        if params.get('district'):
+            slug = str(params['district'])
+            if slug not in self.districts:
+                # wp_set_object_terms() creates unknown terms
+                self.add_district(slug, slug)
+            record['district'] = slug
+
+        record['location'] = parse_coordinates(record['coordinates'])
+
+    @staticmethod
+    def now():
+        """Current GMT time as a MySQL datetime"""
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    def create(self, params, date=None):
+        """Create a property from a REST payload and return its record"""
+        with self.lock:
+            date = date or self.now()
+            record = {
+                'id': self.next_post_id,
+                'date': date,
+                'modified': date,
+                'title': str(params.get('title') or ''),
+                'content': str(params.get('content') or ''),
+                'district': None,
+                'building_name': None,
+                'coordinates': None,
+                'floors': None,
+                'building_type': None,
+                'eco_rating': None,
+                'premises': [],
+            }
+            self.next_post_id += 1
+            self.apply_fields(record, params)
+            self.properties[record['id']] = record
+            self.index(record)
+            self.touch()
+            return record
+
+    def update(self, post_id, params):
+        """Update a property and return its record, or None if it does not exist"""
+        with self.lock:
+            record = self.properties.get(post_id)
+            if record is None:
+                return None
+
+            self.unindex(record)
+            record['modified'] = self.now()
+            if params.get('title'):
+                record['title'] = str(params['title'])
+            if 'content' in params:
+                record['content'] = str(params['content'] or '')
+            self.apply_fields(record, params)
+            self.index(record)
+            self.touch()
+            return record
+
+    def delete(self, post_id):
+        """Delete a property and return its record, or None if it does not exist"""
+        with self.lock:
+            record = self.properties.pop(post_id, None)
+            if record is not None:
+                self.unindex(record)
+                insort(self.tombstones, (self.now(), post_id))
+                self.touch()
+            return record
+
+    def candidates(self, filters):
+        """IDs matching the attribute filters, or None when nothing filters"""
+        sets = []
+
+        for name in ('district', 'building_type', 'balcony', 'bathroom', 'rooms'):
+            if filters.get(name):
+                sets.append(self.indexes[name].get(filters[name], set()))
+
+        for name, low, high in (('floors', filters.get('min_floors'), filters.get('max_floors')),
+                                ('eco_rating', filters.get('min_eco_rating'), None)):
+            if low or high:
+                sets.append(set().union(*(ids for value, ids in self.indexes[name].items()
+                                          if (not low or value >= low) and (not high or value <= high))))
+
+        if not sets and not filters.get('bbox'):
+            return None
+
+        result = set.intersection(*sorted(sets, key=len)) if sets else set(self.properties)
+
+        # All premise conditions apply to the same premise
+        premise_filter = {name: filters[name] for name in ('rooms', 'balcony', 'bathroom') if filters.get(name)}
+        if len(premise_filter) > 1:
+            result = {post_id for post_id in result if any(
+                all((self.to_int(premise[name]) if name == 'rooms' else premise[name]) == value
+                    for name, value in premise_filter.items())
+                for premise in self.properties[post_id]['premises'])}
+
+        if filters.get('bbox'):
+            min_lat, min_lon, max_lat, max_lon = filters['bbox']
+            result = {post_id for post_id in result
+                      if self.properties[post_id]['location']
+                      and min_lat <= self.properties[post_id]['location'][0] <= max_lat
+                      and in_longitude_range(self.properties[post_id]['location'][1], min_lon, max_lon)}
+
+        return result
+
+    def search(self, filters, after, offset, limit):
+        """Return (records, keys, total) for one page of filtered properties
+
+        Without `near` properties are sorted newest first by (post_date, id) and
+        `after` is such a key; with `near` they are sorted nearest first by
+        (distance key, id) within the radius.
+        """
+        with self.lock:
+            candidates = self.candidates(filters)
+
+            if filters.get('near'):
+                lat, lon, radius = filters['near']
+                limit_key = radius * 1000000
+                pool = self.properties.keys() if candidates is None else candidates
+                keys = sorted(
+                    (key, post_id) for post_id, key in (
+                        (post_id, distance_key(*self.properties[post_id]['location'], (lat, lon)))
+                        for post_id in pool if self.properties[post_id]['location']
+                    ) if key <= limit_key
+                )
+                if after is not None:
+                    keys = keys[bisect_left(keys, (after[0], after[1] + 1)):]
+                page = keys[offset:offset + limit]
+                return [self.properties[post_id] for _, post_id in page], page, len(keys)
+
+            if candidates is None:
+                keys = self.order
+            else:
+                keys = sorted((self.properties[post_id]['date'], post_id) for post_id in candidates)
+
+            end = len(keys) if after is None else bisect_left(keys, tuple(after))
+            stop = max(end - offset, 0)
+            page = keys[max(stop - limit, 0):stop][::-1]
+            return [self.properties[post_id] for _, post_id in page], page, end
+
+
+    def changes_after(self, filters, after, limit, include_deleted):
+        """Return up to `limit` (modified, id, record) changes after a feed position
+
+        Tombstones have None as record. Filters apply to live properties only,
+        as the plugin cannot tell which filters a deleted property matched.
+        """
+        with self.lock:
+            candidates = self.candidates(filters)
+
+            if filters.get('near'):
+                lat, lon, radius = filters['near']
+                pool = self.properties.keys() if candidates is None else candidates
+                candidates = {post_id for post_id in pool if self.properties[post_id]['location']
+                              and distance_key(*self.properties[post_id]['location'], (lat, lon)) <= radius * 1000000}
+
+            changes = []
+            for index in range(bisect_right(self.changes, tuple(after)), len(self.changes)):
+                modified, post_id = self.changes[index]
+                if candidates is None or post_id in candidates:
+                    changes.append((modified, post_id, self.properties[post_id]))
+                    if len(changes) == limit:
+                        break
+
+            if include_deleted:
+                start = bisect_right(self.tombstones, tuple(after))
+                changes.extend((deleted, post_id, None) for deleted, post_id in self.tombstones[start:start + limit])
+
+            return sorted(changes, key=lambda change: change[:2])[:limit]
+
+
+class LocalApiServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the store, credentials and fault injection settings"""
+
+    daemon_threads = True
+
+    def __init__(self, address, store, username, password, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, verbose=False, server_timing=False):
+        """Initialize with the listening address, store and settings"""
+        super().__init__(address, RequestHandler)
+        self.store = store
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.verbose = verbose
+        self.server_timing = server_timing
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    def count(self, name):
+        """Count one served request by route or outcome"""
+        with self.stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def inject_faults(self):
+        """Sleep for the injected latency; return True if this request should fail"""
+        delay = self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def cache_get(self, key):
+        """Cached (body, content type, headers, etag) for a key, or None"""
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry is None or entry[0] != self.store.generation:
+                return None
+            self.cache.move_to_end(key)
+            return entry[1]
+
+    def cache_set(self, key, value):
+        """Cache a response for the current store generation"""
+        with self.cache_lock:
+            self.cache[key] = (self.store.generation, value)
+            while len(self.cache) > CACHE_MAX_ENTRIES:
+                self.cache.popitem(last=False)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Route requests to the stand-in endpoints"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'LocalApiServer/1.0'
+
+    # Headers and body are written separately; without this keep-alive
+    # connections stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    routes = [
+        (re.compile(r'^/wp-json/?$'), 'index'),
+        (re.compile(r'^/wp-json/real-estate/v1/properties/?$'), 'properties'),
+        (re.compile(r'^/wp-json/real-estate/v1/properties/batch/?$'), 'batch'),
+        (re.compile(r'^/wp-json/real-estate/v1/properties/(\d+)/?$'), 'property'),
+        (re.compile(r'^/wp-json/wp/v2/district/?$'), 'districts'),
+        (re.compile(r'^/wp-json/wp/v2/users/me/?$'), 'users_me'),
+    ]
+
+    def log_message(self, format, *args):
+        """Only log requests with --verbose"""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        """Parse the request, inject faults and call the matching route handler"""
+        self.started = time.perf_counter()
+        self.timings = OrderedDict()
+        url = urlsplit(self.path)
+        self.query = dict(parse_qsl(url.query, keep_blank_values=True))
+        self.body_error = None
+        self.body = self.read_body()
+        self.extra_headers = {}
+        self.own_route = url.path.startswith('/wp-json/real-estate/v1')
+
+        if self.server.inject_faults():
+            self.server.count('injected_error')
+            error = ApiError('injected_error', 'Injected error from local_api_server.py', self.server.error_status)
+            return self.send_data(error.to_dict(), error.status)
+
+        for pattern, name in self.routes:
+            match = pattern.match(url.path)
+            if match:
+                break
+        else:
+            error = ApiError('rest_no_route', 'No route was found matching the URL and request method.', 404)
+            return self.send_data(error.to_dict(), error.status)
+
+        self.server.count(f"{method} {name}")
+
+        try:
+            handler = getattr(self, f"{name}_{method.lower()}", None)
+            if handler is None and method in ('PUT', 'PATCH'):
+                handler = getattr(self, f"{name}_post", None)
+            if handler is None:
+                raise ApiError('rest_no_route', 'No route was found matching the URL and request method.', 404)
+            handler(*match.groups())
+        except ApiError as error:
+            self.send_data(error.to_dict(), error.status)
+
+    def read_body(self):
+        """Decode a JSON or form-encoded request body into a dict"""
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if not raw:
+            return {}
+
+        if 'json' in (self.headers.get('Content-Type') or ''):
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                self.body_error = ApiError('rest_invalid_json', 'Invalid JSON body passed.', 400)
+                return {}
+            return data if isinstance(data, dict) else {}
+
+        return dict(parse_qsl(raw.decode('utf-8'), keep_blank_values=True))
+
+    def params(self):
+        """Query and body parameters, body first, as WP_REST_Request merges them"""
+        if self.body_error is not None:
+            raise self.body_error
+        return dict(self.query, **self.body)
+
+    @property
+    def site_url(self):
+        """Base URL the client used"""
+        return f"http://{self.headers.get('Host') or '%s:%s' % self.server.server_address[:2]}"
+
+    def response_format(self):
+        """Format negotiated from the Accept header, as serve_negotiated_request() picks it"""
+        return api_formats.negotiate_format(self.headers.get('Accept'), self.own_route)
+
+    def authenticated(self):
+        """Check Basic Authentication; raise on wrong credentials, return False without any"""
+        header = self.headers.get('Authorization') or ''
+        if not header.startswith('Basic '):
+            return False
+
+        try:
+            username, _, password = base64.b64decode(header[6:]).decode('utf-8').partition(':')
+        except ValueError:
+            username, password = '', ''
+
+        if username != self.server.username:
+            raise ApiError('invalid_username', 'Unknown username. Check again or try your email address.', 401)
+        if password.replace(' ', '') != self.server.password.replace(' ', ''):
+            raise ApiError('incorrect_password', 'The provided password is an invalid application password.', 401)
+
+        return True
+
+    def require_admin(self):
+        """Raise rest_forbidden unless the request is authenticated"""
+        if not self.authenticated():
+            raise ApiError('rest_forbidden', 'Sorry, you are not allowed to do that.', 401)
+
+    def encode(self, data):
+        """Encode a response body in the negotiated format"""
+        format = self.response_format()
+        if format == 'xml':
+            return encode_xml(data), 'application/xml; charset=UTF-8'
+        if format in api_formats.BINARY_FORMATS:
+            return api_formats.encode(data, format), api_formats.MEDIA_TYPES[format]
+        return encode_json(data), 'application/json; charset=UTF-8'
+
+    def send_data(self, data, status=200, headers=None):
+        """Encode and send a response"""
+        body, content_type = self.encode(data)
+        self.send_body(body, content_type, status, headers)
+
+    def send_body(self, body, content_type, status=200, headers=None):
+        """Send an encoded response with the extra headers, compressed on the plugin's routes"""
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+
+        if self.own_route:
+            self.send_header('Vary', 'Accept, Accept-Encoding')
+            encoding = api_formats.negotiate_encoding(self.headers.get('Accept-Encoding'))
+            if encoding and len(body) >= COMPRESS_MIN_BYTES and api_formats.format_of(content_type) != 'xml':
+                with self.timed('compress'):
+                    body = api_formats.compress(body, encoding)
+                self.send_header('Content-Encoding', encoding)
+            if self.server.server_timing:
+                self.send_header('Server-Timing', format_server_timing(self.timings, time.perf_counter() - self.started))
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in dict(self.extra_headers, **(headers or {})).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    @contextmanager
+    def timed(self, phase):
+        """Add the time spent in the block to a Server-Timing phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - started
+
+    def prepare_property(self, record, fields=None):
+        """Build a property response like prepare_property_for_response()"""
+        response = OrderedDict()
+
+        for name, sub_fields in RESPONSE_FIELDS.items():
+            if fields is not None and name not in fields:
+                continue
+
+            if name == 'link':
+                value = f"{self.site_url}/?post_type=real_estate_object&p={record['id']}"
+            elif name == 'modified_gmt':
+                value = record['modified'].replace(' ', 'T')
+            elif name == 'note':
+                value = NOTE
+            elif name == 'districts':
+                district = self.server.store.districts.get(record['district'])
+                value = [{'id': district['id'], 'name': district['name'], 'slug': district['slug']}] if district else []
+            else:
+                value = record[name]
+
+            # Keep only the response's sub-fields of each row, or the requested ones
+            if sub_fields is not True:
+                selected = fields[name] if fields is not None and fields[name] is not True else sub_fields
+                value = [{key: row[key] for key in sub_fields if key in selected} for row in value]
+
+            response[name] = value
+
+        return response
+
+    @staticmethod
+    def requested_fields(values):
+        """Fields requested through fields= or compact=true, or None for all fields"""
+        if values.get('fields'):
+            return parse_fields(values['fields'])
+        if values.get('compact'):
+            return parse_fields(COMPACT_FIELDS)
+        return None
+
+    def index_get(self):
+        """GET /wp-json/: namespaces and routes"""
+        routes = {
+            '/real-estate/v1/properties': ['GET', 'POST'],
+            '/real-estate/v1/properties/batch': ['POST'],
+            '/real-estate/v1/properties/(?P<id>\\d+)': ['GET', 'POST', 'PUT', 'PATCH', 'DELETE'],
+            '/wp/v2/district': ['GET', 'POST'],
+            '/wp/v2/users/me': ['GET'],
+        }
+        self.send_data({
+            'name': 'Local Real Estate API',
+            'url': self.site_url,
+            'namespaces': ['wp/v2', 'real-estate/v1'],
+            'routes': {route: {'namespace': route.split('/')[1] + '/' + route.split('/')[2], 'methods': methods}
+                       for route, methods in routes.items()},
+        })
+
+    def properties_get(self):
+        """GET /properties, answered from the response cache for anonymous requests"""
+        anonymous = not self.authenticated()
+        cache_key = None
+
+        if anonymous:
+            params = dict({'page': '1', 'per_page': '10'}, **self.query)
+            cache_key = json.dumps([sorted(params.items()), self.response_format()])
+            with self.timed('cache'):
+                cached = self.server.cache_get(cache_key)
+
+            if cached is not None:
+                body, content_type, headers, etag = cached
+                self.server.count('cache HIT')
+                if self.not_modified(etag):
+                    return self.send_body(b'', content_type, 304, {'ETag': etag, 'Last-Modified': headers['Last-Modified']})
+                return self.send_body(body, content_type, 200, dict(headers, **{'X-Real-Estate-Cache': 'HIT'}))
+
+        body, content_type, headers = self.build_properties_page()
+
+        if cache_key is not None:
+            etag = '"' + hashlib.md5(cache_key.encode('utf-8') + str(self.server.store.generation).encode()).hexdigest() + '"'
+            headers['ETag'] = etag
+            headers['Last-Modified'] = formatdate(self.server.store.modified, usegmt=True)
+            self.server.cache_set(cache_key, (body, content_type, headers, etag))
+            self.server.count('cache MISS')
+            headers = dict(headers, **{'X-Real-Estate-Cache': 'MISS'})
+
+        self.send_body(body, content_type, 200, headers)
+
+    def not_modified(self, etag):
+        """Check If-None-Match and If-Modified-Since like the response cache"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            etags = [value.strip() for value in if_none_match.split(',')]
+            return etag in etags or '*' in etags
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= int(self.server.store.modified)
+            except (TypeError, ValueError):
+                return False
+
+        return False
+
+    def build_properties_page(self):
+        """Run a GET /properties query and return (body, content type, headers)"""
+        values = validate_args(self.query, PROPERTY_ARGS)
+        fields = self.requested_fields(values)
+        per_page = values['per_page']
+
+        filters = {name: values[name] for name in ('district', 'building_type', 'min_floors', 'max_floors',
+                                                   'min_eco_rating', 'balcony', 'bathroom', 'rooms')}
+        if values['near']:
+            filters['near'] = parse_coordinates(values['near']) + (values['radius'],)
+        if values['bbox']:
+            filters['bbox'] = parse_bbox(values['bbox'])
+
+        if values['modified_after'] is not None:
+            return self.build_changes_page(values, filters, fields)
+
+        sort = 'distance' if filters.get('near') else 'date'
+        cursor_mode = values['cursor'] is not None
+        include_totals = values['include_totals']
+        after = None
+
+        if cursor_mode:
+            after = self.decode_cursor(values['cursor'], sort)
+            include_totals = include_totals and after is None
+            with self.timed('query'):
+                records, keys, total = self.server.store.search(filters, after, 0, per_page + 1)
+        else:
+            with self.timed('query'):
+                records, keys, total = self.server.store.search(filters, None, (values['page'] - 1) * per_page, per_page)
+
+        headers = {}
+        if include_totals:
+            headers['X-WP-Total'] = str(total)
+            headers['X-WP-TotalPages'] = str(math.ceil(total / per_page))
+
+        if cursor_mode and len(records) > per_page:
+            records = records[:per_page]
+            key, post_id = keys[per_page - 1]
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'s': sort, 'v': key, 'id': post_id}, separators=(',', ':')).encode('utf-8')
+            ).decode('ascii').rstrip('=')
+            next_url = f"{self.site_url}/wp-json/real-estate/v1/properties?" + urlencode(
+                dict(self.query, cursor=cursor), quote_via=quote)
+            headers['X-Real-Estate-Next-Cursor'] = cursor
+            headers['Link'] = f'<{next_url}>; rel="next"'
+
+        with self.timed('prepare'):
+            properties = [self.prepare_property(record, fields) for record in records]
+        with self.timed('serialize'):
+            body, content_type = self.encode(properties)
+        return body, content_type, headers
+
+    def build_changes_page(self, values, filters, fields):
+        """Answer a change feed request: changes after modified_after/modified_after_id, oldest first"""
+        if values['cursor'] is not None:
+            raise ApiError('invalid_parameter_combination',
+                           'cursor cannot be combined with modified_after; continue with modified_after_id', 400)
+
+        # Feed clients continue from the last item, so its position is always returned
+        if fields is not None:
+            fields.update(id=True, modified_gmt=True)
+
+        after = (parse_datetime(values['modified_after']), values['modified_after_id'])
+        with self.timed('query'):
+            changes = self.server.store.changes_after(filters, after, values['per_page'], values['include_deleted'])
+        body, content_type = self.encode([
+            self.prepare_property(record, fields) if record is not None
+            else {'id': post_id, 'modified_gmt': modified.replace(' ', 'T'), 'deleted': True}
+            for modified, post_id, record in changes
+        ])
+        return body, content_type, {}
+
+    @staticmethod
+    def decode_cursor(cursor, sort):
+        """Decode a cursor into the keyset position (value, id), or None for the first page"""
+        if cursor in (CURSOR_START, ''):
+            return None
+
+        error = ApiError('invalid_cursor', 'Invalid cursor for this query', 400)
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except ValueError:
+            raise error
+
+        if not isinstance(data, dict) or data.get('s') != sort or not isinstance(data.get('id'), int):
+            raise error
+        if sort == 'date' and not re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', str(data.get('v'))):
+            raise error
+        if sort == 'distance' and not isinstance(data.get('v'), int):
+            raise error
+
+        return data['v'], data['id']
+
+    def properties_post(self):
+        """POST /properties"""
+        self.require_admin()
+        record = self.server.store.create(self.params())
+        self.send_data(self.prepare_property(record))
+
+    def property_get(self, post_id):
+        """GET /properties/{id}"""
+        record = self.server.store.properties.get(int(post_id))
+        if record is None:
+            raise ApiError('not_found', 'Property not found', 404)
+
+        values = validate_args(self.query, PROPERTY_ITEM_ARGS)
+        self.send_data(self.prepare_property(record, self.requested_fields(values)))
+
+    def property_post(self, post_id):
+        """POST/PUT/PATCH /properties/{id}"""
+        self.require_admin()
+        record = self.server.store.update(int(post_id), self.params())
+        if record is None:
+            raise ApiError('not_found', 'Property not found', 404)
+        self.send_data(self.prepare_property(record))
+
+    def property_delete(self, post_id):
+        """DELETE /properties/{id}"""
+        self.require_admin()
+        record = self.server.store.delete(int(post_id))
+        if record is None:
+            raise ApiError('not_found', 'Property not found', 404)
+        self.send_data({'deleted': True, 'previous': self.prepare_property(record)})
+
+    def batch_post(self):
+        """POST /properties/batch"""
+        self.require_admin()
+        operations = self.params().get('operations')
+
+        if not isinstance(operations, list) or not operations:
+            raise ApiError('rest_invalid_param', 'Invalid parameter(s): operations', 400,
+                           params={'operations': 'operations must contain at least 1 items.'})
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            raise ApiError('rest_invalid_param', 'Invalid parameter(s): operations', 400,
+                           params={'operations': f"operations must contain at most {BATCH_MAX_OPERATIONS} items."})
+
+        store = self.server.store
+        results = []
+
+        for index, operation in enumerate(operations):
+            method = operation.get('method', '') if isinstance(operation, dict) else ''
+            data = operation.get('data') if isinstance(operation, dict) and isinstance(operation.get('data'), dict) else {}
+            result = {'index': index, 'method': method}
+
+            try:
+                if method not in ('create', 'update', 'delete'):
+                    raise ApiError('invalid_method', 'Operation method must be create, update or delete', 400)
+
+                if method == 'create':
+                    if not data.get('title'):
+                        raise ApiError('missing_title', 'Property title is required', 400)
+                    record = store.create(data)
+                    result.update(status=201, id=record['id'], body=self.prepare_property(record))
+                elif method == 'update':
+                    record = store.update(int(operation.get('id') or 0), data)
+                    if record is None:
+                        raise ApiError('not_found', 'Property not found', 404)
+                    result.update(status=200, id=record['id'], body=self.prepare_property(record))
+                else:
+                    record = store.delete(int(operation.get('id') or 0))
+                    if record is None:
+                        raise ApiError('not_found', 'Property not found', 404)
+                    result.update(status=200, id=record['id'],
+                                  body={'deleted': True, 'previous': self.prepare_property(record)})
+            except ApiError as error:
+                result.update(status=error.status, error={'code': error.code, 'message': error.message})
+
+            results.append(result)
+
+        self.send_data({'results': results})
+
+    def prepare_district(self, district):
+        """Build a /wp/v2/district term response"""
+        return {
+            'id': district['id'],
+            'count': self.server.store.district_count(district['slug']),
+            'description': district['description'],
+            'link': f"{self.site_url}/district/{district['slug']}/",
+            'name': district['name'],
+            'slug': district['slug'],
+            'taxonomy': 'district',
+            'parent': 0,
+            'meta': [],
+        }
+
+    def districts_get(self):
+        """GET /wp/v2/district"""
+        self.authenticated()
+        values = validate_args(self.query, DISTRICT_ARGS)
+        districts = [district for district in self.server.store.districts.values()
+                     if not values['slug'] or district['slug'] in values['slug'].split(',')]
+        start = (values['page'] - 1) * values['per_page']
+
+        if start and start >= len(districts):
+            raise ApiError('rest_term_invalid_page_number',
+                           'The page number requested is larger than the number of pages available.', 400)
+
+        self.send_data([self.prepare_district(district) for district in districts[start:start + values['per_page']]], headers={
+            'X-WP-Total': str(len(districts)),
+            'X-WP-TotalPages': str(math.ceil(len(districts) / values['per_page'])),
+        })
+
+    def districts_post(self):
+        """POST /wp/v2/district"""
+        self.require_admin()
+        params = self.params()
+
+        if not params.get('name'):
+            raise ApiError('rest_missing_callback_param', 'Missing parameter(s): name', 400, params=['name'])
+
+        slug = params.get('slug') or quote(re.sub(r'\s+', '-', str(params['name']).strip().lower()), safe='-').lower()
+        store = self.server.store
+        if slug in store.districts:
+            raise ApiError('term_exists', 'A term with the name provided already exists in this taxonomy.', 400,
+                           term_id=store.districts[slug]['id'])
+
+        district = store.add_district(str(params['name']), slug, str(params.get('description', '')))
+        self.send_data(self.prepare_district(district), 201)
+
+    def users_me_get(self):
+        """GET /wp/v2/users/me"""
+        if not self.authenticated():
+            raise ApiError('rest_not_logged_in', 'You are not currently logged in.', 401)
+
+        username = self.server.username
+        self.send_data({
+            'id': 1,
+            'name': username,
+            'url': '',
+            'description': '',
+            'link': f"{self.site_url}/author/{username}/",
+            'slug': username,
+            'avatar_urls': {},
+            'meta': [],
+        })
+
+
+def load_store(count, seed, dataset=None):
+    """Create the districts and the seeded or NDJSON-loaded properties"""
+    store = PropertyStore()
+
+    for slug, name, _ in DISTRICTS:
+        store.add_district(name, slug, f'Properties in the {name} district')
+
+    if dataset:
+        opener = gzip.open if dataset.endswith('.gz') else open
+        with opener(dataset, 'rt', encoding='utf-8') as stream:
+            for index, line in enumerate(stream):
+                if line.strip():
+                    store.create(json.loads(line), post_date(index))
+    else:
+        factory = PropertyFactory(seed)
+        for index in range(count):
+            store.create(factory.build(index), post_date(index))
+
+    return store
+
+
+def main():
+    """Main function to parse arguments and run the server"""
+    parser = argparse.ArgumentParser(description='Serve an in-memory stand-in for the Real Estate Objects REST API')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on (default: 8080)')
+    parser.add_argument('-c', '--count', type=int, default=1000, help='Number of seeded properties (default: 1000)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of the properties (default: 42)')
+    parser.add_argument('--dataset', help='Load properties from an NDJSON file of generate_dataset.py instead (.gz allowed)')
+    parser.add_argument('-u', '--username', default='admin', help='Accepted username (default: admin)')
+    parser.add_argument('-p', '--password', default='local test pass', help='Accepted application password (default: "local test pass")')
+    parser.add_argument('--latency', type=float, default=0, help='Injected latency per request in ms (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0, help='Random +/- variation of the injected latency in ms (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests answered with an injected error (default: 0)')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected errors (default: 503)')
+    parser.add_argument('--server-timing', action='store_true', help='Send Server-Timing phases like REAL_ESTATE_OBJECTS_SERVER_TIMING')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every request')
+
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    store = load_store(args.count, args.seed, args.dataset)
+    print(f"✓ Loaded {len(store.properties)} properties in {time.perf_counter() - started:.2f}s")
+
+    server = LocalApiServer((args.host, args.port), store, args.username, args.password,
+                            latency=args.latency / 1000, jitter=args.jitter / 1000,
+                            error_rate=args.error_rate, error_status=args.error_status, verbose=args.verbose,
+                            server_timing=args.server_timing)
+    print(f"✓ Serving http://{args.host}:{args.port}/wp-json/ (user {args.username!r}, password {args.password!r})")
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("\nRequests served:")
+        for name, count in sorted(server.stats.items()):
+            print(f"  {name:<24} {count}")
+
+
+if __name__ == "__main__":
+    main()
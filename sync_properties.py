@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Incremental Property Sync
+
+This script mirrors the property catalogue into a local SQLite database
+through the change feed of GET /properties (modified_after, modified_after_id
+and include_deleted). Only properties changed or deleted since the previous
+run are transferred: each page of changes is applied and the high-water mark
+(modified_gmt and ID of the last change) is stored in the same transaction,
+so an interrupted sync resumes where it stopped.
+
+The first run, --full, and a 410 sync_expired answer (tombstones pruned on
+the server) rebuild the mirror from an empty table instead.
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+from api_client import add_client_arguments, client_from_args
+
+EPOCH = '1970-01-01T00:00:00'
+
+# Seconds the server's change feed trails its clock (FEED_LAG_SECONDS in the plugin)
+FEED_LAG_SECONDS = 5
+
+
+class PropertySync:
+    """Class to keep a SQLite mirror of the properties up to date"""
+
+    def __init__(self, base_url, database, client, per_page=100, overlap=2):
+        """Initialize with the WordPress site URL and the mirror database path
+
+        The server only returns changes a few seconds old, so saves committed
+        late within their second are not skipped. `overlap` seconds of changes
+        before the high-water mark are also read again on every run, as a margin
+        for clock differences between web servers.
+        """
+        self.api_url = f"{base_url.rstrip('/')}/wp-json/real-estate/v1/properties"
+        self.client = client
+        self.per_page = per_page
+        self.overlap = overlap
+        self.db = sqlite3.connect(database)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS properties (
+                id INTEGER PRIMARY KEY,
+                modified_gmt TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self.stats = {'requests': 0, 'bytes': 0, 'upserted': 0, 'deleted': 0}
+
+    def get_state(self, name, default=None):
+        """Read a value of the sync state"""
+        row = self.db.execute('SELECT value FROM sync_state WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, name, value):
+        """Write a value of the sync state (committed with the current page)"""
+        self.db.execute('INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)', (name, str(value)))
+
+    def fetch_changes(self, modified_after, after_id, include_deleted):
+        """Fetch one page of the change feed; return (changes, server time) or raise on errors"""
+        response = self.client.get(self.api_url, params={
+            'modified_after': modified_after,
+            'modified_after_id': after_id,
+            'include_deleted': 'true' if include_deleted else 'false',
+            'include_totals': 'false',
+            'per_page': self.per_page,
+        })
+        self.stats['requests'] += 1
+        self.stats['bytes'] += len(response.content)
+
+        if response.status_code == 410:
+            raise SyncExpired(response.json().get('message', 'Sync expired'))
+        response.raise_for_status()
+
+        server_time = response.headers.get('Date')
+        return response.json(), parsedate_to_datetime(server_time) if server_time else datetime.now(timezone.utc)
+
+    def apply(self, changes):
+        """Upsert changed properties and delete tombstoned ones"""
+        for change in changes:
+            if change.get('deleted'):
+                self.db.execute('DELETE FROM properties WHERE id = ?', (change['id'],))
+                self.stats['deleted'] += 1
+            else:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO properties (id, modified_gmt, data) VALUES (?, ?, ?)',
+                    (change['id'], change['modified_gmt'], json.dumps(change, ensure_ascii=False))
+                )
+                self.stats['upserted'] += 1
+
+    def walk(self, modified_after, after_id, include_deleted):
+        """Apply every change after a position, committing the high-water mark with each page
+
+        Returns the server time of the first response.
+        """
+        started_at = None
+
+        while True:
+            changes, server_time = self.fetch_changes(modified_after, after_id, include_deleted)
+            started_at = started_at or server_time
+
+            if changes:
+                self.apply(changes)
+                modified_after, after_id = changes[-1]['modified_gmt'], changes[-1]['id']
+                self.set_state('modified_after', modified_after)
+                self.set_state('modified_after_id', after_id)
+            self.db.commit()
+
+            if len(changes) < self.per_page:
+                return started_at
+
+    def full_sync(self):
+        """Rebuild the mirror from scratch
+
+        Deletions made while the catalogue is copied are caught by the next
+        incremental run, which starts from the time the copy began.
+        """
+        print("Running full sync")
+        self.db.execute('DELETE FROM properties')
+        self.db.execute('DELETE FROM sync_state')
+        self.db.commit()
+
+        started_at = self.walk(EPOCH, 0, False)
+
+        # The copy ends at the feed horizon of its first request, not at the request time
+        horizon = started_at - timedelta(seconds=FEED_LAG_SECONDS + self.overlap)
+        self.set_state('modified_after', horizon.strftime('%Y-%m-%dT%H:%M:%S'))
+        self.set_state('modified_after_id', 0)
+        self.db.commit()
+
+    def incremental_sync(self):
+        """Apply the changes since the stored high-water mark"""
+        mark = self.get_state('modified_after')
+        start = datetime.fromisoformat(mark) - timedelta(seconds=self.overlap)
+        print(f"Syncing changes since {mark}")
+        self.walk(start.strftime('%Y-%m-%dT%H:%M:%S'), 0, True)
+
+    def run(self, full=False):
+        """Run a full or incremental sync and print what was transferred"""
+        started = time.perf_counter()
+
+        if full or self.get_state('modified_after') is None:
+            self.full_sync()
+        else:
+            try:
+                self.incremental_sync()
+            except SyncExpired as e:
+                print(f"✗ {e}")
+                self.full_sync()
+
+        elapsed = time.perf_counter() - started
+        total = self.db.execute('SELECT COUNT(*) FROM properties').fetchone()[0]
+
+        print(f"✓ Sync complete: {self.stats['upserted']} upserted, {self.stats['deleted']} deleted, {total} properties mirrored")
+        print(f"Requests:       {self.stats['requests']}")
+        print(f"Transferred:    {self.stats['bytes'] / 1024:.1f} KB")
+        print(f"Elapsed time:   {elapsed:.2f}s")
+        print(f"High-water mark: {self.get_state('modified_after')} / {self.get_state('modified_after_id')}")
+
+
+class SyncExpired(Exception):
+    """The server pruned tombstones after the stored high-water mark"""
+
+
+def main():
+    """Main function to parse arguments and run the sync"""
+    parser = argparse.ArgumentParser(description='Mirror properties into SQLite through the change feed')
+    parser.add_argument('url', help='WordPress site URL')
+    parser.add_argument('-d', '--database', default='properties.sqlite', help='Mirror database (default: properties.sqlite)')
+    parser.add_argument('--per-page', type=int, default=100, help='Changes per request, max 100 (default: 100)')
+    parser.add_argument('--overlap', type=float, default=2, help='Seconds before the high-water mark read again (default: 2)')
+    parser.add_argument('--full', action='store_true', help='Rebuild the mirror instead of applying changes')
+    add_client_arguments(parser)
+
+    args = parser.parse_args()
+
+    client = client_from_args(args)
+    sync = PropertySync(args.url, args.database, client, min(args.per_page, 100), args.overlap)
+
+    try:
+        sync.run(args.full)
+    except Exception as e:
+        print(f"✗ Sync failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
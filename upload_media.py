@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Bulk Media Uploader
+
+This script pushes the example_images set (or any directory of images) to the
+WordPress media library through POST /wp/v2/media from a thread pool and
+reports upload throughput and latency. With --wait it then follows the
+background media pipeline of the Simple SVG Upload plugin (SVG dimensions,
+previews, thumbnails) until every upload is processed and reports how fast
+the queue drained.
+"""
+
+import sys
+import time
+import argparse
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from api_client import add_client_arguments, client_from_args
+from api_stats import LatencyRecorder
+
+DEFAULT_DIRECTORY = Path(__file__).parent / 'example_images'
+IMAGE_EXTENSIONS = {'.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp'}
+PENDING_STATUSES = ('pending', 'processing')
+
+mimetypes.add_type('image/svg+xml', '.svg')
+
+
+class MediaUploader:
+    """Class to upload images concurrently and watch their processing"""
+
+    def __init__(self, base_url, username, password, client):
+        """Initialize with WordPress credentials"""
+        self.base_url = base_url.rstrip('/')
+        self.media_url = f"{self.base_url}/wp-json/wp/v2/media"
+        self.client = client
+        self.latency = LatencyRecorder('POST /wp/v2/media')
+
+        self.client.set_auth(username, password)
+        response = self.client.get(f"{self.base_url}/wp-json/wp/v2/users/me", authenticated=True)
+        if response.status_code != 200:
+            print(f"✗ Authentication failed: {response.status_code}")
+            sys.exit(1)
+        print("✓ Authentication configured")
+
+    @staticmethod
+    def collect_files(directory):
+        """Return the image files of a directory, sorted by name"""
+        return sorted(path for path in Path(directory).iterdir()
+                      if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS)
+
+    def upload_file(self, path):
+        """Upload one file and return (attachment ID or None, bytes sent)"""
+        content = path.read_bytes()
+        headers = {
+            'Content-Type': mimetypes.guess_type(path.name)[0] or 'application/octet-stream',
+            'Content-Disposition': f'attachment; filename="{path.name}"',
+        }
+
+        started = time.perf_counter()
+        try:
+            response = self.client.post(self.media_url, headers=headers, data=content, authenticated=True)
+        except Exception as e:
+            self.latency.record_error(time.perf_counter() - started, type(e).__name__)
+            print(f"✗ {path.name}: {e}")
+            return None, 0
+
+        success = response.status_code == 201
+        self.latency.record(time.perf_counter() - started, response.status_code, success)
+
+        if not success:
+            print(f"✗ {path.name}: HTTP {response.status_code}")
+            return None, 0
+
+        return response.json().get('id'), len(content)
+
+    def upload_all(self, files, repeat, workers):
+        """Upload every file `repeat` times and print throughput; return the attachment IDs"""
+        queue = [path for _ in range(repeat) for path in files]
+        print(f"\n=== Uploading {len(queue)} files ({len(files)} x {repeat}) with {workers} worker(s) ===\n")
+
+        ids = []
+        sent = 0
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for attachment_id, size in executor.map(self.upload_file, queue):
+                if attachment_id:
+                    ids.append(attachment_id)
+                    sent += size
+
+        elapsed = time.perf_counter() - started
+        stats = self.latency.summary(elapsed)
+
+        print(f"Uploaded:       {len(ids)} of {len(queue)} files ({stats['errors']} errors)")
+        print(f"Elapsed time:   {elapsed:.2f}s")
+        print(f"Throughput:     {len(ids) / elapsed if elapsed > 0 else 0:.2f} files/s, "
+              f"{sent / elapsed / 1024 / 1024 if elapsed > 0 else 0:.2f} MB/s")
+        print(f"Latency p50:    {stats['p50'] * 1000:.1f} ms")
+        print(f"Latency p95:    {stats['p95'] * 1000:.1f} ms")
+
+        return ids
+
+    def fetch_statuses(self, ids):
+        """Return the media_pipeline status of every attachment, 100 per request"""
+        statuses = {}
+        for start in range(0, len(ids), 100):
+            chunk = ids[start:start + 100]
+            response = self.client.get(self.media_url, params={
+                'include': ','.join(str(attachment_id) for attachment_id in chunk),
+                'per_page': len(chunk),
+                'context': 'edit',
+                '_fields': 'id,media_pipeline',
+            }, authenticated=True)
+            response.raise_for_status()
+            for item in response.json():
+                statuses[item['id']] = item.get('media_pipeline')
+        return statuses
+
+    def wait_for_pipeline(self, ids, timeout, interval):
+        """Poll until no upload is pending and print how fast the queue drained"""
+        print(f"\n=== Waiting for the media pipeline to process {len(ids)} uploads ===\n")
+
+        started = time.perf_counter()
+        statuses = {}
+
+        while time.perf_counter() - started < timeout:
+            statuses = self.fetch_statuses(ids)
+            waiting = sum(1 for status in statuses.values() if status in PENDING_STATUSES)
+            print(f"{time.perf_counter() - started:6.1f}s  {len(ids) - waiting}/{len(ids)} processed")
+            if waiting == 0:
+                break
+            time.sleep(interval)
+
+        elapsed = time.perf_counter() - started
+        done = sum(1 for status in statuses.values() if status == 'done')
+        failed = sum(1 for status in statuses.values() if status == 'failed')
+        waiting = sum(1 for status in statuses.values() if status in PENDING_STATUSES)
+
+        if waiting:
+            print(f"✗ {waiting} uploads still queued after {timeout:.0f}s")
+        else:
+            print(f"✓ Queue drained in {elapsed:.2f}s ({done / elapsed if elapsed > 0 else 0:.2f} files/s)")
+        if failed:
+            print(f"✗ {failed} uploads failed processing")
+
+        return waiting == 0 and failed == 0
+
+    def delete_all(self, ids):
+        """Permanently delete the uploaded attachments"""
+        deleted = 0
+        for attachment_id in ids:
+            response = self.client.delete(f"{self.media_url}/{attachment_id}", params={'force': 'true'}, authenticated=True)
+            if response.status_code == 200:
+                deleted += 1
+        print(f"\nDeleted {deleted} of {len(ids)} uploads")
+
+
+def main():
+    """Main function to parse arguments and run the uploader"""
+    parser = argparse.ArgumentParser(description='Upload example images concurrently and measure media throughput')
+    parser.add_argument('url', help='WordPress site URL')
+    parser.add_argument('-u', '--username', required=True, help='WordPress username')
+    parser.add_argument('-p', '--password', required=True, help='WordPress application password')
+    parser.add_argument('-d', '--directory', default=str(DEFAULT_DIRECTORY), help='Directory of images (default: example_images)')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='Upload the set this many times (default: 1)')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='Concurrent uploads (default: 4)')
+    parser.add_argument('--wait', action='store_true', help='Wait for the media pipeline to process every upload')
+    parser.add_argument('--wait-timeout', type=float, default=300, help='Seconds to wait for the pipeline (default: 300)')
+    parser.add_argument('--poll-interval', type=float, default=2, help='Seconds between status polls (default: 2)')
+    parser.add_argument('--delete', action='store_true', help='Delete the uploads afterwards')
+    add_client_arguments(parser)
+
+    args = parser.parse_args()
+
+    files = MediaUploader.collect_files(args.directory)
+    if not files:
+        print(f"✗ No images found in {args.directory}")
+        sys.exit(1)
+
+    client = client_from_args(args, min_pool_size=args.workers)
+    uploader = MediaUploader(args.url, args.username, args.password, client)
+
+    ids = uploader.upload_all(files, args.repeat, args.workers)
+
+    success = len(ids) == len(files) * args.repeat
+    if args.wait and ids:
+        success = uploader.wait_for_pipeline(ids, args.wait_timeout, args.poll_interval) and success
+
+    if args.delete and ids:
+        uploader.delete_all(ids)
+
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
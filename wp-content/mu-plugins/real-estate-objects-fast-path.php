@@ -0,0 +1,30 @@
+<?php
+/**
+ * Plugin Name: Real Estate Objects Fast Path
+ * Description: Serves cached anonymous GET /wp-json/real-estate/v1/properties responses before regular plugins and the theme are loaded
+ * Version: 1.0
+ * Author: Ihor Nemyrovskyi
+ * Text Domain: real-estate-objects
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+define('REAL_ESTATE_OBJECTS_FAST_PATH_DIR', WP_PLUGIN_DIR . '/real-estate-objects/');
+
+// Only while the plugin itself is active
+if (in_array('real-estate-objects/real-estate-objects.php', (array) get_option('active_plugins', array()), true)
+    && file_exists(REAL_ESTATE_OBJECTS_FAST_PATH_DIR . 'class-real-estate-response-cache.php')
+    && file_exists(REAL_ESTATE_OBJECTS_FAST_PATH_DIR . 'class-real-estate-encoder.php')) {
+
+    // Loaded at file scope so the class files' globals stay global; the plugin's require_once skips them later
+    require_once REAL_ESTATE_OBJECTS_FAST_PATH_DIR . 'class-real-estate-fragment-cache.php';
+    require_once REAL_ESTATE_OBJECTS_FAST_PATH_DIR . 'class-real-estate-encoder.php';
+    require_once REAL_ESTATE_OBJECTS_FAST_PATH_DIR . 'class-real-estate-response-cache.php';
+
+    // Wait for the other MU-plugins, e.g. ones changing the REST URL prefix. Requests sending
+    // an X-Real-Estate-Full-Bootstrap header bypass the fast path and load WordPress fully.
+    add_action('muplugins_loaded', array('Real_Estate_Response_Cache', 'serve_early'));
+}
@@ -0,0 +1,121 @@
+<?php
+/**
+ * Query count benchmark for GET /properties
+ *
+ * Compares the database queries and time needed to build one page of
+ * properties three ways:
+ *
+ *   before    - the old per-post lookups: wp_get_object_terms() plus six
+ *               get_field() calls per post
+ *   raw       - the same WP_Query, whose default update_post_meta_cache and
+ *               update_post_term_cache priming already loads every post's
+ *               meta and districts in two queries, read with plain
+ *               get_post_meta()/get_the_terms(). This is where the per-post
+ *               queries go away: ACF's get_field() resolves each field
+ *               reference on its own, raw reads hit the primed cache.
+ *   endpoint  - Real_Estate_REST_API::get_properties() as it is now
+ *
+ * Run it with WP-CLI against a site seeded with create_mock_entries.py:
+ *
+ *   wp eval-file wp-content/plugins/real-estate-objects/bin/benchmark-query-counts.php [per_page] [runs]
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+$per_page = isset($args[0]) ? max(1, min(100, intval($args[0]))) : 100;
+$runs = isset($args[1]) ? max(1, intval($args[1])) : 5;
+
+/**
+ * Run $callback on a cold object cache and return its query count and time
+ *
+ * @param callable $callback
+ * @return array
+ */
+function real_estate_objects_benchmark_measure($callback) {
+    wp_cache_flush();
+
+    $queries = get_num_queries();
+    $started = microtime(true);
+
+    $callback();
+
+    return array(
+        'queries' => get_num_queries() - $queries,
+        'time'    => microtime(true) - $started,
+    );
+}
+
+// The response building used before the caches were primed in bulk
+$before = function () use ($per_page) {
+    $query = new WP_Query(array(
+        'post_type'      => 'real_estate_object',
+        'posts_per_page' => $per_page,
+        'paged'          => 1,
+    ));
+
+    foreach ($query->posts as $post) {
+        wp_get_object_terms($post->ID, 'district');
+        get_permalink($post->ID);
+        get_field('building_name', $post->ID);
+        get_field('coordinates', $post->ID);
+        get_field('floors', $post->ID);
+        get_field('building_type', $post->ID);
+        get_field('eco_rating', $post->ID);
+        get_field('premises', $post->ID);
+    }
+};
+
+// Raw meta and term reads from the caches WP_Query primes for the page
+$raw = function () use ($per_page) {
+    $query = new WP_Query(array(
+        'post_type'      => 'real_estate_object',
+        'posts_per_page' => $per_page,
+        'paged'          => 1,
+    ));
+
+    foreach ($query->posts as $post) {
+        get_the_terms($post->ID, 'district');
+        get_permalink($post->ID);
+        $premises = intval(get_post_meta($post->ID, 'premises', true));
+
+        foreach (array('building_name', 'coordinates', 'floors', 'building_type', 'eco_rating') as $key) {
+            get_post_meta($post->ID, $key, true);
+        }
+
+        for ($row = 0; $row < $premises; $row++) {
+            foreach (array('area', 'rooms', 'balcony', 'bathroom', 'image') as $sub_field) {
+                get_post_meta($post->ID, "premises_{$row}_{$sub_field}", true);
+            }
+        }
+    }
+};
+
+$endpoint = function () use ($per_page) {
+    $request = new WP_REST_Request('GET', '/real-estate/v1/properties');
+    $request->set_param('per_page', $per_page);
+    rest_do_request($request);
+};
+
+$count = wp_count_posts('real_estate_object');
+WP_CLI::log(sprintf('Seeded dataset: %d published properties, page size %d, %d runs', $count->publish, $per_page, $runs));
+
+foreach (array('before' => $before, 'raw' => $raw, 'endpoint' => $endpoint) as $label => $callback) {
+    $queries = array();
+    $times = array();
+
+    for ($i = 0; $i < $runs; $i++) {
+        $result = real_estate_objects_benchmark_measure($callback);
+        $queries[] = $result['queries'];
+        $times[] = $result['time'];
+    }
+
+    WP_CLI::log(sprintf(
+        '%-8s queries/page: %d   avg time: %.1f ms',
+        $label,
+        max($queries),
+        array_sum($times) / count($times) * 1000
+    ));
+}
@@ -0,0 +1,131 @@
+<?php
+/**
+ * XML serializer benchmark for GET /properties
+ *
+ * Compares peak memory and time per request of the former SimpleXMLElement
+ * conversion with the streaming XMLWriter serializer in
+ * Real_Estate_REST_API::write_xml(), and checks that both produce the same
+ * document (compared in canonical form).
+ *
+ * Run it with WP-CLI (PHP 8.2+ for per-serializer peak memory):
+ *
+ *   wp eval-file wp-content/plugins/real-estate-objects/bin/benchmark-xml-serializer.php [per_page] [runs]
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+$per_page = isset($args[0]) ? max(1, min(100, intval($args[0]))) : 100;
+$runs = isset($args[1]) ? max(1, intval($args[1])) : 20;
+
+/**
+ * The former recursive SimpleXMLElement conversion
+ *
+ * @param mixed $data
+ * @param SimpleXMLElement|null $xml
+ * @param string $root_tag
+ * @return string|SimpleXMLElement
+ */
+function real_estate_objects_benchmark_simplexml($data, $xml = null, $root_tag = 'response') {
+    if ($xml === null) {
+        $xml = new SimpleXMLElement("<?xml version=\"1.0\"?><{$root_tag}></{$root_tag}>");
+    }
+
+    foreach ($data as $key => $value) {
+        if (is_numeric($key)) {
+            $key = 'item';
+        }
+
+        $key = preg_replace('/[^a-z0-9_]/i', '', $key);
+
+        if (is_array($value) || is_object($value)) {
+            $child = $xml->addChild($key);
+            real_estate_objects_benchmark_simplexml($value, $child, $key);
+        } elseif (is_string($value) && (strpos($value, '<') !== false || strpos($value, '>') !== false)) {
+            $child = $xml->addChild($key);
+            $child_node = dom_import_simplexml($child);
+            $child_node->appendChild($child_node->ownerDocument->createCDATASection($value));
+        } else {
+            $xml->addChild($key, htmlspecialchars((string) $value));
+        }
+    }
+
+    if ($root_tag === 'response') {
+        return $xml->asXML();
+    }
+
+    return $xml;
+}
+
+/**
+ * Canonical form of an XML document, for comparing serializer output
+ *
+ * @param string $xml
+ * @return string
+ */
+function real_estate_objects_benchmark_canonical($xml) {
+    $document = new DOMDocument();
+    $document->loadXML($xml);
+
+    return $document->C14N();
+}
+
+global $real_estate_rest_api;
+
+$request = new WP_REST_Request('GET', '/real-estate/v1/properties');
+$request->set_param('per_page', $per_page);
+$data = rest_do_request($request)->get_data();
+
+$serializers = array(
+    'SimpleXMLElement' => function () use ($data) {
+        echo real_estate_objects_benchmark_simplexml($data);
+    },
+    'XMLWriter' => function () use ($data, $real_estate_rest_api) {
+        $real_estate_rest_api->write_xml($data);
+    },
+);
+
+if (!function_exists('memory_reset_peak_usage')) {
+    WP_CLI::warning('memory_reset_peak_usage() needs PHP 8.2; peak memory figures are cumulative.');
+}
+
+WP_CLI::log(sprintf('%d properties per page, %d runs', count($data), $runs));
+
+$outputs = array();
+
+foreach ($serializers as $label => $serializer) {
+    $times = array();
+    $peak = 0;
+
+    for ($i = 0; $i < $runs; $i++) {
+        if (function_exists('memory_reset_peak_usage')) {
+            memory_reset_peak_usage();
+        }
+
+        $baseline = memory_get_usage();
+        $started = microtime(true);
+
+        ob_start();
+        $serializer();
+        $outputs[$label] = ob_get_clean();
+
+        $times[] = microtime(true) - $started;
+        $peak = max($peak, memory_get_peak_usage() - $baseline);
+    }
+
+    WP_CLI::log(sprintf(
+        '%-16s avg time: %6.2f ms   peak memory: %8.1f KB   output: %d bytes',
+        $label,
+        array_sum($times) / count($times) * 1000,
+        $peak / 1024,
+        strlen($outputs[$label])
+    ));
+}
+
+if (real_estate_objects_benchmark_canonical($outputs['SimpleXMLElement']) === real_estate_objects_benchmark_canonical($outputs['XMLWriter'])) {
+    WP_CLI::success('Both serializers produce the same document.');
+} else {
+    WP_CLI::error('Serializer output differs.');
+}
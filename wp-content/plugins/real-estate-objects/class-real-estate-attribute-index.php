@@ -0,0 +1,509 @@
+<?php
+/**
+ * Typed lookup table for floors, eco-rating, building type and location filtering and sorting
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+class Real_Estate_Attribute_Index extends Real_Estate_Index {
+
+    /**
+     * Schema version, bump to re-run dbDelta and the backfill
+     */
+    const DB_VERSION = '3';
+
+    /**
+     * Option holding the installed schema version
+     */
+    const DB_VERSION_OPTION = 'real_estate_objects_attributes_db_version';
+
+    /**
+     * WP_Query var holding attribute filters (building_type, min_floors, max_floors, min_eco_rating, near, bbox)
+     */
+    const QUERY_VAR = 'real_estate_attributes';
+
+    /**
+     * WP_Query var holding attribute ordering, e.g. array('eco_rating' => 'DESC')
+     */
+    const ORDERBY_VAR = 'real_estate_attributes_orderby';
+
+    /**
+     * Mean Earth radius in kilometres
+     */
+    const EARTH_RADIUS_KM = 6371.0;
+
+    /**
+     * Kilometres per degree of latitude
+     */
+    const KM_PER_DEGREE = 111.045;
+
+    /**
+     * Meta keys mirrored into the table
+     *
+     * @var array
+     */
+    private $meta_keys = array('floors', 'eco_rating', 'building_type', 'coordinates');
+
+    /**
+     * Constructor
+     */
+    public function __construct() {
+        parent::__construct();
+
+        // Filter and sort WP_Query results through the table
+        add_filter('posts_clauses', array($this, 'filter_posts_clauses'), 10, 2);
+    }
+
+    /**
+     * Attribute table name
+     *
+     * @return string
+     */
+    public static function table() {
+        global $wpdb;
+
+        return $wpdb->prefix . 'real_estate_attributes';
+    }
+
+    /**
+     * Create or upgrade the attribute table
+     */
+    public static function install() {
+        global $wpdb;
+
+        require_once ABSPATH . 'wp-admin/includes/upgrade.php';
+
+        $table = self::table();
+        $charset_collate = $wpdb->get_charset_collate();
+
+        dbDelta("CREATE TABLE {$table} (
+            post_id bigint(20) unsigned NOT NULL,
+            floors tinyint(3) unsigned DEFAULT NULL,
+            eco_rating tinyint(3) unsigned DEFAULT NULL,
+            building_type varchar(20) DEFAULT NULL,
+            lat decimal(9,6) DEFAULT NULL,
+            lon decimal(9,6) DEFAULT NULL,
+            PRIMARY KEY  (post_id),
+            KEY eco_rating (eco_rating,post_id),
+            KEY floors (floors,post_id),
+            KEY building_type (building_type,floors,post_id),
+            KEY location (lat,lon,post_id)
+        ) {$charset_collate};");
+
+        update_option(self::DB_VERSION_OPTION, self::DB_VERSION);
+    }
+
+    /**
+     * Tables emptied before a full rebuild
+     *
+     * @return string[]
+     */
+    protected function tables() {
+        return array(self::table());
+    }
+
+    /**
+     * Whether a meta key is floors, eco_rating, building_type or coordinates
+     *
+     * @param string $meta_key
+     * @return bool
+     */
+    protected function watches_meta($meta_key) {
+        return in_array($meta_key, $this->meta_keys, true);
+    }
+
+    /**
+     * Re-index changed properties
+     *
+     * @param int[] $post_ids
+     */
+    public function sync_posts($post_ids) {
+        foreach ($post_ids as $post_id) {
+            $this->sync_post($post_id);
+        }
+    }
+
+    /**
+     * Remove a deleted property's row
+     *
+     * @param int $post_id
+     */
+    protected function delete_post_data($post_id) {
+        global $wpdb;
+
+        $wpdb->delete(self::table(), array('post_id' => $post_id), array('%d'));
+    }
+
+    /**
+     * Rebuild the row of one property from its ACF meta
+     *
+     * @param int $post_id
+     */
+    public function sync_post($post_id) {
+        global $wpdb;
+
+        $floors = get_post_meta($post_id, 'floors', true);
+        $eco_rating = get_post_meta($post_id, 'eco_rating', true);
+        $building_type = get_post_meta($post_id, 'building_type', true);
+        $coordinates = self::parse_coordinates(get_post_meta($post_id, 'coordinates', true));
+
+        // wpdb writes null values as NULL
+        $wpdb->replace(self::table(), array(
+            'post_id'       => $post_id,
+            'floors'        => is_numeric($floors) ? intval($floors) : null,
+            'eco_rating'    => is_numeric($eco_rating) ? intval($eco_rating) : null,
+            'building_type' => $building_type !== '' ? (string) $building_type : null,
+            'lat'           => $coordinates ? $coordinates[0] : null,
+            'lon'           => $coordinates ? $coordinates[1] : null,
+        ), array('%d', '%d', '%d', '%s', '%f', '%f'));
+    }
+
+    /**
+     * Build the attribute filter for WP_Query from request values
+     *
+     * Empty values are skipped; returns an empty array when nothing is filtered.
+     *
+     * @param mixed $building_type
+     * @param mixed $min_floors
+     * @param mixed $max_floors
+     * @param mixed $min_eco_rating
+     * @return array
+     */
+    public static function build_filter($building_type, $min_floors, $max_floors, $min_eco_rating) {
+        $filter = array();
+
+        if (!empty($building_type)) {
+            $filter['building_type'] = (string) $building_type;
+        }
+
+        if (!empty($min_floors)) {
+            $filter['min_floors'] = intval($min_floors);
+        }
+
+        if (!empty($max_floors)) {
+            $filter['max_floors'] = intval($max_floors);
+        }
+
+        if (!empty($min_eco_rating)) {
+            $filter['min_eco_rating'] = intval($min_eco_rating);
+        }
+
+        return $filter;
+    }
+
+    /**
+     * Parse a "lat, lon" string into numeric coordinates
+     *
+     * @param mixed $value
+     * @return array|null array(lat, lon), or null if the value is not a valid point
+     */
+    public static function parse_coordinates($value) {
+        if (!is_string($value) || !preg_match('/^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$/', $value, $matches)) {
+            return null;
+        }
+
+        $lat = floatval($matches[1]);
+        $lon = floatval($matches[2]);
+
+        if (abs($lat) > 90 || abs($lon) > 180) {
+            return null;
+        }
+
+        return array($lat, $lon);
+    }
+
+    /**
+     * Parse a "min_lat,min_lon,max_lat,max_lon" bounding box
+     *
+     * A min_lon greater than max_lon is a box crossing the 180th meridian.
+     *
+     * @param mixed $value
+     * @return array|null array(min_lat, min_lon, max_lat, max_lon), or null if invalid
+     */
+    public static function parse_bbox($value) {
+        if (!is_string($value)) {
+            return null;
+        }
+
+        $parts = array_map('trim', explode(',', $value));
+
+        if (count($parts) !== 4) {
+            return null;
+        }
+
+        $south_west = self::parse_coordinates($parts[0] . ',' . $parts[1]);
+        $north_east = self::parse_coordinates($parts[2] . ',' . $parts[3]);
+
+        if (!$south_west || !$north_east || $south_west[0] > $north_east[0]) {
+            return null;
+        }
+
+        return array($south_west[0], $south_west[1], $north_east[0], $north_east[1]);
+    }
+
+    /**
+     * Build the location filter for WP_Query from request values
+     *
+     * @param mixed $near "lat,lon" centre point
+     * @param mixed $radius Radius around $near in kilometres
+     * @param mixed $bbox "min_lat,min_lon,max_lat,max_lon"
+     * @return array
+     */
+    public static function build_location_filter($near, $radius, $bbox) {
+        $filter = array();
+        $point = self::parse_coordinates($near);
+
+        if ($point) {
+            $filter['near'] = array($point[0], $point[1], floatval($radius));
+        }
+
+        $box = self::parse_bbox($bbox);
+
+        if ($box) {
+            $filter['bbox'] = $box;
+        }
+
+        return $filter;
+    }
+
+    /**
+     * Table expression that filters and sorts read as "attributes"
+     *
+     * The table once the backfill is done. Until then the same columns are
+     * computed from post meta, which gives complete results but reads the
+     * meta of every property.
+     *
+     * @param int $post_id Limit to one property, 0 for all
+     * @return string
+     */
+    private function source_sql($post_id = 0) {
+        global $wpdb;
+
+        if ($this->is_ready()) {
+            return self::table();
+        }
+
+        $where = $post_id ? $wpdb->prepare(' AND post_id = %d', $post_id) : '';
+
+        // "lat, lon" as accepted by parse_coordinates()
+        $point = '^[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*,[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*$';
+
+        return "(SELECT post_id,
+            MAX(CASE WHEN meta_key = 'floors' AND meta_value <> '' THEN CAST(meta_value AS UNSIGNED) END) AS floors,
+            MAX(CASE WHEN meta_key = 'eco_rating' AND meta_value <> '' THEN CAST(meta_value AS UNSIGNED) END) AS eco_rating,
+            MAX(CASE WHEN meta_key = 'building_type' AND meta_value <> '' THEN meta_value END) AS building_type,
+            MAX(CASE WHEN meta_key = 'coordinates' AND meta_value REGEXP '{$point}' THEN CAST(TRIM(SUBSTRING_INDEX(meta_value, ',', 1)) AS DECIMAL(9,6)) END) AS lat,
+            MAX(CASE WHEN meta_key = 'coordinates' AND meta_value REGEXP '{$point}' THEN CAST(TRIM(SUBSTRING_INDEX(meta_value, ',', -1)) AS DECIMAL(9,6)) END) AS lon
+            FROM {$wpdb->postmeta}
+            WHERE meta_key IN ('" . implode("', '", $this->meta_keys) . "'){$where}
+            GROUP BY post_id)";
+    }
+
+    /**
+     * SQL expression for the great-circle distance in kilometres from a point
+     *
+     * @param float $lat
+     * @param float $lon
+     * @return string
+     */
+    private function distance_sql($lat, $lon) {
+        global $wpdb;
+
+        return $wpdb->prepare(
+            '(%f * 2 * ASIN(SQRT(POWER(SIN(RADIANS(attributes.lat - %f) / 2), 2) + COS(RADIANS(%f)) * COS(RADIANS(attributes.lat)) * POWER(SIN(RADIANS(attributes.lon - %f) / 2), 2))))',
+            self::EARTH_RADIUS_KM,
+            $lat,
+            $lat,
+            $lon
+        );
+    }
+
+    /**
+     * SQL condition for a longitude range that may cross the 180th meridian
+     *
+     * Ranges reaching past ±180 are wrapped around, and a range crossing the
+     * meridian (min greater than max) is split in two on either side of it.
+     *
+     * @param float $min_lon
+     * @param float $max_lon
+     * @return string|null Condition, or null if every longitude is in range
+     */
+    private function longitude_sql($min_lon, $max_lon) {
+        global $wpdb;
+
+        if ($max_lon - $min_lon >= 360) {
+            return null;
+        }
+
+        if ($min_lon < -180) {
+            $min_lon += 360;
+        }
+
+        if ($max_lon > 180) {
+            $max_lon -= 360;
+        }
+
+        if ($min_lon <= $max_lon) {
+            return $wpdb->prepare('attributes.lon BETWEEN %f AND %f', $min_lon, $max_lon);
+        }
+
+        return $wpdb->prepare('(attributes.lon >= %f OR attributes.lon <= %f)', $min_lon, $max_lon);
+    }
+
+    /**
+     * SQL expression for the distance in millimetres, used as an exact sort and cursor key
+     *
+     * @param float $lat
+     * @param float $lon
+     * @return string
+     */
+    private function distance_key_sql($lat, $lon) {
+        return 'CAST(ROUND(' . $this->distance_sql($lat, $lon) . ' * 1000000) AS SIGNED)';
+    }
+
+    /**
+     * Distance key of one property from a point, for building a pagination cursor
+     *
+     * @param int $post_id
+     * @param float $lat
+     * @param float $lon
+     * @return int|null
+     */
+    public function get_distance_key($post_id, $lat, $lon) {
+        global $wpdb;
+
+        $key = $wpdb->get_var($wpdb->prepare(
+            'SELECT ' . $this->distance_key_sql($lat, $lon) . ' FROM ' . $this->source_sql($post_id) . ' AS attributes WHERE attributes.post_id = %d',
+            $post_id
+        ));
+
+        return $key === null ? null : intval($key);
+    }
+
+    /**
+     * Join the table and apply attribute filters and ordering
+     *
+     * Falls back to post meta until the backfill is done, see source_sql().
+     *
+     * @param array $clauses
+     * @param WP_Query $query
+     * @return array
+     */
+    public function filter_posts_clauses($clauses, $query) {
+        global $wpdb;
+
+        $filter = $query->get(self::QUERY_VAR);
+        $orderby = $query->get(self::ORDERBY_VAR);
+
+        if (!is_array($filter)) {
+            $filter = array();
+        }
+
+        if (!is_array($orderby)) {
+            $orderby = array();
+        }
+
+        $conditions = array();
+
+        if (isset($filter['building_type'])) {
+            $conditions[] = $wpdb->prepare('attributes.building_type = %s', $filter['building_type']);
+        }
+
+        if (isset($filter['min_floors'])) {
+            $conditions[] = $wpdb->prepare('attributes.floors >= %d', $filter['min_floors']);
+        }
+
+        if (isset($filter['max_floors'])) {
+            $conditions[] = $wpdb->prepare('attributes.floors <= %d', $filter['max_floors']);
+        }
+
+        if (isset($filter['min_eco_rating'])) {
+            $conditions[] = $wpdb->prepare('attributes.eco_rating >= %d', $filter['min_eco_rating']);
+        }
+
+        if (isset($filter['bbox'])) {
+            list($min_lat, $min_lon, $max_lat, $max_lon) = $filter['bbox'];
+            $conditions[] = $wpdb->prepare('attributes.lat BETWEEN %f AND %f', $min_lat, $max_lat);
+            $longitude = $this->longitude_sql($min_lon, $max_lon);
+
+            if ($longitude !== null) {
+                $conditions[] = $longitude;
+            }
+        }
+
+        $distance = null;
+
+        if (isset($filter['near'])) {
+            list($lat, $lon, $radius) = $filter['near'];
+            $distance = $this->distance_sql($lat, $lon);
+
+            // Bounding box of the circle narrows the scan on the location index before the exact distance check;
+            // its longitude range wraps around the 180th meridian, and a circle around a pole spans every longitude
+            $lat_delta = $radius / self::KM_PER_DEGREE;
+            $lon_delta = abs($lat) + $lat_delta >= 90 ? 180 : $radius / (self::KM_PER_DEGREE * cos(deg2rad($lat)));
+
+            $conditions[] = $wpdb->prepare('attributes.lat BETWEEN %f AND %f', $lat - $lat_delta, $lat + $lat_delta);
+            $longitude = $this->longitude_sql($lon - $lon_delta, $lon + $lon_delta);
+
+            if ($longitude !== null) {
+                $conditions[] = $longitude;
+            }
+
+            $conditions[] = $distance . $wpdb->prepare(' <= %f', $radius);
+
+            // Keyset pagination: continue after the last property of the previous page
+            if (isset($filter['after_distance'])) {
+                list($after_key, $after_id) = $filter['after_distance'];
+                $conditions[] = $wpdb->prepare(
+                    "({$this->distance_key_sql($lat, $lon)} > %d OR ({$this->distance_key_sql($lat, $lon)} = %d AND {$wpdb->posts}.ID > %d))",
+                    $after_key,
+                    $after_key,
+                    $after_id
+                );
+            }
+        }
+
+        $order = array();
+
+        foreach ($orderby as $column => $direction) {
+            $direction = strtoupper($direction) === 'ASC' ? 'ASC' : 'DESC';
+
+            if (in_array($column, array('floors', 'eco_rating'), true)) {
+                $order[] = "attributes.{$column} {$direction}";
+            } elseif ($column === 'distance' && isset($filter['near'])) {
+                $order[] = $this->distance_key_sql($filter['near'][0], $filter['near'][1]) . " {$direction}";
+            }
+        }
+
+        if (empty($conditions) && empty($order)) {
+            return $clauses;
+        }
+
+        // Filtering needs a row; ordering alone keeps properties that have none
+        $join = empty($conditions) ? 'LEFT JOIN' : 'INNER JOIN';
+        $clauses['join'] .= " {$join} " . $this->source_sql() . " AS attributes ON attributes.post_id = {$wpdb->posts}.ID";
+
+        if (!empty($conditions)) {
+            $clauses['where'] .= ' AND ' . implode(' AND ', $conditions);
+        }
+
+        if (!empty($order)) {
+            // Stable tie-break so pages never overlap
+            $order[] = "{$wpdb->posts}.ID ASC";
+            $clauses['orderby'] = implode(', ', $order);
+        }
+
+        return $clauses;
+    }
+}
+
+// Initialize the class
+$real_estate_attribute_index = new Real_Estate_Attribute_Index();
+
+if (defined('WP_CLI') && WP_CLI) {
+    // wp real-estate reindex-attributes [--batch-size=<number>]
+    Real_Estate_Index::add_rebuild_command('real-estate reindex-attributes', $real_estate_attribute_index, 'Attribute index');
+}
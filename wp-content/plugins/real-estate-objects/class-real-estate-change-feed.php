@@ -0,0 +1,442 @@
+<?php
+/**
+ * Change feed of modified and deleted properties for incremental sync
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+class Real_Estate_Change_Feed extends Real_Estate_Index {
+
+    /**
+     * Schema version, bump to re-run dbDelta
+     */
+    const DB_VERSION = '1';
+
+    /**
+     * Option holding the installed schema version
+     */
+    const DB_VERSION_OPTION = 'real_estate_objects_change_feed_db_version';
+
+    /**
+     * WP_Query var holding the feed position array(post_modified_gmt, ID)
+     */
+    const QUERY_VAR = 'real_estate_modified_after';
+
+    /**
+     * Index on the posts table that serves the feed order
+     */
+    const POSTS_INDEX = 'real_estate_modified_gmt';
+
+    /**
+     * Seconds the feed trails the current time
+     *
+     * post_modified_gmt is set when a save starts and has 1-second resolution,
+     * so a save committing after a reader passed its timestamp would be
+     * skipped. Holding back the last seconds gives such saves time to commit.
+     */
+    const FEED_LAG_SECONDS = 5;
+
+    /**
+     * Days tombstones are kept
+     */
+    const TOMBSTONE_DAYS = 90;
+
+    /**
+     * Option holding the newest pruned tombstone time; older feed positions cannot see every deletion
+     */
+    const PRUNED_OPTION = 'real_estate_objects_tombstones_pruned_before';
+
+    /**
+     * Daily cron event pruning old tombstones
+     */
+    const PRUNE_EVENT = 'real_estate_objects_prune_tombstones';
+
+    /**
+     * Move properties up the feed when their districts change or a district is deleted
+     *
+     * @var bool
+     */
+    protected $watches_districts = true;
+
+    /**
+     * Move properties up the feed when one of their districts is renamed
+     *
+     * @var bool
+     */
+    protected $watches_district_names = true;
+
+    /**
+     * Properties saved through wp_insert_post()/wp_update_post() during this request
+     *
+     * @var array
+     */
+    private $saved_ids = array();
+
+    /**
+     * Constructor
+     */
+    public function __construct() {
+        // Field and district changes that bypass wp_update_post() still move a property up the feed
+        parent::__construct();
+
+        // Tombstones for properties that leave the catalogue
+        add_action('transition_post_status', array($this, 'status_changed'), 10, 3);
+        add_action(self::PRUNE_EVENT, array($this, 'prune'));
+
+        // Feed position and order for WP_Query
+        add_filter('posts_clauses', array($this, 'filter_posts_clauses'), 10, 2);
+    }
+
+    /**
+     * Tombstone table name
+     *
+     * @return string
+     */
+    public static function table() {
+        global $wpdb;
+
+        return $wpdb->prefix . 'real_estate_tombstones';
+    }
+
+    /**
+     * Create or upgrade the tombstone table
+     */
+    public static function install() {
+        global $wpdb;
+
+        require_once ABSPATH . 'wp-admin/includes/upgrade.php';
+
+        $table = self::table();
+        $charset_collate = $wpdb->get_charset_collate();
+
+        dbDelta("CREATE TABLE {$table} (
+            post_id bigint(20) unsigned NOT NULL,
+            deleted_gmt datetime NOT NULL,
+            PRIMARY KEY  (post_id),
+            KEY deleted (deleted_gmt,post_id)
+        ) {$charset_collate};");
+
+        update_option(self::DB_VERSION_OPTION, self::DB_VERSION);
+    }
+
+    /**
+     * Install the tombstone table and the posts index on plugin activation
+     */
+    public static function activate() {
+        self::install();
+        self::add_posts_index();
+    }
+
+    /**
+     * Whether the posts table has the index serving the feed order
+     *
+     * @return bool
+     */
+    public static function has_posts_index() {
+        global $wpdb;
+
+        return (bool) $wpdb->get_var($wpdb->prepare("SHOW INDEX FROM {$wpdb->posts} WHERE Key_name = %s", self::POSTS_INDEX));
+    }
+
+    /**
+     * Add the index serving the feed order to the posts table unless it exists
+     *
+     * WordPress only indexes post_date; without this the feed sorts every
+     * property of the type. Adding an index rebuilds the posts table, so it
+     * only runs on activation and from WP-CLI, never from maybe_install().
+     *
+     * @return bool Whether the index exists afterwards
+     */
+    public static function add_posts_index() {
+        global $wpdb;
+
+        if (self::has_posts_index()) {
+            return true;
+        }
+
+        return $wpdb->query("ALTER TABLE {$wpdb->posts} ADD INDEX " . self::POSTS_INDEX . " (post_type, post_status, post_modified_gmt, ID)") !== false;
+    }
+
+    /**
+     * Install the table after plugin updates that skip the activation hook and schedule pruning
+     */
+    public function maybe_install() {
+        parent::maybe_install();
+
+        if (!wp_next_scheduled(self::PRUNE_EVENT)) {
+            wp_schedule_event(time() + DAY_IN_SECONDS, 'daily', self::PRUNE_EVENT);
+        }
+    }
+
+    /**
+     * Nothing to rebuild; the feed reads the posts table
+     *
+     * @return string[]
+     */
+    protected function tables() {
+        return array();
+    }
+
+    /**
+     * Whether a meta key is an ACF field or the featured image
+     *
+     * @param string $meta_key
+     * @return bool
+     */
+    protected function watches_meta($meta_key) {
+        return self::is_field_meta($meta_key);
+    }
+
+    /**
+     * Parse a modified_after value into a GMT MySQL datetime
+     *
+     * Accepts "Y-m-d H:i:s" and RFC 3339 with or without a UTC offset; values
+     * without an offset are read as GMT, like the modified_gmt response field.
+     *
+     * @param mixed $value
+     * @return string|null
+     */
+    public static function parse_datetime($value) {
+        if (!is_string($value) || !preg_match('/^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:\.\d+)?(Z|[+-]\d{2}:?\d{2})?$/i', trim($value), $matches)) {
+            return null;
+        }
+
+        $offset = isset($matches[3]) && $matches[3] !== '' ? $matches[3] : 'Z';
+        $timestamp = strtotime($matches[1] . 'T' . $matches[2] . $offset);
+
+        return $timestamp === false ? null : gmdate('Y-m-d H:i:s', $timestamp);
+    }
+
+    /**
+     * Newest change time the feed returns, FEED_LAG_SECONDS before now
+     *
+     * @return string GMT datetime
+     */
+    public static function horizon() {
+        return gmdate('Y-m-d H:i:s', time() - self::FEED_LAG_SECONDS);
+    }
+
+    /**
+     * Remember a property saved through the post API; its post_modified is already current
+     *
+     * @param int $post_id
+     */
+    public function post_saved($post_id) {
+        $this->saved_ids[$post_id] = true;
+    }
+
+    /**
+     * Bump post_modified of properties changed without a post save during this request
+     *
+     * One UPDATE for all of them, so meta written by update_field(), WP-CLI or
+     * importers reaches the feed like an edit in the admin.
+     *
+     * @param int[] $post_ids
+     */
+    public function sync_posts($post_ids) {
+        global $wpdb;
+
+        $post_ids = array_map('intval', array_diff($post_ids, array_keys($this->saved_ids)));
+
+        if (empty($post_ids)) {
+            return;
+        }
+
+        $wpdb->query($wpdb->prepare(
+            "UPDATE {$wpdb->posts} SET post_modified = %s, post_modified_gmt = %s WHERE post_type = 'real_estate_object' AND ID IN (" . implode(',', $post_ids) . ')',
+            current_time('mysql'),
+            current_time('mysql', true)
+        ));
+
+        foreach ($post_ids as $post_id) {
+            clean_post_cache($post_id);
+        }
+    }
+
+    /**
+     * Record a tombstone when a property is unpublished and drop it when the property is published again
+     *
+     * @param string $new_status
+     * @param string $old_status
+     * @param WP_Post $post
+     */
+    public function status_changed($new_status, $old_status, $post) {
+        global $wpdb;
+
+        if ($post->post_type !== 'real_estate_object' || $new_status === $old_status) {
+            return;
+        }
+
+        if ($new_status === 'publish') {
+            $wpdb->delete(self::table(), array('post_id' => $post->ID), array('%d'));
+        } elseif ($old_status === 'publish') {
+            $this->add_tombstone($post->ID);
+        }
+    }
+
+    /**
+     * Record a tombstone for a deleted property
+     *
+     * @param int $post_id
+     */
+    protected function delete_post_data($post_id) {
+        $this->add_tombstone($post_id);
+    }
+
+    /**
+     * Store or refresh the tombstone of a property
+     *
+     * @param int $post_id
+     */
+    private function add_tombstone($post_id) {
+        global $wpdb;
+
+        $wpdb->replace(self::table(), array(
+            'post_id'     => $post_id,
+            'deleted_gmt' => current_time('mysql', true),
+        ), array('%d', '%s'));
+    }
+
+    /**
+     * Tombstones after a feed position, oldest first
+     *
+     * @param array $after array(GMT datetime, ID)
+     * @param int $limit
+     * @return array[] Rows with post_id and deleted_gmt
+     */
+    public function get_tombstones($after, $limit) {
+        global $wpdb;
+
+        list($modified, $id) = $after;
+
+        return $wpdb->get_results($wpdb->prepare(
+            'SELECT post_id, deleted_gmt FROM ' . self::table() . ' WHERE (deleted_gmt > %s OR (deleted_gmt = %s AND post_id > %d)) AND deleted_gmt <= %s ORDER BY deleted_gmt ASC, post_id ASC LIMIT %d',
+            $modified,
+            $modified,
+            $id,
+            self::horizon(),
+            $limit
+        ), ARRAY_A);
+    }
+
+    /**
+     * Whether every deletion after a feed position still has its tombstone
+     *
+     * @param string $modified_after GMT datetime
+     * @return bool
+     */
+    public function covers($modified_after) {
+        $pruned_before = get_option(self::PRUNED_OPTION);
+
+        return !$pruned_before || $modified_after >= $pruned_before;
+    }
+
+    /**
+     * Delete tombstones older than a number of days
+     *
+     * @param int $days
+     * @return int Number of tombstones deleted
+     */
+    public function prune($days = self::TOMBSTONE_DAYS) {
+        global $wpdb;
+
+        $table = self::table();
+        $cutoff = gmdate('Y-m-d H:i:s', time() - max(1, intval($days)) * DAY_IN_SECONDS);
+        $newest = $wpdb->get_var($wpdb->prepare("SELECT MAX(deleted_gmt) FROM {$table} WHERE deleted_gmt < %s", $cutoff));
+
+        if (!$newest) {
+            return 0;
+        }
+
+        $deleted = (int) $wpdb->query($wpdb->prepare("DELETE FROM {$table} WHERE deleted_gmt <= %s", $newest));
+
+        // Syncs positioned before the newest pruned tombstone could miss a deletion
+        if ($newest > (string) get_option(self::PRUNED_OPTION)) {
+            update_option(self::PRUNED_OPTION, $newest, false);
+        }
+
+        return $deleted;
+    }
+
+    /**
+     * Continue the feed after a position, in post_modified_gmt and ID order, up to the horizon
+     *
+     * @param array $clauses
+     * @param WP_Query $query
+     * @return array
+     */
+    public function filter_posts_clauses($clauses, $query) {
+        global $wpdb;
+
+        $after = $query->get(self::QUERY_VAR);
+
+        if (empty($after) || !is_array($after)) {
+            return $clauses;
+        }
+
+        list($modified, $id) = $after;
+
+        $clauses['where'] .= $wpdb->prepare(
+            " AND ({$wpdb->posts}.post_modified_gmt > %s OR ({$wpdb->posts}.post_modified_gmt = %s AND {$wpdb->posts}.ID > %d)) AND {$wpdb->posts}.post_modified_gmt <= %s",
+            $modified,
+            $modified,
+            $id,
+            self::horizon()
+        );
+        $clauses['orderby'] = "{$wpdb->posts}.post_modified_gmt ASC, {$wpdb->posts}.ID ASC";
+
+        return $clauses;
+    }
+}
+
+// Initialize the class
+$real_estate_change_feed = new Real_Estate_Change_Feed();
+
+if (defined('WP_CLI') && WP_CLI) {
+    /**
+     * Delete property tombstones older than a number of days.
+     *
+     * Syncs positioned before the newest deleted tombstone get a 410 sync_expired
+     * error for include_deleted and have to run a full sync.
+     *
+     * ## OPTIONS
+     *
+     * [--days=<number>]
+     * : Age in days of the tombstones to delete. Default 90.
+     *
+     * ## EXAMPLES
+     *
+     *     wp real-estate prune-tombstones --days=30
+     */
+    WP_CLI::add_command('real-estate prune-tombstones', function ($args, $assoc_args) {
+        global $real_estate_change_feed;
+
+        $days = isset($assoc_args['days']) ? max(1, intval($assoc_args['days'])) : Real_Estate_Change_Feed::TOMBSTONE_DAYS;
+        $deleted = $real_estate_change_feed->prune($days);
+
+        WP_CLI::success(sprintf('Deleted %d tombstones older than %d days.', $deleted, $days));
+    });
+
+    /**
+     * Add the index serving the change feed to the posts table.
+     *
+     * Sites that updated the plugin without reactivating it need this once.
+     * Adding an index rebuilds the posts table, so run it off-peak on large sites.
+     *
+     * ## EXAMPLES
+     *
+     *     wp real-estate add-feed-index
+     */
+    WP_CLI::add_command('real-estate add-feed-index', function () {
+        if (Real_Estate_Change_Feed::has_posts_index()) {
+            WP_CLI::success('Change feed index already exists.');
+        } elseif (Real_Estate_Change_Feed::add_posts_index()) {
+            WP_CLI::success('Change feed index added to the posts table.');
+        } else {
+            WP_CLI::error('Could not add the change feed index to the posts table.');
+        }
+    });
+}
@@ -0,0 +1,543 @@
+<?php
+/**
+ * Materialized per-property read documents
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+class Real_Estate_Documents extends Real_Estate_Index {
+
+    /**
+     * Schema version, bump to re-run dbDelta
+     */
+    const DB_VERSION = '1';
+
+    /**
+     * Option holding the installed schema version
+     */
+    const DB_VERSION_OPTION = 'real_estate_objects_documents_db_version';
+
+    /**
+     * Document layout version, bump when build_document() output changes so stored documents are rebuilt on read
+     */
+    const DOCUMENT_VERSION = 1;
+
+    /**
+     * Rebuild a property's document when the post is saved
+     *
+     * @var bool
+     */
+    protected $watches_save = true;
+
+    /**
+     * Rebuild documents when their districts change or a district is deleted
+     *
+     * @var bool
+     */
+    protected $watches_districts = true;
+
+    /**
+     * Rebuild documents when one of their districts is renamed
+     *
+     * @var bool
+     */
+    protected $watches_district_names = true;
+
+    /**
+     * Documents loaded during this request, by post ID
+     *
+     * @var array
+     */
+    private $documents = array();
+
+    /**
+     * Constructor
+     */
+    public function __construct() {
+        parent::__construct();
+
+        // Documents copy image URLs and alt texts, so attachment edits rebuild the properties that use them
+        add_action('attachment_updated', array($this, 'attachment_changed'));
+        add_action('delete_attachment', array($this, 'attachment_changed'));
+
+        // Load the documents of archive and district pages in one query
+        add_filter('the_posts', array($this, 'prime_main_query'), 10, 2);
+    }
+
+    /**
+     * Document table name
+     *
+     * @return string
+     */
+    public static function table() {
+        global $wpdb;
+
+        return $wpdb->prefix . 'real_estate_documents';
+    }
+
+    /**
+     * Create or upgrade the document table
+     */
+    public static function install() {
+        global $wpdb;
+
+        require_once ABSPATH . 'wp-admin/includes/upgrade.php';
+
+        $table = self::table();
+        $charset_collate = $wpdb->get_charset_collate();
+
+        dbDelta("CREATE TABLE {$table} (
+            post_id bigint(20) unsigned NOT NULL,
+            document longtext NOT NULL,
+            hash char(32) NOT NULL,
+            updated datetime NOT NULL,
+            PRIMARY KEY  (post_id)
+        ) {$charset_collate};");
+
+        update_option(self::DB_VERSION_OPTION, self::DB_VERSION);
+    }
+
+    /**
+     * Tables emptied before a full rebuild
+     *
+     * @return string[]
+     */
+    protected function tables() {
+        return array(self::table());
+    }
+
+    /**
+     * Whether a meta key is an ACF field or the featured image
+     *
+     * @param string $meta_key
+     * @return bool
+     */
+    protected function watches_meta($meta_key) {
+        return self::is_field_meta($meta_key);
+    }
+
+    /**
+     * Mark a property's document for rebuilding
+     *
+     * @param int $post_id
+     * @return bool Whether the post is a property
+     */
+    public function mark_dirty($post_id) {
+        if (!parent::mark_dirty($post_id)) {
+            return false;
+        }
+
+        unset($this->documents[(int) $post_id]);
+
+        return true;
+    }
+
+    /**
+     * Mark a property dirty when one of its fields or its featured image changes
+     *
+     * @param int|array $meta_id
+     * @param int $post_id
+     * @param string $meta_key
+     */
+    public function meta_changed($meta_id, $post_id, $meta_key) {
+        // Alt text and file of an attachment a document may have copied
+        if ($meta_key === '_wp_attachment_image_alt' || $meta_key === '_wp_attached_file') {
+            $this->attachment_changed($post_id);
+            return;
+        }
+
+        parent::meta_changed($meta_id, $post_id, $meta_key);
+    }
+
+    /**
+     * Mark the properties using an attachment as building or premises image dirty
+     *
+     * Also fires real_estate_objects_document_invalidated for each of them,
+     * as no property hook runs when only the attachment changes.
+     *
+     * @param int $attachment_id
+     */
+    public function attachment_changed($attachment_id) {
+        global $wpdb;
+
+        if (get_post_type($attachment_id) !== 'attachment') {
+            return;
+        }
+
+        $post_ids = $wpdb->get_col($wpdb->prepare(
+            "SELECT DISTINCT meta.post_id FROM {$wpdb->postmeta} AS meta
+            INNER JOIN {$wpdb->posts} AS posts ON posts.ID = meta.post_id AND posts.post_type = 'real_estate_object'
+            WHERE meta.meta_value = %s AND (meta.meta_key = 'building_image' OR meta.meta_key LIKE %s)",
+            (string) $attachment_id,
+            $wpdb->esc_like('premises_') . '%' . $wpdb->esc_like('_image')
+        ));
+
+        foreach ($post_ids as $post_id) {
+            $this->mark_dirty((int) $post_id);
+
+            /**
+             * Fires when a property's document changes without a change to the property itself
+             *
+             * @param int $post_id
+             */
+            do_action('real_estate_objects_document_invalidated', (int) $post_id);
+        }
+    }
+
+    /**
+     * Remove a deleted property's document
+     *
+     * @param int $post_id
+     */
+    protected function delete_post_data($post_id) {
+        global $wpdb;
+
+        unset($this->documents[$post_id]);
+        $wpdb->delete(self::table(), array('post_id' => $post_id), array('%d'));
+    }
+
+    /**
+     * Rebuild and store the documents of changed properties
+     *
+     * @param int[] $post_ids
+     */
+    public function sync_posts($post_ids) {
+        foreach ($post_ids as $post_id) {
+            $this->refresh($post_id);
+        }
+    }
+
+    /**
+     * Rebuild and store documents without keeping them in memory
+     *
+     * @param int[] $post_ids
+     */
+    protected function rebuild_posts($post_ids) {
+        foreach ($post_ids as $post_id) {
+            $document = $this->build_document($post_id);
+
+            if ($document !== null) {
+                $this->save_document($post_id, $document);
+            }
+        }
+    }
+
+    /**
+     * Rebuild and store one property's document
+     *
+     * @param int $post_id
+     * @return array|null The document, or null if the post is not a property
+     */
+    public function refresh($post_id) {
+        unset($this->dirty_ids[$post_id]);
+
+        $document = $this->build_document($post_id);
+
+        if ($document === null) {
+            return null;
+        }
+
+        $this->save_document($post_id, $document);
+        $this->documents[$post_id] = $document;
+
+        return $document;
+    }
+
+    /**
+     * Load the stored documents of several properties in one query
+     *
+     * @param int[] $post_ids
+     */
+    public function prime($post_ids) {
+        global $wpdb;
+
+        $post_ids = array_diff(array_map('intval', $post_ids), array_keys($this->documents));
+
+        if (empty($post_ids)) {
+            return;
+        }
+
+        $rows = $wpdb->get_results(
+            'SELECT post_id, document FROM ' . self::table() . ' WHERE post_id IN (' . implode(',', $post_ids) . ')'
+        );
+
+        foreach ($rows as $row) {
+            $document = json_decode($row->document, true);
+
+            if (is_array($document) && isset($document['version']) && $document['version'] === self::DOCUMENT_VERSION) {
+                $this->documents[(int) $row->post_id] = $document;
+            }
+        }
+    }
+
+    /**
+     * Prime documents for the main query of property archives and district pages
+     *
+     * @param WP_Post[] $posts
+     * @param WP_Query $query
+     * @return WP_Post[]
+     */
+    public function prime_main_query($posts, $query) {
+        if ($query->is_main_query() && !empty($posts) && ($query->is_post_type_archive('real_estate_object') || $query->is_tax('district') || $query->is_singular('real_estate_object'))) {
+            $this->prime(wp_list_pluck($posts, 'ID'));
+        }
+
+        return $posts;
+    }
+
+    /**
+     * Get a property's document
+     *
+     * Stored documents are used as they are; a missing, outdated or
+     * changed-in-this-request document is built and stored on the spot.
+     *
+     * @param int $post_id
+     * @return array|null
+     */
+    public function get($post_id) {
+        $post_id = (int) $post_id;
+
+        if (isset($this->dirty_ids[$post_id])) {
+            return $this->refresh($post_id);
+        }
+
+        if (!array_key_exists($post_id, $this->documents)) {
+            $this->prime(array($post_id));
+        }
+
+        if (isset($this->documents[$post_id])) {
+            return $this->documents[$post_id];
+        }
+
+        return $this->refresh($post_id);
+    }
+
+    /**
+     * Build a property's document from the post, its ACF meta and its districts
+     *
+     * ACF stores simple fields under their own name and repeater rows as
+     * `premises` (row count) plus `premises_{n}_{sub_field}`, so the whole
+     * document comes from one get_post_meta() call and the term cache.
+     *
+     * @param int $post_id
+     * @return array|null
+     */
+    public function build_document($post_id) {
+        $post = get_post($post_id);
+
+        if (!$post || $post->post_type !== 'real_estate_object') {
+            return null;
+        }
+
+        $meta = get_post_meta($post->ID);
+
+        $value = function ($key) use ($meta) {
+            return isset($meta[$key][0]) ? maybe_unserialize($meta[$key][0]) : null;
+        };
+
+        $premises = array();
+        $premises_count = intval($value('premises'));
+
+        for ($row = 0; $row < $premises_count; $row++) {
+            $premises[] = array(
+                'area'     => $value("premises_{$row}_area"),
+                'rooms'    => $value("premises_{$row}_rooms"),
+                'balcony'  => $value("premises_{$row}_balcony"),
+                'bathroom' => $value("premises_{$row}_bathroom"),
+                'image'    => $this->get_image_data($value("premises_{$row}_image")),
+            );
+        }
+
+        $districts = array();
+        $terms = get_the_terms($post->ID, 'district');
+
+        if ($terms && !is_wp_error($terms)) {
+            foreach ($terms as $term) {
+                $districts[] = array(
+                    'id'   => $term->term_id,
+                    'name' => $term->name,
+                    'slug' => $term->slug,
+                );
+            }
+        }
+
+        return array(
+            'version'        => self::DOCUMENT_VERSION,
+            'id'             => $post->ID,
+            'title'          => $post->post_title,
+            'content'        => $post->post_content,
+            'excerpt'        => get_the_excerpt($post),
+            'districts'      => $districts,
+            'building_name'  => $value('building_name'),
+            'coordinates'    => $value('coordinates'),
+            'floors'         => $value('floors'),
+            'building_type'  => $value('building_type'),
+            'eco_rating'     => $value('eco_rating'),
+            'building_image' => $this->get_image_data($value('building_image')),
+            'price'          => $value('price'),
+            'premises'       => $premises,
+        );
+    }
+
+    /**
+     * Compare every stored document with a freshly built one
+     *
+     * @param int $batch_size Properties per batch
+     * @param bool $fix Rewrite missing and stale documents and drop orphaned ones
+     * @return array Post IDs by problem: missing, stale and orphaned
+     */
+    public function check_all($batch_size = 500, $fix = false) {
+        global $wpdb;
+
+        $problems = array('missing' => array(), 'stale' => array(), 'orphaned' => array());
+
+        $this->walk_properties($batch_size, function ($post_ids) use (&$problems, $fix, $wpdb) {
+            $hashes = $wpdb->get_results(
+                'SELECT post_id, hash FROM ' . self::table() . ' WHERE post_id IN (' . implode(',', array_map('intval', $post_ids)) . ')',
+                OBJECT_K
+            );
+
+            foreach ($post_ids as $post_id) {
+                $document = $this->build_document($post_id);
+                $problem = null;
+
+                if (!isset($hashes[$post_id])) {
+                    $problem = 'missing';
+                } elseif ($hashes[$post_id]->hash !== md5(wp_json_encode($document))) {
+                    $problem = 'stale';
+                }
+
+                if ($problem === null) {
+                    continue;
+                }
+
+                $problems[$problem][] = (int) $post_id;
+
+                if ($fix) {
+                    $this->save_document($post_id, $document);
+                }
+            }
+        });
+
+        $problems['orphaned'] = array_map('intval', $wpdb->get_col(
+            'SELECT d.post_id FROM ' . self::table() . " d LEFT JOIN {$wpdb->posts} p ON p.ID = d.post_id AND p.post_type = 'real_estate_object' WHERE p.ID IS NULL"
+        ));
+
+        if ($fix && !empty($problems['orphaned'])) {
+            $wpdb->query('DELETE FROM ' . self::table() . ' WHERE post_id IN (' . implode(',', $problems['orphaned']) . ')');
+        }
+
+        return $problems;
+    }
+
+    /**
+     * Store a document with its hash
+     *
+     * @param int $post_id
+     * @param array $document
+     */
+    private function save_document($post_id, $document) {
+        global $wpdb;
+
+        $json = wp_json_encode($document);
+
+        $wpdb->replace(self::table(), array(
+            'post_id'  => $post_id,
+            'document' => $json,
+            'hash'     => md5($json),
+            'updated'  => current_time('mysql', true),
+        ), array('%d', '%s', '%s', '%s'));
+    }
+
+    /**
+     * Image ID, URL and alt text of an image field value
+     *
+     * @param mixed $value Attachment ID or URL
+     * @return array|null
+     */
+    private function get_image_data($value) {
+        if (empty($value)) {
+            return null;
+        }
+
+        if (!is_numeric($value)) {
+            return array('id' => 0, 'url' => (string) $value, 'alt' => '');
+        }
+
+        $url = wp_get_attachment_url($value);
+
+        if (!$url) {
+            return null;
+        }
+
+        return array(
+            'id'  => (int) $value,
+            'url' => $url,
+            'alt' => (string) get_post_meta($value, '_wp_attachment_image_alt', true),
+        );
+    }
+}
+
+// Initialize the class
+$real_estate_documents = new Real_Estate_Documents();
+
+/**
+ * Get the materialized document of a property, for templates
+ *
+ * @param int|null $post_id Defaults to the current post
+ * @return array|null
+ */
+function real_estate_objects_get_document($post_id = null) {
+    global $real_estate_documents;
+
+    return $real_estate_documents->get($post_id ? $post_id : get_the_ID());
+}
+
+if (defined('WP_CLI') && WP_CLI) {
+    // wp real-estate rebuild-documents [--batch-size=<number>]
+    Real_Estate_Index::add_rebuild_command('real-estate rebuild-documents', $real_estate_documents, 'Property documents');
+
+    /**
+     * Check the materialized property documents against the posts they are built from.
+     *
+     * ## OPTIONS
+     *
+     * [--batch-size=<number>]
+     * : Properties loaded per batch. Default 500.
+     *
+     * [--fix]
+     * : Rewrite missing and stale documents and delete orphaned ones.
+     *
+     * ## EXAMPLES
+     *
+     *     wp real-estate check-documents
+     *     wp real-estate check-documents --fix
+     */
+    WP_CLI::add_command('real-estate check-documents', function ($args, $assoc_args) {
+        global $real_estate_documents;
+
+        $batch_size = isset($assoc_args['batch-size']) ? max(1, intval($assoc_args['batch-size'])) : 500;
+        $fix = isset($assoc_args['fix']);
+        $problems = $real_estate_documents->check_all($batch_size, $fix);
+        $total = 0;
+
+        foreach ($problems as $problem => $post_ids) {
+            $total += count($post_ids);
+
+            if (!empty($post_ids)) {
+                WP_CLI::log(sprintf('%s (%d): %s', ucfirst($problem), count($post_ids), implode(', ', array_slice($post_ids, 0, 50))));
+            }
+        }
+
+        if ($total === 0) {
+            WP_CLI::success('All documents are consistent.');
+        } elseif ($fix) {
+            WP_CLI::success(sprintf('Fixed %d inconsistent documents.', $total));
+        } else {
+            WP_CLI::error(sprintf('%d inconsistent documents. Run with --fix to repair them.', $total));
+        }
+    });
+}
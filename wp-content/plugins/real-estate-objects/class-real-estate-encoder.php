@@ -0,0 +1,509 @@
+<?php
+/**
+ * Response formats and content codings for the Real Estate REST API
+ *
+ * GET /properties and the other real-estate/v1 routes can answer in JSON,
+ * XML, MessagePack or CBOR, picked from the Accept header, and compress the
+ * body with gzip or Brotli, picked from Accept-Encoding. The class has no
+ * hooks of its own: the REST API's serve hook and the response cache's fast
+ * path both call it, so it is loaded by the fast path MU-plugin as well.
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+class Real_Estate_Encoder {
+
+    /**
+     * Bodies smaller than this are sent uncompressed
+     */
+    const MIN_COMPRESS_BYTES = 1024;
+
+    /**
+     * gzip level; 6 is zlib's default trade-off for dynamic responses
+     */
+    const GZIP_LEVEL = 6;
+
+    /**
+     * Brotli quality; 11 is too slow for uncached responses
+     */
+    const BROTLI_QUALITY = 5;
+
+    /**
+     * Media types accepted in the Accept header, by format
+     *
+     * @var array
+     */
+    private static $media_types = array(
+        'application/json'        => 'json',
+        'application/xml'         => 'xml',
+        'application/msgpack'     => 'msgpack',
+        'application/x-msgpack'   => 'msgpack',
+        'application/vnd.msgpack' => 'msgpack',
+        'application/cbor'        => 'cbor',
+    );
+
+    /**
+     * Content-Type sent for each format
+     *
+     * @var array
+     */
+    private static $content_types = array(
+        'json'    => 'application/json',
+        'xml'     => 'application/xml',
+        'msgpack' => 'application/msgpack',
+        'cbor'    => 'application/cbor',
+    );
+
+    /**
+     * Pick the response format from an Accept header
+     *
+     * The highest q wins; on a tie an exact media type beats a wildcard and
+     * an earlier entry beats a later one. Types with q=0 are refused and
+     * never picked. Wildcards, unknown types and a missing header mean JSON.
+     *
+     * @param string|null $accept Accept header
+     * @param bool $binary Whether MessagePack and CBOR may be picked
+     * @return string json, xml, msgpack or cbor
+     */
+    public static function negotiate_format($accept, $binary = true) {
+        $best = null;
+        $best_rank = null;
+
+        foreach (self::parse_header($accept) as $position => $entry) {
+            list($value, $q) = $entry;
+
+            if ($q <= 0) {
+                continue;
+            }
+
+            $format = isset(self::$media_types[$value]) ? self::$media_types[$value] : null;
+
+            if (!$binary && ($format === 'msgpack' || $format === 'cbor')) {
+                $format = null;
+            }
+
+            if ($format === null && $value !== '*/*' && $value !== 'application/*') {
+                continue;
+            }
+
+            $rank = array($q, $format !== null ? 1 : 0, -$position);
+
+            if ($best_rank === null || $rank > $best_rank) {
+                $best_rank = $rank;
+                $best = $format ? $format : 'json';
+            }
+        }
+
+        return $best ? $best : 'json';
+    }
+
+    /**
+     * Pick the content coding from an Accept-Encoding header
+     *
+     * Brotli needs the brotli extension. Nothing is picked while
+     * zlib.output_compression already compresses the output.
+     *
+     * @param string|null $accept_encoding Accept-Encoding header
+     * @return string|null br, gzip or null for identity
+     */
+    public static function negotiate_encoding($accept_encoding) {
+        if (!$accept_encoding || ini_get('zlib.output_compression')) {
+            return null;
+        }
+
+        $available = array();
+
+        if (function_exists('brotli_compress')) {
+            $available['br'] = 0;
+        }
+
+        if (function_exists('gzencode')) {
+            $available['gzip'] = 0;
+        }
+
+        $listed = array();
+        $wildcard = null;
+
+        foreach (self::parse_header($accept_encoding) as $entry) {
+            list($value, $q) = $entry;
+
+            if ($value === 'x-gzip') {
+                $value = 'gzip';
+            }
+
+            if ($value === '*') {
+                $wildcard = $q;
+            } elseif (isset($available[$value])) {
+                $available[$value] = $q;
+                $listed[$value] = true;
+            }
+        }
+
+        // Codings the client did not list are covered by "*"
+        if ($wildcard !== null) {
+            foreach (array_keys(array_diff_key($available, $listed)) as $coding) {
+                $available[$coding] = $wildcard;
+            }
+        }
+
+        // Ties go to Brotli, which is listed first
+        $best = null;
+
+        foreach ($available as $coding => $q) {
+            if ($q > 0 && ($best === null || $q > $available[$best])) {
+                $best = $coding;
+            }
+        }
+
+        return $best;
+    }
+
+    /**
+     * Content-Type header value of a format
+     *
+     * @param string $format
+     * @return string
+     */
+    public static function content_type($format) {
+        $type = self::$content_types[$format];
+
+        if ($format === 'json' || $format === 'xml') {
+            $type .= '; charset=' . get_option('blog_charset');
+        }
+
+        return $type;
+    }
+
+    /**
+     * Encode response data as JSON, MessagePack or CBOR
+     *
+     * @param mixed $data
+     * @param string $format json, msgpack or cbor
+     * @return string
+     */
+    public static function encode($data, $format) {
+        switch ($format) {
+            case 'msgpack':
+                return self::msgpack($data);
+
+            case 'cbor':
+                return self::cbor($data);
+
+            default:
+                return wp_json_encode($data);
+        }
+    }
+
+    /**
+     * Encode data as MessagePack
+     *
+     * Uses the msgpack extension when it is loaded. Arrays with the keys
+     * 0..n-1 become MessagePack arrays and all other arrays and objects maps,
+     * as wp_json_encode() decides between JSON arrays and objects.
+     *
+     * @param mixed $data
+     * @return string
+     */
+    public static function msgpack($data) {
+        if (function_exists('msgpack_pack')) {
+            return msgpack_pack($data);
+        }
+
+        if ($data === null) {
+            return "\xc0";
+        }
+
+        if (is_bool($data)) {
+            return $data ? "\xc3" : "\xc2";
+        }
+
+        if (is_int($data)) {
+            if ($data >= 0) {
+                if ($data < 0x80) {
+                    return chr($data);
+                }
+                if ($data <= 0xff) {
+                    return "\xcc" . chr($data);
+                }
+                if ($data <= 0xffff) {
+                    return "\xcd" . pack('n', $data);
+                }
+                if ($data <= 0xffffffff) {
+                    return "\xce" . pack('N', $data);
+                }
+                return "\xcf" . pack('J', $data);
+            }
+
+            if ($data >= -32) {
+                return chr($data & 0xff);
+            }
+            if ($data >= -0x80) {
+                return "\xd0" . chr($data & 0xff);
+            }
+            if ($data >= -0x8000) {
+                return "\xd1" . pack('n', $data & 0xffff);
+            }
+            if ($data >= -0x80000000) {
+                return "\xd2" . pack('N', $data & 0xffffffff);
+            }
+            return "\xd3" . pack('J', $data);
+        }
+
+        if (is_float($data)) {
+            return "\xcb" . pack('E', $data);
+        }
+
+        if (is_object($data)) {
+            if ($data instanceof JsonSerializable) {
+                return self::msgpack($data->jsonSerialize());
+            }
+
+            // Objects are always maps, as in JSON
+            return self::msgpack_map(get_object_vars($data));
+        }
+
+        if (is_array($data)) {
+            if (!self::is_list($data)) {
+                return self::msgpack_map($data);
+            }
+
+            $count = count($data);
+
+            if ($count < 16) {
+                $packed = chr(0x90 | $count);
+            } elseif ($count <= 0xffff) {
+                $packed = "\xdc" . pack('n', $count);
+            } else {
+                $packed = "\xdd" . pack('N', $count);
+            }
+
+            foreach ($data as $value) {
+                $packed .= self::msgpack($value);
+            }
+
+            return $packed;
+        }
+
+        $data = (string) $data;
+        $length = strlen($data);
+
+        if ($length < 32) {
+            return chr(0xa0 | $length) . $data;
+        }
+        if ($length <= 0xff) {
+            return "\xd9" . chr($length) . $data;
+        }
+        if ($length <= 0xffff) {
+            return "\xda" . pack('n', $length) . $data;
+        }
+        return "\xdb" . pack('N', $length) . $data;
+    }
+
+    /**
+     * Encode an array as a MessagePack map
+     *
+     * @param array $data
+     * @return string
+     */
+    private static function msgpack_map($data) {
+        $count = count($data);
+
+        if ($count < 16) {
+            $packed = chr(0x80 | $count);
+        } elseif ($count <= 0xffff) {
+            $packed = "\xde" . pack('n', $count);
+        } else {
+            $packed = "\xdf" . pack('N', $count);
+        }
+
+        // Keys are strings, as in JSON
+        foreach ($data as $key => $value) {
+            $packed .= self::msgpack((string) $key) . self::msgpack($value);
+        }
+
+        return $packed;
+    }
+
+    /**
+     * Encode data as CBOR (RFC 8949)
+     *
+     * Uses the same array/map rule as msgpack(). Strings are written as text
+     * strings, so they have to be UTF-8 like the JSON output.
+     *
+     * @param mixed $data
+     * @return string
+     */
+    public static function cbor($data) {
+        if ($data === null) {
+            return "\xf6";
+        }
+
+        if (is_bool($data)) {
+            return $data ? "\xf5" : "\xf4";
+        }
+
+        if (is_int($data)) {
+            return $data >= 0 ? self::cbor_head(0, $data) : self::cbor_head(1, -1 - $data);
+        }
+
+        if (is_float($data)) {
+            return "\xfb" . pack('E', $data);
+        }
+
+        if (is_object($data)) {
+            if ($data instanceof JsonSerializable) {
+                return self::cbor($data->jsonSerialize());
+            }
+
+            // Objects are always maps, as in JSON
+            return self::cbor_map(get_object_vars($data));
+        }
+
+        if (is_array($data)) {
+            if (!self::is_list($data)) {
+                return self::cbor_map($data);
+            }
+
+            $packed = self::cbor_head(4, count($data));
+
+            foreach ($data as $value) {
+                $packed .= self::cbor($value);
+            }
+
+            return $packed;
+        }
+
+        $data = (string) $data;
+
+        return self::cbor_head(3, strlen($data)) . $data;
+    }
+
+    /**
+     * Encode an array as a CBOR map
+     *
+     * @param array $data
+     * @return string
+     */
+    private static function cbor_map($data) {
+        $packed = self::cbor_head(5, count($data));
+
+        foreach ($data as $key => $value) {
+            $packed .= self::cbor((string) $key) . self::cbor($value);
+        }
+
+        return $packed;
+    }
+
+    /**
+     * CBOR initial byte and argument
+     *
+     * @param int $major Major type 0-7
+     * @param int $value Argument, e.g. a length
+     * @return string
+     */
+    private static function cbor_head($major, $value) {
+        $major <<= 5;
+
+        if ($value < 24) {
+            return chr($major | $value);
+        }
+        if ($value <= 0xff) {
+            return chr($major | 24) . chr($value);
+        }
+        if ($value <= 0xffff) {
+            return chr($major | 25) . pack('n', $value);
+        }
+        if ($value <= 0xffffffff) {
+            return chr($major | 26) . pack('N', $value);
+        }
+        return chr($major | 27) . pack('J', $value);
+    }
+
+    /**
+     * Compress an encoded body with the negotiated coding when worthwhile
+     *
+     * @param string $body
+     * @param string|null $encoding br, gzip or null
+     * @return array array(body, applied coding or null)
+     */
+    public static function compress($body, $encoding) {
+        if (!$encoding || strlen($body) < self::MIN_COMPRESS_BYTES) {
+            return array($body, null);
+        }
+
+        $compressed = $encoding === 'br' ? brotli_compress($body, self::BROTLI_QUALITY) : gzencode($body, self::GZIP_LEVEL);
+
+        return $compressed === false ? array($body, null) : array($compressed, $encoding);
+    }
+
+    /**
+     * Send a body returned by compress()
+     *
+     * Sets Content-Encoding and Content-Length; the status and Content-Type
+     * have to be sent by the caller.
+     *
+     * @param string $body
+     * @param string|null $coding Coding applied by compress()
+     */
+    public static function send($body, $coding) {
+        if (!headers_sent()) {
+            if ($coding) {
+                header('Content-Encoding: ' . $coding);
+            }
+
+            header('Content-Length: ' . strlen($body));
+        }
+
+        echo $body;
+    }
+
+    /**
+     * Whether an array has the keys 0..n-1 in order, i.e. is a JSON array
+     *
+     * @param array $data
+     * @return bool
+     */
+    private static function is_list($data) {
+        if (function_exists('array_is_list')) {
+            return array_is_list($data);
+        }
+
+        return $data === array() || array_keys($data) === range(0, count($data) - 1);
+    }
+
+    /**
+     * Split an Accept or Accept-Encoding header into lowercase values and q-values
+     *
+     * @param string|null $header
+     * @return array List of array(value, q)
+     */
+    private static function parse_header($header) {
+        $entries = array();
+
+        foreach (explode(',', (string) $header) as $part) {
+            $params = explode(';', $part);
+            $value = strtolower(trim(array_shift($params)));
+
+            if ($value === '') {
+                continue;
+            }
+
+            $q = 1.0;
+
+            foreach ($params as $param) {
+                $pair = explode('=', $param, 2);
+
+                if (strtolower(trim($pair[0])) === 'q') {
+                    $q = isset($pair[1]) ? (float) trim($pair[1]) : 0.0;
+                }
+            }
+
+            $entries[] = array($value, $q);
+        }
+
+        return $entries;
+    }
+}
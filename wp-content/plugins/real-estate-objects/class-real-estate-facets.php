@@ -0,0 +1,598 @@
+<?php
+/**
+ * Incrementally maintained facet counts for the property filters
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+class Real_Estate_Facets extends Real_Estate_Index {
+
+    /**
+     * Schema version, bump to re-run dbDelta
+     */
+    const DB_VERSION = '1';
+
+    /**
+     * Option holding the installed schema version
+     */
+    const DB_VERSION_OPTION = 'real_estate_objects_facets_db_version';
+
+    /**
+     * Premise predicate matching every property
+     */
+    const ANY_PREMISE = '*:*:*';
+
+    /**
+     * Highest room count with its own facet value
+     */
+    const MAX_ROOMS = 10;
+
+    /**
+     * Building types offered by the filters
+     *
+     * @var array
+     */
+    private $building_types = array('panel', 'brick', 'foam_block');
+
+    /**
+     * Recount a property when it is saved, e.g. published or unpublished
+     *
+     * @var bool
+     */
+    protected $watches_save = true;
+
+    /**
+     * Recount properties when their districts change or a district is deleted
+     *
+     * @var bool
+     */
+    protected $watches_districts = true;
+
+    /**
+     * Constructor
+     */
+    public function __construct() {
+        parent::__construct();
+
+        add_action('rest_api_init', array($this, 'register_routes'));
+    }
+
+    /**
+     * Aggregate table: property counts per combination of filter values
+     *
+     * @return string
+     */
+    public static function table() {
+        global $wpdb;
+
+        return $wpdb->prefix . 'real_estate_facets';
+    }
+
+    /**
+     * Cells each property is currently counted in, used to apply changes as deltas
+     *
+     * @return string
+     */
+    public static function state_table() {
+        global $wpdb;
+
+        return $wpdb->prefix . 'real_estate_facet_state';
+    }
+
+    /**
+     * Create or upgrade the facet tables
+     */
+    public static function install() {
+        global $wpdb;
+
+        require_once ABSPATH . 'wp-admin/includes/upgrade.php';
+
+        $table = self::table();
+        $state_table = self::state_table();
+        $charset_collate = $wpdb->get_charset_collate();
+
+        dbDelta("CREATE TABLE {$table} (
+            premise varchar(12) NOT NULL,
+            district_id bigint(20) unsigned NOT NULL,
+            building_type varchar(20) NOT NULL,
+            eco_rating tinyint(3) unsigned NOT NULL,
+            floors tinyint(3) unsigned NOT NULL,
+            property_count int(11) NOT NULL DEFAULT 0,
+            PRIMARY KEY  (premise,district_id,building_type,eco_rating,floors)
+        ) {$charset_collate};");
+
+        dbDelta("CREATE TABLE {$state_table} (
+            post_id bigint(20) unsigned NOT NULL,
+            cells longtext NOT NULL,
+            PRIMARY KEY  (post_id)
+        ) {$charset_collate};");
+
+        update_option(self::DB_VERSION_OPTION, self::DB_VERSION);
+    }
+
+    /**
+     * Tables emptied before a full rebuild
+     *
+     * @return string[]
+     */
+    protected function tables() {
+        return array(self::table(), self::state_table());
+    }
+
+    /**
+     * Whether a meta key is a filtered field or premise feature
+     *
+     * @param string $meta_key
+     * @return bool
+     */
+    protected function watches_meta($meta_key) {
+        return in_array($meta_key, array('floors', 'eco_rating', 'building_type'), true) || preg_match('/^premises(_\d+_(rooms|balcony|bathroom))?$/', $meta_key);
+    }
+
+    /**
+     * Recount changed properties
+     *
+     * @param int[] $post_ids
+     */
+    public function sync_posts($post_ids) {
+        $this->update_cells($post_ids);
+    }
+
+    /**
+     * Remove a deleted property from the counts
+     *
+     * @param int $post_id
+     */
+    protected function delete_post_data($post_id) {
+        $this->apply_cells($post_id, array());
+        $this->remove_empty_cells();
+    }
+
+    /**
+     * Cells a property is counted in
+     *
+     * A property counts once for every combination of one of its districts
+     * (or district 0, "any") and one premise predicate it satisfies (or
+     * "*:*:*", "any"), together with its building type, eco-rating and floors.
+     * A predicate is "rooms:balcony:bathroom" with * for "any", so
+     * "2:1:*" means "has a 2-room premise with a balcony".
+     *
+     * @param int $post_id
+     * @return array Cell keys
+     */
+    private function get_cells($post_id) {
+        global $real_estate_premises_index;
+
+        if (get_post_type($post_id) !== 'real_estate_object' || get_post_status($post_id) !== 'publish') {
+            return array();
+        }
+
+        $district_ids = wp_get_object_terms($post_id, 'district', array('fields' => 'ids'));
+        $district_ids = is_wp_error($district_ids) ? array(0) : array_merge(array(0), array_map('intval', $district_ids));
+
+        $building_type = (string) get_post_meta($post_id, 'building_type', true);
+        $eco_rating = intval(get_post_meta($post_id, 'eco_rating', true));
+        $floors = intval(get_post_meta($post_id, 'floors', true));
+
+        $premises = array(self::ANY_PREMISE => true);
+
+        foreach ($real_estate_premises_index->get_premises_rows($post_id) as $row) {
+            $rooms = ($row['rooms'] >= 1 && $row['rooms'] <= self::MAX_ROOMS) ? array((string) $row['rooms'], '*') : array('*');
+
+            foreach ($rooms as $room) {
+                foreach (array((string) $row['balcony'], '*') as $balcony) {
+                    foreach (array((string) $row['bathroom'], '*') as $bathroom) {
+                        $premises["{$room}:{$balcony}:{$bathroom}"] = true;
+                    }
+                }
+            }
+        }
+
+        $cells = array();
+
+        foreach (array_keys($premises) as $premise) {
+            foreach (array_unique($district_ids) as $district_id) {
+                $cells[] = implode('|', array($premise, $district_id, $building_type, $eco_rating, $floors));
+            }
+        }
+
+        return $cells;
+    }
+
+    /**
+     * Move properties from their previous cells to their current ones
+     *
+     * The previous cells of all of them are read in one query and the count
+     * changes applied in chunked upserts, so the same code serves single
+     * edits and batched rebuilds, also while other requests write.
+     *
+     * @param int[] $post_ids
+     */
+    private function update_cells($post_ids) {
+        global $wpdb;
+
+        $previous = $wpdb->get_results(
+            'SELECT post_id, cells FROM ' . self::state_table() . ' WHERE post_id IN (' . implode(',', array_map('intval', $post_ids)) . ')',
+            OBJECT_K
+        );
+
+        $deltas = array();
+        $removed = false;
+
+        foreach ($post_ids as $post_id) {
+            $cells = $this->get_cells($post_id);
+            $old = isset($previous[$post_id]) ? json_decode($previous[$post_id]->cells, true) : null;
+            $old = is_array($old) ? $old : array();
+
+            foreach (array_diff($old, $cells) as $cell) {
+                $deltas[$cell] = (isset($deltas[$cell]) ? $deltas[$cell] : 0) - 1;
+                $removed = true;
+            }
+
+            foreach (array_diff($cells, $old) as $cell) {
+                $deltas[$cell] = (isset($deltas[$cell]) ? $deltas[$cell] : 0) + 1;
+            }
+
+            if (!empty($cells)) {
+                $this->save_state($post_id, $cells);
+            } elseif (isset($previous[$post_id])) {
+                $wpdb->delete(self::state_table(), array('post_id' => $post_id), array('%d'));
+            }
+        }
+
+        $this->apply_deltas(array_filter($deltas));
+
+        if ($removed) {
+            $this->remove_empty_cells();
+        }
+    }
+
+    /**
+     * Move a property from its previous cells to new ones
+     *
+     * @param int $post_id
+     * @param array $cells
+     */
+    private function apply_cells($post_id, $cells) {
+        global $wpdb;
+
+        $previous = $wpdb->get_var($wpdb->prepare('SELECT cells FROM ' . self::state_table() . ' WHERE post_id = %d', $post_id));
+        $previous = $previous ? json_decode($previous, true) : array();
+
+        $deltas = array();
+
+        foreach (array_diff($previous, $cells) as $cell) {
+            $deltas[$cell] = -1;
+        }
+
+        foreach (array_diff($cells, $previous) as $cell) {
+            $deltas[$cell] = 1;
+        }
+
+        $this->apply_deltas($deltas);
+
+        if (empty($cells)) {
+            $wpdb->delete(self::state_table(), array('post_id' => $post_id), array('%d'));
+        } else {
+            $this->save_state($post_id, $cells);
+        }
+    }
+
+    /**
+     * Remember the cells a property is counted in
+     *
+     * @param int $post_id
+     * @param array $cells
+     */
+    private function save_state($post_id, $cells) {
+        global $wpdb;
+
+        $wpdb->replace(self::state_table(), array('post_id' => $post_id, 'cells' => wp_json_encode(array_values($cells))), array('%d', '%s'));
+    }
+
+    /**
+     * Add count deltas to cells in chunked upserts
+     *
+     * @param array $deltas Delta by cell key
+     */
+    private function apply_deltas($deltas) {
+        global $wpdb;
+
+        foreach (array_chunk($deltas, 500, true) as $chunk) {
+            $values = array();
+
+            foreach ($chunk as $cell => $delta) {
+                list($premise, $district_id, $building_type, $eco_rating, $floors) = explode('|', $cell);
+                $values[] = $wpdb->prepare('(%s, %d, %s, %d, %d, %d)', $premise, $district_id, $building_type, $eco_rating, $floors, $delta);
+            }
+
+            $wpdb->query(
+                'INSERT INTO ' . self::table() . ' (premise, district_id, building_type, eco_rating, floors, property_count) VALUES '
+                . implode(', ', $values)
+                . ' ON DUPLICATE KEY UPDATE property_count = property_count + VALUES(property_count)'
+            );
+        }
+    }
+
+    /**
+     * Drop cells no property is counted in any more
+     */
+    private function remove_empty_cells() {
+        global $wpdb;
+
+        $wpdb->query('DELETE FROM ' . self::table() . ' WHERE property_count <= 0');
+    }
+
+    /**
+     * Register the facets route
+     */
+    public function register_routes() {
+        register_rest_route('real-estate/v1', '/facets', array(
+            array(
+                'methods'  => WP_REST_Server::READABLE,
+                'callback' => array($this, 'get_facets'),
+                'permission_callback' => '__return_true',
+                'args'     => array(
+                    'district' => array(
+                        'description' => 'Selected district slug',
+                        'type'        => 'string',
+                    ),
+                    'building_type' => array(
+                        'description' => 'Selected building type',
+                        'type'        => 'string',
+                        'enum'        => $this->building_types,
+                    ),
+                    'min_floors' => array(
+                        'description' => 'Selected minimum number of floors',
+                        'type'        => 'integer',
+                        'minimum'     => 1,
+                        'maximum'     => 20,
+                    ),
+                    'max_floors' => array(
+                        'description' => 'Selected maximum number of floors',
+                        'type'        => 'integer',
+                        'minimum'     => 1,
+                        'maximum'     => 20,
+                    ),
+                    'min_eco_rating' => array(
+                        'description' => 'Selected minimum eco-rating',
+                        'type'        => 'integer',
+                        'minimum'     => 1,
+                        'maximum'     => 5,
+                    ),
+                    'rooms' => array(
+                        'description' => 'Selected room count',
+                        'type'        => 'integer',
+                        'minimum'     => 1,
+                        'maximum'     => self::MAX_ROOMS,
+                    ),
+                    'balcony' => array(
+                        'description' => 'Selected balcony option',
+                        'type'        => 'string',
+                        'enum'        => array('yes', 'no'),
+                    ),
+                    'bathroom' => array(
+                        'description' => 'Selected bathroom option',
+                        'type'        => 'string',
+                        'enum'        => array('yes', 'no'),
+                    ),
+                ),
+            ),
+        ));
+    }
+
+    /**
+     * Get facet counts for a selection
+     *
+     * @param WP_REST_Request $request
+     * @return WP_REST_Response|WP_Error
+     */
+    public function get_facets($request) {
+        global $real_estate_fragment_cache;
+
+        $selection = array(
+            'district'       => null,
+            'building_type'  => $request['building_type'] ?: null,
+            'min_floors'     => $request['min_floors'] ? intval($request['min_floors']) : null,
+            'max_floors'     => $request['max_floors'] ? intval($request['max_floors']) : null,
+            'min_eco_rating' => $request['min_eco_rating'] ? intval($request['min_eco_rating']) : null,
+            'rooms'          => $request['rooms'] ? intval($request['rooms']) : null,
+            'balcony'        => $request['balcony'] ? ($request['balcony'] === 'yes' ? '1' : '0') : null,
+            'bathroom'       => $request['bathroom'] ? ($request['bathroom'] === 'yes' ? '1' : '0') : null,
+        );
+
+        if (!empty($request['district'])) {
+            $term = get_term_by('slug', $request['district'], 'district');
+
+            // An unknown district matches nothing
+            $selection['district'] = $term ? intval($term->term_id) : -1;
+        }
+
+        // Counts grow while the backfill runs and would show too few properties per option
+        if (!$this->is_ready()) {
+            return new WP_Error('facets_unavailable', 'Facet counts are not available until the facets backfill has finished', array('status' => 503));
+        }
+
+        $facets = $real_estate_fragment_cache->remember('facets', $selection, function () use ($selection) {
+            return $this->compute_facets($selection);
+        });
+
+        return new WP_REST_Response($facets);
+    }
+
+    /**
+     * Compute facet counts from the aggregate table
+     *
+     * Each dimension is counted with every other selected filter applied but
+     * its own selection ignored, so the counts show what choosing another
+     * value would return.
+     *
+     * @param array $selection
+     * @return array
+     */
+    public function compute_facets($selection) {
+        $facets = array(
+            'total'         => $this->sum_counts($selection),
+            'district'      => array(),
+            'building_type' => array_fill_keys($this->building_types, 0),
+            'floors'        => array_fill_keys(range(1, 20), 0),
+            'eco_rating'    => array_fill_keys(range(1, 5), 0),
+            'rooms'         => array_fill_keys(range(1, self::MAX_ROOMS), 0),
+            'balcony'       => array('yes' => 0, 'no' => 0),
+            'bathroom'      => array('yes' => 0, 'no' => 0),
+        );
+
+        // Districts
+        $district_counts = $this->sum_counts(array_merge($selection, array('district' => null)), 'district_id');
+        $districts = get_terms(array('taxonomy' => 'district', 'hide_empty' => false));
+
+        foreach (is_wp_error($districts) ? array() : $districts as $district) {
+            $facets['district'][] = array(
+                'slug'  => $district->slug,
+                'name'  => $district->name,
+                'count' => isset($district_counts[$district->term_id]) ? $district_counts[$district->term_id] : 0,
+            );
+        }
+
+        // Building types, floors and eco-ratings
+        foreach ($this->sum_counts(array_merge($selection, array('building_type' => null)), 'building_type') as $type => $count) {
+            if (isset($facets['building_type'][$type])) {
+                $facets['building_type'][$type] = $count;
+            }
+        }
+
+        // Both bounds are ignored, so the form can count either bound's options with the other one applied
+        foreach ($this->sum_counts(array_merge($selection, array('min_floors' => null, 'max_floors' => null)), 'floors') as $floors => $count) {
+            if (isset($facets['floors'][$floors])) {
+                $facets['floors'][$floors] = $count;
+            }
+        }
+
+        foreach ($this->sum_counts(array_merge($selection, array('min_eco_rating' => null)), 'eco_rating') as $rating => $count) {
+            if (isset($facets['eco_rating'][$rating])) {
+                $facets['eco_rating'][$rating] = $count;
+            }
+        }
+
+        // Premise features, each with the other two premise selections applied
+        $premise_counts = $this->sum_counts(array_merge($selection, array('rooms' => null)), 'premise', $this->premise_variants($selection, 'rooms'));
+
+        foreach ($facets['rooms'] as $rooms => $count) {
+            $premise = $this->premise_predicate(array_merge($selection, array('rooms' => $rooms)));
+            $facets['rooms'][$rooms] = isset($premise_counts[$premise]) ? $premise_counts[$premise] : 0;
+        }
+
+        foreach (array('balcony', 'bathroom') as $feature) {
+            $premise_counts = $this->sum_counts(array_merge($selection, array($feature => null)), 'premise', $this->premise_variants($selection, $feature));
+
+            foreach (array('yes' => '1', 'no' => '0') as $label => $value) {
+                $premise = $this->premise_predicate(array_merge($selection, array($feature => $value)));
+                $facets[$feature][$label] = isset($premise_counts[$premise]) ? $premise_counts[$premise] : 0;
+            }
+        }
+
+        return $facets;
+    }
+
+    /**
+     * Premise predicate for the premise part of a selection
+     *
+     * @param array $selection
+     * @return string
+     */
+    private function premise_predicate($selection) {
+        $part = function ($value) {
+            return $value === null ? '*' : (string) $value;
+        };
+
+        return $part($selection['rooms']) . ':' . $part($selection['balcony']) . ':' . $part($selection['bathroom']);
+    }
+
+    /**
+     * Predicates for every value of one premise feature, the others as selected
+     *
+     * @param array $selection
+     * @param string $feature rooms, balcony or bathroom
+     * @return array
+     */
+    private function premise_variants($selection, $feature) {
+        $values = $feature === 'rooms' ? range(1, self::MAX_ROOMS) : array('1', '0');
+        $predicates = array();
+
+        foreach ($values as $value) {
+            $predicates[] = $this->premise_predicate(array_merge($selection, array($feature => $value)));
+        }
+
+        return $predicates;
+    }
+
+    /**
+     * Sum property counts of the cells matching a selection
+     *
+     * @param array $selection
+     * @param string|null $group_by Column to group by, or null for a single total
+     * @param array|null $premises Premise predicates to group over instead of the selected one
+     * @return int|array Total, or counts by group value
+     */
+    private function sum_counts($selection, $group_by = null, $premises = null) {
+        global $wpdb;
+
+        $conditions = array();
+
+        if ($premises !== null) {
+            $conditions[] = "premise IN ('" . implode("', '", array_map('esc_sql', $premises)) . "')";
+        } else {
+            $conditions[] = $wpdb->prepare('premise = %s', $this->premise_predicate($selection));
+        }
+
+        // District 0 holds every property once; grouping by district needs the real ones
+        if ($group_by === 'district_id') {
+            $conditions[] = 'district_id > 0';
+        } else {
+            $conditions[] = $wpdb->prepare('district_id = %d', $selection['district'] !== null ? $selection['district'] : 0);
+        }
+
+        if ($selection['building_type'] !== null) {
+            $conditions[] = $wpdb->prepare('building_type = %s', $selection['building_type']);
+        }
+
+        if ($selection['min_eco_rating'] !== null) {
+            $conditions[] = $wpdb->prepare('eco_rating >= %d', $selection['min_eco_rating']);
+        }
+
+        if ($selection['min_floors'] !== null) {
+            $conditions[] = $wpdb->prepare('floors >= %d', $selection['min_floors']);
+        }
+
+        if ($selection['max_floors'] !== null) {
+            $conditions[] = $wpdb->prepare('floors <= %d', $selection['max_floors']);
+        }
+
+        $where = implode(' AND ', $conditions);
+        $table = self::table();
+
+        if ($group_by === null) {
+            return intval($wpdb->get_var("SELECT COALESCE(SUM(property_count), 0) FROM {$table} WHERE {$where}"));
+        }
+
+        $rows = $wpdb->get_results("SELECT {$group_by} AS value, SUM(property_count) AS total FROM {$table} WHERE {$where} GROUP BY {$group_by}");
+        $counts = array();
+
+        foreach ($rows as $row) {
+            $counts[$row->value] = intval($row->total);
+        }
+
+        return $counts;
+    }
+}
+
+// Initialize the class
+$real_estate_facets = new Real_Estate_Facets();
+
+if (defined('WP_CLI') && WP_CLI) {
+    // wp real-estate rebuild-facets [--batch-size=<number>]
+    Real_Estate_Index::add_rebuild_command('real-estate rebuild-facets', $real_estate_facets, 'Facet counts');
+}
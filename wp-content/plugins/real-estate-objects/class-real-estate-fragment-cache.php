@@ -0,0 +1,348 @@
+<?php
+/**
+ * Fragment cache for AJAX filter results and the filter form, with hit ratio statistics
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+class Real_Estate_Fragment_Cache {
+
+    /**
+     * Lifetime of a cached fragment in seconds
+     */
+    const TTL = HOUR_IN_SECONDS;
+
+    /**
+     * Option holding the current generation of every fragment group
+     */
+    const GENERATIONS_OPTION = 'real_estate_objects_fragment_generations';
+
+    /**
+     * Option holding hit/miss counters per cache, without a persistent object cache
+     */
+    const STATS_OPTION = 'real_estate_objects_cache_stats';
+
+    /**
+     * Object cache group holding hit/miss counters, with a persistent object cache
+     */
+    const STATS_GROUP = 'real_estate_objects_stats';
+
+    /**
+     * Without a persistent object cache, one request in this many writes its counters, scaled up
+     */
+    const STATS_SAMPLE_RATE = 20;
+
+    /**
+     * Caches whose hits and misses are counted
+     *
+     * @var array
+     */
+    private static $caches = array('rest_properties', 'ajax_results', 'filter_form', 'facets');
+
+    /**
+     * Hits and misses counted during this request, per cache
+     *
+     * @var array
+     */
+    private $pending_stats = array();
+
+    /**
+     * Constructor
+     */
+    public function __construct() {
+        // Results depend on properties; the response cache already watches every property change
+        add_action('real_estate_objects_cache_flushed', array($this, 'flush_results'));
+
+        // The filter form lists the districts
+        add_action('created_district', array($this, 'flush_form'));
+        add_action('edited_district', array($this, 'flush_form'));
+        add_action('delete_district', array($this, 'flush_form'));
+
+        // Expose hit ratios
+        add_action('rest_api_init', array($this, 'register_routes'));
+        add_action('shutdown', array($this, 'save_stats'));
+    }
+
+    /**
+     * Return a cached fragment, or build and cache it
+     *
+     * @param string $group Fragment group, e.g. ajax_results, filter_form or facets
+     * @param mixed $key Anything that identifies the fragment within the group
+     * @param callable $callback Builds the fragment on a miss
+     * @return mixed
+     */
+    public function remember($group, $key, $callback) {
+        $cache_key = 'reo_frag_' . md5(wp_json_encode(array($group, $key, $this->get_generation($group))));
+        $cached = get_transient($cache_key);
+
+        if ($cached !== false) {
+            $this->record($group, true);
+            return $cached;
+        }
+
+        $this->record($group, false);
+
+        $value = call_user_func($callback);
+        set_transient($cache_key, $value, self::TTL);
+
+        return $value;
+    }
+
+    /**
+     * Count a cache hit or miss
+     *
+     * @param string $cache Cache name
+     * @param bool $hit
+     */
+    public function record($cache, $hit) {
+        if (!isset($this->pending_stats[$cache])) {
+            $this->pending_stats[$cache] = array('hits' => 0, 'misses' => 0);
+        }
+
+        $this->pending_stats[$cache][$hit ? 'hits' : 'misses']++;
+    }
+
+    /**
+     * Add this request's counters to the stored statistics
+     *
+     * With a persistent object cache the counters are incremented there
+     * atomically. Without one, only a sample of requests writes the option,
+     * adding its counts times the sample rate, so ratios stay accurate while
+     * most requests write nothing to the database.
+     */
+    public function save_stats() {
+        if (empty($this->pending_stats)) {
+            return;
+        }
+
+        $pending = $this->pending_stats;
+        $this->pending_stats = array();
+
+        if (wp_using_ext_object_cache()) {
+            foreach ($pending as $cache => $counts) {
+                foreach ($counts as $field => $count) {
+                    if ($count > 0) {
+                        self::increment("{$cache}:{$field}", $count);
+                    }
+                }
+            }
+
+            return;
+        }
+
+        if (mt_rand(1, self::STATS_SAMPLE_RATE) !== 1) {
+            return;
+        }
+
+        // Concurrent sampled writes may lose each other's increments, which is fine for ratios
+        $stats = get_option(self::STATS_OPTION, array());
+
+        foreach ($pending as $cache => $counts) {
+            if (!isset($stats[$cache])) {
+                $stats[$cache] = array('hits' => 0, 'misses' => 0);
+            }
+
+            $stats[$cache]['hits'] += $counts['hits'] * self::STATS_SAMPLE_RATE;
+            $stats[$cache]['misses'] += $counts['misses'] * self::STATS_SAMPLE_RATE;
+        }
+
+        update_option(self::STATS_OPTION, $stats, false);
+    }
+
+    /**
+     * Atomically increment a counter in the object cache, creating it if needed
+     *
+     * @param string $key
+     * @param int $count
+     */
+    private static function increment($key, $count) {
+        if (wp_cache_incr($key, $count, self::STATS_GROUP) === false) {
+            // Another request may create it first, in which case add() fails and incr() applies
+            wp_cache_add($key, 0, self::STATS_GROUP);
+            wp_cache_incr($key, $count, self::STATS_GROUP);
+        }
+    }
+
+    /**
+     * Stored hit/miss counters per cache
+     *
+     * @return array
+     */
+    private function get_counters() {
+        if (!wp_using_ext_object_cache()) {
+            return get_option(self::STATS_OPTION, array());
+        }
+
+        $counters = array();
+
+        foreach (self::$caches as $cache) {
+            $hits = (int) wp_cache_get("{$cache}:hits", self::STATS_GROUP);
+            $misses = (int) wp_cache_get("{$cache}:misses", self::STATS_GROUP);
+
+            if ($hits || $misses) {
+                $counters[$cache] = array('hits' => $hits, 'misses' => $misses);
+            }
+        }
+
+        return $counters;
+    }
+
+    /**
+     * Hit/miss counters and hit ratio per cache
+     *
+     * Without a persistent object cache the counters are sampled estimates.
+     *
+     * @return array
+     */
+    public function get_stats() {
+        $stats = array();
+
+        foreach ($this->get_counters() as $cache => $counts) {
+            $total = $counts['hits'] + $counts['misses'];
+            $stats[$cache] = array(
+                'hits'      => $counts['hits'],
+                'misses'    => $counts['misses'],
+                'hit_ratio' => $total ? round($counts['hits'] / $total, 4) : null,
+            );
+        }
+
+        return $stats;
+    }
+
+    /**
+     * Reset all counters
+     */
+    public function reset_stats() {
+        $this->pending_stats = array();
+        delete_option(self::STATS_OPTION);
+
+        foreach (self::$caches as $cache) {
+            wp_cache_delete("{$cache}:hits", self::STATS_GROUP);
+            wp_cache_delete("{$cache}:misses", self::STATS_GROUP);
+        }
+    }
+
+    /**
+     * Invalidate cached AJAX filter results and facet counts
+     */
+    public function flush_results() {
+        $this->bump_generation('ajax_results');
+        $this->bump_generation('facets');
+    }
+
+    /**
+     * Invalidate the cached filter form and facet counts, which list the districts
+     */
+    public function flush_form() {
+        $this->bump_generation('filter_form');
+        $this->bump_generation('facets');
+    }
+
+    /**
+     * Register the statistics route
+     */
+    public function register_routes() {
+        register_rest_route('real-estate/v1', '/cache-stats', array(
+            array(
+                'methods'  => WP_REST_Server::READABLE,
+                'callback' => array($this, 'get_stats_response'),
+                'permission_callback' => array($this, 'check_admin_permission'),
+            ),
+            array(
+                'methods'  => WP_REST_Server::DELETABLE,
+                'callback' => array($this, 'reset_stats_response'),
+                'permission_callback' => array($this, 'check_admin_permission'),
+            ),
+        ));
+    }
+
+    /**
+     * Check if user has admin permission
+     *
+     * @return bool
+     */
+    public function check_admin_permission() {
+        return current_user_can('manage_options');
+    }
+
+    /**
+     * Get cache statistics
+     *
+     * @return WP_REST_Response
+     */
+    public function get_stats_response() {
+        return new WP_REST_Response($this->get_stats());
+    }
+
+    /**
+     * Reset cache statistics
+     *
+     * @return WP_REST_Response
+     */
+    public function reset_stats_response() {
+        $this->reset_stats();
+
+        return new WP_REST_Response(array('reset' => true));
+    }
+
+    /**
+     * Current generation of a fragment group
+     *
+     * @param string $group
+     * @return string
+     */
+    private function get_generation($group) {
+        $generations = get_option(self::GENERATIONS_OPTION, array());
+
+        return isset($generations[$group]) ? $generations[$group] : '0';
+    }
+
+    /**
+     * Start a new generation of a fragment group, orphaning its cached entries until they expire
+     *
+     * @param string $group
+     */
+    private function bump_generation($group) {
+        $generations = get_option(self::GENERATIONS_OPTION, array());
+        $generations[$group] = (string) microtime(true);
+
+        update_option(self::GENERATIONS_OPTION, $generations);
+    }
+}
+
+// Initialize the class
+$real_estate_fragment_cache = new Real_Estate_Fragment_Cache();
+
+if (defined('WP_CLI') && WP_CLI) {
+    /**
+     * Show hit ratios of the plugin's caches.
+     *
+     * ## OPTIONS
+     *
+     * [--reset]
+     * : Reset the counters after showing them.
+     *
+     * ## EXAMPLES
+     *
+     *     wp real-estate cache-stats
+     */
+    WP_CLI::add_command('real-estate cache-stats', function ($args, $assoc_args) {
+        global $real_estate_fragment_cache;
+
+        $rows = array();
+
+        foreach ($real_estate_fragment_cache->get_stats() as $cache => $counts) {
+            $rows[] = array_merge(array('cache' => $cache), $counts);
+        }
+
+        WP_CLI\Utils\format_items('table', $rows, array('cache', 'hits', 'misses', 'hit_ratio'));
+
+        if (isset($assoc_args['reset'])) {
+            $real_estate_fragment_cache->reset_stats();
+            WP_CLI::success('Cache statistics reset.');
+        }
+    });
+}
@@ -0,0 +1,459 @@
+<?php
+/**
+ * Shared dirty tracking and batched rebuilds for data derived from properties
+ *
+ * The premises and attribute indexes, the facet counts, the property
+ * documents and the change feed all keep data derived from a property's
+ * post, ACF meta and districts. The invalidation rules live here so a change
+ * marks a property dirty the same way in all of them; subclasses declare
+ * what they depend on and how their data is updated, deleted and rebuilt.
+ *
+ * A newly installed or upgraded table starts empty on sites that already
+ * have properties, so installing it schedules a backfill that rebuilds the
+ * properties in chunks through WP-Cron. Until it finishes, is_ready() is
+ * false and readers fall back to the post meta the data is derived from.
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+abstract class Real_Estate_Index {
+
+    /**
+     * Properties rebuilt per backfill batch
+     */
+    const BACKFILL_BATCH_SIZE = 200;
+
+    /**
+     * Backfill batches per cron run
+     */
+    const BACKFILL_BATCHES = 5;
+
+    /**
+     * Backfill position value once every property has been processed
+     */
+    const BACKFILL_COMPLETE = 'complete';
+
+    /**
+     * Properties changed during this request, by post ID
+     *
+     * @var array
+     */
+    protected $dirty_ids = array();
+
+    /**
+     * Whether saving a property marks it dirty
+     *
+     * @var bool
+     */
+    protected $watches_save = false;
+
+    /**
+     * Whether district assignments and district deletions mark properties dirty
+     *
+     * @var bool
+     */
+    protected $watches_districts = false;
+
+    /**
+     * Whether renaming a district marks its properties dirty
+     *
+     * @var bool
+     */
+    protected $watches_district_names = false;
+
+    /**
+     * Constructor
+     */
+    public function __construct() {
+        add_action('plugins_loaded', array($this, 'maybe_install'));
+
+        // Mark properties dirty when anything the derived data depends on changes
+        add_action('save_post_real_estate_object', array($this, 'post_saved'));
+        add_action('added_post_meta', array($this, 'meta_changed'), 10, 3);
+        add_action('updated_post_meta', array($this, 'meta_changed'), 10, 3);
+        add_action('deleted_post_meta', array($this, 'meta_changed'), 10, 3);
+        add_action('set_object_terms', array($this, 'terms_changed'), 10, 4);
+        add_action('edited_district', array($this, 'district_changed'));
+        add_action('pre_delete_term', array($this, 'district_deleting'), 10, 2);
+        add_action('delete_post', array($this, 'post_deleting'));
+
+        // Runs before other shutdown work such as the response cache flush
+        add_action('shutdown', array($this, 'sync_dirty'), 0);
+
+        add_action(static::backfill_option(), array($this, 'backfill'));
+    }
+
+    /**
+     * Create or upgrade the tables and store DB_VERSION in DB_VERSION_OPTION
+     */
+    abstract public static function install();
+
+    /**
+     * Tables emptied before a full rebuild; none means there is nothing to rebuild
+     *
+     * @return string[]
+     */
+    abstract protected function tables();
+
+    /**
+     * Whether a change of this meta key affects the derived data
+     *
+     * @param string $meta_key
+     * @return bool
+     */
+    abstract protected function watches_meta($meta_key);
+
+    /**
+     * Bring the derived data of changed properties up to date
+     *
+     * @param int[] $post_ids
+     */
+    abstract public function sync_posts($post_ids);
+
+    /**
+     * Remove the derived data of a property that is being deleted
+     *
+     * @param int $post_id
+     */
+    abstract protected function delete_post_data($post_id);
+
+    /**
+     * Install the tables after plugin updates that skip the activation hook and backfill them
+     *
+     * Tables installed by the activation hook or by an older version
+     * without backfills have no backfill position yet and are backfilled too.
+     */
+    public function maybe_install() {
+        $installed = get_option(static::DB_VERSION_OPTION) !== static::DB_VERSION;
+
+        if ($installed) {
+            static::install();
+        }
+
+        if ($this->tables() && ($installed || get_option(static::backfill_option()) === false)) {
+            static::schedule_backfill();
+        }
+    }
+
+    /**
+     * Option holding the backfill position, also the name of its cron event
+     *
+     * @return string
+     */
+    public static function backfill_option() {
+        return static::DB_VERSION_OPTION . '_backfill';
+    }
+
+    /**
+     * Start rebuilding every property from the first one through WP-Cron
+     */
+    public static function schedule_backfill() {
+        update_option(static::backfill_option(), 0);
+
+        if (!wp_next_scheduled(static::backfill_option())) {
+            wp_schedule_single_event(time(), static::backfill_option());
+        }
+    }
+
+    /**
+     * Whether the backfill has processed every property
+     *
+     * The position option is autoloaded, so this costs no query.
+     *
+     * @return bool
+     */
+    public function is_ready() {
+        return get_option(static::backfill_option()) === self::BACKFILL_COMPLETE;
+    }
+
+    /**
+     * Rebuild the next properties of a pending backfill and schedule the rest
+     *
+     * Rebuilding a property replaces what it had, so properties changed
+     * while the backfill runs stay correct.
+     */
+    public function backfill() {
+        $position = get_option(static::backfill_option());
+
+        if ($position === false || $position === self::BACKFILL_COMPLETE) {
+            return;
+        }
+
+        $last_id = $this->walk_properties(self::BACKFILL_BATCH_SIZE, function ($post_ids) {
+            $this->rebuild_posts($post_ids);
+        }, (int) $position, self::BACKFILL_BATCHES);
+
+        if ($last_id) {
+            update_option(static::backfill_option(), $last_id);
+            wp_schedule_single_event(time(), static::backfill_option());
+            return;
+        }
+
+        $this->complete_backfill();
+    }
+
+    /**
+     * Mark the backfill as done and drop its pending cron event
+     */
+    protected function complete_backfill() {
+        update_option(static::backfill_option(), self::BACKFILL_COMPLETE);
+        wp_clear_scheduled_hook(static::backfill_option());
+    }
+
+    /**
+     * Whether an ACF field or the featured image is stored under a meta key
+     *
+     * ACF keeps field references under "_{name}" keys and WordPress keeps
+     * edit locks and such under "_"; none of them change a property.
+     *
+     * @param string $meta_key
+     * @return bool
+     */
+    public static function is_field_meta($meta_key) {
+        return strpos($meta_key, '_') !== 0 || $meta_key === '_thumbnail_id';
+    }
+
+    /**
+     * Mark a property dirty
+     *
+     * @param int $post_id
+     * @return bool Whether the post is a property
+     */
+    public function mark_dirty($post_id) {
+        if (get_post_type($post_id) !== 'real_estate_object') {
+            return false;
+        }
+
+        $this->dirty_ids[(int) $post_id] = true;
+
+        return true;
+    }
+
+    /**
+     * Mark a saved property dirty
+     *
+     * @param int $post_id
+     */
+    public function post_saved($post_id) {
+        if ($this->watches_save) {
+            $this->mark_dirty($post_id);
+        }
+    }
+
+    /**
+     * Mark a property dirty when a watched meta key changes
+     *
+     * @param int|array $meta_id
+     * @param int $post_id
+     * @param string $meta_key
+     */
+    public function meta_changed($meta_id, $post_id, $meta_key) {
+        if ($this->watches_meta($meta_key)) {
+            $this->mark_dirty($post_id);
+        }
+    }
+
+    /**
+     * Mark a property dirty when its districts change
+     *
+     * @param int $object_id
+     * @param array $terms
+     * @param array $tt_ids
+     * @param string $taxonomy
+     */
+    public function terms_changed($object_id, $terms, $tt_ids, $taxonomy) {
+        if ($this->watches_districts && $taxonomy === 'district') {
+            $this->mark_dirty($object_id);
+        }
+    }
+
+    /**
+     * Mark the properties of a renamed district dirty
+     *
+     * @param int $term_id
+     */
+    public function district_changed($term_id) {
+        if ($this->watches_district_names) {
+            $this->mark_district_dirty($term_id);
+        }
+    }
+
+    /**
+     * Mark the properties of a district dirty before the district is deleted
+     *
+     * @param int $term_id
+     * @param string $taxonomy
+     */
+    public function district_deleting($term_id, $taxonomy) {
+        if ($this->watches_districts && $taxonomy === 'district') {
+            $this->mark_district_dirty($term_id);
+        }
+    }
+
+    /**
+     * Mark every property of a district dirty
+     *
+     * @param int $term_id
+     */
+    private function mark_district_dirty($term_id) {
+        $post_ids = get_objects_in_term($term_id, 'district');
+
+        if (!is_wp_error($post_ids)) {
+            foreach ($post_ids as $post_id) {
+                $this->mark_dirty($post_id);
+            }
+        }
+    }
+
+    /**
+     * Drop a deleted property's pending changes and derived data
+     *
+     * @param int $post_id
+     */
+    public function post_deleting($post_id) {
+        if (get_post_type($post_id) !== 'real_estate_object') {
+            return;
+        }
+
+        unset($this->dirty_ids[$post_id]);
+        $this->delete_post_data($post_id);
+    }
+
+    /**
+     * Update every property that changed during this request
+     */
+    public function sync_dirty() {
+        $post_ids = array_keys($this->dirty_ids);
+        $this->dirty_ids = array();
+
+        if (!empty($post_ids)) {
+            $this->sync_posts($post_ids);
+        }
+    }
+
+    /**
+     * Rebuild the derived data of a batch of properties whose posts, meta and terms are loaded
+     *
+     * Also used on tables that are not empty, so it has to replace what a
+     * property had before.
+     *
+     * @param int[] $post_ids
+     */
+    protected function rebuild_posts($post_ids) {
+        $this->sync_posts($post_ids);
+    }
+
+    /**
+     * Rebuild everything from scratch in batches, completing a pending backfill
+     *
+     * @param int $batch_size Properties per batch
+     * @param callable|null $progress Called with the number of properties processed so far
+     * @return int Number of properties processed
+     */
+    public function rebuild_all($batch_size = 500, $progress = null) {
+        global $wpdb;
+
+        $tables = $this->tables();
+
+        if (empty($tables)) {
+            return 0;
+        }
+
+        foreach ($tables as $table) {
+            $wpdb->query("TRUNCATE TABLE {$table}");
+        }
+
+        $processed = 0;
+
+        $this->walk_properties($batch_size, function ($post_ids) use (&$processed, $progress) {
+            $this->rebuild_posts($post_ids);
+
+            $processed += count($post_ids);
+
+            if ($progress) {
+                call_user_func($progress, $processed);
+            }
+        });
+
+        $this->complete_backfill();
+
+        return $processed;
+    }
+
+    /**
+     * Call a function with every batch of property IDs, with their posts, meta and districts loaded
+     *
+     * Auto-drafts are skipped; trashed and unpublished properties are
+     * included so they are up to date when they come back.
+     *
+     * @param int $batch_size
+     * @param callable $callback Called with an array of post IDs
+     * @param int $after_id Start after this post ID
+     * @param int $max_batches Stop after this many batches, 0 for no limit
+     * @return int The last post ID processed, or 0 when every property has been walked
+     */
+    protected function walk_properties($batch_size, $callback, $after_id = 0, $max_batches = 0) {
+        global $wpdb;
+
+        $batches = 0;
+
+        do {
+            $post_ids = array_map('intval', $wpdb->get_col($wpdb->prepare(
+                "SELECT ID FROM {$wpdb->posts} WHERE post_type = 'real_estate_object' AND post_status <> 'auto-draft' AND ID > %d ORDER BY ID ASC LIMIT %d",
+                $after_id,
+                $batch_size
+            )));
+
+            if (empty($post_ids)) {
+                return 0;
+            }
+
+            _prime_post_caches($post_ids, true, true);
+
+            call_user_func($callback, $post_ids);
+
+            // Keep memory flat on large catalogues
+            foreach ($post_ids as $post_id) {
+                clean_post_cache($post_id);
+            }
+
+            $after_id = end($post_ids);
+            $batches++;
+        } while (count($post_ids) === $batch_size && ($max_batches === 0 || $batches < $max_batches));
+
+        return count($post_ids) === $batch_size ? $after_id : 0;
+    }
+
+    /**
+     * Register a WP-CLI command that installs the tables and rebuilds them in batches
+     *
+     * @param string $command e.g. 'real-estate reindex-premises'
+     * @param Real_Estate_Index $index
+     * @param string $label What is rebuilt, e.g. 'Premises index'
+     */
+    public static function add_rebuild_command($command, $index, $label) {
+        WP_CLI::add_command($command, function ($args, $assoc_args) use ($index, $label) {
+            $index::install();
+
+            $batch_size = isset($assoc_args['batch-size']) ? max(1, intval($assoc_args['batch-size'])) : 500;
+            $processed = $index->rebuild_all($batch_size, function ($processed) {
+                WP_CLI::log(sprintf('Processed %d properties', $processed));
+            });
+
+            WP_CLI::success(sprintf('%s rebuilt for %d properties.', $label, $processed));
+        }, array(
+            'shortdesc' => sprintf('Rebuild the %s from the properties.', strtolower($label)),
+            'synopsis'  => array(
+                array(
+                    'type'        => 'assoc',
+                    'name'        => 'batch-size',
+                    'description' => 'Properties loaded per batch. Default 500.',
+                    'optional'    => true,
+                ),
+            ),
+        ));
+    }
+}
@@ -0,0 +1,283 @@
+<?php
+/**
+ * Indexed premises table for room/balcony/bathroom filtering
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+class Real_Estate_Premises_Index extends Real_Estate_Index {
+
+    /**
+     * Schema version, bump to re-run dbDelta
+     */
+    const DB_VERSION = '1';
+
+    /**
+     * Option holding the installed schema version
+     */
+    const DB_VERSION_OPTION = 'real_estate_objects_premises_db_version';
+
+    /**
+     * WP_Query var holding premises filters (rooms, balcony, bathroom)
+     */
+    const QUERY_VAR = 'real_estate_premises';
+
+    /**
+     * Constructor
+     */
+    public function __construct() {
+        parent::__construct();
+
+        // Filter WP_Query results through the table
+        add_filter('posts_where', array($this, 'filter_posts_where'), 10, 2);
+    }
+
+    /**
+     * Premises table name
+     *
+     * @return string
+     */
+    public static function table() {
+        global $wpdb;
+
+        return $wpdb->prefix . 'real_estate_premises';
+    }
+
+    /**
+     * Create or upgrade the premises table
+     */
+    public static function install() {
+        global $wpdb;
+
+        require_once ABSPATH . 'wp-admin/includes/upgrade.php';
+
+        $table = self::table();
+        $charset_collate = $wpdb->get_charset_collate();
+
+        dbDelta("CREATE TABLE {$table} (
+            post_id bigint(20) unsigned NOT NULL,
+            row_index smallint(5) unsigned NOT NULL,
+            area decimal(10,2) DEFAULT NULL,
+            rooms tinyint(3) unsigned NOT NULL DEFAULT 0,
+            balcony tinyint(1) NOT NULL DEFAULT 0,
+            bathroom tinyint(1) NOT NULL DEFAULT 0,
+            PRIMARY KEY  (post_id,row_index),
+            KEY rooms_features (rooms,balcony,bathroom,post_id),
+            KEY features (balcony,bathroom,post_id)
+        ) {$charset_collate};");
+
+        update_option(self::DB_VERSION_OPTION, self::DB_VERSION);
+    }
+
+    /**
+     * Tables emptied before a full rebuild
+     *
+     * @return string[]
+     */
+    protected function tables() {
+        return array(self::table());
+    }
+
+    /**
+     * Whether a meta key is the premises repeater or one of its indexed sub-fields
+     *
+     * @param string $meta_key
+     * @return bool
+     */
+    protected function watches_meta($meta_key) {
+        return strpos($meta_key, 'premises') === 0 && preg_match('/^premises(_\d+_(area|rooms|balcony|bathroom))?$/', $meta_key);
+    }
+
+    /**
+     * Re-index changed properties
+     *
+     * @param int[] $post_ids
+     */
+    public function sync_posts($post_ids) {
+        foreach ($post_ids as $post_id) {
+            $this->sync_post($post_id);
+        }
+    }
+
+    /**
+     * Remove a deleted property's rows
+     *
+     * @param int $post_id
+     */
+    protected function delete_post_data($post_id) {
+        global $wpdb;
+
+        $wpdb->delete(self::table(), array('post_id' => $post_id), array('%d'));
+    }
+
+    /**
+     * Rebuild the rows of one property from its ACF premises meta
+     *
+     * @param int $post_id
+     */
+    public function sync_post($post_id) {
+        global $wpdb;
+
+        $table = self::table();
+        $wpdb->delete($table, array('post_id' => $post_id), array('%d'));
+
+        $rows = $this->get_premises_rows($post_id);
+
+        if (empty($rows)) {
+            return;
+        }
+
+        $values = array();
+
+        foreach ($rows as $row) {
+            $values[] = $wpdb->prepare('(%d, %d, %f, %d, %d, %d)', $post_id, $row['row_index'], $row['area'], $row['rooms'], $row['balcony'], $row['bathroom']);
+        }
+
+        $wpdb->query("INSERT INTO {$table} (post_id, row_index, area, rooms, balcony, bathroom) VALUES " . implode(', ', $values));
+    }
+
+    /**
+     * Read the premises repeater rows from post meta
+     *
+     * @param int $post_id
+     * @return array
+     */
+    public function get_premises_rows($post_id) {
+        $rows = array();
+        $count = intval(get_post_meta($post_id, 'premises', true));
+
+        for ($row = 0; $row < $count; $row++) {
+            $rows[] = array(
+                'row_index' => $row,
+                'area'      => floatval(str_replace(',', '.', get_post_meta($post_id, "premises_{$row}_area", true))),
+                'rooms'     => intval(get_post_meta($post_id, "premises_{$row}_rooms", true)),
+                'balcony'   => get_post_meta($post_id, "premises_{$row}_balcony", true) === 'yes' ? 1 : 0,
+                'bathroom'  => get_post_meta($post_id, "premises_{$row}_bathroom", true) === 'yes' ? 1 : 0,
+            );
+        }
+
+        return $rows;
+    }
+
+    /**
+     * Build the premises filter for WP_Query from request values
+     *
+     * Empty values are skipped; returns an empty array when nothing is filtered.
+     *
+     * @param mixed $rooms
+     * @param mixed $balcony 'yes' or 'no'
+     * @param mixed $bathroom 'yes' or 'no'
+     * @return array
+     */
+    public static function build_filter($rooms, $balcony, $bathroom) {
+        $filter = array();
+
+        if (!empty($rooms)) {
+            $filter['rooms'] = intval($rooms);
+        }
+
+        if (!empty($balcony)) {
+            $filter['balcony'] = $balcony === 'yes' ? 1 : 0;
+        }
+
+        if (!empty($bathroom)) {
+            $filter['bathroom'] = $bathroom === 'yes' ? 1 : 0;
+        }
+
+        return $filter;
+    }
+
+    /**
+     * Restrict a query to properties with at least one matching premise
+     *
+     * All conditions apply to the same premise. Until the backfill has
+     * indexed every property, the premises meta is searched instead.
+     *
+     * @param string $where
+     * @param WP_Query $query
+     * @return string
+     */
+    public function filter_posts_where($where, $query) {
+        global $wpdb;
+
+        $filter = $query->get(self::QUERY_VAR);
+
+        if (empty($filter) || !is_array($filter)) {
+            return $where;
+        }
+
+        if (!$this->is_ready()) {
+            return $where . $this->meta_where($filter);
+        }
+
+        $conditions = array();
+
+        foreach (array('rooms', 'balcony', 'bathroom') as $column) {
+            if (isset($filter[$column])) {
+                $conditions[] = $wpdb->prepare("premises.{$column} = %d", $filter[$column]);
+            }
+        }
+
+        if (empty($conditions)) {
+            return $where;
+        }
+
+        $table = self::table();
+
+        return $where . " AND {$wpdb->posts}.ID IN (SELECT premises.post_id FROM {$table} AS premises WHERE " . implode(' AND ', $conditions) . ')';
+    }
+
+    /**
+     * The premises filter as a search of the ACF repeater meta
+     *
+     * Starts from the premises_{n}_{column} rows of the first filtered
+     * column and joins the other columns of the same row n.
+     *
+     * @param array $filter
+     * @return string
+     */
+    private function meta_where($filter) {
+        global $wpdb;
+
+        $joins = '';
+        $conditions = array();
+        $anchor = null;
+
+        foreach (array('rooms', 'balcony', 'bathroom') as $column) {
+            if (!isset($filter[$column])) {
+                continue;
+            }
+
+            if ($anchor === null) {
+                $anchor = $column;
+                $conditions[] = $wpdb->prepare("{$column}.meta_key LIKE %s", $wpdb->esc_like('premises_') . '%' . $wpdb->esc_like("_{$column}"));
+            } else {
+                $joins .= " INNER JOIN {$wpdb->postmeta} AS {$column} ON {$column}.post_id = {$anchor}.post_id"
+                    . " AND {$column}.meta_key = CONCAT(SUBSTRING_INDEX({$anchor}.meta_key, '_', 2), '_{$column}')";
+            }
+
+            if ($column === 'rooms') {
+                $conditions[] = $wpdb->prepare('CAST(rooms.meta_value AS UNSIGNED) = %d', $filter['rooms']);
+            } else {
+                $conditions[] = $filter[$column] ? "{$column}.meta_value = 'yes'" : "{$column}.meta_value <> 'yes'";
+            }
+        }
+
+        if ($anchor === null) {
+            return '';
+        }
+
+        return " AND {$wpdb->posts}.ID IN (SELECT {$anchor}.post_id FROM {$wpdb->postmeta} AS {$anchor}{$joins} WHERE " . implode(' AND ', $conditions) . ')';
+    }
+}
+
+// Initialize the class
+$real_estate_premises_index = new Real_Estate_Premises_Index();
+
+if (defined('WP_CLI') && WP_CLI) {
+    // wp real-estate reindex-premises [--batch-size=<number>]
+    Real_Estate_Index::add_rebuild_command('real-estate reindex-premises', $real_estate_premises_index, 'Premises index');
+}
@@ -0,0 +1,588 @@
+<?php
+/**
+ * Response cache for anonymous GET /properties requests
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+class Real_Estate_Response_Cache {
+
+    /**
+     * Route whose responses are cached
+     */
+    const ROUTE = '/real-estate/v1/properties';
+
+    /**
+     * Lifetime of a cached response in seconds
+     */
+    const TTL = HOUR_IN_SECONDS;
+
+    /**
+     * Maximum number of cached responses; the oldest entries are evicted first
+     */
+    const MAX_ENTRIES = 500;
+
+    /**
+     * Transient holding the list of cached keys in insertion order
+     */
+    const INDEX_KEY = 'real_estate_objects_cache_index';
+
+    /**
+     * Option holding the time of the last property change
+     */
+    const MODIFIED_OPTION = 'real_estate_objects_cache_modified';
+
+    /**
+     * Request header that makes the lean fast path fall through to the full bootstrap
+     */
+    const FULL_BOOTSTRAP_HEADER = 'HTTP_X_REAL_ESTATE_FULL_BOOTSTRAP';
+
+    /**
+     * Integer query parameters of GET /properties
+     *
+     * @var array
+     */
+    private static $integer_params = array('min_floors', 'max_floors', 'min_eco_rating', 'rooms', 'page', 'per_page', 'modified_after_id');
+
+    /**
+     * Response headers that are not stored with a cached response, as they are set again when it is served
+     *
+     * @var array
+     */
+    private static $unstored_headers = array('ETag', 'Last-Modified', 'X-Real-Estate-Cache', 'Server-Timing', 'Content-Type', 'Content-Encoding', 'Content-Length', 'Vary');
+
+    /**
+     * Whether a final flush is already scheduled for this request
+     *
+     * @var bool
+     */
+    private $flush_scheduled = false;
+
+    /**
+     * Constructor
+     */
+    public function __construct() {
+        // Serve and store cached responses
+        add_filter('rest_pre_dispatch', array($this, 'serve_cached_response'), 10, 3);
+        // After other plugins add their headers, before Server-Timing at 100
+        add_filter('rest_post_dispatch', array($this, 'store_response'), 99, 3);
+        add_filter('rest_pre_serve_request', array($this, 'serve_not_modified'), 9, 4);
+
+        // Invalidate when a property, its meta or its districts change
+        add_action('save_post_real_estate_object', array($this, 'property_changed'));
+        add_action('delete_post', array($this, 'property_changed'));
+        add_action('added_post_meta', array($this, 'property_meta_changed'), 10, 2);
+        add_action('updated_post_meta', array($this, 'property_meta_changed'), 10, 2);
+        add_action('deleted_post_meta', array($this, 'property_meta_changed'), 10, 2);
+        add_action('set_object_terms', array($this, 'property_changed'));
+        add_action('real_estate_objects_document_invalidated', array($this, 'property_changed'));
+        add_action('edited_district', array($this, 'flush'));
+        add_action('delete_district', array($this, 'flush'));
+    }
+
+    /**
+     * Return a cached response (or 304) for a cacheable request
+     *
+     * @param mixed $result Response to replace the requested version with
+     * @param WP_REST_Server $server Server instance
+     * @param WP_REST_Request $request Request used to generate the response
+     * @return mixed
+     */
+    public function serve_cached_response($result, $server, $request) {
+        global $real_estate_timing;
+
+        if ($result !== null) {
+            return $result;
+        }
+
+        $key = $this->get_cache_key($request);
+
+        if (!$key) {
+            return $result;
+        }
+
+        $validators = self::get_validators($key);
+
+        if (self::is_not_modified($request->get_header('if_none_match'), $request->get_header('if_modified_since'), $validators)) {
+            self::record_stat(true);
+            $response = new WP_REST_Response(null, 304);
+            $this->add_validator_headers($response, $validators, 'HIT');
+            return $response;
+        }
+
+        $real_estate_timing->start('cache');
+        $cached = get_transient($key);
+        $real_estate_timing->stop('cache');
+
+        if ($cached === false) {
+            self::record_stat(false);
+            return $result;
+        }
+
+        self::record_stat(true);
+        $response = new WP_REST_Response($cached['data'], 200);
+        $response->set_headers($cached['headers']);
+        $this->add_validator_headers($response, $validators, 'HIT');
+
+        return $response;
+    }
+
+    /**
+     * Store a successful uncached response
+     *
+     * @param WP_REST_Response $response Result to send to the client
+     * @param WP_REST_Server $server Server instance
+     * @param WP_REST_Request $request Request used to generate the response
+     * @return WP_REST_Response
+     */
+    public function store_response($response, $server, $request) {
+        if (!$response instanceof WP_REST_Response || $response->get_status() !== 200) {
+            return $response;
+        }
+
+        $headers = $response->get_headers();
+
+        if (isset($headers['X-Real-Estate-Cache'])) {
+            return $response;
+        }
+
+        $key = $this->get_cache_key($request);
+
+        if (!$key) {
+            return $response;
+        }
+
+        set_transient($key, array(
+            'data'    => $response->get_data(),
+            'headers' => array_diff_key($headers, array_flip(self::$unstored_headers)),
+            'cors'    => self::get_cors_headers($request),
+        ), self::TTL);
+
+        $this->add_to_index($key);
+        $this->add_validator_headers($response, self::get_validators($key), 'MISS');
+
+        return $response;
+    }
+
+    /**
+     * CORS headers the REST server sends with a response, replayed by the fast path
+     *
+     * The fast path answers before plugins load, so the lists are taken
+     * through the core filters when the response is stored. Null when CORS
+     * headers have been turned off by removing rest_send_cors_headers().
+     *
+     * @param WP_REST_Request $request
+     * @return array|null
+     */
+    private static function get_cors_headers($request) {
+        if (has_filter('rest_pre_serve_request', 'rest_send_cors_headers') === false) {
+            return null;
+        }
+
+        return array(
+            'Access-Control-Expose-Headers' => implode(', ', apply_filters('rest_exposed_cors_headers', array('X-WP-Total', 'X-WP-TotalPages', 'Link'), $request)),
+            'Access-Control-Allow-Headers'  => implode(', ', apply_filters('rest_allowed_cors_headers', array('Authorization', 'X-WP-Nonce', 'Content-Disposition', 'Content-MD5', 'Content-Type'), $request)),
+        );
+    }
+
+    /**
+     * Send 304 responses without a body
+     *
+     * @param bool $served Whether the request has already been served
+     * @param WP_REST_Response $result The response object
+     * @param WP_REST_Request $request The request object
+     * @param WP_REST_Server $server The REST server
+     * @return bool
+     */
+    public function serve_not_modified($served, $result, $request, $server) {
+        if ($result instanceof WP_REST_Response && $result->get_status() === 304) {
+            return true;
+        }
+
+        return $served;
+    }
+
+    /**
+     * Flush the cache when a property changes
+     *
+     * @param int $post_id
+     */
+    public function property_changed($post_id) {
+        if (get_post_type($post_id) === 'real_estate_object') {
+            $this->schedule_flush();
+        }
+    }
+
+    /**
+     * Flush the cache when a property's meta changes
+     *
+     * @param int|array $meta_id
+     * @param int $post_id
+     */
+    public function property_meta_changed($meta_id, $post_id) {
+        $this->property_changed($post_id);
+    }
+
+    /**
+     * Flush now and once more at the end of the request
+     *
+     * The second flush drops anything a concurrent reader cached while the
+     * property's fields were still being written.
+     */
+    private function schedule_flush() {
+        if ($this->flush_scheduled) {
+            return;
+        }
+
+        $this->flush_scheduled = true;
+        $this->flush();
+        add_action('shutdown', array($this, 'flush'));
+    }
+
+    /**
+     * Drop every cached response
+     */
+    public function flush() {
+        $index = get_transient(self::INDEX_KEY);
+
+        if (is_array($index)) {
+            foreach ($index as $key) {
+                delete_transient($key);
+            }
+        }
+
+        delete_transient(self::INDEX_KEY);
+
+        // Cache keys include the modification time, so anything missed above is unreachable
+        update_option(self::MODIFIED_OPTION, microtime(true));
+
+        /**
+         * Fires after cached property responses were dropped
+         */
+        do_action('real_estate_objects_cache_flushed');
+    }
+
+    /**
+     * Serve a cached JSON, MessagePack or CBOR response before plugins and the theme are loaded
+     *
+     * Called by the real-estate-objects-fast-path MU-plugin. Anonymous GET
+     * /properties requests whose response is cached are answered here and the
+     * request ends; everything else returns and continues through the normal
+     * bootstrap. Anonymous reads of the route that miss define
+     * REAL_ESTATE_OBJECTS_LEAN_REST so the plugin skips loading front-end code.
+     *
+     * A hit skips rest_api_init and the REST server, so the headers they would
+     * add are replayed: the stored response headers and the CORS headers of
+     * rest_send_cors_headers(). Headers other plugins send directly with
+     * header() are not; those sites should not install the MU-plugin, or
+     * clients can send X-Real-Estate-Full-Bootstrap to bypass it.
+     */
+    public static function serve_early() {
+        if (!self::is_lean_request()) {
+            return;
+        }
+
+        define('REAL_ESTATE_OBJECTS_LEAN_REST', true);
+
+        $accept = isset($_SERVER['HTTP_ACCEPT']) ? $_SERVER['HTTP_ACCEPT'] : '';
+
+        $format = self::get_format($accept);
+
+        // XML is rendered by the REST API class, which is not loaded yet
+        if ($format === 'xml') {
+            return;
+        }
+
+        $key = self::build_cache_key($_GET, $accept);
+
+        if (!$key) {
+            return;
+        }
+
+        $validators = self::get_validators($key);
+        $if_none_match = isset($_SERVER['HTTP_IF_NONE_MATCH']) ? $_SERVER['HTTP_IF_NONE_MATCH'] : '';
+        $if_modified_since = isset($_SERVER['HTTP_IF_MODIFIED_SINCE']) ? $_SERVER['HTTP_IF_MODIFIED_SINCE'] : '';
+
+        $cached = get_transient($key);
+
+        // Misses are stored and counted by the normal REST dispatch; entries stored before CORS headers were kept are refreshed
+        if ($cached === false || !array_key_exists('cors', $cached)) {
+            return;
+        }
+
+        if (self::is_not_modified($if_none_match, $if_modified_since, $validators)) {
+            self::send_early_headers(304, $format, array(), $cached['cors'], $validators);
+            self::record_early_hit();
+            exit;
+        }
+
+        self::send_early_headers(200, $format, $cached['headers'], $cached['cors'], $validators);
+        self::record_early_hit();
+
+        $accept_encoding = isset($_SERVER['HTTP_ACCEPT_ENCODING']) ? $_SERVER['HTTP_ACCEPT_ENCODING'] : '';
+        list($body, $coding) = Real_Estate_Encoder::compress(Real_Estate_Encoder::encode($cached['data'], $format), Real_Estate_Encoder::negotiate_encoding($accept_encoding));
+        Real_Estate_Encoder::send($body, $coding);
+        exit;
+    }
+
+    /**
+     * Whether the current request is an anonymous GET /properties the fast path may answer
+     *
+     * Runs before pluggable.php, so logged-in visitors are recognised by their
+     * cookie and API clients by their Authorization header.
+     *
+     * @return bool
+     */
+    private static function is_lean_request() {
+        if (!isset($_SERVER['REQUEST_METHOD']) || $_SERVER['REQUEST_METHOD'] !== 'GET' || !empty($_SERVER[self::FULL_BOOTSTRAP_HEADER])) {
+            return false;
+        }
+
+        if (!empty($_SERVER['HTTP_AUTHORIZATION']) || !empty($_SERVER['REDIRECT_HTTP_AUTHORIZATION']) || !empty($_SERVER['PHP_AUTH_USER'])) {
+            return false;
+        }
+
+        foreach (array_keys($_COOKIE) as $name) {
+            if (strpos($name, 'wordpress_logged_in_') === 0) {
+                return false;
+            }
+        }
+
+        // JSONP, envelopes, embedding and field filtering are applied by the REST server
+        foreach (array_keys($_GET) as $name) {
+            if ($name !== '' && $name[0] === '_') {
+                return false;
+            }
+        }
+
+        if (isset($_GET['rest_route'])) {
+            return untrailingslashit($_GET['rest_route']) === self::ROUTE;
+        }
+
+        $path = isset($_SERVER['REQUEST_URI']) ? parse_url($_SERVER['REQUEST_URI'], PHP_URL_PATH) : '';
+        $home_path = untrailingslashit((string) parse_url(home_url(), PHP_URL_PATH));
+
+        return untrailingslashit((string) $path) === $home_path . '/' . rest_get_url_prefix() . self::ROUTE;
+    }
+
+    /**
+     * Send the status and headers of a response served by the fast path
+     *
+     * @param int $status
+     * @param string $format json, msgpack or cbor
+     * @param array $headers Cached response headers
+     * @param array|null $cors Cached CORS headers, null if CORS is turned off
+     * @param array $validators
+     */
+    private static function send_early_headers($status, $format, $headers, $cors, $validators) {
+        status_header($status);
+
+        header('Content-Type: ' . Real_Estate_Encoder::content_type($format));
+        header('Vary: Accept, Accept-Encoding');
+        header('X-Content-Type-Options: nosniff');
+        header('X-Robots-Tag: noindex');
+
+        if ($cors) {
+            foreach ($cors as $name => $value) {
+                header($name . ': ' . $value);
+            }
+
+            // Same as rest_send_cors_headers(); fast path requests are anonymous GETs
+            $origin = isset($_SERVER['HTTP_ORIGIN']) ? $_SERVER['HTTP_ORIGIN'] : '';
+
+            if ($origin) {
+                header('Access-Control-Allow-Origin: ' . ($origin === 'null' ? $origin : esc_url_raw($origin)));
+                header('Access-Control-Allow-Methods: OPTIONS, GET, POST, PUT, PATCH, DELETE');
+                header('Access-Control-Allow-Credentials: true');
+            }
+
+            header('Vary: Origin', false);
+        }
+
+        foreach ($headers as $name => $value) {
+            header($name . ': ' . $value);
+        }
+
+        header('ETag: ' . $validators['etag']);
+        header('Last-Modified: ' . $validators['last_modified']);
+        header('X-Real-Estate-Cache: HIT');
+        header('X-Real-Estate-Path: lean');
+    }
+
+    /**
+     * Count a fast path hit, only where that needs no database write
+     *
+     * With a persistent object cache the counter is incremented in memory on
+     * shutdown; without one, fast path hits are not counted.
+     */
+    private static function record_early_hit() {
+        if (wp_using_ext_object_cache()) {
+            self::record_stat(true);
+        }
+    }
+
+    /**
+     * Count a hit or miss in the shared cache statistics
+     *
+     * @param bool $hit
+     */
+    private static function record_stat($hit) {
+        global $real_estate_fragment_cache;
+
+        if ($real_estate_fragment_cache) {
+            $real_estate_fragment_cache->record('rest_properties', $hit);
+        }
+    }
+
+    /**
+     * Build the cache key for a request, or null if it is not cacheable
+     *
+     * @param WP_REST_Request $request
+     * @return string|null
+     */
+    private function get_cache_key($request) {
+        if ($request->get_method() !== 'GET' || untrailingslashit($request->get_route()) !== self::ROUTE || is_user_logged_in()) {
+            return null;
+        }
+
+        return self::build_cache_key($request->get_query_params(), $request->get_header('accept'));
+    }
+
+    /**
+     * Build the cache key for GET /properties query parameters, or null if they are not cacheable
+     *
+     * @param array $params
+     * @param string|null $accept Accept header
+     * @return string|null
+     */
+    private static function build_cache_key($params, $accept) {
+        // Change feed pages trail the current time, so a stored page would hide later changes
+        if (isset($params['modified_after'])) {
+            return null;
+        }
+
+        foreach (self::$integer_params as $name) {
+            if (!isset($params[$name]) || $params[$name] === '') {
+                continue;
+            }
+
+            // Let invalid values reach validation instead of a cached page
+            if (!is_numeric($params[$name])) {
+                return null;
+            }
+
+            $params[$name] = intval($params[$name]);
+        }
+
+        $params = wp_parse_args($params, array('page' => 1, 'per_page' => 10));
+        ksort($params);
+
+        return 'reo_resp_' . md5(wp_json_encode(array(
+            $params,
+            self::get_format($accept),
+            self::get_modified(),
+        )));
+    }
+
+    /**
+     * Response format negotiated from the Accept header
+     *
+     * @param string|null $accept
+     * @return string
+     */
+    private static function get_format($accept) {
+        return Real_Estate_Encoder::negotiate_format($accept);
+    }
+
+    /**
+     * Time of the last property change
+     *
+     * @return float
+     */
+    private static function get_modified() {
+        $modified = get_option(self::MODIFIED_OPTION);
+
+        if (!$modified) {
+            $modified = microtime(true);
+            update_option(self::MODIFIED_OPTION, $modified);
+        }
+
+        return (float) $modified;
+    }
+
+    /**
+     * ETag and Last-Modified values for a cache key
+     *
+     * @param string $key
+     * @return array
+     */
+    private static function get_validators($key) {
+        return array(
+            'etag'          => '"' . substr($key, strlen('reo_resp_')) . '"',
+            'last_modified' => gmdate('D, d M Y H:i:s', (int) self::get_modified()) . ' GMT',
+        );
+    }
+
+    /**
+     * Check the request's conditional headers against the validators
+     *
+     * @param string|null $if_none_match If-None-Match header
+     * @param string|null $if_modified_since If-Modified-Since header
+     * @param array $validators
+     * @return bool
+     */
+    private static function is_not_modified($if_none_match, $if_modified_since, $validators) {
+        if ($if_none_match) {
+            $etags = array_map('trim', explode(',', $if_none_match));
+            return in_array($validators['etag'], $etags, true) || in_array('*', $etags, true);
+        }
+
+        if ($if_modified_since) {
+            $since = strtotime($if_modified_since);
+            return $since !== false && $since >= (int) self::get_modified();
+        }
+
+        return false;
+    }
+
+    /**
+     * Add ETag, Last-Modified and cache status headers
+     *
+     * @param WP_REST_Response $response
+     * @param array $validators
+     * @param string $status HIT or MISS
+     */
+    private function add_validator_headers($response, $validators, $status) {
+        $response->header('ETag', $validators['etag']);
+        $response->header('Last-Modified', $validators['last_modified']);
+        $response->header('X-Real-Estate-Cache', $status);
+    }
+
+    /**
+     * Remember a cached key and evict the oldest entries over MAX_ENTRIES
+     *
+     * @param string $key
+     */
+    private function add_to_index($key) {
+        $index = get_transient(self::INDEX_KEY);
+
+        if (!is_array($index)) {
+            $index = array();
+        }
+
+        $index[] = $key;
+        $index = array_values(array_unique($index));
+
+        while (count($index) > self::MAX_ENTRIES) {
+            delete_transient(array_shift($index));
+        }
+
+        set_transient(self::INDEX_KEY, $index);
+    }
+}
+
+// Initialize the class
+$real_estate_response_cache = new Real_Estate_Response_Cache();
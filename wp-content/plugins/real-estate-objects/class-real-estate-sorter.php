@@ -30,10 +30,8 @@ class Real_Estate_Sorter {
              is_tax('district') ||
              (isset($query->query['post_type']) && $query->query['post_type'] === 'real_estate_object'))) {
 
-            // Add meta query for eco_rating
-            $query->set('meta_key', 'eco_rating');
-            $query->set('orderby', 'meta_value_num');
-            $query->set('order', 'DESC'); // Higher eco-rating first
+            // Sort on the indexed eco_rating column instead of casting meta values
+            $query->set(Real_Estate_Attribute_Index::ORDERBY_VAR, array('eco_rating' => 'DESC')); // Higher eco-rating first
         }
     }
 }
@@ -0,0 +1,204 @@
+<?php
+/**
+ * Opt-in Server-Timing instrumentation of the property endpoints
+ *
+ * Enable it on a development or staging site with
+ *
+ *   define('REAL_ESTATE_OBJECTS_SERVER_TIMING', true);
+ *
+ * or the real_estate_objects_server_timing filter. GET /properties and the
+ * filter AJAX handler then report the time and database query count of each
+ * phase (query, documents, prepare, serialize, ...) in Server-Timing headers,
+ * and the AJAX response also carries them in a timing field.
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+class Real_Estate_Timing {
+
+    /**
+     * Recorded phases: name => array(seconds, database queries)
+     *
+     * @var array
+     */
+    private $phases = array();
+
+    /**
+     * Running phases: name => array(start time, query count at start)
+     *
+     * @var array
+     */
+    private $running = array();
+
+    /**
+     * Whether timing is enabled, resolved on first use
+     *
+     * @var bool|null
+     */
+    private $enabled = null;
+
+    /**
+     * Constructor
+     */
+    public function __construct() {
+        // Report the dispatch phases with the REST response headers
+        add_filter('rest_post_dispatch', array($this, 'add_rest_header'), 100, 3);
+    }
+
+    /**
+     * Whether phases are recorded for this request
+     *
+     * @return bool
+     */
+    public function enabled() {
+        if ($this->enabled === null) {
+            $enabled = defined('REAL_ESTATE_OBJECTS_SERVER_TIMING') && REAL_ESTATE_OBJECTS_SERVER_TIMING;
+
+            /**
+             * Filter whether Server-Timing instrumentation is enabled
+             *
+             * @param bool $enabled Default from REAL_ESTATE_OBJECTS_SERVER_TIMING
+             */
+            $this->enabled = (bool) apply_filters('real_estate_objects_server_timing', $enabled);
+        }
+
+        return $this->enabled;
+    }
+
+    /**
+     * Start timing a phase; a phase started again adds to its total
+     *
+     * @param string $phase Metric name, [a-z_]
+     */
+    public function start($phase) {
+        global $wpdb;
+
+        if (!$this->enabled()) {
+            return;
+        }
+
+        $this->running[$phase] = array(microtime(true), $wpdb->num_queries);
+    }
+
+    /**
+     * Stop timing a phase
+     *
+     * @param string $phase
+     */
+    public function stop($phase) {
+        global $wpdb;
+
+        if (!isset($this->running[$phase])) {
+            return;
+        }
+
+        list($started, $queries) = $this->running[$phase];
+        unset($this->running[$phase]);
+
+        if (!isset($this->phases[$phase])) {
+            $this->phases[$phase] = array(0.0, 0);
+        }
+
+        $this->phases[$phase][0] += microtime(true) - $started;
+        $this->phases[$phase][1] += $wpdb->num_queries - $queries;
+    }
+
+    /**
+     * Recorded phases in milliseconds, in the order they first started
+     *
+     * Each call also reports the time since the request started as "total".
+     *
+     * @return array name => array('dur' => milliseconds, 'queries' => count)
+     */
+    public function get_metrics() {
+        global $wpdb;
+
+        $metrics = array();
+
+        foreach ($this->phases as $phase => $timing) {
+            $metrics[$phase] = array(
+                'dur'     => round($timing[0] * 1000, 2),
+                'queries' => $timing[1],
+            );
+        }
+
+        $metrics['total'] = array(
+            'dur'     => round((microtime(true) - $_SERVER['REQUEST_TIME_FLOAT']) * 1000, 2),
+            'queries' => $wpdb->num_queries,
+        );
+
+        return $metrics;
+    }
+
+    /**
+     * Format phases as a Server-Timing header value
+     *
+     * The query count goes in desc, e.g. query;dur=4.21;desc="2 queries".
+     *
+     * @param array $metrics From get_metrics()
+     * @return string
+     */
+    public static function format_header($metrics) {
+        $entries = array();
+
+        foreach ($metrics as $phase => $metric) {
+            $entries[] = sprintf('%s;dur=%.2F;desc="%d queries"', $phase, $metric['dur'], $metric['queries']);
+        }
+
+        return implode(', ', $entries);
+    }
+
+    /**
+     * Send the phases recorded so far, plus the total, as a Server-Timing header
+     *
+     * Used where the body is written directly; further headers are appended,
+     * not replaced.
+     *
+     * @param string[] $only Phases to send, or an empty array for all
+     */
+    public function send_header($only = array()) {
+        if (!$this->enabled() || headers_sent()) {
+            return;
+        }
+
+        $metrics = $this->get_metrics();
+
+        if ($only) {
+            $metrics = array_intersect_key($metrics, array_flip($only));
+        }
+
+        header('Server-Timing: ' . self::format_header($metrics), false);
+    }
+
+    /**
+     * Add the dispatch phases of real-estate/v1 requests to the response
+     *
+     * Serialization happens after this filter, so serve_negotiated_request()
+     * sends the serialize phase and the total in a second header.
+     *
+     * @param WP_REST_Response $response Result to send to the client
+     * @param WP_REST_Server $server Server instance
+     * @param WP_REST_Request $request Request used to generate the response
+     * @return WP_REST_Response
+     */
+    public function add_rest_header($response, $server, $request) {
+        if (!$this->enabled() || !$response instanceof WP_REST_Response || strpos($request->get_route(), '/real-estate/v1') !== 0) {
+            return $response;
+        }
+
+        $metrics = $this->get_metrics();
+        unset($metrics['total']);
+
+        if ($metrics) {
+            $response->header('Server-Timing', self::format_header($metrics));
+        }
+
+        return $response;
+    }
+}
+
+// Initialize the class
+$real_estate_timing = new Real_Estate_Timing();
@@ -15,6 +15,15 @@
         var currentSort = 'ecology-high'; // Default sort
         var currentView = 'blocks'; // Default view
 
+        var resultCache = createLruCache(30); // AJAX responses by serialized filter state
+        var inFlight = {}; // Requests by state key, shared by searches and prefetches
+        var activeKey = null; // State key of the search whose results should be shown
+        var searchTimer = null;
+        var renderedItems = {}; // Result nodes by view and property ID
+        var renderedCount = 0;
+        var facetCache = createLruCache(30); // Facet counts by serialized form state
+        var facetRequest = null;
+
         // Set initial active state for view buttons
         setViewButtonState();
 
@@ -30,9 +39,15 @@
             setTimeout(function() {
                 currentPage = 1;
                 performSearch();
+                updateFacetCounts();
             }, 10);
         });
 
+        // Refresh the option counts as soon as a filter changes
+        $form.on('change', 'select', function() {
+            updateFacetCounts();
+        });
+
         // Pagination click handler
         $pagination.on('click', 'a.page-numbers', function(e) {
             e.preventDefault();
@@ -68,7 +83,7 @@
             // Update active state
             setViewButtonState();
 
-            // Re-render results with the new view
+            // Re-render the stored results with the new view, without a request
             if ($container.data('results')) {
                 displayResults($container.data('results'));
             }
@@ -86,203 +101,421 @@
             });
         }
 
-        // Function to perform the search
-        function performSearch() {
-            // Show loading indicator
-            $loading.show();
-            $container.empty();
-            $pagination.empty();
+        // Function to create a small least-recently-used cache
+        function createLruCache(limit) {
+            var keys = [];
+            var values = {};
 
-            // Get form data
-            var formData = $form.serializeArray();
+            function touch(key) {
+                var index = $.inArray(key, keys);
+                if (index !== -1) {
+                    keys.splice(index, 1);
+                }
+                keys.push(key);
+            }
 
-            // Add current page
-            formData.push({
+            return {
+                get: function(key) {
+                    if (!values.hasOwnProperty(key)) {
+                        return undefined;
+                    }
+                    touch(key);
+                    return values[key];
+                },
+                set: function(key, value) {
+                    touch(key);
+                    values[key] = value;
+
+                    while (keys.length > limit) {
+                        delete values[keys.shift()];
+                    }
+                }
+            };
+        }
+
+        // Function to build the filter state of a page
+        function getFilterState(page) {
+            var state = $form.serializeArray();
+
+            // Add page
+            state.push({
                 name: 'page',
-                value: currentPage
+                value: page
             });
 
             // Add sort option
-            formData.push({
+            state.push({
                 name: 'sort',
                 value: currentSort
             });
 
-            // Add action and nonce
-            formData.push({
-                name: 'action',
-                value: 'real_estate_filter'
-            });
+            return state;
+        }
 
-            formData.push({
-                name: 'nonce',
-                value: real_estate_filter.nonce
-            });
+        // Function to send (or reuse) the AJAX request for a filter state
+        function fetchState(state, key) {
+            if (inFlight[key]) {
+                return inFlight[key];
+            }
 
-            // Send AJAX request
-            $.ajax({
+            // Add action and nonce
+            var data = state.concat([
+                {
+                    name: 'action',
+                    value: 'real_estate_filter'
+                },
+                {
+                    name: 'nonce',
+                    value: real_estate_filter.nonce
+                }
+            ]);
+
+            var request = $.ajax({
                 url: real_estate_filter.ajax_url,
                 type: 'POST',
-                data: formData,
-                dataType: 'json',
-                success: function(response) {
-                    if (response.success) {
-                        // Store the results for reuse with view switching
-                        $container.data('results', response.data.results);
-                        displayResults(response.data.results);
-                        displayPagination(response.data.pagination);
-                    } else {
-                        $container.html('<div class="no-results">Помилка: ' + response.data + '</div>');
-                    }
-                },
-                error: function() {
-                    $container.html('<div class="no-results">Помилка: не вдалося завантажити результати.</div>');
-                },
-                complete: function() {
-                    $loading.hide();
+                data: data,
+                dataType: 'json'
+            });
+
+            inFlight[key] = request;
+
+            request.done(function(response) {
+                if (response.success) {
+                    resultCache.set(key, response.data);
                 }
+            }).always(function() {
+                delete inFlight[key];
             });
+
+            return request;
         }
 
-        // Function to display results
-        function displayResults(results) {
-            if (results.length === 0) {
-                $container.html('<div class="no-results">Не знайдено об\'єктів за вашими критеріями.</div>');
+        // Function to perform the search
+        function performSearch() {
+            var state = getFilterState(currentPage);
+            var key = $.param(state);
+            var cached = resultCache.get(key);
+            var previous = inFlight[activeKey];
+
+            // Cancel the search this one supersedes, unless it is a prefetch
+            if (activeKey !== key && previous && !previous.isPrefetch) {
+                previous.abort();
+            }
+
+            activeKey = key;
+            clearTimeout(searchTimer);
+
+            // Cached pages are shown right away
+            if (cached) {
+                $loading.hide();
+                showData(cached);
                 return;
             }
 
-            var html = '';
+            // Show loading indicator
+            $loading.show();
 
-            // Different layouts based on view
-            if (currentView === 'blocks') {
-                html = '<div class="row results-grid">';
-
-                $.each(results, function(index, item) {
-                    var buildingType = '';
-                    switch (item.building_type) {
-                        case 'panel':
-                            buildingType = 'Панель';
-                            break;
-                        case 'brick':
-                            buildingType = 'Цегла';
-                            break;
-                        case 'foam_block':
-                            buildingType = 'Піноблок';
-                            break;
-                    }
+            // Debounce bursts of clicks into a single request
+            searchTimer = setTimeout(function() {
+                var request = fetchState(state, key);
 
-                    html += '<div class="col-md-6 col-lg-4 mb-4">';
-                    html += '<div class="card h-100">';
+                // A search waiting on a prefetch must not be cancelled as a prefetch
+                request.isPrefetch = false;
 
-                    // Card image
-                    if (item.image_url) {
-                        html += '<a href="' + item.link + '">';
-                        html += '<img src="' + item.image_url + '" class="card-img-top" alt="' + item.title + '">';
-                        html += '</a>';
+                request.done(function(response) {
+                    if (activeKey !== key) {
+                        return;
                     }
 
-                    // Card body
-                    html += '<div class="card-body">';
-                    html += '<h5 class="card-title"><a href="' + item.link + '">' + item.title + '</a></h5>';
-
-                    html += '<div class="card-meta">';
-                    if (item.building_name) {
-                        html += '<p><strong>Назва:</strong> ' + item.building_name + '</p>';
+                    if (response.success) {
+                        showData(response.data);
+                    } else {
+                        showError('Помилка: ' + response.data);
                     }
-                    if (item.floors) {
-                        html += '<p><strong>Поверхів:</strong> ' + item.floors + '</p>';
+                }).fail(function(xhr, status) {
+                    if (activeKey === key && status !== 'abort') {
+                        showError('Помилка: не вдалося завантажити результати.');
                     }
-                    if (buildingType) {
-                        html += '<p><strong>Тип:</strong> ' + buildingType + '</p>';
+                }).always(function() {
+                    if (activeKey === key) {
+                        $loading.hide();
                     }
-                    if (item.eco_rating) {
-                        html += '<p><strong>Екологічність:</strong> ' + item.eco_rating + ' / 5</p>';
+                });
+            }, 150);
+        }
+
+        // Function to show a page of results and prefetch the next one
+        function showData(data) {
+            // Store the results for reuse with view switching
+            $container.data('results', data.results);
+            displayResults(data.results);
+            displayPagination(data.pagination);
+            prefetchNextPage(data.pagination);
+        }
+
+        // Function to show an error instead of results
+        function showError(message) {
+            $container.data('results', null);
+            $container.children().detach();
+            $container.append($('<div class="no-results">').text(message));
+            $pagination.empty();
+        }
+
+        // Function to load the next page in the background
+        function prefetchNextPage(pagination) {
+            var nextPage = pagination.current + 1;
+
+            if (nextPage > pagination.total) {
+                return;
+            }
+
+            var state = getFilterState(nextPage);
+            var key = $.param(state);
+
+            if (resultCache.get(key) || inFlight[key]) {
+                return;
+            }
+
+            fetchState(state, key).isPrefetch = true;
+        }
+
+        // Function to fetch the facet counts of the current form state
+        function updateFacetCounts() {
+            if (!real_estate_filter.facets_url) {
+                return;
+            }
+
+            var params = $.grep($form.serializeArray(), function(field) {
+                return field.value !== '';
+            });
+            var key = $.param(params);
+            var cached = facetCache.get(key);
+
+            if (facetRequest) {
+                facetRequest.abort();
+                facetRequest = null;
+            }
+
+            if (cached) {
+                displayFacetCounts(cached);
+                return;
+            }
+
+            // Only successful responses are shown; a 503 while the counts are backfilled leaves the plain labels
+            facetRequest = $.ajax({
+                url: real_estate_filter.facets_url,
+                type: 'GET',
+                data: params,
+                dataType: 'json'
+            }).done(function(facets) {
+                facetCache.set(key, facets);
+                displayFacetCounts(facets);
+            }).always(function() {
+                facetRequest = null;
+            });
+        }
+
+        // Function to append counts to the filter options
+        function displayFacetCounts(facets) {
+            var districts = {};
+            var ecoAtLeast = {};
+            var floorsAtLeast = {};
+            var floorsAtMost = {};
+            var minFloors = parseInt($form.find('select[name="min_floors"]').val(), 10) || 1;
+            var maxFloors = parseInt($form.find('select[name="max_floors"]').val(), 10) || 20;
+            var running = 0;
+
+            $.each(facets.district, function(index, district) {
+                districts[district.slug] = district.count;
+            });
+
+            // The eco-rating filter is a minimum, so each option counts its rating and above
+            for (var rating = 5; rating >= 1; rating--) {
+                running += facets.eco_rating[rating] || 0;
+                ecoAtLeast[rating] = running;
+            }
+
+            // Floor counts are per exact value, so each bound sums its range up to the other bound
+            for (var floors = 1; floors <= 20; floors++) {
+                floorsAtLeast[floors] = 0;
+                floorsAtMost[floors] = 0;
+
+                for (var value = 1; value <= 20; value++) {
+                    var count = (facets.floors && facets.floors[value]) || 0;
+
+                    if (value >= floors && value <= maxFloors) {
+                        floorsAtLeast[floors] += count;
                     }
-                    if (item.price && item.price > 0) {
-                        html += '<p><strong>Ціна:</strong> ' + item.price + ' грн</p>';
+
+                    if (value <= floors && value >= minFloors) {
+                        floorsAtMost[floors] += count;
                     }
-                    html += '</div>';
+                }
+            }
 
-                    html += '<div class="card-text">' + item.excerpt + '</div>';
-                    html += '</div>';
+            setOptionCounts('district', districts);
+            setOptionCounts('building_type', facets.building_type);
+            setOptionCounts('min_floors', floorsAtLeast);
+            setOptionCounts('max_floors', floorsAtMost);
+            setOptionCounts('min_eco_rating', ecoAtLeast);
+            setOptionCounts('rooms', facets.rooms);
+            setOptionCounts('balcony', facets.balcony);
+            setOptionCounts('bathroom', facets.bathroom);
+        }
 
-                    // Card footer
-                    html += '<div class="card-footer">';
-                    html += '<a href="' + item.link + '" class="btn btn-primary">Детальніше</a>';
-                    html += '</div>';
+        // Function to set the count shown next to each option of a select
+        function setOptionCounts(name, counts) {
+            $form.find('select[name="' + name + '"] option').each(function() {
+                var $option = $(this);
+                var value = $option.val();
 
-                    html += '</div>'; // End card
-                    html += '</div>'; // End column
-                });
+                if (value === '') {
+                    return;
+                }
+
+                if (!$option.data('label')) {
+                    $option.data('label', $option.text());
+                }
+
+                var count = counts && counts.hasOwnProperty(value) ? counts[value] : 0;
+                $option.text($option.data('label') + ' (' + count + ')');
+            });
+        }
+
+        // Function to get the label of a building type
+        function getBuildingTypeLabel(type) {
+            switch (type) {
+                case 'panel':
+                    return 'Панель';
+                case 'brick':
+                    return 'Цегла';
+                case 'foam_block':
+                    return 'Піноблок';
+            }
+            return '';
+        }
+
+        // Function to build the meta lines of an item
+        function buildMeta(item, tagName, className) {
+            var buildingType = getBuildingTypeLabel(item.building_type);
+            var lines = [];
+
+            if (item.building_name) {
+                lines.push(['Назва:', item.building_name]);
+            }
+            if (item.floors) {
+                lines.push(['Поверхів:', item.floors]);
+            }
+            if (buildingType) {
+                lines.push(['Тип:', buildingType]);
+            }
+            if (item.eco_rating) {
+                lines.push(['Екологічність:', item.eco_rating + ' / 5']);
+            }
+            if (item.price && item.price > 0) {
+                lines.push(['Ціна:', item.price + ' грн']);
+            }
+
+            return $.map(lines, function(line) {
+                return $('<' + tagName + '>')
+                    .addClass(className)
+                    .append($('<strong>').text(line[0]), document.createTextNode(' ' + line[1]))[0];
+            });
+        }
+
+        // Function to build a card for the blocks view
+        function buildBlockItem(item) {
+            var $card = $('<div class="card h-100">');
+            var alt = $('<div>').html(item.title).text();
+
+            // Card image
+            if (item.image_url) {
+                $('<a>').attr('href', item.link)
+                    .append($('<img class="card-img-top">').attr({ src: item.image_url, alt: alt }))
+                    .appendTo($card);
+            }
+
+            // Card body
+            $('<div class="card-body">').append(
+                $('<h5 class="card-title">').append($('<a>').attr('href', item.link).html(item.title)),
+                $('<div class="card-meta">').append(buildMeta(item, 'p', '')),
+                $('<div class="card-text">').html(item.excerpt)
+            ).appendTo($card);
+
+            // Card footer
+            $('<div class="card-footer">').append(
+                $('<a class="btn btn-primary">').attr('href', item.link).text('Детальніше')
+            ).appendTo($card);
 
-                html += '</div>'; // End row
+            return $('<div class="col-md-6 col-lg-4 mb-4">').append($card)[0];
+        }
+
+        // Function to build a row for the list view
+        function buildListItem(item) {
+            var $image = $('<div class="result-image">');
+            var alt = $('<div>').html(item.title).text();
+
+            // Image
+            if (item.image_url) {
+                $image.append($('<img>').attr({ src: item.image_url, alt: alt }));
             } else {
-                // List view
-                html = '<div class="results-list">';
-
-                $.each(results, function(index, item) {
-                    var buildingType = '';
-                    switch (item.building_type) {
-                        case 'panel':
-                            buildingType = 'Панель';
-                            break;
-                        case 'brick':
-                            buildingType = 'Цегла';
-                            break;
-                        case 'foam_block':
-                            buildingType = 'Піноблок';
-                            break;
-                    }
+                $image.append('<div class="no-image">Зображення відсутнє</div>');
+            }
 
-                    html += '<div class="result-item">';
+            // Content
+            var $content = $('<div class="result-content">').append(
+                $('<h3>').append($('<a>').attr('href', item.link).html(item.title)),
+                $('<div class="result-meta">').append(buildMeta(item, 'span', 'meta-item')),
+                $('<div class="result-excerpt">').html(item.excerpt),
+                $('<a class="view-details">').attr('href', item.link).text('Детальніше')
+            );
 
-                    // Image
-                    html += '<div class="result-image">';
-                    if (item.image_url) {
-                        html += '<img src="' + item.image_url + '" alt="' + item.title + '">';
-                    } else {
-                        html += '<div class="no-image">Зображення відсутнє</div>';
-                    }
-                    html += '</div>';
+            return $('<div class="result-item">').append($image, $content)[0];
+        }
 
-                    // Content
-                    html += '<div class="result-content">';
-                    html += '<h3><a href="' + item.link + '">' + item.title + '</a></h3>';
+        // Function to get the node of an item in the current view, building it only once
+        function getItemNode(item) {
+            var key = currentView + ':' + item.id;
 
-                    html += '<div class="result-meta">';
-                    if (item.building_name) {
-                        html += '<span class="meta-item"><strong>Назва:</strong> ' + item.building_name + '</span>';
-                    }
-                    if (item.floors) {
-                        html += '<span class="meta-item"><strong>Поверхів:</strong> ' + item.floors + '</span>';
-                    }
-                    if (buildingType) {
-                        html += '<span class="meta-item"><strong>Тип:</strong> ' + buildingType + '</span>';
-                    }
-                    if (item.eco_rating) {
-                        html += '<span class="meta-item"><strong>Екологічність:</strong> ' + item.eco_rating + ' / 5</span>';
-                    }
-                    if (item.price && item.price > 0) {
-                        html += '<span class="meta-item"><strong>Ціна:</strong> ' + item.price + ' грн</span>';
-                    }
-                    html += '</div>';
+            if (!renderedItems[key]) {
+                // Keep the node cache bounded on long browsing sessions
+                if (renderedCount >= 300) {
+                    renderedItems = {};
+                    renderedCount = 0;
+                }
 
-                    html += '<div class="result-excerpt">' + item.excerpt + '</div>';
-                    html += '<a href="' + item.link + '" class="view-details">Детальніше</a>';
-                    html += '</div>';
+                renderedItems[key] = currentView === 'blocks' ? buildBlockItem(item) : buildListItem(item);
+                renderedCount++;
+            }
 
-                    html += '</div>';
-                });
+            return renderedItems[key];
+        }
+
+        // Function to display results
+        function displayResults(results) {
+            // Detach the previous nodes instead of destroying them so they can be reused
+            $container.children().detach();
 
-                html += '</div>';
+            if (results.length === 0) {
+                $container.html('<div class="no-results">Не знайдено об\'єктів за вашими критеріями.</div>');
+                return;
             }
 
-            $container.html(html);
+            // Different layouts based on view
+            var wrapper = document.createElement('div');
+            wrapper.className = currentView === 'blocks' ? 'row results-grid' : 'results-list';
+
+            $.each(results, function(index, item) {
+                wrapper.appendChild(getItemNode(item));
+            });
+
+            $container[0].appendChild(wrapper);
         }
 
         // Function to display pagination
         function displayPagination(pagination) {
             if (pagination.total <= 1) {
+                $pagination.empty();
                 return;
             }
 
@@ -314,6 +547,7 @@
 
         // Initial search
         performSearch();
+        updateFacetCounts();
     });
 
 })(jQuery);
@@ -21,14 +21,51 @@ define('REAL_ESTATE_OBJECTS_URL', plugin_dir_url(__FILE__));
 // Include ACF fields registration
 require_once REAL_ESTATE_OBJECTS_PATH . 'acf-fields.php';
 
+// Include shared dirty tracking and batched rebuilds of the property indexes
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-index.php';
+
+// Include floors/eco-rating/building type lookup table
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-attribute-index.php';
+register_activation_hook(__FILE__, array('Real_Estate_Attribute_Index', 'install'));
+
+// Include incrementally maintained facet counts
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-facets.php';
+register_activation_hook(__FILE__, array('Real_Estate_Facets', 'install'));
+
 // Include Real Estate Sorter class
 require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-sorter.php';
 
+// Include premises index table
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-premises-index.php';
+register_activation_hook(__FILE__, array('Real_Estate_Premises_Index', 'install'));
+
+// Include materialized property documents read by the REST API, the AJAX filter and the templates
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-documents.php';
+register_activation_hook(__FILE__, array('Real_Estate_Documents', 'install'));
+
+// Include change feed tombstones and ordering for incremental property sync
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-change-feed.php';
+register_activation_hook(__FILE__, array('Real_Estate_Change_Feed', 'activate'));
+
+// Include opt-in Server-Timing instrumentation of the property endpoints
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-timing.php';
+
+// Include MessagePack/CBOR encoders and response compression
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-encoder.php';
+
 // Include REST API functionality
 require_once REAL_ESTATE_OBJECTS_PATH . 'rest-api.php';
 
-// Include Shortcode and Widget functionality
-require_once REAL_ESTATE_OBJECTS_PATH . 'shortcode-widget.php';
+// Include fragment cache for AJAX results and the filter form
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-fragment-cache.php';
+
+// Include REST API response cache
+require_once REAL_ESTATE_OBJECTS_PATH . 'class-real-estate-response-cache.php';
+
+// Include Shortcode and Widget functionality, except for JSON reads routed through the fast path MU-plugin
+if (!defined('REAL_ESTATE_OBJECTS_LEAN_REST')) {
+    require_once REAL_ESTATE_OBJECTS_PATH . 'shortcode-widget.php';
+}
 
 
 // Register Custom Post Type and Taxonomy on init
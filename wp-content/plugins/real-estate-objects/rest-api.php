@@ -10,6 +10,54 @@ if (!defined('ABSPATH')) {
 
 class Real_Estate_REST_API {
 
+    /**
+     * Maximum number of operations accepted by /properties/batch
+     */
+    const BATCH_MAX_OPERATIONS = 100;
+
+    /**
+     * WP_Query var holding the keyset position of a date-ordered cursor page
+     */
+    const CURSOR_VAR = 'real_estate_cursor';
+
+    /**
+     * Cursor value that starts a cursor walk
+     */
+    const CURSOR_START = '*';
+
+    /**
+     * Field list used by compact=true
+     */
+    const COMPACT_FIELDS = 'id,title,districts.slug,coordinates,floors,building_type,eco_rating';
+
+    /**
+     * Property response fields in output order, with the sub-fields that can be selected
+     *
+     * @var array
+     */
+    private $response_fields = array(
+        'id'            => true,
+        'title'         => true,
+        'content'       => true,
+        'link'          => true,
+        'modified_gmt'  => true,
+        'districts'     => array('id', 'name', 'slug'),
+        'building_name' => true,
+        'coordinates'   => true,
+        'floors'        => true,
+        'building_type' => true,
+        'eco_rating'    => true,
+        'premises'      => array('area', 'rooms', 'balcony', 'bathroom'),
+        'note'          => true,
+    );
+
+    /**
+     * Response fields read from the materialized property document
+     *
+     * @var array
+     */
+    private $document_fields = array('districts', 'building_name', 'coordinates', 'floors', 'building_type', 'eco_rating', 'premises');
+
     /**
      * Constructor
      */
@@ -17,8 +65,11 @@ class Real_Estate_REST_API {
         // Register REST API routes
         add_action('rest_api_init', array($this, 'register_routes'));
 
-        // Add XML support
-        add_filter('rest_pre_serve_request', array($this, 'serve_xml_request'), 10, 4);
+        // Keyset pagination for cursor mode
+        add_filter('posts_where', array($this, 'filter_cursor_where'), 10, 2);
+
+        // Add XML, MessagePack and CBOR support and response compression
+        add_filter('rest_pre_serve_request', array($this, 'serve_negotiated_request'), 10, 4);
     }
 
     /**
@@ -58,6 +109,80 @@ class Real_Estate_REST_API {
                         'minimum'     => 1,
                         'maximum'     => 5,
                     ),
+                    'rooms' => array(
+                        'description' => 'Only properties with a premise with this many rooms; with balcony or bathroom, the same premise must match all of them',
+                        'type'        => 'integer',
+                        'minimum'     => 1,
+                        'maximum'     => 10,
+                    ),
+                    'balcony' => array(
+                        'description' => 'Only properties with a premise with (yes) or without (no) a balcony; with rooms or bathroom, the same premise must match all of them',
+                        'type'        => 'string',
+                        'enum'        => array('yes', 'no'),
+                    ),
+                    'bathroom' => array(
+                        'description' => 'Only properties with a premise with (yes) or without (no) a bathroom; with rooms or balcony, the same premise must match all of them',
+                        'type'        => 'string',
+                        'enum'        => array('yes', 'no'),
+                    ),
+                    'near' => array(
+                        'description' => 'Only properties within radius of this point, as "lat,lon"; sorted nearest first',
+                        'type'        => 'string',
+                        'validate_callback' => function($param) {
+                            return Real_Estate_Attribute_Index::parse_coordinates($param) !== null;
+                        },
+                    ),
+                    'radius' => array(
+                        'description' => 'Search radius around near in kilometres',
+                        'type'        => 'number',
+                        'default'     => 2,
+                        'minimum'     => 0.01,
+                        'maximum'     => 100,
+                    ),
+                    'bbox' => array(
+                        'description' => 'Only properties inside this box, as "min_lat,min_lon,max_lat,max_lon"; min_lon > max_lon crosses the 180th meridian',
+                        'type'        => 'string',
+                        'validate_callback' => function($param) {
+                            return Real_Estate_Attribute_Index::parse_bbox($param) !== null;
+                        },
+                    ),
+                    'fields' => array(
+                        'description' => 'Comma-separated fields to return, e.g. id,coordinates,premises.rooms',
+                        'type'        => 'string',
+                        'validate_callback' => array($this, 'validate_fields'),
+                    ),
+                    'compact' => array(
+                        'description' => 'Return only ' . self::COMPACT_FIELDS,
+                        'type'        => 'boolean',
+                        'default'     => false,
+                    ),
+                    'cursor' => array(
+                        'description' => 'Cursor pagination: "*" for the first page, then the value of X-Real-Estate-Next-Cursor',
+                        'type'        => 'string',
+                    ),
+                    'modified_after' => array(
+                        'description' => 'Change feed: only properties modified after this GMT time, oldest change first',
+                        'type'        => 'string',
+                        'validate_callback' => function($param) {
+                            return Real_Estate_Change_Feed::parse_datetime($param) !== null;
+                        },
+                    ),
+                    'modified_after_id' => array(
+                        'description' => 'Change feed: continue after this property ID among changes at exactly modified_after',
+                        'type'        => 'integer',
+                        'default'     => 0,
+                        'minimum'     => 0,
+                    ),
+                    'include_deleted' => array(
+                        'description' => 'Change feed: also return tombstones of deleted and unpublished properties',
+                        'type'        => 'boolean',
+                        'default'     => false,
+                    ),
+                    'include_totals' => array(
+                        'description' => 'Whether to count matching properties for X-WP-Total and X-WP-TotalPages',
+                        'type'        => 'boolean',
+                        'default'     => true,
+                    ),
                     'page' => array(
                         'description' => 'Page number',
                         'type'        => 'integer',
@@ -80,6 +205,26 @@ class Real_Estate_REST_API {
             ),
         ));
 
+        register_rest_route('real-estate/v1', '/properties/batch', array(
+            array(
+                'methods'  => WP_REST_Server::CREATABLE,
+                'callback' => array($this, 'batch_properties'),
+                'permission_callback' => array($this, 'check_admin_permission'),
+                'args'     => array(
+                    'operations' => array(
+                        'description' => 'List of create/update/delete operations',
+                        'type'        => 'array',
+                        'required'    => true,
+                        'minItems'    => 1,
+                        'maxItems'    => self::BATCH_MAX_OPERATIONS,
+                        'items'       => array(
+                            'type' => 'object',
+                        ),
+                    ),
+                ),
+            ),
+        ));
+
         register_rest_route('real-estate/v1', '/properties/(?P<id>\d+)', array(
             array(
                 'methods'  => WP_REST_Server::READABLE,
@@ -91,6 +236,16 @@ class Real_Estate_REST_API {
                             return is_numeric($param);
                         },
                     ),
+                    'fields' => array(
+                        'description' => 'Comma-separated fields to return, e.g. id,coordinates,premises.rooms',
+                        'type'        => 'string',
+                        'validate_callback' => array($this, 'validate_fields'),
+                    ),
+                    'compact' => array(
+                        'description' => 'Return only ' . self::COMPACT_FIELDS,
+                        'type'        => 'boolean',
+                        'default'     => false,
+                    ),
                 ),
             ),
             array(
@@ -136,12 +291,19 @@ class Real_Estate_REST_API {
      * @return WP_REST_Response
      */
     public function get_properties($request) {
+        global $real_estate_change_feed, $real_estate_timing;
+
+        $per_page = $request['per_page'] ?: 10;
+
+        // Meta and districts come from the documents primed below, and only when a requested field needs them
         $args = array(
-            'post_type'      => 'real_estate_object',
-            'posts_per_page' => $request['per_page'] ?: 10,
-            'paged'          => $request['page'] ?: 1,
-            'meta_query'     => array(),
-            'tax_query'      => array(),
+            'post_type'              => 'real_estate_object',
+            'posts_per_page'         => $per_page,
+            'paged'                  => $request['page'] ?: 1,
+            'no_found_rows'          => !$request['include_totals'],
+            'tax_query'              => array(),
+            'update_post_meta_cache' => false,
+            'update_post_term_cache' => false,
         );
 
         // Filter by district
@@ -153,60 +315,246 @@ class Real_Estate_REST_API {
             );
         }
 
-        // Filter by building type
-        if (!empty($request['building_type'])) {
-            $args['meta_query'][] = array(
-                'key'     => 'building_type',
-                'value'   => $request['building_type'],
-                'compare' => '=',
-            );
+        // Filter by building type, floors and eco-rating through the typed attribute table
+        $attribute_filter = Real_Estate_Attribute_Index::build_filter(
+            $request['building_type'],
+            $request['min_floors'],
+            $request['max_floors'],
+            $request['min_eco_rating']
+        );
+
+        // Filter by location (near/radius, bbox) through the indexed lat/lon columns
+        $attribute_filter += Real_Estate_Attribute_Index::build_location_filter($request['near'], $request['radius'], $request['bbox']);
+
+        if (!empty($attribute_filter)) {
+            $args[Real_Estate_Attribute_Index::QUERY_VAR] = $attribute_filter;
         }
 
-        // Filter by floors
-        if (!empty($request['min_floors'])) {
-            $args['meta_query'][] = array(
-                'key'     => 'floors',
-                'value'   => $request['min_floors'],
-                'compare' => '>=',
-                'type'    => 'NUMERIC',
-            );
+        // Change feed: keyset on post_modified_gmt plus ID, oldest change first
+        $feed_after = null;
+
+        if ($request['modified_after'] !== null) {
+            $feed_after = array(Real_Estate_Change_Feed::parse_datetime($request['modified_after']), intval($request['modified_after_id']));
+
+            if ($request['cursor'] !== null) {
+                return new WP_Error('invalid_parameter_combination', 'cursor cannot be combined with modified_after; continue with modified_after_id', array('status' => 400));
+            }
+
+            if ($request['include_deleted'] && !$real_estate_change_feed->covers($feed_after[0])) {
+                return new WP_Error('sync_expired', 'Tombstones after modified_after have been pruned; run a full sync', array('status' => 410));
+            }
+
+            $args[Real_Estate_Change_Feed::QUERY_VAR] = $feed_after;
+            $args['paged'] = 1;
+            $args['no_found_rows'] = true;
+        } elseif (isset($attribute_filter['near'])) {
+            $args[Real_Estate_Attribute_Index::ORDERBY_VAR] = array('distance' => 'ASC');
         }
 
-        if (!empty($request['max_floors'])) {
-            $args['meta_query'][] = array(
-                'key'     => 'floors',
-                'value'   => $request['max_floors'],
-                'compare' => '<=',
-                'type'    => 'NUMERIC',
-            );
+        // Cursor mode: keyset on the active sort key plus ID instead of an offset
+        $cursor_mode = $request['cursor'] !== null;
+        $sort = isset($attribute_filter['near']) ? 'distance' : 'date';
+
+        if ($cursor_mode) {
+            $after = $this->decode_cursor($request['cursor'], $sort);
+
+            if (is_wp_error($after)) {
+                return $after;
+            }
+
+            // One extra row tells whether another page follows without counting
+            $args['posts_per_page'] = $per_page + 1;
+            $args['paged'] = 1;
+
+            // Totals are only counted for the first page; later pages would count the remainder
+            $args['no_found_rows'] = $args['no_found_rows'] || $after !== null;
+
+            if ($sort === 'date') {
+                $args['orderby'] = array('date' => 'DESC', 'ID' => 'DESC');
+
+                if ($after !== null) {
+                    $args[self::CURSOR_VAR] = $after;
+                }
+            } elseif ($after !== null) {
+                $args[Real_Estate_Attribute_Index::QUERY_VAR]['after_distance'] = $after;
+            }
         }
 
-        // Filter by eco-rating
-        if (!empty($request['min_eco_rating'])) {
-            $args['meta_query'][] = array(
-                'key'     => 'eco_rating',
-                'value'   => $request['min_eco_rating'],
-                'compare' => '>=',
-                'type'    => 'NUMERIC',
-            );
+        // Filter by premises through the indexed premises table
+        $premises_filter = Real_Estate_Premises_Index::build_filter($request['rooms'], $request['balcony'], $request['bathroom']);
+
+        if (!empty($premises_filter)) {
+            $args[Real_Estate_Premises_Index::QUERY_VAR] = $premises_filter;
         }
 
         // Get posts
+        $real_estate_timing->start('query');
         $query = new WP_Query($args);
+        $real_estate_timing->stop('query');
+
+        $posts = $query->posts;
+        $next_cursor = null;
+
+        if ($cursor_mode && count($posts) > $per_page) {
+            $posts = array_slice($posts, 0, $per_page);
+            $next_cursor = $this->encode_cursor(end($posts), $sort, $attribute_filter);
+        }
+
         $properties = array();
+        $fields = $this->get_requested_fields($request);
 
-        foreach ($query->posts as $post) {
-            $properties[] = $this->prepare_property_for_response($post);
+        // Feed clients continue from the last item, so its position is always returned
+        if ($feed_after !== null && $fields !== null) {
+            $fields += array('id' => true, 'modified_gmt' => true);
+        }
+
+        // Load the documents for the whole page in one query
+        $real_estate_timing->start('documents');
+        $this->prime_property_caches($posts, $fields);
+        $real_estate_timing->stop('documents');
+
+        $real_estate_timing->start('prepare');
+
+        foreach ($posts as $post) {
+            $properties[] = $this->prepare_property_for_response($post, $fields);
+        }
+
+        $real_estate_timing->stop('prepare');
+
+        if ($feed_after !== null && $request['include_deleted']) {
+            $real_estate_timing->start('tombstones');
+            $properties = $this->merge_tombstones($properties, $feed_after, $per_page);
+            $real_estate_timing->stop('tombstones');
         }
 
         // Return response with pagination
         $response = new WP_REST_Response($properties);
-        $response->header('X-WP-Total', $query->found_posts);
-        $response->header('X-WP-TotalPages', $query->max_num_pages);
+
+        if (!$args['no_found_rows']) {
+            $response->header('X-WP-Total', $query->found_posts);
+            $response->header('X-WP-TotalPages', (int) ceil($query->found_posts / $per_page));
+        }
+
+        if ($next_cursor !== null) {
+            $response->header('X-Real-Estate-Next-Cursor', $next_cursor);
+            $response->link_header('next', add_query_arg(
+                array_map('rawurlencode', array_merge($request->get_query_params(), array('cursor' => $next_cursor))),
+                rest_url('real-estate/v1/properties')
+            ));
+        }
 
         return $response;
     }
 
+    /**
+     * Merge the tombstones after a feed position into a page of changed properties
+     *
+     * Both lists are in (modified_gmt, id) order; the merged page keeps the
+     * first $per_page changes, and the next request continues after the last.
+     *
+     * @param array $properties Prepared properties
+     * @param array $after Feed position array(GMT datetime, ID)
+     * @param int $per_page
+     * @return array
+     */
+    private function merge_tombstones($properties, $after, $per_page) {
+        global $real_estate_change_feed;
+
+        $changes = $properties;
+
+        foreach ($real_estate_change_feed->get_tombstones($after, $per_page) as $tombstone) {
+            $changes[] = array(
+                'id'           => (int) $tombstone['post_id'],
+                'modified_gmt' => mysql_to_rfc3339($tombstone['deleted_gmt']),
+                'deleted'      => true,
+            );
+        }
+
+        usort($changes, function ($a, $b) {
+            return strcmp($a['modified_gmt'], $b['modified_gmt']) ?: $a['id'] - $b['id'];
+        });
+
+        return array_slice($changes, 0, $per_page);
+    }
+
+    /**
+     * Build the opaque cursor pointing after a property
+     *
+     * @param WP_Post $post Last property of the page
+     * @param string $sort Active sort key, date or distance
+     * @param array $attribute_filter Attribute filter of the query
+     * @return string
+     */
+    private function encode_cursor($post, $sort, $attribute_filter) {
+        global $real_estate_attribute_index;
+
+        if ($sort === 'distance') {
+            list($lat, $lon) = $attribute_filter['near'];
+            $value = $real_estate_attribute_index->get_distance_key($post->ID, $lat, $lon);
+        } else {
+            $value = $post->post_date;
+        }
+
+        $json = wp_json_encode(array('s' => $sort, 'v' => $value, 'id' => $post->ID));
+
+        return rtrim(strtr(base64_encode($json), '+/', '-_'), '=');
+    }
+
+    /**
+     * Decode a cursor into the keyset position array(value, id)
+     *
+     * @param string $cursor
+     * @param string $sort Active sort key the cursor must have been built for
+     * @return array|null|WP_Error Null for the first page
+     */
+    private function decode_cursor($cursor, $sort) {
+        if ($cursor === self::CURSOR_START || $cursor === '') {
+            return null;
+        }
+
+        $data = json_decode(base64_decode(strtr($cursor, '-_', '+/')), true);
+
+        if (!is_array($data) || !isset($data['s'], $data['v'], $data['id']) || $data['s'] !== $sort || !is_numeric($data['id'])) {
+            return new WP_Error('invalid_cursor', 'Invalid cursor for this query', array('status' => 400));
+        }
+
+        if ($sort === 'date' && !preg_match('/^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$/', $data['v'])) {
+            return new WP_Error('invalid_cursor', 'Invalid cursor for this query', array('status' => 400));
+        }
+
+        if ($sort === 'distance' && !is_int($data['v'])) {
+            return new WP_Error('invalid_cursor', 'Invalid cursor for this query', array('status' => 400));
+        }
+
+        return array($data['v'], intval($data['id']));
+    }
+
+    /**
+     * Continue a date-ordered cursor walk after the previous page's last property
+     *
+     * @param string $where
+     * @param WP_Query $query
+     * @return string
+     */
+    public function filter_cursor_where($where, $query) {
+        global $wpdb;
+
+        $after = $query->get(self::CURSOR_VAR);
+
+        if (empty($after) || !is_array($after)) {
+            return $where;
+        }
+
+        list($date, $id) = $after;
+
+        return $where . $wpdb->prepare(
+            " AND ({$wpdb->posts}.post_date < %s OR ({$wpdb->posts}.post_date = %s AND {$wpdb->posts}.ID < %d))",
+            $date,
+            $date,
+            $id
+        );
+    }
+
     /**
      * Get single property
      *
@@ -220,7 +568,7 @@ class Real_Estate_REST_API {
             return new WP_Error('not_found', 'Property not found', array('status' => 404));
         }
 
-        return $this->prepare_property_for_response($post);
+        return $this->prepare_property_for_response($post, $this->get_requested_fields($request));
     }
 
     /**
@@ -235,87 +583,229 @@ class Real_Estate_REST_API {
         // Log the incoming parameters for debugging
         error_log("Creating property with parameters: " . print_r($params, true));
 
-        // Create post
-        $post_data = array(
-            'post_type'    => 'real_estate_object',
-            'post_title'   => sanitize_text_field($params['title']),
-            'post_content' => wp_kses_post($params['content'] ?? ''),
-            'post_status'  => 'publish',
-        );
-
-        $post_id = wp_insert_post($post_data, true);
+        $post_id = $this->insert_property($params);
 
         if (is_wp_error($post_id)) {
             error_log("Error creating property: " . $post_id->get_error_message());
             return $post_id;
         }
 
-        // Set district taxonomy
-        if (!empty($params['district'])) {
-            wp_set_object_terms($post_id, $params['district'], 'district');
+        // Return the newly created property
+        return $this->prepare_property_for_response(get_post($post_id));
+    }
+
+    /**
+     * Update property
+     *
+     * @param WP_REST_Request $request
+     * @return WP_REST_Response|WP_Error
+     */
+    public function update_property($request) {
+        $post = get_post($request['id']);
+
+        if (!$post || $post->post_type !== 'real_estate_object') {
+            return new WP_Error('not_found', 'Property not found', array('status' => 404));
         }
 
-        // Set ACF fields
-        if (!empty($params['building_name'])) {
-            update_field('building_name', sanitize_text_field($params['building_name']), $post_id);
+        $this->apply_property_update($post, $request->get_params());
+
+        return $this->get_property($request);
+    }
+
+    /**
+     * Delete property
+     *
+     * @param WP_REST_Request $request
+     * @return WP_REST_Response|WP_Error
+     */
+    public function delete_property($request) {
+        $post = get_post($request['id']);
+
+        if (!$post || $post->post_type !== 'real_estate_object') {
+            return new WP_Error('not_found', 'Property not found', array('status' => 404));
         }
 
-        if (!empty($params['coordinates'])) {
-            update_field('coordinates', sanitize_text_field($params['coordinates']), $post_id);
+        // Deleting the post also deletes its document
+        $previous = $this->prepare_property_for_response($post);
+
+        $result = wp_delete_post($post->ID, true);
+
+        if (!$result) {
+            return new WP_Error('delete_failed', 'Failed to delete property', array('status' => 500));
         }
 
-        if (!empty($params['floors'])) {
-            update_field('floors', intval($params['floors']), $post_id);
+        return new WP_REST_Response(array(
+            'deleted'  => true,
+            'previous' => $previous,
+        ));
+    }
+
+    /**
+     * Run a batch of create/update/delete operations in one request
+     *
+     * Each operation is an object with a `method` (create, update or delete),
+     * an `id` for update/delete and a `data` object with the same fields as the
+     * single-item endpoints. Term counting and post cache invalidation are
+     * deferred while the batch runs and flushed once for every touched property.
+     *
+     * @param WP_REST_Request $request
+     * @return WP_REST_Response
+     */
+    public function batch_properties($request) {
+        $operations = $request['operations'];
+        $results = array();
+        $touched_ids = array();
+
+        wp_defer_term_counting(true);
+        wp_suspend_cache_invalidation(true);
+
+        foreach (array_values($operations) as $index => $operation) {
+            $result = $this->run_batch_operation($operation);
+            $result = array('index' => $index) + $result;
+
+            if (!empty($result['id'])) {
+                $touched_ids[] = $result['id'];
+            }
+
+            $results[] = $result;
         }
 
-        if (!empty($params['building_type'])) {
-            update_field('building_type', sanitize_text_field($params['building_type']), $post_id);
+        wp_suspend_cache_invalidation(false);
+
+        foreach (array_unique($touched_ids) as $post_id) {
+            clean_post_cache($post_id);
         }
 
-        if (!empty($params['eco_rating'])) {
-            update_field('eco_rating', intval($params['eco_rating']), $post_id);
+        wp_defer_term_counting(false);
+
+        // Build the item bodies only now, from fresh caches
+        foreach ($results as $key => $result) {
+            if ($result['status'] < 300 && $result['method'] !== 'delete') {
+                $results[$key]['body'] = $this->prepare_property_for_response(get_post($result['id']));
+            }
         }
 
-        // Handle premises if provided
-        if (!empty($params['premises']) && is_array($params['premises'])) {
-            $premises_data = array();
+        return new WP_REST_Response(array('results' => $results));
+    }
 
-            foreach ($params['premises'] as $premise) {
-                $premises_data[] = array(
-                    'area'     => sanitize_text_field($premise['area'] ?? ''),
-                    'rooms'    => intval($premise['rooms'] ?? 1),
-                    'balcony'  => sanitize_text_field($premise['balcony'] ?? 'no'),
-                    'bathroom' => sanitize_text_field($premise['bathroom'] ?? 'yes'),
-                );
+    /**
+     * Run a single batch operation
+     *
+     * @param mixed $operation The operation object from the batch request
+     * @return array Result with method, status, id and either body or error
+     */
+    private function run_batch_operation($operation) {
+        $method = is_array($operation) && isset($operation['method']) ? $operation['method'] : '';
+        $params = is_array($operation) && isset($operation['data']) && is_array($operation['data']) ? $operation['data'] : array();
+
+        if (!in_array($method, array('create', 'update', 'delete'), true)) {
+            return $this->batch_error($method, new WP_Error('invalid_method', 'Operation method must be create, update or delete', array('status' => 400)));
+        }
+
+        if ($method === 'create') {
+            if (empty($params['title'])) {
+                return $this->batch_error($method, new WP_Error('missing_title', 'Property title is required', array('status' => 400)));
             }
 
-            update_field('premises', $premises_data, $post_id);
+            $post_id = $this->insert_property($params);
+
+            if (is_wp_error($post_id)) {
+                return $this->batch_error($method, $post_id);
+            }
+
+            return array('method' => $method, 'status' => 201, 'id' => $post_id);
         }
 
-        // Create a proper WP_REST_Request object with the correct ID parameter
-        $request_get = new WP_REST_Request('GET', '/real-estate/v1/properties/' . $post_id);
-        $request_get->set_param('id', $post_id);
+        $post = get_post(isset($operation['id']) ? intval($operation['id']) : 0);
 
-        // Return the newly created property
-        return $this->prepare_property_for_response(get_post($post_id));
+        if (!$post || $post->post_type !== 'real_estate_object') {
+            return $this->batch_error($method, new WP_Error('not_found', 'Property not found', array('status' => 404)));
+        }
+
+        if ($method === 'update') {
+            $this->apply_property_update($post, $params);
+
+            // Drop only this post from the cache so later operations see the update
+            wp_cache_delete($post->ID, 'posts');
+
+            return array('method' => $method, 'status' => 200, 'id' => $post->ID);
+        }
+
+        $previous = $this->prepare_property_for_response($post);
+
+        if (!wp_delete_post($post->ID, true)) {
+            return $this->batch_error($method, new WP_Error('delete_failed', 'Failed to delete property', array('status' => 500)));
+        }
+
+        return array(
+            'method' => $method,
+            'status' => 200,
+            'id'     => $post->ID,
+            'body'   => array(
+                'deleted'  => true,
+                'previous' => $previous,
+            ),
+        );
     }
 
     /**
-     * Update property
+     * Format a failed batch operation
      *
-     * @param WP_REST_Request $request
-     * @return WP_REST_Response|WP_Error
+     * @param string $method The operation method
+     * @param WP_Error $error The error
+     * @return array
      */
-    public function update_property($request) {
-        $post = get_post($request['id']);
+    private function batch_error($method, $error) {
+        $data = $error->get_error_data();
+
+        return array(
+            'method' => $method,
+            'status' => isset($data['status']) ? $data['status'] : 500,
+            'error'  => array(
+                'code'    => $error->get_error_code(),
+                'message' => $error->get_error_message(),
+            ),
+        );
+    }
 
-        if (!$post || $post->post_type !== 'real_estate_object') {
-            return new WP_Error('not_found', 'Property not found', array('status' => 404));
+    /**
+     * Insert a new property post with its district and ACF fields
+     *
+     * @param array $params Property fields
+     * @return int|WP_Error The new post ID
+     */
+    private function insert_property($params) {
+        $post_data = array(
+            'post_type'    => 'real_estate_object',
+            'post_title'   => sanitize_text_field($params['title'] ?? ''),
+            'post_content' => wp_kses_post($params['content'] ?? ''),
+            'post_status'  => 'publish',
+        );
+
+        $post_id = wp_insert_post($post_data, true);
+
+        if (is_wp_error($post_id)) {
+            return $post_id;
         }
 
-        $params = $request->get_params();
+        // Set district taxonomy
+        if (!empty($params['district'])) {
+            wp_set_object_terms($post_id, $params['district'], 'district');
+        }
+
+        // Set ACF fields
+        $this->save_property_fields($post_id, $params);
+
+        return $post_id;
+    }
 
-        // Update post
+    /**
+     * Apply an update to an existing property post
+     *
+     * @param WP_Post $post The property
+     * @param array $params Property fields to change
+     */
+    private function apply_property_update($post, $params) {
         $post_data = array(
             'ID' => $post->ID,
         );
@@ -336,24 +826,34 @@ class Real_Estate_REST_API {
         }
 
         // Update ACF fields
+        $this->save_property_fields($post->ID, $params);
+    }
+
+    /**
+     * Save the ACF fields present in $params
+     *
+     * @param int $post_id
+     * @param array $params
+     */
+    private function save_property_fields($post_id, $params) {
         if (!empty($params['building_name'])) {
-            update_field('building_name', sanitize_text_field($params['building_name']), $post->ID);
+            update_field('building_name', sanitize_text_field($params['building_name']), $post_id);
         }
 
         if (!empty($params['coordinates'])) {
-            update_field('coordinates', sanitize_text_field($params['coordinates']), $post->ID);
+            update_field('coordinates', sanitize_text_field($params['coordinates']), $post_id);
         }
 
         if (!empty($params['floors'])) {
-            update_field('floors', intval($params['floors']), $post->ID);
+            update_field('floors', intval($params['floors']), $post_id);
         }
 
         if (!empty($params['building_type'])) {
-            update_field('building_type', sanitize_text_field($params['building_type']), $post->ID);
+            update_field('building_type', sanitize_text_field($params['building_type']), $post_id);
         }
 
         if (!empty($params['eco_rating'])) {
-            update_field('eco_rating', intval($params['eco_rating']), $post->ID);
+            update_field('eco_rating', intval($params['eco_rating']), $post_id);
         }
 
         // Handle premises if provided
@@ -369,99 +869,195 @@ class Real_Estate_REST_API {
                 );
             }
 
-            update_field('premises', $premises_data, $post->ID);
+            update_field('premises', $premises_data, $post_id);
         }
+    }
 
-        return $this->get_property($request);
+    /**
+     * Check a fields parameter
+     *
+     * @param string $value
+     * @return true|WP_Error
+     */
+    public function validate_fields($value) {
+        $fields = $this->parse_fields($value);
+
+        return is_wp_error($fields) ? $fields : true;
     }
 
     /**
-     * Delete property
+     * Parse a comma-separated field list into array(field => true|array(sub_field => true))
+     *
+     * @param string $value
+     * @return array|WP_Error
+     */
+    private function parse_fields($value) {
+        $fields = array();
+
+        foreach (explode(',', (string) $value) as $path) {
+            $path = trim($path);
+
+            if ($path === '') {
+                continue;
+            }
+
+            $parts = explode('.', $path, 2);
+            $name = $parts[0];
+
+            if (!isset($this->response_fields[$name])) {
+                return new WP_Error('invalid_field', sprintf('Unknown field: %s', $path), array('status' => 400));
+            }
+
+            if (count($parts) === 1) {
+                $fields[$name] = true;
+                continue;
+            }
+
+            if (!is_array($this->response_fields[$name]) || !in_array($parts[1], $this->response_fields[$name], true)) {
+                return new WP_Error('invalid_field', sprintf('Unknown field: %s', $path), array('status' => 400));
+            }
+
+            // A whole field wins over some of its sub-fields
+            if (!isset($fields[$name])) {
+                $fields[$name] = array();
+            }
+
+            if (is_array($fields[$name])) {
+                $fields[$name][$parts[1]] = true;
+            }
+        }
+
+        if (empty($fields)) {
+            return new WP_Error('invalid_field', 'No fields requested', array('status' => 400));
+        }
+
+        return $fields;
+    }
+
+    /**
+     * Fields requested through fields= or compact=true, or null for all fields
      *
      * @param WP_REST_Request $request
-     * @return WP_REST_Response|WP_Error
+     * @return array|null
      */
-    public function delete_property($request) {
-        $post = get_post($request['id']);
+    private function get_requested_fields($request) {
+        if (!empty($request['fields'])) {
+            return $this->parse_fields($request['fields']);
+        }
 
-        if (!$post || $post->post_type !== 'real_estate_object') {
-            return new WP_Error('not_found', 'Property not found', array('status' => 404));
+        if ($request['compact']) {
+            return $this->parse_fields(self::COMPACT_FIELDS);
         }
 
-        $result = wp_delete_post($post->ID, true);
+        return null;
+    }
 
-        if (!$result) {
-            return new WP_Error('delete_failed', 'Failed to delete property', array('status' => 500));
+    /**
+     * Load the materialized documents of a list of properties
+     *
+     * Nothing is loaded when only post columns and links are requested.
+     *
+     * @param WP_Post[] $posts
+     * @param array|null $fields Requested fields, or null for all fields
+     */
+    private function prime_property_caches($posts, $fields = null) {
+        global $real_estate_documents;
+
+        $post_ids = wp_list_pluck($posts, 'ID');
+
+        if (empty($post_ids)) {
+            return;
         }
 
-        return new WP_REST_Response(array(
-            'deleted'  => true,
-            'previous' => $this->prepare_property_for_response($post),
-        ));
+        if ($fields === null || array_intersect_key($fields, array_flip($this->document_fields))) {
+            $real_estate_documents->prime($post_ids);
+        }
     }
 
     /**
      * Prepare property for response
      *
+     * Districts and ACF fields come from the property's materialized
+     * document; only the requested fields are looked up, so unrequested
+     * documents and permalinks cost nothing.
+     *
      * @param WP_Post $post
+     * @param array|null $fields Requested fields, or null for all fields
      * @return array
      */
-    private function prepare_property_for_response($post) {
-        $districts = wp_get_object_terms($post->ID, 'district');
-        $district_data = array();
+    private function prepare_property_for_response($post, $fields = null) {
+        global $real_estate_documents;
 
-        foreach ($districts as $district) {
-            $district_data[] = array(
-                'id'   => $district->term_id,
-                'name' => $district->name,
-                'slug' => $district->slug,
-            );
-        }
+        $response = array();
+        $document = false;
 
-        // Get ACF fields
-        $building_name = get_field('building_name', $post->ID);
-        $coordinates = get_field('coordinates', $post->ID);
-        $floors = get_field('floors', $post->ID);
-        $building_type = get_field('building_type', $post->ID);
-        $eco_rating = get_field('eco_rating', $post->ID);
-        $premises = get_field('premises', $post->ID);
-
-        // Format premises data
-        $premises_data = array();
-        if ($premises) {
-            foreach ($premises as $premise) {
-                $premise_data = array(
-                    'area'     => $premise['area'],
-                    'rooms'    => $premise['rooms'],
-                    'balcony'  => $premise['balcony'],
-                    'bathroom' => $premise['bathroom'],
-                );
+        foreach (array_keys($this->response_fields) as $name) {
+            if ($fields !== null && !isset($fields[$name])) {
+                continue;
+            }
+
+            switch ($name) {
+                case 'id':
+                    $value = $post->ID;
+                    break;
+
+                case 'title':
+                    $value = $post->post_title;
+                    break;
 
-                $premises_data[] = $premise_data;
+                case 'content':
+                    $value = $post->post_content;
+                    break;
+
+                case 'link':
+                    $value = get_permalink($post->ID);
+                    break;
+
+                case 'modified_gmt':
+                    $value = mysql_to_rfc3339($post->post_modified_gmt);
+                    break;
+
+                case 'note':
+                    $value = 'Images should be added manually through WordPress admin';
+                    break;
+
+                default:
+                    // Districts and ACF fields from the (primed) document
+                    if ($document === false) {
+                        $document = $real_estate_documents->get($post->ID);
+                    }
+
+                    // No document when the post is no longer a property
+                    $value = isset($document[$name]) ? $document[$name] : null;
             }
-        }
 
-        // Prepare response
-        $response = array(
-            'id'            => $post->ID,
-            'title'         => $post->post_title,
-            'content'       => $post->post_content,
-            'link'          => get_permalink($post->ID),
-            'districts'     => $district_data,
-            'building_name' => $building_name,
-            'coordinates'   => $coordinates,
-            'floors'        => $floors,
-            'building_type' => $building_type,
-            'eco_rating'    => $eco_rating,
-            'premises'      => $premises_data,
-            'note'          => 'Images should be added manually through WordPress admin'
-        );
+            // Keep only the response's sub-fields of each row, or the requested ones
+            if (is_array($this->response_fields[$name])) {
+                if (!is_array($value)) {
+                    $value = array();
+                }
+
+
+                $selected = ($fields !== null && is_array($fields[$name])) ? $fields[$name] : array_flip($this->response_fields[$name]);
+                $value = array_map(function ($row) use ($selected) {
+                    return array_intersect_key($row, $selected);
+                }, $value);
+            }
+
+            $response[$name] = $value;
+        }
 
         return $response;
     }
 
     /**
-     * Serve XML response if requested
+     * Serve the response in the negotiated format and content coding
+     *
+     * XML is served for every REST route whose client accepts it. On the
+     * real-estate/v1 routes MessagePack and CBOR can be negotiated as well,
+     * and JSON, MessagePack and CBOR bodies are compressed with gzip or
+     * Brotli per Accept-Encoding. Uncompressed JSON, JSONP and _pretty
+     * output are left to WordPress.
      *
      * @param bool $served Whether the request has already been served
      * @param WP_REST_Response $result The response object
@@ -469,68 +1065,143 @@ class Real_Estate_REST_API {
      * @param WP_REST_Server $server The REST server
      * @return bool Whether the request has been served
      */
-    public function serve_xml_request($served, $result, $request, $server) {
-        $headers = $request->get_headers();
+    public function serve_negotiated_request($served, $result, $request, $server) {
+        global $real_estate_timing;
+
+        // Already served, e.g. as a 304 by the response cache
+        if ($served) {
+            return $served;
+        }
+
+        $own_route = strpos($request->get_route(), '/real-estate/v1') === 0;
+        $format = Real_Estate_Encoder::negotiate_format($request->get_header('accept'), $own_route);
+
+        if ($own_route) {
+            header('Vary: Accept, Accept-Encoding', false);
+        }
+
+        if ($format === 'xml') {
+            // Set headers and stream the response data as XML
+            $server->send_header('Content-Type', Real_Estate_Encoder::content_type('xml'));
 
-        // Check if client accepts XML
-        if (isset($headers['accept']) && strpos($headers['accept'][0], 'application/xml') !== false) {
-            // Convert response data to XML
-            $xml = $this->convert_to_xml($result->get_data());
+            // Timed documents are buffered, so the serialize phase can go in a header
+            if ($own_route && $real_estate_timing->enabled()) {
+                ob_start();
+                $real_estate_timing->start('serialize');
+                $this->write_xml($result->get_data());
+                $real_estate_timing->stop('serialize');
+                $xml = ob_get_clean();
 
-            // Set headers and output XML
-            $server->send_header('Content-Type', 'application/xml; charset=' . get_option('blog_charset'));
-            echo $xml;
+                $real_estate_timing->send_header(array('serialize', 'total'));
+                echo $xml;
+
+                return true;
+            }
+
+            $this->write_xml($result->get_data());
 
             return true; // Request has been served
         }
 
-        return $served; // Let WordPress handle the request
+        if (!$own_route) {
+            return $served; // Let WordPress handle the request
+        }
+
+        $encoding = Real_Estate_Encoder::negotiate_encoding($request->get_header('accept_encoding'));
+
+        // Timed JSON is encoded here too, so the serialize phase can be measured
+        if ($format === 'json' && ((!$encoding && !$real_estate_timing->enabled()) || isset($_GET['_jsonp']) || isset($_GET['_pretty']))) {
+            return $served;
+        }
+
+        $server->send_header('Content-Type', Real_Estate_Encoder::content_type($format));
+
+        if ($request->get_method() === 'HEAD') {
+            return true;
+        }
+
+        // As WP_REST_Server::serve_request() prepares the data for wp_json_encode()
+        $embed = isset($_GET['_embed']) ? rest_parse_embed_param($_GET['_embed']) : false;
+        $data = $server->response_to_data($result, $embed);
+        $data = apply_filters('rest_pre_echo_response', $data, $server, $request);
+
+        if ($result->get_status() === 204 || $data === null) {
+            return true;
+        }
+
+        $real_estate_timing->start('serialize');
+        $body = Real_Estate_Encoder::encode($data, $format);
+        $real_estate_timing->stop('serialize');
+
+        $real_estate_timing->start('compress');
+        list($body, $coding) = Real_Estate_Encoder::compress($body, $encoding);
+        $real_estate_timing->stop('compress');
+
+        $real_estate_timing->send_header(array('serialize', 'compress', 'total'));
+        Real_Estate_Encoder::send($body, $coding);
+
+        return true;
     }
 
     /**
-     * Convert data to XML
+     * Stream data as XML
+     *
+     * Elements are written with XMLWriter straight to $uri and flushed after
+     * every top-level item, so no document tree is built in memory. The element
+     * structure matches the former SimpleXMLElement conversion: numeric keys
+     * become <item>, keys are stripped to [a-z0-9_] and strings containing
+     * angle brackets are wrapped in CDATA.
      *
      * @param mixed $data The data to convert
-     * @param SimpleXMLElement $xml The XML element to add to
-     * @param string $root_tag The root tag name
-     * @return string XML string
+     * @param string $uri Where to write the document
      */
-    private function convert_to_xml($data, $xml = null, $root_tag = 'response') {
-        if ($xml === null) {
-            $xml = new SimpleXMLElement("<?xml version=\"1.0\"?><{$root_tag}></{$root_tag}>");
-        }
+    public function write_xml($data, $uri = 'php://output') {
+        $writer = new XMLWriter();
+        $writer->openUri($uri);
+        $writer->startDocument('1.0');
+        $writer->startElement('response');
 
         foreach ($data as $key => $value) {
-            // Handle numeric array keys
-            if (is_numeric($key)) {
-                $key = 'item';
-            }
+            $this->write_xml_element($writer, $key, $value);
+            $writer->flush();
+        }
 
-            // Clean up key name
-            $key = preg_replace('/[^a-z0-9_]/i', '', $key);
-
-            // Handle different value types
-            if (is_array($value) || is_object($value)) {
-                $child = $xml->addChild($key);
-                $this->convert_to_xml($value, $child, $key);
-            } else {
-                // Handle CDATA for text content
-                if (is_string($value) && (strpos($value, '<') !== false || strpos($value, '>') !== false)) {
-                    $child = $xml->addChild($key);
-                    $child_node = dom_import_simplexml($child);
-                    $cdata = $child_node->ownerDocument->createCDATASection($value);
-                    $child_node->appendChild($cdata);
-                } else {
-                    $xml->addChild($key, htmlspecialchars((string)$value));
-                }
-            }
+        $writer->endElement();
+        $writer->endDocument();
+        $writer->flush();
+    }
+
+    /**
+     * Write a single key/value pair as an XML element
+     *
+     * @param XMLWriter $writer
+     * @param int|string $key
+     * @param mixed $value
+     */
+    private function write_xml_element($writer, $key, $value) {
+        // Handle numeric array keys
+        if (is_numeric($key)) {
+            $key = 'item';
         }
 
-        if ($root_tag === 'response') {
-            return $xml->asXML();
+        // Clean up key name
+        $key = preg_replace('/[^a-z0-9_]/i', '', $key);
+
+        $writer->startElement($key);
+
+        // Handle different value types
+        if (is_array($value) || is_object($value)) {
+            foreach ($value as $child_key => $child_value) {
+                $this->write_xml_element($writer, $child_key, $child_value);
+            }
+        } elseif (is_string($value) && (strpos($value, '<') !== false || strpos($value, '>') !== false)) {
+            // Handle CDATA for text content; "]]>" has to be split across sections
+            $writer->writeCdata(str_replace(']]>', ']]]]><![CDATA[>', $value));
+        } elseif ((string) $value !== '') {
+            $writer->text((string) $value);
         }
 
-        return $xml;
+        $writer->endElement();
     }
 }
 
@@ -117,17 +117,30 @@ function real_estate_objects_shortcode_callback($atts) {
  * @return string Filter form HTML
  */
 function real_estate_objects_filter_form() {
+    global $real_estate_fragment_cache;
+
     // Enqueue scripts and styles
     wp_enqueue_script('jquery');
-    wp_enqueue_script('real-estate-filter', REAL_ESTATE_OBJECTS_URL . 'js/real-estate-filter.js', array('jquery'), '1.0', true);
+    wp_enqueue_script('real-estate-filter', REAL_ESTATE_OBJECTS_URL . 'js/real-estate-filter.js', array('jquery'), '1.2', true);
     wp_enqueue_style('real-estate-filter', REAL_ESTATE_OBJECTS_URL . 'css/real-estate-filter.css');
 
     // Localize script with ajax url
     wp_localize_script('real-estate-filter', 'real_estate_filter', array(
         'ajax_url' => admin_url('admin-ajax.php'),
         'nonce'    => wp_create_nonce('real_estate_filter_nonce'),
+        'facets_url' => rest_url('real-estate/v1/facets'),
     ));
 
+    // The markup only changes with the districts and the language
+    return $real_estate_fragment_cache->remember('filter_form', get_locale(), 'real_estate_objects_render_filter_form');
+}
+
+/**
+ * Render the filter form markup
+ *
+ * @return string Filter form HTML
+ */
+function real_estate_objects_render_filter_form() {
     // Get all districts
     $districts = get_terms(array(
         'taxonomy'   => 'district',
@@ -296,123 +309,137 @@ function real_estate_objects_filter_ajax() {
         wp_send_json_error('Invalid nonce');
     }
 
-    $args = array(
-        'post_type'      => 'real_estate_object',
-        'posts_per_page' => 5,
-        'paged'          => isset($_POST['page']) ? intval($_POST['page']) : 1,
-        'meta_query'     => array('relation' => 'AND'),
-        'tax_query'      => array(),
-        'orderby'        => array(
-            'ID' => 'ASC' // Add a secondary, consistent ordering by ID to prevent duplicates
-        ),
-    );
+    global $real_estate_fragment_cache;
 
-    // Filter by district
-    if (!empty($_POST['district'])) {
-        $args['tax_query'][] = array(
-            'taxonomy' => 'district',
-            'field'    => 'slug',
-            'terms'    => sanitize_text_field($_POST['district']),
-        );
-    }
+    $filters = real_estate_objects_normalize_filter_request();
 
-    // Filter by building type
-    if (!empty($_POST['building_type'])) {
-        $args['meta_query'][] = array(
-            'key'     => 'building_type',
-            'value'   => sanitize_text_field($_POST['building_type']),
-            'compare' => '=',
-        );
+    // Results are the same for every anonymous visitor
+    if (is_user_logged_in()) {
+        real_estate_objects_send_filter_results(real_estate_objects_filter_results($filters));
     }
 
-    // Filter by floors
-    if (!empty($_POST['min_floors'])) {
-        $args['meta_query'][] = array(
-            'key'     => 'floors',
-            'value'   => intval($_POST['min_floors']),
-            'compare' => '>=',
-            'type'    => 'NUMERIC',
-        );
+    real_estate_objects_send_filter_results($real_estate_fragment_cache->remember('ajax_results', $filters, function () use ($filters) {
+        return real_estate_objects_filter_results($filters);
+    }));
+}
+add_action('wp_ajax_real_estate_filter', 'real_estate_objects_filter_ajax');
+add_action('wp_ajax_nopriv_real_estate_filter', 'real_estate_objects_filter_ajax');
+
+/**
+ * Send filter results, with the recorded phases when Server-Timing is enabled
+ *
+ * The phases go in a Server-Timing header and, for debugging from the
+ * browser, in a timing field next to results and pagination. The field is
+ * added after the fragment cache, so cached results never contain it.
+ *
+ * @param array $data Results and pagination
+ */
+function real_estate_objects_send_filter_results($data) {
+    global $real_estate_timing;
+
+    if ($real_estate_timing->enabled()) {
+        $data['timing'] = $real_estate_timing->get_metrics();
+        $real_estate_timing->send_header();
     }
 
-    if (!empty($_POST['max_floors'])) {
-        $args['meta_query'][] = array(
-            'key'     => 'floors',
-            'value'   => intval($_POST['max_floors']),
-            'compare' => '<=',
-            'type'    => 'NUMERIC',
-        );
+    wp_send_json_success($data);
+}
+
+/**
+ * Normalize the filter request
+ *
+ * Empty values are dropped and numbers cast, so equivalent requests share a
+ * cache key.
+ *
+ * @return array
+ */
+function real_estate_objects_normalize_filter_request() {
+    $integer_fields = array('min_floors', 'max_floors', 'min_eco_rating', 'rooms', 'page');
+    $text_fields = array('district', 'building_type', 'balcony', 'bathroom', 'sort');
+    $filters = array();
+
+    foreach ($integer_fields as $field) {
+        if (!empty($_POST[$field]) && intval($_POST[$field]) > 0) {
+            $filters[$field] = intval($_POST[$field]);
+        }
     }
 
-    // Filter by eco-rating
-    if (!empty($_POST['min_eco_rating'])) {
-        $args['meta_query'][] = array(
-            'key'     => 'eco_rating',
-            'value'   => intval($_POST['min_eco_rating']),
-            'compare' => '>=',
-            'type'    => 'NUMERIC',
-        );
+    foreach ($text_fields as $field) {
+        if (!empty($_POST[$field])) {
+            $filters[$field] = sanitize_text_field($_POST[$field]);
+        }
     }
 
-    // Add premises filters if needed
-    $premises_meta_query = array('relation' => 'AND');
-    $has_premises_filter = false;
+    $filters = wp_parse_args($filters, array('page' => 1, 'sort' => 'ecology-high'));
+    ksort($filters);
 
-    // Filter by rooms
-    if (!empty($_POST['rooms'])) {
-        $premises_meta_query[] = array(
-            'key'     => 'premises_%_rooms',
-            'value'   => intval($_POST['rooms']),
-            'compare' => '=',
-        );
-        $has_premises_filter = true;
-    }
+    return $filters;
+}
+
+/**
+ * Run the filter query
+ *
+ * @param array $filters Normalized filters from real_estate_objects_normalize_filter_request()
+ * @return array Results and pagination
+ */
+function real_estate_objects_filter_results($filters) {
+    global $real_estate_documents, $real_estate_timing;
+
+    $value = function ($field) use ($filters) {
+        return isset($filters[$field]) ? $filters[$field] : '';
+    };
+
+    // Meta and districts come from the documents primed below, not from WP_Query's caches
+    $args = array(
+        'post_type'              => 'real_estate_object',
+        'posts_per_page'         => 5,
+        'paged'                  => $filters['page'],
+        'tax_query'              => array(),
+        'update_post_meta_cache' => false,
+        'update_post_term_cache' => false,
+        'orderby'                => array(
+            'ID' => 'ASC' // Add a secondary, consistent ordering by ID to prevent duplicates
+        ),
+    );
 
-    // Filter by balcony
-    if (!empty($_POST['balcony'])) {
-        $premises_meta_query[] = array(
-            'key'     => 'premises_%_balcony',
-            'value'   => sanitize_text_field($_POST['balcony']),
-            'compare' => '=',
+    // Filter by district
+    if (!empty($filters['district'])) {
+        $args['tax_query'][] = array(
+            'taxonomy' => 'district',
+            'field'    => 'slug',
+            'terms'    => $filters['district'],
         );
-        $has_premises_filter = true;
     }
 
-    // Filter by bathroom
-    if (!empty($_POST['bathroom'])) {
-        $premises_meta_query[] = array(
-            'key'     => 'premises_%_bathroom',
-            'value'   => sanitize_text_field($_POST['bathroom']),
-            'compare' => '=',
-        );
-        $has_premises_filter = true;
+    // Filter by building type, floors and eco-rating through the typed attribute table
+    $attribute_filter = Real_Estate_Attribute_Index::build_filter(
+        $value('building_type'),
+        $value('min_floors'),
+        $value('max_floors'),
+        $value('min_eco_rating')
+    );
+
+    if (!empty($attribute_filter)) {
+        $args[Real_Estate_Attribute_Index::QUERY_VAR] = $attribute_filter;
     }
 
-    // Add premises meta query if any premises filter is applied
-    if ($has_premises_filter) {
-        $args['meta_query'][] = $premises_meta_query;
+    // Filter by premises (rooms, balcony, bathroom) through the indexed premises table
+    $premises_filter = Real_Estate_Premises_Index::build_filter($value('rooms'), $value('balcony'), $value('bathroom'));
+
+    if (!empty($premises_filter)) {
+        $args[Real_Estate_Premises_Index::QUERY_VAR] = $premises_filter;
     }
 
     // Sort results if requested
-    $sort = isset($_POST['sort']) ? sanitize_text_field($_POST['sort']) : 'ecology-high';
-
-    switch ($sort) {
+    switch ($filters['sort']) {
         case 'ecology-high':
             // Sort by ecology rating (highest first)
-            $args['meta_key'] = 'eco_rating';
-            $args['orderby'] = array(
-                'meta_value_num' => 'DESC',
-                'ID' => 'ASC'
-            );
+            $args[Real_Estate_Attribute_Index::ORDERBY_VAR] = array('eco_rating' => 'DESC');
             break;
 
         case 'ecology-low':
             // Sort by ecology rating (lowest first)
-            $args['meta_key'] = 'eco_rating';
-            $args['orderby'] = array(
-                'meta_value_num' => 'ASC',
-                'ID' => 'ASC'
-            );
+            $args[Real_Estate_Attribute_Index::ORDERBY_VAR] = array('eco_rating' => 'ASC');
             break;
 
         case 'price-low':
@@ -435,45 +462,48 @@ function real_estate_objects_filter_ajax() {
     }
 
     // Get posts
+    $real_estate_timing->start('query');
     $query = new WP_Query($args);
-    $results = array();
+    $real_estate_timing->stop('query');
 
-    if ($query->have_posts()) {
-        while ($query->have_posts()) {
-            $query->the_post();
-
-            $building_image = get_field('building_image');
-            $image_url = !empty($building_image) ? $building_image['url'] : '';
-
-            $results[] = array(
-                'id'            => get_the_ID(),
-                'title'         => get_the_title(),
-                'excerpt'       => get_the_excerpt(),
-                'link'          => get_permalink(),
-                'image_url'     => $image_url,
-                'building_name' => get_field('building_name'),
-                'floors'        => get_field('floors'),
-                'building_type' => get_field('building_type'),
-                'eco_rating'    => get_field('eco_rating'),
-                'price'         => get_field('price') ? get_field('price') : 0,
-            );
-        }
+    $results = array();
 
-        wp_reset_postdata();
+    // Load the materialized documents of the page in one query
+    $real_estate_timing->start('documents');
+    $real_estate_documents->prime(wp_list_pluck($query->posts, 'ID'));
+    $real_estate_timing->stop('documents');
+
+    $real_estate_timing->start('prepare');
+
+    foreach ($query->posts as $post) {
+        $document = $real_estate_documents->get($post->ID);
+
+        $results[] = array(
+            'id'            => $post->ID,
+            'title'         => get_the_title($post),
+            'excerpt'       => $document['excerpt'],
+            'link'          => get_permalink($post),
+            'image_url'     => !empty($document['building_image']) ? $document['building_image']['url'] : '',
+            'building_name' => $document['building_name'],
+            'floors'        => $document['floors'],
+            'building_type' => $document['building_type'],
+            'eco_rating'    => $document['eco_rating'],
+            'price'         => $document['price'] ? $document['price'] : 0,
+        );
     }
 
+    $real_estate_timing->stop('prepare');
+
     // Prepare pagination
     $pagination = array(
         'total'        => $query->max_num_pages,
-        'current'      => isset($_POST['page']) ? intval($_POST['page']) : 1,
+        'current'      => $filters['page'],
         'per_page'     => 5,
         'total_items'  => $query->found_posts,
     );
 
-    wp_send_json_success(array(
+    return array(
         'results'    => $results,
         'pagination' => $pagination,
-    ));
+    );
 }
-add_action('wp_ajax_real_estate_filter', 'real_estate_objects_filter_ajax');
-add_action('wp_ajax_nopriv_real_estate_filter', 'real_estate_objects_filter_ajax');
@@ -0,0 +1,431 @@
+<?php
+/**
+ * Media pipeline: SVG sanitization on upload, background dimensions, previews and raster thumbnails
+ *
+ * SVG files are sanitized with the cheap regex pass before they are moved
+ * into the uploads directory, so an unsanitized file is never public. The
+ * slower work is queued: a WP-Cron worker (or `wp simple-svg-upload
+ * process-queue`) reads SVG dimensions, renders previews and generates
+ * raster thumbnails in batches, and retries attachments that failed or
+ * were left behind by a crashed worker.
+ */
+
+// Exit if accessed directly
+if (!defined('ABSPATH')) {
+    exit;
+}
+
+/**
+ * Attachment meta holding the pipeline status: pending, processing, done or failed
+ */
+define('SIMPLE_SVG_UPLOAD_STATUS_META', '_simple_svg_upload_status');
+
+/**
+ * Attachment meta counting the processing attempts
+ */
+define('SIMPLE_SVG_UPLOAD_ATTEMPTS_META', '_simple_svg_upload_attempts');
+
+/**
+ * Processing attempts before an attachment is left as failed
+ */
+define('SIMPLE_SVG_UPLOAD_MAX_ATTEMPTS', 3);
+
+/**
+ * WP-Cron hook of the queue worker
+ */
+define('SIMPLE_SVG_UPLOAD_CRON_HOOK', 'simple_svg_upload_process_queue');
+
+/**
+ * Hourly WP-Cron hook that restarts the worker for retries and crashed runs
+ */
+define('SIMPLE_SVG_UPLOAD_RETRY_HOOK', 'simple_svg_upload_retry_queue');
+
+/**
+ * Option used as the worker lock
+ */
+define('SIMPLE_SVG_UPLOAD_LOCK_OPTION', 'simple_svg_upload_queue_lock');
+
+/**
+ * Attachments processed per worker run
+ */
+define('SIMPLE_SVG_UPLOAD_BATCH_SIZE', 20);
+
+/**
+ * Width of the raster preview rendered for SVG files
+ */
+define('SIMPLE_SVG_UPLOAD_PREVIEW_WIDTH', 1024);
+
+/**
+ * Sanitize an uploaded SVG before it is moved into the uploads directory
+ *
+ * @param array $file Name, type and temporary path of the upload
+ * @return array
+ */
+function simple_svg_upload_sanitize($file) {
+    if (empty($file['error']) && ($file['type'] === 'image/svg+xml' || preg_match('/\.svg$/i', $file['name']))) {
+        $content = file_get_contents($file['tmp_name']);
+
+        if ($content === false || file_put_contents($file['tmp_name'], simple_svg_upload_sanitize_markup($content)) === false) {
+            $file['error'] = 'The SVG file could not be sanitized.';
+        }
+    }
+
+    return $file;
+}
+add_filter('wp_handle_upload_prefilter', 'simple_svg_upload_sanitize');
+add_filter('wp_handle_sideload_prefilter', 'simple_svg_upload_sanitize');
+
+/**
+ * Schedule the hourly retry run
+ */
+function simple_svg_upload_schedule_retries() {
+    if (!wp_next_scheduled(SIMPLE_SVG_UPLOAD_RETRY_HOOK)) {
+        wp_schedule_event(time() + HOUR_IN_SECONDS, 'hourly', SIMPLE_SVG_UPLOAD_RETRY_HOOK);
+    }
+}
+add_action('init', 'simple_svg_upload_schedule_retries');
+
+/**
+ * Queue new image attachments and wake the worker
+ *
+ * @param int $attachment_id
+ */
+function simple_svg_upload_enqueue($attachment_id) {
+    if (!wp_attachment_is_image($attachment_id) && get_post_mime_type($attachment_id) !== 'image/svg+xml') {
+        return;
+    }
+
+    update_post_meta($attachment_id, SIMPLE_SVG_UPLOAD_STATUS_META, 'pending');
+    delete_post_meta($attachment_id, SIMPLE_SVG_UPLOAD_ATTEMPTS_META);
+
+    if (!wp_next_scheduled(SIMPLE_SVG_UPLOAD_CRON_HOOK)) {
+        wp_schedule_single_event(time(), SIMPLE_SVG_UPLOAD_CRON_HOOK);
+    }
+}
+add_action('add_attachment', 'simple_svg_upload_enqueue');
+
+/**
+ * Defer thumbnail generation of queued raster images to the worker
+ *
+ * @param array $sizes Image sizes to generate
+ * @param array $image_meta
+ * @param int $attachment_id
+ * @return array
+ */
+function simple_svg_upload_defer_subsizes($sizes, $image_meta, $attachment_id) {
+    if (get_post_meta($attachment_id, SIMPLE_SVG_UPLOAD_STATUS_META, true) === 'pending') {
+        return array();
+    }
+
+    return $sizes;
+}
+add_filter('intermediate_image_sizes_advanced', 'simple_svg_upload_defer_subsizes', 10, 3);
+
+/**
+ * Process a batch of queued attachments
+ *
+ * Only one worker runs at a time. If more attachments are waiting after
+ * the batch, another run is scheduled right away.
+ *
+ * @param int $limit Attachments to process
+ * @return int Number of attachments processed
+ */
+function simple_svg_upload_process_queue($limit = SIMPLE_SVG_UPLOAD_BATCH_SIZE) {
+    if (!simple_svg_upload_acquire_lock()) {
+        return 0;
+    }
+
+    $processed = 0;
+
+    try {
+        foreach (simple_svg_upload_get_queue($limit) as $attachment_id) {
+            simple_svg_upload_process_attachment($attachment_id);
+            $processed++;
+        }
+    } finally {
+        delete_option(SIMPLE_SVG_UPLOAD_LOCK_OPTION);
+    }
+
+    if (!empty(simple_svg_upload_get_queue(1)) && !wp_next_scheduled(SIMPLE_SVG_UPLOAD_CRON_HOOK)) {
+        wp_schedule_single_event(time(), SIMPLE_SVG_UPLOAD_CRON_HOOK);
+    }
+
+    return $processed;
+}
+add_action(SIMPLE_SVG_UPLOAD_CRON_HOOK, 'simple_svg_upload_process_queue');
+add_action(SIMPLE_SVG_UPLOAD_RETRY_HOOK, 'simple_svg_upload_process_queue');
+
+/**
+ * IDs of queued attachments, oldest first
+ *
+ * Besides pending attachments this returns failed ones and ones still
+ * marked processing, which only a crashed worker leaves behind as a single
+ * worker runs at a time, until they have used up their attempts.
+ *
+ * @param int $limit
+ * @return int[]
+ */
+function simple_svg_upload_get_queue($limit) {
+    return get_posts(array(
+        'post_type'      => 'attachment',
+        'post_status'    => 'inherit',
+        'posts_per_page' => $limit,
+        'orderby'        => 'ID',
+        'order'          => 'ASC',
+        'fields'         => 'ids',
+        'no_found_rows'  => true,
+        'meta_query'     => array(
+            'relation' => 'OR',
+            array(
+                'key'   => SIMPLE_SVG_UPLOAD_STATUS_META,
+                'value' => 'pending',
+            ),
+            array(
+                'relation' => 'AND',
+                array(
+                    'key'     => SIMPLE_SVG_UPLOAD_STATUS_META,
+                    'value'   => array('processing', 'failed'),
+                    'compare' => 'IN',
+                ),
+                array(
+                    'relation' => 'OR',
+                    array(
+                        'key'     => SIMPLE_SVG_UPLOAD_ATTEMPTS_META,
+                        'compare' => 'NOT EXISTS',
+                    ),
+                    array(
+                        'key'     => SIMPLE_SVG_UPLOAD_ATTEMPTS_META,
+                        'value'   => SIMPLE_SVG_UPLOAD_MAX_ATTEMPTS,
+                        'compare' => '<',
+                        'type'    => 'NUMERIC',
+                    ),
+                ),
+            ),
+        ),
+    ));
+}
+
+/**
+ * Take the worker lock, breaking locks left behind by a crashed worker
+ *
+ * @return bool
+ */
+function simple_svg_upload_acquire_lock() {
+    if (add_option(SIMPLE_SVG_UPLOAD_LOCK_OPTION, time(), '', 'no')) {
+        return true;
+    }
+
+    if ((int) get_option(SIMPLE_SVG_UPLOAD_LOCK_OPTION) < time() - 10 * MINUTE_IN_SECONDS) {
+        delete_option(SIMPLE_SVG_UPLOAD_LOCK_OPTION);
+        return add_option(SIMPLE_SVG_UPLOAD_LOCK_OPTION, time(), '', 'no');
+    }
+
+    return false;
+}
+
+/**
+ * Run the pipeline steps for one attachment
+ *
+ * @param int $attachment_id
+ * @return bool Whether the attachment was processed successfully
+ */
+function simple_svg_upload_process_attachment($attachment_id) {
+    update_post_meta($attachment_id, SIMPLE_SVG_UPLOAD_STATUS_META, 'processing');
+    update_post_meta($attachment_id, SIMPLE_SVG_UPLOAD_ATTEMPTS_META, (int) get_post_meta($attachment_id, SIMPLE_SVG_UPLOAD_ATTEMPTS_META, true) + 1);
+
+    if (get_post_mime_type($attachment_id) === 'image/svg+xml') {
+        $result = simple_svg_upload_process_svg($attachment_id);
+    } else {
+        // Generates the sub-sizes skipped at upload; no longer filtered out as the status is not pending
+        require_once ABSPATH . 'wp-admin/includes/image.php';
+        $result = !is_wp_error(wp_update_image_subsizes($attachment_id));
+    }
+
+    update_post_meta($attachment_id, SIMPLE_SVG_UPLOAD_STATUS_META, $result ? 'done' : 'failed');
+
+    return $result;
+}
+
+/**
+ * Record the dimensions and preview of an SVG sanitized on upload
+ *
+ * @param int $attachment_id
+ * @return bool
+ */
+function simple_svg_upload_process_svg($attachment_id) {
+    $file = get_attached_file($attachment_id);
+
+    if (!$file || !file_exists($file)) {
+        return false;
+    }
+
+    $content = file_get_contents($file);
+
+    if ($content === false) {
+        return false;
+    }
+
+    $metadata = array('file' => _wp_relative_upload_path($file), 'sizes' => array());
+    $dimensions = simple_svg_upload_get_dimensions($content);
+
+    if ($dimensions) {
+        $metadata['width'] = $dimensions['width'];
+        $metadata['height'] = $dimensions['height'];
+
+        $preview = simple_svg_upload_render_preview($file, $dimensions);
+
+        if ($preview) {
+            $metadata['sizes']['preview'] = $preview;
+        }
+    }
+
+    wp_update_attachment_metadata($attachment_id, $metadata);
+
+    return true;
+}
+
+/**
+ * Remove script tags and event handler attributes from SVG markup
+ *
+ * @param string $content
+ * @return string
+ */
+function simple_svg_upload_sanitize_markup($content) {
+    // Remove script tags
+    $content = preg_replace('/<script[\s\S]*?>[\s\S]*?<\/script>/i', '', $content);
+
+    // Remove onclick and other event handlers
+    return preg_replace('/\s+on\w+=["\'][^"\']*["\']/', '', $content);
+}
+
+/**
+ * Width and height of an SVG from its root element
+ *
+ * Uses the width and height attributes when they are absolute lengths and
+ * falls back to the viewBox.
+ *
+ * @param string $content
+ * @return array|null
+ */
+function simple_svg_upload_get_dimensions($content) {
+    if (!preg_match('/<svg\b[^>]*>/i', $content, $match)) {
+        return null;
+    }
+
+    $attribute = function ($name) use ($match) {
+        return preg_match('/\s' . $name . '\s*=\s*["\']([^"\']*)["\']/i', $match[0], $value) ? trim($value[1]) : null;
+    };
+
+    $width = $attribute('width');
+    $height = $attribute('height');
+
+    if ($width !== null && $height !== null && preg_match('/^[\d.]+(px)?$/', $width) && preg_match('/^[\d.]+(px)?$/', $height)) {
+        return array('width' => (int) round((float) $width), 'height' => (int) round((float) $height));
+    }
+
+    $view_box = $attribute('viewBox');
+
+    if ($view_box !== null) {
+        $parts = preg_split('/[\s,]+/', $view_box);
+
+        if (count($parts) === 4 && (float) $parts[2] > 0 && (float) $parts[3] > 0) {
+            return array('width' => (int) round((float) $parts[2]), 'height' => (int) round((float) $parts[3]));
+        }
+    }
+
+    return null;
+}
+
+/**
+ * Render a PNG preview of an SVG next to it, if Imagick can read SVG
+ *
+ * @param string $file Sanitized SVG file
+ * @param array $dimensions Width and height of the SVG
+ * @return array|null Size entry for the attachment metadata
+ */
+function simple_svg_upload_render_preview($file, $dimensions) {
+    if (!class_exists('Imagick') || !in_array('SVG', Imagick::queryFormats('SVG'), true)) {
+        return null;
+    }
+
+    $width = min(SIMPLE_SVG_UPLOAD_PREVIEW_WIDTH, $dimensions['width']);
+    $height = (int) round($width * $dimensions['height'] / $dimensions['width']);
+    $preview = preg_replace('/\.svg$/i', '', $file) . '-preview.png';
+
+    try {
+        $image = new Imagick();
+        $image->setBackgroundColor(new ImagickPixel('transparent'));
+        $image->readImage($file);
+        $image->setImageFormat('png32');
+        $image->thumbnailImage($width, $height);
+        $image->writeImage($preview);
+        $image->clear();
+    } catch (Exception $e) {
+        return null;
+    }
+
+    return array(
+        'file'      => wp_basename($preview),
+        'width'     => $width,
+        'height'    => $height,
+        'mime-type' => 'image/png',
+    );
+}
+
+/**
+ * Pipeline status of an attachment for the REST API
+ *
+ * @param array $object
+ * @return string|null
+ */
+function simple_svg_upload_get_rest_status($object) {
+    $status = get_post_meta($object['id'], SIMPLE_SVG_UPLOAD_STATUS_META, true);
+
+    return $status ? $status : null;
+}
+
+/**
+ * Expose the pipeline status on /wp/v2/media
+ */
+function simple_svg_upload_register_rest_fields() {
+    register_rest_field('attachment', 'media_pipeline', array(
+        'get_callback' => 'simple_svg_upload_get_rest_status',
+        'schema'       => array(
+            'description' => 'Background processing status: pending, processing, done or failed',
+            'type'        => array('string', 'null'),
+            'context'     => array('view', 'edit'),
+            'readonly'    => true,
+        ),
+    ));
+}
+add_action('rest_api_init', 'simple_svg_upload_register_rest_fields');
+
+if (defined('WP_CLI') && WP_CLI) {
+    /**
+     * Process the media queue until it is empty.
+     *
+     * ## OPTIONS
+     *
+     * [--batch-size=<number>]
+     * : Attachments per batch. Default 20.
+     *
+     * ## EXAMPLES
+     *
+     *     wp simple-svg-upload process-queue
+     */
+    WP_CLI::add_command('simple-svg-upload process-queue', function ($args, $assoc_args) {
+        $batch_size = isset($assoc_args['batch-size']) ? max(1, intval($assoc_args['batch-size'])) : SIMPLE_SVG_UPLOAD_BATCH_SIZE;
+        $total = 0;
+
+        do {
+            $processed = simple_svg_upload_process_queue($batch_size);
+            $total += $processed;
+
+            if ($processed) {
+                WP_CLI::log(sprintf('Processed %d attachments', $total));
+            }
+        } while ($processed === $batch_size);
+
+        WP_CLI::success(sprintf('Processed %d attachments.', $total));
+    });
+}
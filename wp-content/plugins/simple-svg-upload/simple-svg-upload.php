@@ -39,27 +39,8 @@ function simple_svg_upload_fix_mime_type_detection($data, $file, $filename, $mim
 }
 add_filter('wp_check_filetype_and_ext', 'simple_svg_upload_fix_mime_type_detection', 10, 4);
 
-/**
- * Basic SVG sanitization on upload
- */
-function simple_svg_upload_sanitize($file) {
-    if ($file['type'] === 'image/svg+xml') {
-        // Read the file
-        $content = file_get_contents($file['tmp_name']);
-
-        // Remove script tags
-        $content = preg_replace('/<script[\s\S]*?>[\s\S]*?<\/script>/i', '', $content);
-
-        // Remove onclick and other event handlers
-        $content = preg_replace('/\s+on\w+=["\'][^"\']*["\']/', '', $content);
-
-        // Write the sanitized content back to the file
-        file_put_contents($file['tmp_name'], $content);
-    }
-
-    return $file;
-}
-add_filter('wp_handle_upload_prefilter', 'simple_svg_upload_sanitize');
+// Sanitization on upload; dimensions, previews and thumbnails in the background media pipeline
+require_once plugin_dir_path(__FILE__) . 'media-pipeline.php';
 
 /**
  * Display SVG thumbnails in media library
@@ -109,6 +90,7 @@ function simple_svg_upload_admin_page() {
                 <li>Removes &lt;script&gt; tags from SVG files</li>
                 <li>Removes event handlers (like onclick attributes)</li>
             </ul>
+            <p>Sanitization runs during the upload, before the file is stored in the uploads directory. Dimensions and previews are added afterwards by the background media queue.</p>
             <p><strong>Note:</strong> While this provides some protection, it is still recommended to only allow trusted users to upload files.</p>
         </div>
 
@@ -20,21 +20,23 @@ $container = get_theme_mod( 'understrap_container_type' );
 				while ( have_posts() ) {
 					the_post();
 
+					// Gather building metadata from the property's materialized document
+					$document = function_exists( 'real_estate_objects_get_document' ) ? real_estate_objects_get_document( get_the_ID() ) : null;
+
 					// Get district and add to description
 					$district_text = '';
-					$districts = get_the_terms( get_the_ID(), 'district' );
-					if ( $districts && ! is_wp_error( $districts ) ) {
-						$district_text = $districts[0]->name;
+					$districts = $document ? $document['districts'] : array();
+					if ( $districts ) {
+						$district_text = $districts[0]['name'];
 					}
 
-					// Gather building metadata
-					$building_name = get_field('building_name');
-					$floors = get_field('floors');
-					$coordinates = get_field('coordinates');
-					$eco_rating = get_field('eco_rating');
+					$building_name = $document ? $document['building_name'] : '';
+					$floors = $document ? $document['floors'] : '';
+					$coordinates = $document ? $document['coordinates'] : '';
+					$eco_rating = $document ? $document['eco_rating'] : '';
 
 					// Get building type in Ukrainian
-					$building_type = get_field('building_type');
+					$building_type = $document ? $document['building_type'] : '';
 					$building_type_label = '';
 					if ($building_type) {
 						switch ($building_type) {
@@ -71,16 +73,10 @@ $container = get_theme_mod( 'understrap_container_type' );
 								echo '</div>';
 							}
 							// Otherwise try ACF image field
-							else if (function_exists('get_field') && ($building_image = get_field('building_image'))) {
+							else if ($document && ($building_image = $document['building_image'])) {
 								echo '<div class="building-acf-image">';
-								if (is_array($building_image) && !empty($building_image['url'])) {
-									echo '<img src="' . esc_url($building_image['url']) . '" alt="' . esc_attr($building_image['alt'] ?? '') . '" class="img-fluid property-image" />';
-								} elseif (is_numeric($building_image)) {
-									$image_url = wp_get_attachment_url($building_image);
-									if ($image_url) {
-										echo '<img src="' . esc_url($image_url) . '" alt="' . __('Зображення будівлі', 'understrap-child') . '" class="img-fluid property-image" />';
-									}
-								}
+								$image_alt = $building_image['alt'] !== '' ? $building_image['alt'] : __('Зображення будівлі', 'understrap-child');
+								echo '<img src="' . esc_url($building_image['url']) . '" alt="' . esc_attr($image_alt) . '" class="img-fluid property-image" />';
 								echo '</div>';
 							}
 							?>
@@ -115,14 +111,14 @@ $container = get_theme_mod( 'understrap_container_type' );
 											<th><?php _e('Екологічність:', 'understrap-child'); ?></th>
 											<td><?php echo esc_html($eco_rating); ?> / 5</td>
 										</tr>
-										<?php if ($districts && !is_wp_error($districts)) : ?>
+										<?php if ($districts) : ?>
 										<tr>
 											<th><?php _e('Район:', 'understrap-child'); ?></th>
 											<td>
 												<?php
 												$district_links = array();
 												foreach ($districts as $district) {
-													$district_links[] = '<a href="' . esc_url(get_term_link($district)) . '">' . esc_html($district->name) . '</a>';
+													$district_links[] = '<a href="' . esc_url(get_term_link((int) $district['id'], 'district')) . '">' . esc_html($district['name']) . '</a>';
 												}
 												echo implode(', ', $district_links);
 												?>
@@ -134,7 +130,7 @@ $container = get_theme_mod( 'understrap_container_type' );
 
 								<?php
 								// Display premises
-								$premises = get_field('premises');
+								$premises = $document ? $document['premises'] : array();
 								if ($premises) : ?>
 									<div class="premises">
 										<h3><?php _e('Приміщення', 'understrap-child'); ?></h3>
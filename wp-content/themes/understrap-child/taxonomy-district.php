@@ -48,6 +48,9 @@ $container = get_theme_mod( 'understrap_container_type' );
 							// Start the loop.
 							while ( have_posts() ) :
 								the_post();
+
+								// Card fields from the property's materialized document, primed for the whole page
+								$document = function_exists( 'real_estate_objects_get_document' ) ? real_estate_objects_get_document( get_the_ID() ) : null;
 								?>
 								<div class="col-md-6 col-lg-4 mb-4">
 									<div class="card h-100">
@@ -55,7 +58,7 @@ $container = get_theme_mod( 'understrap_container_type' );
 											<a href="<?php the_permalink(); ?>">
 												<?php the_post_thumbnail( 'medium', array( 'class' => 'card-img-top' ) ); ?>
 											</a>
-										<?php elseif ( function_exists( 'get_field' ) && $building_image = get_field( 'building_image' ) ) : ?>
+										<?php elseif ( $document && $building_image = $document['building_image'] ) : ?>
 											<a href="<?php the_permalink(); ?>">
 												<img src="<?php echo esc_url( $building_image['url'] ); ?>" class="card-img-top" alt="<?php the_title_attribute(); ?>">
 											</a>
@@ -66,18 +69,18 @@ $container = get_theme_mod( 'understrap_container_type' );
 												<a href="<?php the_permalink(); ?>"><?php the_title(); ?></a>
 											</h2>
 
-											<?php if ( function_exists( 'get_field' ) ) : ?>
+											<?php if ( $document ) : ?>
 												<div class="card-meta">
-													<?php if ( $building_name = get_field( 'building_name' ) ) : ?>
+													<?php if ( $building_name = $document['building_name'] ) : ?>
 														<p><strong><?php _e( 'Назва:', 'understrap-child' ); ?></strong> <?php echo esc_html( $building_name ); ?></p>
 													<?php endif; ?>
 
-													<?php if ( $floors = get_field( 'floors' ) ) : ?>
+													<?php if ( $floors = $document['floors'] ) : ?>
 														<p><strong><?php _e( 'Поверхів:', 'understrap-child' ); ?></strong> <?php echo esc_html( $floors ); ?></p>
 													<?php endif; ?>
 
 													<?php
-													$building_type = get_field( 'building_type' );
+													$building_type = $document['building_type'];
 													if ( $building_type ) :
 														$building_type_label = '';
 														switch ( $building_type ) {
@@ -95,7 +98,7 @@ $container = get_theme_mod( 'understrap_container_type' );
 														<p><strong><?php _e( 'Тип:', 'understrap-child' ); ?></strong> <?php echo esc_html( $building_type_label ); ?></p>
 													<?php endif; ?>
 
-													<?php if ( $eco_rating = get_field( 'eco_rating' ) ) : ?>
+													<?php if ( $eco_rating = $document['eco_rating'] ) : ?>
 														<p><strong><?php _e( 'Екологічність:', 'understrap-child' ); ?></strong> <?php echo esc_html( $eco_rating ); ?> / 5</p>
 													<?php endif; ?>
 												</div>